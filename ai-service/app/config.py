@@ -18,6 +18,7 @@ class Settings(BaseSettings):
     openai_project_id: str = ""  # Project ID obrigatório para novas APIs
     openai_model: str = "gpt-4o-mini"
     openai_embedding_model: str = "text-embedding-3-small"
+    openai_embedding_dimensions: int = 0  # perfil padrão; 0 = dimensão completa do modelo
     
     # Anthropic (Claude)
     anthropic_api_key: str = ""
@@ -53,10 +54,62 @@ class Settings(BaseSettings):
     QUEUE_MAX_WAIT_TIME: int = 5  # segundos
     QUEUE_MIN_GAP_TIME: int = 3   # segundos
     QUEUE_CHECK_INTERVAL: int = 1 # segundos
+
+    # Streaming da resposta final para o Laravel (mensagens em partes)
+    agent_streaming_enabled: bool = False
+    agent_stream_min_chars: int = 60   # Tamanho minimo de uma parte
+    agent_stream_max_chars: int = 700  # Forca o corte em frases muito longas
+
+    # Single-flight: chamadas identicas ao LLM em andamento compartilham o resultado
+    llm_single_flight_enabled: bool = True
+    llm_single_flight_scope: str = "tenant"  # tenant | global
+    # Execução do agente deduplicada por (tenant, lead, mensagem): reentregas não respondem de novo
+    agent_run_dedup_enabled: bool = True
+    agent_run_dedup_ttl_seconds: int = 600
+
+    # Tool calls read-only do mesmo turno executadas em paralelo (limite por turno)
+    tool_call_concurrency: int = 4
+
+    # Cache TTL de resultados das ferramentas MCP read-only (por tenant, em memória)
+    mcp_tool_cache_enabled: bool = True
+    mcp_tool_cache_max_entries: int = 5000
+
+    # Observabilidade das ferramentas MCP
+    mcp_call_history_size: int = 1000   # Ultimas chamadas mantidas em memoria
+    mcp_metrics_max_series: int = 5000  # Limite de series (tool, tenant, agent_type)
+
+    # Rate limit das ferramentas MCP (token bucket no Redis, compartilhado entre replicas)
+    mcp_rate_limit_burst_ratio: float = 1.0  # capacidade do bucket = limite/min * ratio
+    mcp_rate_limit_local_lease: int = 5      # tokens reservados por ida ao Redis (0 = desliga)
+    mcp_rate_limit_lease_seconds: float = 2.0  # validade dos tokens reservados localmente
+
+    # Roteamento de provedores do MCP (failover, circuit breaker e hedge)
+    llm_failover_enabled: bool = True
+    llm_failover_providers: str = "anthropic,openai"  # ordem de preferencia
+    llm_failover_openai_model: str = "gpt-4o"         # equivalente OpenAI de um modelo Claude
+    llm_circuit_failure_threshold: int = 5            # falhas seguidas que abrem o circuito
+    llm_circuit_open_seconds: int = 30
+    llm_stats_window: int = 200                       # chamadas na janela de latencia/erros
+    llm_hedge_agent_types: str = "sdr"                # agentes sensiveis a latencia
+    llm_hedge_percentile: float = 95.0                # atraso do hedge = pXX da latencia do primario
+    llm_hedge_min_samples: int = 20                   # abaixo disso usa o atraso padrao
+    llm_hedge_min_delay_ms: int = 500
+    llm_hedge_default_delay_ms: int = 4000
     
     # RAG Settings
     rag_top_k: int = 10
     rag_similarity_threshold: float = 0.7
+    rag_index_enabled: bool = True            # snapshot mmap do índice vetorial
+    rag_index_dir: str = "/var/rag-index"     # diretório dos snapshots (compartilhado entre workers)
+    rag_index_refresh_seconds: int = 60       # intervalo mínimo entre refresh incrementais
+    embedding_reindex_batch_size: int = 100   # linhas por lote na re-indexação de perfil
+    
+    # Knowledge Base Compaction
+    kb_compaction_enabled: bool = True
+    kb_compaction_hour: int = 3               # execução diária (hora local)
+    kb_compaction_similarity: float = 0.95    # limiar de quase-duplicado
+    kb_learned_retention_days: int = 180      # conhecimento automático sem uso
+    kb_lead_memory_retention_days: int = 365  # insights de lead (lead_memory)
     
     # Memory Settings
     short_term_memory_limit: int = 20  # últimas N mensagens
@@ -64,6 +117,49 @@ class Settings(BaseSettings):
     
     # ML Settings
     lead_classification_threshold: float = 0.7
+    ml_fused_analysis_enabled: bool = True  # Intenção + BANT + transferência numa única chamada
+
+    # Micro-batching de inferência (LeadScoreNet / CampaignPredictorNet)
+    ml_batching_enabled: bool = True
+    ml_batch_max_size: int = 64           # Predições por forward pass
+    ml_batch_max_wait_ms: float = 5.0     # Espera máxima para completar o batch
+    ml_model_info_ttl_seconds: int = 300  # Cache de get_model_info (invalidado ao salvar modelo)
+    ml_bulk_chunk_size: int = 1000        # Leads por predict_batch no scoring em massa
+    ml_campaign_optimizer_budget_ms: float = 50.0  # Tempo da busca de configuração de campanha
+    ml_inference_runtime: str = "auto"   # auto | numpy | torch (.npz exportado dispensa torch)
+
+    # Cache de modelos carregados (LRU + invalidação entre réplicas via Redis)
+    ml_model_cache_max_entries: int = 500
+    ml_model_cache_max_mb: int = 512
+    ml_model_version_check_seconds: float = 5.0  # Checagem de versão (backstop do pub/sub)
+    ml_model_preload_tenants: int = 50           # Tenants mais ativos carregados no startup
+
+    # Treino fora do event loop (TrainingExecutor)
+    ml_training_mode: str = "process"  # process | thread
+    ml_training_workers: int = 2       # Treinos simultâneos (processos do pool)
+    ml_training_threads: int = 2       # Threads do torch por processo de treino
+    ml_training_nice: int = 10         # Prioridade reduzida dos processos de treino
+    ml_training_memory_budget_mb: int = 2048  # Memória estimada somada dos treinos paralelos
+    ml_global_training_shards: int = 16       # Partes em que o treino global carrega os dados
+    ml_training_fetch_size: int = 5000        # Linhas por fetch do cursor no servidor (cargas de treino)
+    ml_training_cache_dir: str = ""           # Cache .npy dos datasets de treino (vazio = desligado)
+    ml_training_cache_max_mb: int = 2048      # Tamanho máximo do cache de datasets
+
+    # Early stopping, warm-start e fine-tune incremental
+    ml_training_patience: int = 5             # Épocas sem melhora na validação antes de parar (0 = desliga)
+    ml_training_warm_start: bool = True       # Parte dos pesos do modelo atual (tenant ou global)
+    ml_finetune_max_samples: int = 2000       # Tenants até esse tamanho fazem fine-tune só com dados novos
+    ml_finetune_max_runs: int = 5             # Fine-tunes seguidos antes de um retreino completo
+
+    # Classificador local de intenção (fast-path treinado com rótulos do LLM)
+    fast_intent_mode: str = "shadow"          # off | shadow | active
+    fast_intent_threshold: float = 0.85       # Confiança mínima para dispensar o LLM
+    fast_intent_min_samples: int = 200        # Rótulos antes de começar a predizer
+    fast_intent_min_shadow_samples: int = 500 # Predições confiantes medidas antes de ativar
+    fast_intent_min_agreement: float = 0.95   # Concordância com o LLM exigida no limiar
+    fast_intent_audit_rate: float = 0.05      # Fração das confiantes que ainda vai ao LLM
+    fast_intent_max_words: int = 12           # Mensagens maiores sempre vão ao LLM
+    fast_intent_model_path: str = "/var/models/fast_intent.npz"
 
     # =============================================================================
     # Support Agent Settings (SSH, Git, Deploy)
@@ -97,6 +193,13 @@ class Settings(BaseSettings):
 
     # Support RAG (Manual de Usabilidade)
     support_manual_path: str = "docs/MANUAL_USABILIDADE.md"
+    support_manual_embeddings: bool = False  # Ranking hibrido com embeddings das secoes
+
+    # Support Code Index (search_codebase)
+    code_index_dir: str = "/var/code-index"
+    code_index_refresh_seconds: int = 30      # Intervalo minimo entre sincronizacoes
+    code_index_max_file_bytes: int = 1_000_000  # Arquivos maiores nao sao indexados
+    code_index_max_scan_bytes: int = 20_000_000  # Limite de bytes lidos por busca
 
     model_config = SettingsConfigDict(
         env_file=".env",
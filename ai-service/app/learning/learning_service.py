@@ -111,12 +111,8 @@ Resposta Ideal: {response}
 Intenção: {intent or 'geral'}
 """
         
-        # Gera embedding
-        embedding_response = await self.openai.embeddings.create(
-            model=settings.openai_embedding_model,
-            input=knowledge_text
-        )
-        embedding = embedding_response.data[0].embedding
+        # Gera embedding (perfil ativo do tenant)
+        embedding = await vector_store.create_embedding(knowledge_text, tenant_id=tenant_id)
         
         # Salva no vector store como conhecimento aprendido
         await vector_store.save_learned_knowledge(
@@ -182,12 +178,8 @@ Regra aprendida: {lesson.get('rule', '')}
 Tipo de erro: {lesson.get('error_type', '')}
 """
             
-            # Gera embedding
-            embedding_response = await self.openai.embeddings.create(
-                model=settings.openai_embedding_model,
-                input=knowledge_text
-            )
-            embedding = embedding_response.data[0].embedding
+            # Gera embedding (perfil ativo do tenant)
+            embedding = await vector_store.create_embedding(knowledge_text, tenant_id=tenant_id)
             
             # Salva como conhecimento
             await vector_store.save_learned_knowledge(
@@ -5,16 +5,27 @@ Este módulo implementa:
 - LeadScoreNet: Rede neural para prever probabilidade de conversão de leads
 - CampaignPredictorNet: Rede neural para prever performance de campanhas
 - ModelRegistry: Gerenciamento e versionamento de modelos
+- InferenceBatcher: Micro-batching das predições concorrentes
+- numpy_runtime: Inferência sem torch a partir dos pesos exportados (.npz)
 - Training Jobs: Treinamento periódico por tenant
 """
 
 from app.ml.model_registry import ModelRegistry, get_model_registry
-from app.ml.models.lead_score_net import LeadScoreNet
-from app.ml.models.campaign_predictor import CampaignPredictorNet
+from app.ml.inference_batcher import InferenceBatcher, get_inference_batcher
 
 __all__ = [
     'LeadScoreNet',
     'CampaignPredictorNet',
     'ModelRegistry',
     'get_model_registry',
+    'InferenceBatcher',
+    'get_inference_batcher',
 ]
+
+
+def __getattr__(name):
+    # Classes torch carregadas sob demanda (serving NumPy não importa torch)
+    if name in ('LeadScoreNet', 'CampaignPredictorNet'):
+        from app.ml import models
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
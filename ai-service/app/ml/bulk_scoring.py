@@ -0,0 +1,216 @@
+"""
+Scoring de leads em massa.
+
+Usado pelo re-scoring noturno e após importações: em vez de N chamadas a
+/ml/predict/lead-score, os leads (enviados na requisição ou lidos do
+Postgres com cursor no servidor) são processados em chunks:
+
+1. features extraídas coluna a coluna (lead_score_features_batch)
+2. um predict_batch por chunk
+3. resultados emitidos conforme cada chunk termina (NDJSON no endpoint)
+4. opcionalmente, as probabilidades do chunk são gravadas em
+   lead_memory.conversion_probability num único upsert
+"""
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+from app.ml.model_registry import get_model_registry
+from app.ml.models.features import lead_score_features_batch
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# Leads do tenant com as colunas usadas pelas features
+LEADS_SQL = """
+    SELECT
+        l.id,
+        l.score,
+        l.temperature,
+        ps."order" AS stage_index,
+        l.custom_fields,
+        EXTRACT(EPOCH FROM (NOW() - l.last_message_at)) AS seconds_since_last_msg
+    FROM leads l
+    LEFT JOIN pipeline_stages ps ON l.stage_id = ps.id
+    WHERE l.tenant_id = :tenant_id
+"""
+
+# Grava as probabilidades de um chunk inteiro num único comando.
+# O join com leads descarta ids de outro tenant (ou inexistentes) vindos do chamador.
+WRITE_BACK_SQL = """
+    INSERT INTO lead_memory (id, tenant_id, lead_id, conversion_probability, created_at, updated_at)
+    SELECT gen_random_uuid(), l.tenant_id, l.id, v.probability, NOW(), NOW()
+    FROM unnest(CAST(:lead_ids AS uuid[]), CAST(:probabilities AS float8[])) AS v(lead_id, probability)
+    JOIN leads l ON l.id = v.lead_id AND l.tenant_id = CAST(:tenant_id AS uuid)
+    ON CONFLICT (tenant_id, lead_id)
+    DO UPDATE SET conversion_probability = EXCLUDED.conversion_probability, updated_at = NOW()
+"""
+
+
+def _is_uuid(value: Any) -> bool:
+    """True se o id do lead é um UUID válido."""
+    if value is None:
+        return False
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def lead_data_from_row(row: Any) -> Dict[str, Any]:
+    """Monta o dict de extract_features a partir de uma linha de LEADS_SQL."""
+    fields = row.custom_fields
+    if isinstance(fields, str):
+        fields = json.loads(fields)
+    fields = fields or {}
+
+    return {
+        'id': str(row.id),
+        'lead_score': row.score or 0,
+        'temperature': row.temperature or 'unknown',
+        'stage_index': row.stage_index or 0,
+        'intent': fields.get('last_intent', 'unclear'),
+        'intent_confidence': fields.get('intent_confidence', 0),
+        'num_messages': fields.get('message_count', 0),
+        'time_since_last_msg': float(row.seconds_since_last_msg or 0),
+        'avg_response_time': fields.get('avg_response_time', 0),
+        'sentiment': fields.get('sentiment', 0),
+        'has_objection': fields.get('has_objection', False),
+        'objection_count': fields.get('objection_count', 0),
+        'budget_mentioned': fields.get('budget_mentioned', False),
+        'timeline_mentioned': fields.get('timeline_mentioned', False),
+        'decision_maker': fields.get('decision_maker', False),
+        'rag_context_relevance': fields.get('rag_relevance', 0),
+    }
+
+
+def confidence_from_info(model_info: Optional[Dict[str, Any]]) -> str:
+    """Mesma regra de confiança de /ml/predict/lead-score."""
+    if not model_info:
+        return 'low'
+    samples = model_info.get('training_samples', 0) or 0
+    if samples > 500:
+        return 'high'
+    if samples > 100:
+        return 'medium'
+    return 'low'
+
+
+class BulkLeadScorer:
+    """Scoring em chunks de listas de leads ou de um filtro no banco."""
+
+    def __init__(self, tenant_id: str, chunk_size: Optional[int] = None, write_back: bool = False):
+        self.tenant_id = tenant_id
+        self.chunk_size = chunk_size or settings.ml_bulk_chunk_size
+        self.write_back = write_back
+        self.scored = 0
+        self.written = 0
+        self._model = None
+        self._confidence = 'low'
+
+    async def _prepare(self) -> None:
+        registry = get_model_registry()
+        self._model = await registry.get_model('lead_score', self.tenant_id)
+        if self._model is not None:
+            self._confidence = confidence_from_info(
+                await registry.get_model_info('lead_score', self.tenant_id)
+            )
+
+    def _predict(self, leads: List[Dict[str, Any]]) -> np.ndarray:
+        if self._model is None:
+            # Heurística do endpoint individual: score atual do lead
+            scores = np.fromiter((lead.get('lead_score', 50) for lead in leads), dtype=np.float64, count=len(leads))
+            return scores / 100
+        features = lead_score_features_batch(leads)
+        return np.asarray(self._model.predict_batch(features), dtype=np.float64).reshape(-1)
+
+    async def _score_chunk(self, leads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        probabilities = self._predict(leads)
+        self.scored += len(leads)
+
+        if self.write_back and self._model is not None:
+            # Só leads com id UUID válido podem ser gravados (um id malformado abortaria o lote)
+            with_id = [i for i, lead in enumerate(leads) if _is_uuid(lead.get('id'))]
+            if with_id:
+                await self._write_back([str(leads[i]['id']) for i in with_id], probabilities[with_id])
+
+        confidence = self._confidence if self._model is not None else 'low'
+        return [
+            {
+                'lead_id': lead.get('id'),
+                'conversion_probability': float(prob),
+                'score_normalized': int(prob * 100),
+                'confidence': confidence,
+            }
+            for lead, prob in zip(leads, probabilities)
+        ]
+
+    async def _write_back(self, lead_ids: List[str], probabilities: np.ndarray) -> None:
+        from sqlalchemy import text
+
+        engine = await get_model_registry().get_db_engine()
+        async with engine.begin() as conn:
+            result = await conn.execute(text(WRITE_BACK_SQL), {
+                'tenant_id': self.tenant_id,
+                'lead_ids': lead_ids,
+                'probabilities': probabilities.tolist(),
+            })
+        self.written += max(result.rowcount or 0, 0)
+
+    async def score_leads(self, leads: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Scores de leads enviados pelo chamador, na ordem recebida."""
+        await self._prepare()
+        for start in range(0, len(leads), self.chunk_size):
+            for result in await self._score_chunk(leads[start:start + self.chunk_size]):
+                yield result
+
+    async def score_from_db(
+        self,
+        stage_id: Optional[str] = None,
+        pipeline_id: Optional[str] = None,
+        status: Optional[str] = 'open'
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Scores dos leads do tenant que atendem ao filtro.
+
+        Lê com cursor no servidor (conn.stream): só um chunk de linhas fica
+        em memória por vez.
+        """
+        from sqlalchemy import text
+
+        await self._prepare()
+
+        sql = LEADS_SQL
+        params: Dict[str, Any] = {'tenant_id': self.tenant_id}
+        if stage_id:
+            sql += " AND l.stage_id = :stage_id"
+            params['stage_id'] = stage_id
+        if pipeline_id:
+            sql += " AND l.pipeline_id = :pipeline_id"
+            params['pipeline_id'] = pipeline_id
+        if status:
+            sql += " AND l.status = :status"
+            params['status'] = status
+
+        engine = await get_model_registry().get_db_engine()
+        async with engine.connect() as conn:
+            result = await conn.stream(text(sql), params)
+            async for rows in result.partitions(self.chunk_size):
+                leads = [lead_data_from_row(row) for row in rows]
+                for scored in await self._score_chunk(leads):
+                    yield scored
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'done': True,
+            'scored': self.scored,
+            'written': self.written,
+            'used_model': self._model is not None,
+            'confidence': self._confidence if self._model is not None else 'low',
+        }
@@ -0,0 +1,248 @@
+"""
+Busca de configuração de campanha (CampaignPredictorNet).
+
+O get_optimal_configuration percorria 3 objetivos x 3 criativos x 4
+multiplicadores de budget chamando extract_features e um predict de uma
+linha por candidato (36 chamadas), e só olhava o ROAS. Aqui:
+
+1. a grade inicial inteira (objetivos x criativos x faixa contínua de
+   budget x faixa de tamanho de público) vira um record batch, passa por
+   campaign_features_batch e é avaliada num único forward pass
+2. refinamento sucessivo: a cada rodada, novos pontos são sorteados ao
+   redor dos melhores candidatos e da fronteira atual, numa janela que cai
+   pela metade, também avaliados em um único batch, até o orçamento de
+   tempo (ml_campaign_optimizer_budget_ms) ou o máximo de rodadas
+3. devolve a fronteira de Pareto ROAS (maior) x CPA (menor), além da
+   configuração de maior ROAS (critério anterior)
+
+CPA estimado = CPM / (10 * CTR% * taxa de conversão). O CPM
+(historical_data['avg_cpm'], default DEFAULT_CPM) só escala o CPA: não
+muda quais candidatos estão na fronteira.
+
+Funciona com os dois runtimes (torch e NumPy): só usa model.predict_array.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+from app.ml.models.features import campaign_features_batch
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+DEFAULT_CPM = 25.0
+
+
+@dataclass
+class SearchSpace:
+    """Espaço de busca: categorias fixas e faixas contínuas (multiplicadores da base)."""
+    objectives: Tuple[str, ...] = ('OUTCOME_SALES', 'OUTCOME_LEADS', 'OUTCOME_TRAFFIC')
+    creative_types: Tuple[str, ...] = ('video', 'image', 'carousel')
+    budget_range: Tuple[float, float] = (0.5, 2.0)
+    audience_range: Tuple[float, float] = (0.25, 4.0)
+    # Pontos da grade inicial em cada eixo contínuo
+    budget_steps: int = 8
+    audience_steps: int = 5
+    # Refinamento sucessivo
+    max_rounds: int = 6
+    seeds_per_round: int = 16
+    samples_per_seed: int = 8
+    max_front: int = 10
+
+
+class CampaignConfigOptimizer:
+    """Busca em batch sobre o espaço de configurações de uma campanha."""
+
+    def __init__(
+        self,
+        model: Any,
+        base_config: Dict[str, Any],
+        historical_data: Optional[Dict[str, Any]] = None,
+        space: Optional[SearchSpace] = None,
+        seed: int = 0
+    ):
+        self.model = model
+        self.base_config = base_config
+        self.historical_data = historical_data or {}
+        self.space = space or SearchSpace()
+        # Semente fixa: rodadas iguais sorteiam os mesmos pontos. O número de rodadas
+        # depende do orçamento de tempo, então a sugestão pode variar entre passadas
+        self._rng = np.random.default_rng(seed)
+
+        self.base_budget = float(base_config.get('daily_budget', 100) or 100)
+        self.base_audience = float(base_config.get('audience_size', 1000000) or 1000000)
+        self.cpm = float(self.historical_data.get('avg_cpm', DEFAULT_CPM) or DEFAULT_CPM)
+
+        # Candidatos avaliados: categorias (índices) e eixos contínuos em [0, 1]
+        self._objective = np.empty(0, dtype=np.intp)
+        self._creative = np.empty(0, dtype=np.intp)
+        self._u_budget = np.empty(0)
+        self._u_audience = np.empty(0)
+        self._outputs = np.empty((0, 3), dtype=np.float32)
+        self._cpa = np.empty(0)
+
+    # ============================================
+    # Candidatos
+    # ============================================
+
+    def _budgets(self, u: np.ndarray) -> np.ndarray:
+        low, high = self.space.budget_range
+        return self.base_budget * (low + (high - low) * u)
+
+    def _audiences(self, u: np.ndarray) -> np.ndarray:
+        # Escala log: a feature de público já é log10
+        low, high = self.space.audience_range
+        return self.base_audience * low * (high / low) ** u
+
+    def _initial_grid(self) -> Tuple[np.ndarray, ...]:
+        space = self.space
+        grid = np.meshgrid(
+            np.arange(len(space.objectives)),
+            np.arange(len(space.creative_types)),
+            np.linspace(0.0, 1.0, space.budget_steps),
+            np.linspace(0.0, 1.0, space.audience_steps),
+            indexing='ij'
+        )
+        return tuple(axis.reshape(-1) for axis in grid)
+
+    def _refine(self, window: float) -> Tuple[np.ndarray, ...]:
+        """Novos pontos ao redor dos melhores candidatos e da fronteira atual."""
+        space = self.space
+        by_roas = np.argsort(-self._outputs[:, 0])[:space.seeds_per_round]
+        seeds = np.unique(np.concatenate([by_roas, self.pareto_indices()]))[:2 * space.seeds_per_round]
+
+        repeat = space.samples_per_seed
+        offsets = self._rng.uniform(-window, window, size=(2, len(seeds) * repeat))
+        return (
+            np.repeat(self._objective[seeds], repeat),
+            np.repeat(self._creative[seeds], repeat),
+            np.clip(np.repeat(self._u_budget[seeds], repeat) + offsets[0], 0.0, 1.0),
+            np.clip(np.repeat(self._u_audience[seeds], repeat) + offsets[1], 0.0, 1.0),
+        )
+
+    def _configs_batch(self, objective, creative, u_budget, u_audience) -> Dict[str, Any]:
+        """Candidatos como record batch {coluna: valores} para campaign_features_batch."""
+        n = len(objective)
+        columns: Dict[str, Any] = {key: [value] * n for key, value in self.base_config.items()}
+        columns['objective'] = np.asarray(self.space.objectives, dtype=object)[objective]
+        columns['creative_type'] = np.asarray(self.space.creative_types, dtype=object)[creative]
+        columns['daily_budget'] = self._budgets(u_budget)
+        columns['audience_size'] = self._audiences(u_audience)
+        return columns
+
+    def _evaluate(self, objective, creative, u_budget, u_audience) -> None:
+        """Um forward pass para todos os candidatos da rodada."""
+        features = campaign_features_batch(
+            self._configs_batch(objective, creative, u_budget, u_audience),
+            self.historical_data
+        )
+        outputs = np.asarray(self.model.predict_array(features), dtype=np.float32)
+
+        # CTR em %: conversões por impressão = ctr / 100 * taxa de conversão
+        conversions_per_mille = 10.0 * outputs[:, 1].astype(np.float64) * outputs[:, 2]
+        with np.errstate(divide='ignore'):
+            cpa = np.where(conversions_per_mille > 0, self.cpm / conversions_per_mille, np.inf)
+
+        self._objective = np.concatenate([self._objective, objective])
+        self._creative = np.concatenate([self._creative, creative])
+        self._u_budget = np.concatenate([self._u_budget, u_budget])
+        self._u_audience = np.concatenate([self._u_audience, u_audience])
+        self._outputs = np.concatenate([self._outputs, outputs])
+        self._cpa = np.concatenate([self._cpa, cpa])
+
+    # ============================================
+    # Fronteira de Pareto
+    # ============================================
+
+    def pareto_indices(self) -> np.ndarray:
+        """Candidatos não dominados em (ROAS maior, CPA menor), por ROAS decrescente."""
+        if len(self._cpa) == 0:
+            return np.empty(0, dtype=np.intp)
+        order = np.lexsort((self._cpa, -self._outputs[:, 0]))
+        cpa_sorted = self._cpa[order]
+        # Entra quem tem CPA menor que todos os de ROAS maior ou igual
+        best_before = np.minimum.accumulate(np.concatenate([[np.inf], cpa_sorted[:-1]]))
+        return order[cpa_sorted < best_before]
+
+    def _candidate(self, index: int) -> Dict[str, Any]:
+        config = self.base_config.copy()
+        config['objective'] = self.space.objectives[self._objective[index]]
+        config['creative_type'] = self.space.creative_types[self._creative[index]]
+        config['daily_budget'] = round(float(self._budgets(self._u_budget[index:index + 1])[0]), 2)
+        config['audience_size'] = int(self._audiences(self._u_audience[index:index + 1])[0])
+
+        roas, ctr, conversion_rate = (float(v) for v in self._outputs[index])
+        cpa = float(self._cpa[index])
+        prediction = {
+            'predicted_roas': roas,
+            'predicted_ctr': ctr,
+            'predicted_conversion_rate': conversion_rate,
+            'predicted_cpa': round(cpa, 2) if np.isfinite(cpa) else None,
+        }
+        return {'config': config, 'prediction': prediction}
+
+    # ============================================
+    # Busca
+    # ============================================
+
+    def run(self, time_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Grade inicial + refinamento sucessivo dentro do orçamento de tempo.
+
+        Returns:
+            Dict com best_config, best_prediction (maior ROAS),
+            pareto_front, evaluated, rounds e elapsed_ms
+        """
+        if time_budget_ms is None:
+            time_budget_ms = settings.ml_campaign_optimizer_budget_ms
+        started = time.perf_counter()
+        deadline = started + time_budget_ms / 1000
+
+        self._evaluate(*self._initial_grid())
+
+        rounds = 0
+        # Janela inicial: meio passo da grade de budget
+        window = 0.5 / max(self.space.budget_steps - 1, 1)
+        while rounds < self.space.max_rounds and time.perf_counter() < deadline:
+            self._evaluate(*self._refine(window))
+            window /= 2
+            rounds += 1
+
+        front = self.pareto_indices()
+        if len(front) > self.space.max_front:
+            # Pontos espaçados ao longo da fronteira (extremos incluídos)
+            front = front[np.linspace(0, len(front) - 1, self.space.max_front).round().astype(int)]
+
+        best = self._candidate(int(np.argmax(self._outputs[:, 0])))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        logger.debug("campaign_config_search",
+            evaluated=len(self._cpa),
+            rounds=rounds,
+            front=len(front),
+            elapsed_ms=round(elapsed_ms, 1)
+        )
+
+        return {
+            'best_config': best['config'],
+            'best_prediction': best['prediction'],
+            'pareto_front': [self._candidate(int(i)) for i in front],
+            'evaluated': len(self._cpa),
+            'rounds': rounds,
+            'elapsed_ms': round(elapsed_ms, 1),
+        }
+
+
+def optimize_configuration(
+    model: Any,
+    base_config: Dict[str, Any],
+    historical_data: Optional[Dict[str, Any]] = None,
+    time_budget_ms: Optional[float] = None,
+    space: Optional[SearchSpace] = None
+) -> Dict[str, Any]:
+    """Atalho: CampaignConfigOptimizer(...).run(time_budget_ms)."""
+    return CampaignConfigOptimizer(model, base_config, historical_data, space).run(time_budget_ms)
@@ -2,20 +2,73 @@
 Machine Learning - Classificação e Predição
 """
 from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
 import json
+import time
 import structlog
 from openai import AsyncOpenAI
 
 from app.config import get_settings
+from app.ml.fast_intent import FastIntentClassifier, FastIntentPrediction
+from app.services.single_flight import coalesced_call
 from app.models.schemas import (
     LeadTemperature, LeadPrediction, IntentClassification,
-    Qualification, Message, LeadInfo
+    Qualification, Message, LeadInfo, MessageAnalysis
 )
 
 logger = structlog.get_logger()
 settings = get_settings()
 
 
+INTENT_LABELS = [
+    "greeting", "question_product", "question_price", "question_payment",
+    "objection", "interest", "scheduling", "complaint", "support",
+    "goodbye", "unclear", "other",
+]
+
+# Intenções de baixa informação: com fast-path confiante, reaproveita a
+# última qualificação do lead em vez de chamar o LLM
+REUSE_QUALIFICATION_INTENTS = {"greeting", "goodbye"}
+QUALIFICATION_CACHE_SIZE = 10000
+
+TEMPERATURE_MAP = {
+    "hot": LeadTemperature.HOT,
+    "warm": LeadTemperature.WARM,
+    "cold": LeadTemperature.COLD
+}
+
+# Schema da análise fundida (structured outputs, strict)
+MESSAGE_ANALYSIS_SCHEMA = {
+    "name": "message_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": [
+            "intent", "intent_confidence", "temperature", "score",
+            "pain_points", "interests", "objections",
+            "budget_mentioned", "timeline_mentioned", "decision_maker",
+            "product_interest", "transfer_to_human", "transfer_reason"
+        ],
+        "properties": {
+            "intent": {"type": "string", "enum": INTENT_LABELS},
+            "intent_confidence": {"type": "number"},
+            "temperature": {"type": "string", "enum": ["hot", "warm", "cold"]},
+            "score": {"type": "number"},
+            "pain_points": {"type": "array", "items": {"type": "string"}},
+            "interests": {"type": "array", "items": {"type": "string"}},
+            "objections": {"type": "array", "items": {"type": "string"}},
+            "budget_mentioned": {"type": "boolean"},
+            "timeline_mentioned": {"type": "boolean"},
+            "decision_maker": {"type": "boolean"},
+            "product_interest": {"type": ["string", "null"]},
+            "transfer_to_human": {"type": "boolean"},
+            "transfer_reason": {"type": "string"},
+        },
+    },
+}
+
+
 class MLClassifier:
     """
     Classificador ML usando LLM para:
@@ -30,16 +83,47 @@ class MLClassifier:
             api_key=settings.openai_api_key,
             project=settings.openai_project_id if settings.openai_project_id else None
         )
-    
+        # Uso acumulado por tipo de chamada: intent, qualify, fused
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self._fused_fallbacks = 0
+        # Classificador local treinado com os rótulos do LLM
+        self.fast_intent = FastIntentClassifier(INTENT_LABELS)
+        self._last_qualification: "OrderedDict[str, Qualification]" = OrderedDict()
+
+    def _record_usage(self, kind: str, response, started: float) -> None:
+        """Acumula tokens e latência de uma chamada ao LLM."""
+        stats = self._usage.setdefault(kind, {"calls": 0, "tokens": 0, "latency_ms": 0.0})
+        stats["calls"] += 1
+        stats["latency_ms"] += (time.perf_counter() - started) * 1000
+        if getattr(response, "usage", None):
+            stats["tokens"] += response.usage.total_tokens
+
     async def classify_intent(
         self,
         message: str,
         history: List[Message] = None,
-        context: str = ""
+        context: str = "",
+        tenant_id: Optional[str] = None
     ) -> IntentClassification:
         """
         Classifica a intenção da mensagem do lead.
+        Usa o classificador local quando ele está ativo e confiante.
         """
+        prediction = self.fast_intent.predict(message)
+        if self.fast_intent.should_serve(prediction):
+            return IntentClassification(intent=prediction.intent, confidence=prediction.confidence)
+
+        return await self._classify_intent_llm(message, history, context, prediction, tenant_id=tenant_id)
+
+    async def _classify_intent_llm(
+        self,
+        message: str,
+        history: List[Message] = None,
+        context: str = "",
+        prediction: Optional[FastIntentPrediction] = None,
+        tenant_id: Optional[str] = None
+    ) -> IntentClassification:
+        """Classificação via LLM (o rótulo também treina o classificador local)."""
         history_text = ""
         if history:
             history_text = "\n".join([
@@ -74,21 +158,27 @@ Responda APENAS em JSON:
 {{"intent": "nome_da_intencao", "confidence": 0.0-1.0, "entities": {{"chave": "valor"}}}}"""
 
         try:
-            response = await self.openai.chat.completions.create(
+            started = time.perf_counter()
+            response = await coalesced_call(
+                self.openai.chat.completions.create, "classify_intent",
+                tenant_id=tenant_id,
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
                 max_tokens=200,
                 response_format={"type": "json_object"}
             )
+            self._record_usage("intent", response, started)
             
             result = json.loads(response.choices[0].message.content)
             
-            return IntentClassification(
+            intent_result = IntentClassification(
                 intent=result.get("intent", "unclear"),
                 confidence=float(result.get("confidence", 0.5)),
                 alternatives=result.get("alternatives", [])
             )
+            await self.fast_intent.observe(message, intent_result.intent, intent_result.confidence, prediction)
+            return intent_result
             
         except Exception as e:
             logger.error("classify_intent_error", error=str(e))
@@ -98,7 +188,8 @@ Responda APENAS em JSON:
         self,
         lead: LeadInfo,
         messages: List[Message],
-        context: str = ""
+        context: str = "",
+        tenant_id: Optional[str] = None
     ) -> Qualification:
         """
         Qualifica o lead baseado na conversa.
@@ -144,24 +235,22 @@ Responda APENAS em JSON:
 }}"""
 
         try:
-            response = await self.openai.chat.completions.create(
+            started = time.perf_counter()
+            response = await coalesced_call(
+                self.openai.chat.completions.create, "qualify_lead",
+                tenant_id=tenant_id,
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
                 max_tokens=500,
                 response_format={"type": "json_object"}
             )
+            self._record_usage("qualify", response, started)
             
             result = json.loads(response.choices[0].message.content)
             
-            temp_map = {
-                "hot": LeadTemperature.HOT,
-                "warm": LeadTemperature.WARM,
-                "cold": LeadTemperature.COLD
-            }
-            
             return Qualification(
-                temperature=temp_map.get(result.get("temperature", ""), LeadTemperature.UNKNOWN),
+                temperature=TEMPERATURE_MAP.get(result.get("temperature", ""), LeadTemperature.UNKNOWN),
                 score=float(result.get("score", 0)),
                 pain_points=result.get("pain_points", []),
                 interests=result.get("interests", []),
@@ -249,7 +338,7 @@ Responda APENAS em JSON:
             best_contact_time=None  # TODO: implementar análise de horários
         )
     
-    async def detect_sentiment(self, message: str) -> Tuple[str, float]:
+    async def detect_sentiment(self, message: str, tenant_id: Optional[str] = None) -> Tuple[str, float]:
         """Detecta sentimento da mensagem"""
         prompt = f"""Analise o sentimento da mensagem:
 "{message}"
@@ -260,7 +349,9 @@ E dê uma confiança de 0 a 1.
 Responda em JSON: {{"sentiment": "...", "confidence": 0.0}}"""
 
         try:
-            response = await self.openai.chat.completions.create(
+            response = await coalesced_call(
+                self.openai.chat.completions.create, "detect_sentiment",
+                tenant_id=tenant_id,
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.2,
@@ -304,6 +395,227 @@ Responda em JSON: {{"sentiment": "...", "confidence": 0.0}}"""
         
         return False, ""
 
+    # ==================== ANÁLISE FUNDIDA ====================
+
+    async def analyze_message(
+        self,
+        message: str,
+        lead: LeadInfo,
+        messages: List[Message],
+        history: List[Message] = None,
+        tenant_id: Optional[str] = None
+    ) -> MessageAnalysis:
+        """
+        Intenção + qualificação BANT + temperatura + transferência.
+
+        No modo fundido faz uma única chamada com JSON schema estrito; se a
+        resposta não respeitar o schema, cai para as chamadas individuais
+        (classify_intent, qualify_lead e should_transfer_to_human).
+
+        Com o classificador local ativo e confiante, a intenção não vai ao
+        LLM; em saudações/despedidas a última qualificação do lead é reusada.
+        """
+        prediction = self.fast_intent.predict(message)
+        if self.fast_intent.should_serve(prediction):
+            qualification = None
+            if prediction.intent in REUSE_QUALIFICATION_INTENTS:
+                qualification = self._last_qualification.get(lead.id)
+            if qualification is None:
+                qualification = await self.qualify_lead(lead=lead, messages=messages, tenant_id=tenant_id)
+                self._remember_qualification(lead.id, qualification)
+            should_transfer, transfer_reason = await self.should_transfer_to_human(
+                messages=messages,
+                qualification=qualification
+            )
+            return MessageAnalysis(
+                intent=IntentClassification(intent=prediction.intent, confidence=prediction.confidence),
+                qualification=qualification,
+                should_transfer=should_transfer,
+                transfer_reason=transfer_reason,
+                fused=False
+            )
+
+        if settings.ml_fused_analysis_enabled:
+            try:
+                analysis = await self._analyze_fused(message, lead, messages, prediction, tenant_id=tenant_id)
+                self._remember_qualification(lead.id, analysis.qualification)
+                # Regras determinísticas continuam valendo (sem custo de LLM)
+                rule_transfer, rule_reason = await self.should_transfer_to_human(
+                    messages=messages,
+                    qualification=analysis.qualification
+                )
+                if rule_transfer:
+                    analysis.should_transfer = True
+                    analysis.transfer_reason = rule_reason
+                return analysis
+            except Exception as e:
+                self._fused_fallbacks += 1
+                logger.warning("fused_analysis_fallback", error=str(e))
+
+        intent_result = await self._classify_intent_llm(
+            message=message, history=history, prediction=prediction, tenant_id=tenant_id
+        )
+        qualification = await self.qualify_lead(lead=lead, messages=messages, tenant_id=tenant_id)
+        self._remember_qualification(lead.id, qualification)
+        should_transfer, transfer_reason = await self.should_transfer_to_human(
+            messages=messages,
+            qualification=qualification
+        )
+        return MessageAnalysis(
+            intent=intent_result,
+            qualification=qualification,
+            should_transfer=should_transfer,
+            transfer_reason=transfer_reason,
+            fused=False
+        )
+
+    async def _analyze_fused(
+        self,
+        message: str,
+        lead: LeadInfo,
+        messages: List[Message],
+        prediction: Optional[FastIntentPrediction] = None,
+        tenant_id: Optional[str] = None
+    ) -> MessageAnalysis:
+        conversation = "\n".join([
+            f"{'Lead' if m.sender_type.value == 'contact' else 'Agente'}: {m.content}"
+            for m in messages[-20:]
+        ])
+
+        prompt = f"""Analise a conversa de vendas e a mensagem atual do lead.
+
+Lead: {lead.name}
+Estágio atual: {lead.stage_name or 'Novo'}
+
+Conversa:
+{conversation}
+
+Mensagem atual do lead: "{message}"
+
+Retorne:
+1. intent: intenção principal da mensagem atual
+   (greeting, question_product, question_price, question_payment, objection, interest,
+   scheduling, complaint, support, goodbye, unclear, other) e intent_confidence de 0 a 1
+2. Qualificação BANT da conversa inteira: temperature (hot/warm/cold), score 0-100,
+   pain_points, interests, objections, budget_mentioned, timeline_mentioned,
+   decision_maker, product_interest (ou null)
+3. transfer_to_human: true só se o lead pediu uma pessoa, está irritado/confuso
+   ou o caso exige atendimento humano; transfer_reason curto (vazio se false)"""
+
+        started = time.perf_counter()
+        response = await coalesced_call(
+            self.openai.chat.completions.create, "analyze_message",
+            tenant_id=tenant_id,
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=500,
+            response_format={"type": "json_schema", "json_schema": MESSAGE_ANALYSIS_SCHEMA}
+        )
+        self._record_usage("fused", response, started)
+
+        choice = response.choices[0]
+        if getattr(choice.message, "refusal", None):
+            raise ValueError(f"refusal: {choice.message.refusal}")
+        if choice.finish_reason == "length":
+            raise ValueError("resposta truncada")
+
+        result = json.loads(choice.message.content)
+        self._validate_fused(result)
+        await self.fast_intent.observe(message, result["intent"], float(result["intent_confidence"]), prediction)
+
+        qualification = Qualification(
+            temperature=TEMPERATURE_MAP[result["temperature"]],
+            score=max(0.0, min(100.0, float(result["score"]))),
+            pain_points=result["pain_points"],
+            interests=result["interests"],
+            objections=result["objections"],
+            budget_mentioned=result["budget_mentioned"],
+            timeline_mentioned=result["timeline_mentioned"],
+            decision_maker=result["decision_maker"],
+            product_interest=result["product_interest"]
+        )
+
+        return MessageAnalysis(
+            intent=IntentClassification(
+                intent=result["intent"],
+                confidence=max(0.0, min(1.0, float(result["intent_confidence"])))
+            ),
+            qualification=qualification,
+            should_transfer=result["transfer_to_human"],
+            transfer_reason=result["transfer_reason"] if result["transfer_to_human"] else "",
+            fused=True
+        )
+
+    def _remember_qualification(self, lead_id: str, qualification: Qualification) -> None:
+        self._last_qualification[lead_id] = qualification
+        self._last_qualification.move_to_end(lead_id)
+        while len(self._last_qualification) > QUALIFICATION_CACHE_SIZE:
+            self._last_qualification.popitem(last=False)
+
+    def _validate_fused(self, result: Dict[str, Any]) -> None:
+        """Confere o JSON contra o schema (modelos sem strict podem desviar)."""
+        properties = MESSAGE_ANALYSIS_SCHEMA["schema"]["properties"]
+        type_checks = {
+            "string": lambda v: isinstance(v, str),
+            "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+            "boolean": lambda v: isinstance(v, bool),
+            "array": lambda v: isinstance(v, list) and all(isinstance(i, str) for i in v),
+            "null": lambda v: v is None,
+        }
+        for key, spec in properties.items():
+            if key not in result:
+                raise ValueError(f"campo ausente: {key}")
+            types = spec["type"] if isinstance(spec["type"], list) else [spec["type"]]
+            if not any(type_checks[t](result[key]) for t in types):
+                raise ValueError(f"tipo inválido em {key}")
+            if "enum" in spec and result[key] not in spec["enum"]:
+                raise ValueError(f"valor inválido em {key}: {result[key]}")
+
+    def get_analysis_stats(self) -> Dict[str, Any]:
+        """
+        Tokens e latência médios do modo fundido vs. chamadas individuais.
+        O custo individual por mensagem é a soma das médias de intent + qualify.
+        """
+        def avg(kind: str, field: str) -> Optional[float]:
+            stats = self._usage.get(kind)
+            if not stats or not stats["calls"]:
+                return None
+            return stats[field] / stats["calls"]
+
+        fused_tokens, fused_latency = avg("fused", "tokens"), avg("fused", "latency_ms")
+        individual_tokens = individual_latency = None
+        if avg("intent", "tokens") is not None and avg("qualify", "tokens") is not None:
+            individual_tokens = avg("intent", "tokens") + avg("qualify", "tokens")
+            individual_latency = avg("intent", "latency_ms") + avg("qualify", "latency_ms")
+
+        savings = {}
+        if fused_tokens is not None and individual_tokens:
+            savings = {
+                "tokens_per_message": round(individual_tokens - fused_tokens, 1),
+                "tokens_pct": round((1 - fused_tokens / individual_tokens) * 100, 1),
+                "latency_ms_per_message": round(individual_latency - fused_latency, 1),
+                "llm_calls_per_message": 1,
+            }
+
+        fused_calls = self._usage.get("fused", {}).get("calls", 0)
+        return {
+            "fused_enabled": settings.ml_fused_analysis_enabled,
+            "calls": {kind: int(stats["calls"]) for kind, stats in self._usage.items()},
+            "fused_fallbacks": self._fused_fallbacks,
+            "fallback_rate": round(self._fused_fallbacks / fused_calls, 4) if fused_calls else 0.0,
+            "avg_tokens": {
+                "fused": round(fused_tokens, 1) if fused_tokens is not None else None,
+                "individual": round(individual_tokens, 1) if individual_tokens is not None else None,
+            },
+            "avg_latency_ms": {
+                "fused": round(fused_latency, 1) if fused_latency is not None else None,
+                "individual": round(individual_latency, 1) if individual_latency is not None else None,
+            },
+            "savings": savings,
+            "fast_intent": self.fast_intent.get_stats(),
+        }
+
 
 # Singleton
 ml_classifier = MLClassifier()
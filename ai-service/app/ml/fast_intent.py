@@ -0,0 +1,309 @@
+"""
+Classificador local de intenção (fast-path)
+
+Regressão logística multinomial sobre n-gramas com hashing (palavras 1-2 e
+caracteres 2-4), treinada online com as intenções que o LLM já produz.
+Serve em memória em bem menos de 1 ms por mensagem.
+
+Modos (settings.fast_intent_mode):
+- off: não usado
+- shadow: prediz em paralelo ao LLM só para medir concordância
+- active: responde sozinho quando confiança >= fast_intent_threshold, desde
+  que a concordância medida em shadow no mesmo limiar seja suficiente
+  (fast_intent_min_agreement). Uma amostra (fast_intent_audit_rate) das
+  predições confiantes continua indo ao LLM para manter a métrica viva.
+"""
+import asyncio
+import os
+import random
+import re
+import time
+import unicodedata
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+HASH_DIMENSIONS = 2 ** 16
+LEARNING_RATE = 0.5
+REPLAY_BUFFER_SIZE = 5000
+REPLAY_EVERY = 500        # A cada N rótulos, reforça com épocas sobre o buffer
+REPLAY_EPOCHS = 2
+SAVE_EVERY = 200          # Persiste os pesos a cada N rótulos
+MIN_LABEL_CONFIDENCE = 0.6  # Rótulos do LLM abaixo disso não treinam
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e com repetições reduzidas ("oiiii" -> "oii")."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    text = re.sub(r"(.)\1{2,}", r"\1\1", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def hash_features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices e valores (L2-normalizados) das features com hashing."""
+    norm = normalize(text)
+    words = re.findall(r"\w+|[?!]", norm)
+
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {norm} "
+    for n in (2, 3, 4):
+        grams += [f"c{n}:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+
+    counts = Counter(zlib.crc32(g.encode('utf-8')) % HASH_DIMENSIONS for g in grams)
+    if not counts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+@dataclass
+class FastIntentPrediction:
+    intent: str
+    confidence: float
+    latency_ms: float
+
+
+class FastIntentClassifier:
+    """Classificador online de intenção com métricas de shadow."""
+
+    def __init__(self, labels: List[str], model_path: Optional[str] = None):
+        self.labels = list(labels)
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self._model_path = model_path
+        self._weights = np.zeros((len(self.labels), HASH_DIMENSIONS), dtype=np.float32)
+        self._bias = np.zeros(len(self.labels), dtype=np.float32)
+        self._samples_seen = 0
+        self._replay: Deque[Tuple[str, int]] = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._loaded = False
+        self._replaying = False
+        self._shadow = {
+            "samples": 0,
+            "agree": 0,
+            "confident": 0,
+            "confident_agree": 0,
+            "by_intent": {},
+        }
+        self._served = {"local": 0, "llm": 0, "audited": 0}
+
+    @property
+    def model_path(self) -> str:
+        return self._model_path or settings.fast_intent_model_path
+
+    @property
+    def mode(self) -> str:
+        return settings.fast_intent_mode
+
+    # ==================== PERSISTÊNCIA ====================
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = np.load(self.model_path, allow_pickle=False)
+            if list(data["labels"]) != self.labels or data["weights"].shape[1] != HASH_DIMENSIONS:
+                logger.warning("fast_intent_model_incompatible", path=self.model_path)
+                return
+            self._weights = data["weights"].astype(np.float32)
+            self._bias = data["bias"].astype(np.float32)
+            self._samples_seen = int(data["samples_seen"])
+            logger.info("fast_intent_model_loaded", samples_seen=self._samples_seen)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("fast_intent_model_load_failed", error=str(e))
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.model_path) or ".", exist_ok=True)
+            tmp_path = f"{self.model_path}.tmp.npz"
+            np.savez_compressed(
+                tmp_path,
+                labels=np.array(self.labels),
+                weights=self._weights,
+                bias=self._bias,
+                samples_seen=np.array(self._samples_seen)
+            )
+            os.replace(tmp_path, self.model_path)
+        except OSError as e:
+            logger.warning("fast_intent_model_save_failed", error=str(e))
+
+    # ==================== PREDIÇÃO ====================
+
+    def _probabilities(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        logits = self._weights[:, indices] @ values + self._bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def predict(self, message: str) -> Optional[FastIntentPrediction]:
+        """
+        Predição local. None quando o modelo ainda não tem amostras
+        suficientes ou a mensagem é longa demais para o fast-path.
+        """
+        if self.mode == "off":
+            return None
+        self._ensure_loaded()
+        if self._samples_seen < settings.fast_intent_min_samples:
+            return None
+        if len(message.split()) > settings.fast_intent_max_words:
+            return None
+
+        started = time.perf_counter()
+        indices, values = hash_features(message)
+        if len(indices) == 0:
+            return None
+        probs = self._probabilities(indices, values)
+        best = int(np.argmax(probs))
+        return FastIntentPrediction(
+            intent=self.labels[best],
+            confidence=float(probs[best]),
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+
+    def is_active(self) -> bool:
+        """Active só vale depois de concordância suficiente em shadow."""
+        if self.mode != "active":
+            return False
+        shadow = self._shadow
+        if shadow["confident"] < settings.fast_intent_min_shadow_samples:
+            return False
+        return shadow["confident_agree"] / shadow["confident"] >= settings.fast_intent_min_agreement
+
+    def should_serve(self, prediction: Optional[FastIntentPrediction]) -> bool:
+        """Decide se a predição local substitui o LLM nesta mensagem."""
+        if not prediction or prediction.confidence < settings.fast_intent_threshold:
+            return False
+        if not self.is_active():
+            return False
+        if random.random() < settings.fast_intent_audit_rate:
+            self._served["audited"] += 1
+            return False
+        self._served["local"] += 1
+        return True
+
+    # ==================== TREINO ONLINE ====================
+
+    def _sgd_step(self, weights: np.ndarray, bias: np.ndarray, text: str, label: int, lr: float) -> None:
+        indices, values = hash_features(text)
+        if len(indices) == 0:
+            return
+        logits = weights[:, indices] @ values + bias
+        logits -= logits.max()
+        probs = np.exp(logits)
+        probs /= probs.sum()
+        probs[label] -= 1.0  # gradiente da cross-entropy
+        weights[:, indices] -= lr * np.outer(probs, values)
+        bias -= lr * probs
+
+    def _learning_rate(self) -> float:
+        return LEARNING_RATE / (1 + self._samples_seen / 5000)
+
+    async def observe(
+        self,
+        message: str,
+        llm_intent: str,
+        llm_confidence: float,
+        prediction: Optional[FastIntentPrediction] = None
+    ) -> None:
+        """
+        Registra o rótulo do LLM: atualiza métricas de shadow (com a predição
+        feita antes de aprender) e treina o modelo com a mensagem.
+        """
+        if self.mode == "off":
+            return
+        self._ensure_loaded()
+        self._served["llm"] += 1
+
+        if prediction is not None:
+            self._record_shadow(prediction, llm_intent)
+
+        label = self._label_index.get(llm_intent)
+        if label is None or llm_confidence < MIN_LABEL_CONFIDENCE:
+            return
+        if len(message.split()) > settings.fast_intent_max_words:
+            return
+
+        self._sgd_step(self._weights, self._bias, message, label, self._learning_rate())
+        self._samples_seen += 1
+        self._replay.append((message, label))
+
+        if self._samples_seen % SAVE_EVERY == 0:
+            await asyncio.to_thread(self._save)
+        if self._samples_seen % REPLAY_EVERY == 0 and not self._replaying:
+            asyncio.create_task(self._replay_epochs())
+
+    async def _replay_epochs(self) -> None:
+        """Épocas sobre o buffer numa cópia dos pesos (troca atômica no fim)."""
+        self._replaying = True
+        try:
+            samples = list(self._replay)
+
+            def train() -> Tuple[np.ndarray, np.ndarray]:
+                weights, bias = self._weights.copy(), self._bias.copy()
+                lr = self._learning_rate()
+                for _ in range(REPLAY_EPOCHS):
+                    random.shuffle(samples)
+                    for text, label in samples:
+                        self._sgd_step(weights, bias, text, label, lr)
+                return weights, bias
+
+            self._weights, self._bias = await asyncio.to_thread(train)
+            logger.info("fast_intent_replay_done", samples=len(samples))
+        except Exception as e:
+            logger.warning("fast_intent_replay_failed", error=str(e))
+        finally:
+            self._replaying = False
+
+    def _record_shadow(self, prediction: FastIntentPrediction, llm_intent: str) -> None:
+        shadow = self._shadow
+        agree = prediction.intent == llm_intent
+        shadow["samples"] += 1
+        shadow["agree"] += int(agree)
+
+        per_intent = shadow["by_intent"].setdefault(llm_intent, {"samples": 0, "agree": 0})
+        per_intent["samples"] += 1
+        per_intent["agree"] += int(agree)
+
+        if prediction.confidence >= settings.fast_intent_threshold:
+            shadow["confident"] += 1
+            shadow["confident_agree"] += int(agree)
+
+    def get_stats(self) -> Dict[str, Any]:
+        shadow = self._shadow
+
+        def ratio(a: int, b: int) -> Optional[float]:
+            return round(a / b, 4) if b else None
+
+        return {
+            "mode": self.mode,
+            "active": self.is_active(),
+            "samples_seen": self._samples_seen,
+            "threshold": settings.fast_intent_threshold,
+            "shadow": {
+                "samples": shadow["samples"],
+                "agreement": ratio(shadow["agree"], shadow["samples"]),
+                "coverage_at_threshold": ratio(shadow["confident"], shadow["samples"]),
+                "agreement_at_threshold": ratio(shadow["confident_agree"], shadow["confident"]),
+                "by_intent": {
+                    intent: ratio(s["agree"], s["samples"])
+                    for intent, s in shadow["by_intent"].items()
+                },
+            },
+            "served": dict(self._served),
+        }
@@ -0,0 +1,128 @@
+"""
+Micro-batching de inferência dos modelos ML.
+
+Cada predição avulsa (/ml/predict/lead-score, /ml/predict/campaign) monta
+um tensor de uma linha e faz um forward pass. Em re-scoring em massa
+(importações) chegam milhares dessas requisições ao mesmo tempo.
+
+O InferenceBatcher junta as predições concorrentes para o mesmo modelo
+carregado (versão do tenant ou o global compartilhado) por até
+ml_batch_max_wait_ms, empilha as features numa matriz e chama
+predict_batch uma única vez, devolvendo a cada chamador a sua linha.
+O batch é disparado antes se atingir ml_batch_max_size.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+class _PendingBatch:
+    """Predições aguardando o próximo forward pass de um modelo."""
+
+    __slots__ = ("model", "features", "futures", "timer")
+
+    def __init__(self, model: Any):
+        self.model = model
+        self.features: List[np.ndarray] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class InferenceBatcher:
+    """Agrupa predições concorrentes por (tipo de modelo, modelo carregado)."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], _PendingBatch] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _model_stats(self, model_type: str) -> Dict[str, int]:
+        return self._stats.setdefault(
+            model_type, {"requests": 0, "batches": 0, "max_batch": 0, "errors": 0}
+        )
+
+    async def predict(self, model_type: str, model: Any, features: np.ndarray) -> Any:
+        """
+        Prediz uma linha de features através do batch do modelo.
+
+        Returns:
+            O item correspondente de model.predict_batch (float para
+            LeadScoreNet, dict de métricas para CampaignPredictorNet)
+        """
+        if not settings.ml_batching_enabled:
+            return model.predict(features)
+
+        loop = asyncio.get_running_loop()
+        key = (model_type, id(model))
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch(model)
+            batch.timer = loop.call_later(
+                settings.ml_batch_max_wait_ms / 1000, self._flush, model_type, key
+            )
+
+        future = loop.create_future()
+        batch.features.append(np.asarray(features, dtype=np.float32).reshape(-1))
+        batch.futures.append(future)
+        self._model_stats(model_type)["requests"] += 1
+
+        if len(batch.futures) >= settings.ml_batch_max_size:
+            self._flush(model_type, key)
+
+        return await future
+
+    def _flush(self, model_type: str, key: Tuple[str, int]) -> None:
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        stats = self._model_stats(model_type)
+        stats["batches"] += 1
+        stats["max_batch"] = max(stats["max_batch"], len(batch.futures))
+
+        try:
+            outputs = batch.model.predict_batch(np.stack(batch.features))
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error("ml_batch_predict_error", model_type=model_type, size=len(batch.futures), error=str(e))
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, output in zip(batch.futures, outputs):
+            # Chamador pode ter sido cancelado (timeout do cliente)
+            if not future.done():
+                future.set_result(output)
+
+    def get_stats(self) -> Dict[str, Any]:
+        models = {}
+        for model_type, stats in self._stats.items():
+            models[model_type] = {
+                **stats,
+                "avg_batch": round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0,
+            }
+        return {
+            "enabled": settings.ml_batching_enabled,
+            "max_batch_size": settings.ml_batch_max_size,
+            "max_wait_ms": settings.ml_batch_max_wait_ms,
+            "pending_batches": len(self._pending),
+            "models": models,
+        }
+
+
+# Singleton
+inference_batcher = InferenceBatcher()
+
+
+def get_inference_batcher() -> InferenceBatcher:
+    """Retorna instância singleton do batcher."""
+    return inference_batcher
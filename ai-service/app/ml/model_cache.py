@@ -0,0 +1,139 @@
+"""
+Cache LRU de modelos ML carregados.
+
+Limitado por quantidade de entradas e por bytes estimados (pesos): com
+milhares de tenants, só os modelos mais usados ficam em memória.
+
+Cada entrada guarda o carimbo de versão com que foi carregada (ids dos
+modelos ativos publicados no Redis pelo ModelRegistry). O registry
+compara esse carimbo com o atual no máximo a cada
+ml_model_version_check_seconds e recarrega se mudou.
+
+Entradas que apontam para um objeto compartilhado (tenant sem modelo
+próprio usando o global) entram com nbytes=0: os pesos já são contados na
+entrada do modelo global.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """Bytes dos pesos: runtime NumPy (nbytes) ou parâmetros torch."""
+    nbytes = getattr(model, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    parameters = getattr(model, 'parameters', None)
+    if callable(parameters):
+        try:
+            return sum(p.numel() * p.element_size() for p in parameters())
+        except Exception:
+            pass
+    return 0
+
+
+@dataclass
+class CachedModel:
+    """Modelo em cache com o carimbo de versão usado ao carregar."""
+    model: Any
+    version: Optional[str]
+    nbytes: int = 0
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+class ModelCache:
+    """LRU por "{tenant_id}_{model_type}" limitado por entradas e bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedModel]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "stale": 0, "invalidations": 0}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedModel]:
+        """Retorna a entrada e a marca como usada recentemente."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry
+
+    def put(
+        self,
+        key: str,
+        model: Any,
+        version: Optional[str],
+        nbytes: Optional[int] = None
+    ) -> CachedModel:
+        """Adiciona (ou substitui) um modelo e despeja os menos usados."""
+        self.pop(key)
+        entry = CachedModel(
+            model=model,
+            version=version,
+            nbytes=estimate_model_bytes(model) if nbytes is None else nbytes
+        )
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        self._evict()
+        return entry
+
+    def pop(self, key: str) -> Optional[CachedModel]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+        return entry
+
+    def mark_stale(self, key: str) -> None:
+        """Remove uma entrada cuja versão não é mais a ativa."""
+        if self.pop(key) is not None:
+            self._stats["stale"] += 1
+
+    def invalidate(self, tenant_id: Optional[str] = None, model_type: Optional[str] = None) -> int:
+        """Remove entradas do tenant e/ou do tipo (mesma semântica do clear_cache)."""
+        if tenant_id and model_type:
+            keys = [f"{tenant_id}_{model_type}"]
+        elif tenant_id:
+            keys = [k for k in self._entries if k.startswith(f"{tenant_id}_")]
+        elif model_type:
+            keys = [k for k in self._entries if k.endswith(f"_{model_type}")]
+        else:
+            keys = list(self._entries)
+
+        removed = sum(1 for key in keys if self.pop(key) is not None)
+        self._stats["invalidations"] += removed
+        return removed
+
+    def _evict(self) -> None:
+        # Mantém ao menos a entrada recém-inserida, mesmo que sozinha passe do limite
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self._stats["evictions"] += 1
+            logger.debug("model_cache_evicted", key=key, nbytes=entry.nbytes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
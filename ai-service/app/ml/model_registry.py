@@ -6,17 +6,32 @@ Responsável por:
 - Manter cache de modelos carregados
 - Gerenciar modelo global vs específico por tenant
 - Fallback automático para modelo global
+
+Com pesos exportados (.npz ao lado do .pt), os modelos são servidos pelo
+runtime NumPy sem importar torch (settings.ml_inference_runtime).
+
+Cache entre réplicas:
+- LRU limitado (ml_model_cache_max_entries / ml_model_cache_max_mb)
+- save_model e rollback_model gravam o id do modelo ativo em
+  ml:model_version:{tenant|global}:{tipo} e publicam no canal
+  ml:model_invalidate; todas as réplicas descartam o modelo em cache
+- Backstop: entradas comparam o carimbo de versão com o Redis a cada
+  ml_model_version_check_seconds (mensagem de pub/sub perdida)
+- Startup: preload dos modelos dos tenants mais ativos
 """
+import asyncio
 import os
 import json
-import torch
-from typing import Dict, Any, Optional, List
+import time
+import uuid
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
+import redis.asyncio as redis
 import structlog
 
 from app.config import get_settings
-from app.ml.models.lead_score_net import LeadScoreNet, LeadScoreTrainer
-from app.ml.models.campaign_predictor import CampaignPredictorNet, CampaignPredictorTrainer
+from app.ml.model_cache import ModelCache
+from app.ml.numpy_runtime import export_model, load_numpy_model, numpy_weights_path
 
 logger = structlog.get_logger()
 settings = get_settings()
@@ -43,13 +58,49 @@ class ModelRegistry:
     # Diretório para armazenar modelos
     MODELS_DIR = os.environ.get('MODELS_DIR', '/var/models')
     
+    # Redis: versão ativa por (tenant|global, tipo) e canal de invalidação
+    VERSION_KEY_PREFIX = "ml:model_version"
+    INVALIDATION_CHANNEL = "ml:model_invalidate"
+    
+    # Tipos carregados no preload dos tenants mais ativos
+    PRELOAD_MODEL_TYPES = ('lead_score', 'campaign_predictor')
+    
     def __init__(self):
-        self._model_cache: Dict[str, Any] = {}
+        self._model_cache = ModelCache(
+            max_entries=settings.ml_model_cache_max_entries,
+            max_bytes=settings.ml_model_cache_max_mb * 1024 * 1024
+        )
+        # "{tenant_id}_{model_type}" -> (expira_em, info do modelo ativo ou None)
+        self._info_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        # Carregamentos em andamento (requisições concorrentes esperam o mesmo)
+        self._loading: Dict[str, asyncio.Task] = {}
         self._db_engine = None
+        self._redis: Optional[redis.Redis] = None
+        self._retry_redis_at = 0.0
+        self._listener_task: Optional[asyncio.Task] = None
+        # Identifica esta réplica nas mensagens de invalidação
+        self._instance_id = uuid.uuid4().hex
         
         # Garante que diretório existe
         os.makedirs(self.MODELS_DIR, exist_ok=True)
     
+    async def _get_redis(self) -> Optional[redis.Redis]:
+        """Conexão com o Redis (None se indisponível; nova tentativa em 30s)."""
+        if self._redis is not None:
+            return self._redis
+        if time.monotonic() < self._retry_redis_at:
+            return None
+        try:
+            redis_url = settings.redis_url or f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
+            client = redis.from_url(redis_url, decode_responses=True)
+            await client.ping()
+            self._redis = client
+            logger.info("model_registry_redis_connected", url=redis_url)
+        except Exception as e:
+            self._retry_redis_at = time.monotonic() + 30
+            logger.warning("model_registry_redis_unavailable", error=str(e))
+        return self._redis
+    
     async def get_db_engine(self):
         """Lazy loading do engine do banco."""
         if self._db_engine is None:
@@ -82,25 +133,224 @@ class ModelRegistry:
         """
         cache_key = f"{tenant_id}_{model_type}"
         
-        # 1. Verifica cache
-        if cache_key in self._model_cache:
-            logger.debug("model_from_cache", model_type=model_type, tenant_id=tenant_id)
-            return self._model_cache[cache_key]
+        # 1. Verifica cache (e se a versão ainda é a ativa)
+        entry = self._model_cache.get(cache_key)
+        if entry is not None:
+            if await self._is_current(entry, model_type, tenant_id):
+                logger.debug("model_from_cache", model_type=model_type, tenant_id=tenant_id)
+                return entry.model
+            logger.info("model_cache_stale", model_type=model_type, tenant_id=tenant_id)
+            self._model_cache.mark_stale(cache_key)
+        
+        return await self._load_coalesced(cache_key, self._load_model, model_type, tenant_id)
+    
+    async def _load_coalesced(self, cache_key: str, loader, *args) -> Optional[Any]:
+        """Requisições concorrentes para a mesma chave aguardam um único carregamento."""
+        task = self._loading.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(loader(*args))
+            self._loading[cache_key] = task
+            task.add_done_callback(lambda _: self._loading.pop(cache_key, None))
+        return await asyncio.shield(task)
+    
+    async def _load_model(self, model_type: str, tenant_id: str) -> Optional[Any]:
+        """Carrega o modelo do tenant (ou o global) e adiciona ao cache."""
+        cache_key = f"{tenant_id}_{model_type}"
+        # Carimbo lido antes de carregar: se mudar no meio, a próxima checagem recarrega
+        version = await self._version_stamp(model_type, tenant_id)
         
         # 2. Tenta carregar modelo do tenant
         model = await self._load_tenant_model(model_type, tenant_id)
+        if model is not None:
+            self._model_cache.put(cache_key, model, version)
+            return model
         
-        # 3. Fallback para modelo global
-        if model is None:
-            logger.debug("fallback_to_global", model_type=model_type, tenant_id=tenant_id)
-            model = await self._load_global_model(model_type)
-        
-        # Adiciona ao cache se encontrou
+        # 3. Fallback para modelo global (objeto compartilhado entre tenants)
+        logger.debug("fallback_to_global", model_type=model_type, tenant_id=tenant_id)
+        model = await self._get_global_model(model_type)
         if model is not None:
-            self._model_cache[cache_key] = model
+            self._model_cache.put(cache_key, model, version, nbytes=0)
         
         return model
     
+    async def _get_global_model(self, model_type: str) -> Optional[Any]:
+        """Modelo global em cache (uma cópia por réplica, não uma por tenant)."""
+        cache_key = f"global_{model_type}"
+        entry = self._model_cache.get(cache_key)
+        if entry is not None:
+            if await self._is_current(entry, model_type, None):
+                return entry.model
+            self._model_cache.mark_stale(cache_key)
+        
+        async def load_global() -> Optional[Any]:
+            version = await self._version_stamp(model_type, None)
+            model = await self._load_global_model(model_type)
+            if model is not None:
+                self._model_cache.put(cache_key, model, version)
+            return model
+        
+        return await self._load_coalesced(cache_key, load_global)
+    
+    # ============================================
+    # Versões e invalidação entre réplicas
+    # ============================================
+    
+    def _version_key(self, model_type: str, tenant_id: Optional[str]) -> str:
+        return f"{self.VERSION_KEY_PREFIX}:{tenant_id or 'global'}:{model_type}"
+    
+    async def _version_stamp(self, model_type: str, tenant_id: Optional[str]) -> Optional[str]:
+        """
+        Carimbo das versões ativas que definem o modelo servido.
+        
+        Para um tenant entram a versão dele e a global (fallback). None se o
+        Redis estiver indisponível.
+        """
+        client = await self._get_redis()
+        if client is None:
+            return None
+        keys = [self._version_key(model_type, None)]
+        if tenant_id:
+            keys.insert(0, self._version_key(model_type, tenant_id))
+        try:
+            values = await client.mget(keys)
+        except Exception as e:
+            logger.warning("model_version_check_error", error=str(e))
+            return None
+        return "|".join(value or "" for value in values)
+    
+    async def _is_current(self, entry, model_type: str, tenant_id: Optional[str]) -> bool:
+        """Confere o carimbo da entrada no máximo a cada ml_model_version_check_seconds."""
+        now = time.monotonic()
+        if now - entry.checked_at < settings.ml_model_version_check_seconds:
+            return True
+        version = await self._version_stamp(model_type, tenant_id)
+        entry.checked_at = now
+        # Sem Redis (ou entrada carregada sem ele): só a invalidação local vale
+        return version is None or entry.version is None or version == entry.version
+    
+    async def _publish_version(self, model_type: str, tenant_id: Optional[str], model_id: str) -> None:
+        """Grava a versão ativa e avisa as demais réplicas."""
+        client = await self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(self._version_key(model_type, tenant_id), model_id)
+            await client.publish(self.INVALIDATION_CHANNEL, json.dumps({
+                'tenant_id': tenant_id,
+                'model_type': model_type,
+                'origin': self._instance_id,
+            }))
+        except Exception as e:
+            logger.warning("model_version_publish_error", error=str(e))
+    
+    async def invalidate(self, tenant_id: str = None, model_type: str = None) -> None:
+        """Limpa o cache local e o das demais réplicas."""
+        self.clear_cache(tenant_id, model_type)
+        client = await self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.publish(self.INVALIDATION_CHANNEL, json.dumps({
+                'tenant_id': tenant_id,
+                'model_type': model_type,
+                'origin': self._instance_id,
+            }))
+        except Exception as e:
+            logger.warning("model_invalidation_publish_error", error=str(e))
+    
+    async def start_invalidation_listener(self) -> None:
+        """Assina o canal de invalidação (chamado no startup)."""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_invalidations())
+    
+    async def stop_invalidation_listener(self) -> None:
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+    
+    async def _listen_invalidations(self) -> None:
+        while True:
+            client = await self._get_redis()
+            if client is None:
+                await asyncio.sleep(30)
+                continue
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                logger.info("model_invalidation_listener_started")
+                async for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    self._handle_invalidation(message.get('data'))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("model_invalidation_listener_error", error=str(e))
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+    
+    def _handle_invalidation(self, data: Any) -> None:
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if payload.get('origin') == self._instance_id:
+            return  # Já limpo localmente por quem publicou
+        tenant_id = payload.get('tenant_id')
+        model_type = payload.get('model_type')
+        if tenant_id is None and model_type:
+            # Modelo global mudou: afeta todo tenant que faz fallback para ele
+            self.clear_cache(model_type=model_type)
+        else:
+            self.clear_cache(tenant_id, model_type)
+        logger.info("model_cache_invalidated", tenant_id=tenant_id, model_type=model_type)
+    
+    async def preload_hot_tenants(self, limit: Optional[int] = None) -> int:
+        """
+        Carrega os modelos dos tenants com mais conversas recentes.
+        
+        Evita que as primeiras predições após o deploy paguem o carregamento.
+        """
+        limit = settings.ml_model_preload_tenants if limit is None else limit
+        if limit <= 0:
+            return 0
+        try:
+            engine = await self.get_db_engine()
+            
+            async with engine.connect() as conn:
+                from sqlalchemy import text
+                
+                result = await conn.execute(text("""
+                    SELECT tenant_id
+                    FROM leads
+                    WHERE last_message_at > NOW() - INTERVAL '1 day'
+                    GROUP BY tenant_id
+                    ORDER BY COUNT(*) DESC
+                    LIMIT :limit
+                """), {'limit': limit})
+                
+                tenant_ids = [str(row.tenant_id) for row in result.fetchall()]
+        except Exception as e:
+            logger.warning("model_preload_error", error=str(e))
+            return 0
+        
+        loaded = 0
+        for tenant_id in tenant_ids:
+            for model_type in self.PRELOAD_MODEL_TYPES:
+                if await self.get_model(model_type, tenant_id) is not None:
+                    loaded += 1
+        
+        logger.info("model_preload_completed", tenants=len(tenant_ids), models=loaded)
+        return loaded
+    
     async def _load_tenant_model(
         self,
         model_type: str,
@@ -170,14 +420,36 @@ class ModelRegistry:
         model_type: str,
         weights_path: str
     ) -> Optional[Any]:
-        """Carrega modelo do arquivo."""
+        """
+        Carrega modelo do arquivo.
+        
+        Runtime (settings.ml_inference_runtime):
+        - auto: .npz exportado se existir, senão checkpoint torch
+        - numpy: somente .npz (réplicas sem torch instalado)
+        - torch: sempre o checkpoint .pt
+        """
         try:
             full_path = os.path.join(self.MODELS_DIR, weights_path)
+            runtime = settings.ml_inference_runtime
+            
+            npz_path = numpy_weights_path(full_path)
+            if runtime != 'torch' and os.path.exists(npz_path):
+                model = load_numpy_model(npz_path, model_type)
+                logger.info("model_loaded", model_type=model_type, path=weights_path, runtime='numpy')
+                return model
+            
+            if runtime == 'numpy':
+                logger.warning("numpy_weights_not_found", path=npz_path)
+                return None
             
             if not os.path.exists(full_path):
                 logger.warning("model_file_not_found", path=full_path)
                 return None
             
+            import torch
+            from app.ml.models.lead_score_net import LeadScoreNet
+            from app.ml.models.campaign_predictor import CampaignPredictorNet
+            
             checkpoint = torch.load(full_path, map_location='cpu')
             
             # Instancia modelo correto baseado no tipo
@@ -199,7 +471,7 @@ class ModelRegistry:
             model.load_state_dict(checkpoint['model_state_dict'])
             model.eval()
             
-            logger.info("model_loaded", model_type=model_type, path=weights_path)
+            logger.info("model_loaded", model_type=model_type, path=weights_path, runtime='torch')
             
             return model
             
@@ -231,7 +503,7 @@ class ModelRegistry:
             ID do modelo salvo
         """
         try:
-            import uuid
+            import torch
             
             # Gera path único
             model_id = str(uuid.uuid4())
@@ -253,6 +525,12 @@ class ModelRegistry:
             }
             torch.save(checkpoint, full_path)
             
+            # Pesos para o runtime NumPy (réplicas de inferência sem torch)
+            try:
+                export_model(model, numpy_weights_path(full_path), model_type)
+            except Exception as e:
+                logger.warning("numpy_export_failed", model_type=model_type, error=str(e))
+            
             # Salva no banco
             engine = await self.get_db_engine()
             
@@ -305,15 +583,13 @@ class ModelRegistry:
                     'is_global': tenant_id is None,
                 })
             
-            # Invalida cache
+            # Invalida cache (local e, via Redis, das demais réplicas)
             if tenant_id:
-                cache_key = f"{tenant_id}_{model_type}"
-                self._model_cache.pop(cache_key, None)
+                self.clear_cache(tenant_id, model_type)
             else:
                 # Invalida cache de todos os tenants para este tipo
-                keys_to_remove = [k for k in self._model_cache if k.endswith(f"_{model_type}")]
-                for key in keys_to_remove:
-                    self._model_cache.pop(key, None)
+                self.clear_cache(model_type=model_type)
+            await self._publish_version(model_type, tenant_id, model_id)
             
             logger.info("model_saved",
                 model_id=model_id,
@@ -329,6 +605,83 @@ class ModelRegistry:
             logger.error("save_model_error", error=str(e))
             return None
     
+    async def rollback_model(
+        self,
+        model_type: str,
+        tenant_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reativa a versão anterior (status ready) do modelo do tenant ou global.
+        
+        Returns:
+            Dict com o modelo reativado ou None se não há versão anterior
+        """
+        if tenant_id:
+            scope = "tenant_id = :tenant_id"
+            params = {'tenant_id': tenant_id, 'model_type': model_type}
+        else:
+            scope = "is_global = true"
+            params = {'model_type': model_type}
+        
+        try:
+            engine = await self.get_db_engine()
+            
+            async with engine.begin() as conn:
+                from sqlalchemy import text
+                
+                current = (await conn.execute(text(f"""
+                    SELECT id, version FROM ml_models
+                    WHERE {scope} AND model_type = :model_type AND is_active = true
+                    ORDER BY version DESC
+                    LIMIT 1
+                """), params)).fetchone()
+                
+                if not current:
+                    return None
+                
+                previous = (await conn.execute(text(f"""
+                    SELECT id, version FROM ml_models
+                    WHERE {scope} AND model_type = :model_type
+                    AND status = 'ready' AND version < :version
+                    ORDER BY version DESC
+                    LIMIT 1
+                """), {**params, 'version': current.version})).fetchone()
+                
+                if not previous:
+                    return None
+                
+                await conn.execute(text(f"""
+                    UPDATE ml_models SET is_active = false, updated_at = NOW()
+                    WHERE {scope} AND model_type = :model_type
+                """), params)
+                await conn.execute(text("""
+                    UPDATE ml_models SET is_active = true, updated_at = NOW()
+                    WHERE id = :id
+                """), {'id': previous.id})
+            
+            if tenant_id:
+                self.clear_cache(tenant_id, model_type)
+            else:
+                self.clear_cache(model_type=model_type)
+            await self._publish_version(model_type, tenant_id, str(previous.id))
+            
+            logger.info("model_rolled_back",
+                model_type=model_type,
+                tenant_id=tenant_id,
+                from_version=current.version,
+                to_version=previous.version
+            )
+            
+            return {
+                'model_id': str(previous.id),
+                'version': previous.version,
+                'previous_version': current.version,
+            }
+            
+        except Exception as e:
+            logger.error("rollback_model_error", error=str(e))
+            return None
+    
     async def should_train_tenant_model(
         self,
         model_type: str,
@@ -396,72 +749,111 @@ class ModelRegistry:
         model_type: str,
         tenant_id: str
     ) -> Optional[Dict[str, Any]]:
-        """Retorna informações sobre o modelo ativo."""
+        """
+        Retorna informações sobre o modelo ativo.
+
+        O resultado fica em cache por ml_model_info_ttl_seconds (cada
+        predição consulta a confiança do modelo); save_model e clear_cache
+        invalidam.
+        """
+        cache_key = f"{tenant_id}_{model_type}"
+        cached = self._info_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
         try:
-            engine = await self.get_db_engine()
+            info = await self._fetch_model_info(model_type, tenant_id)
+        except Exception as e:
+            # Erro de banco não entra no cache: a próxima chamada tenta de novo
+            logger.error("get_model_info_error", error=str(e))
+            return None
+        self._info_cache[cache_key] = (time.monotonic() + settings.ml_model_info_ttl_seconds, info)
+        return info
+
+    async def _fetch_model_info(
+        self,
+        model_type: str,
+        tenant_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Busca no banco o modelo ativo do tenant (ou o global). Erros de banco propagam."""
+        engine = await self.get_db_engine()
+        
+        async with engine.connect() as conn:
+            from sqlalchemy import text
             
-            async with engine.connect() as conn:
-                from sqlalchemy import text
-                
-                # Tenta modelo do tenant
+            # Tenta modelo do tenant
+            result = await conn.execute(text("""
+                SELECT id, version, weights_path, metrics, hyperparameters, training_samples, trained_at, is_global
+                FROM ml_models
+                WHERE tenant_id = :tenant_id
+                AND model_type = :model_type
+                AND is_active = true
+                ORDER BY version DESC
+                LIMIT 1
+            """), {'tenant_id': tenant_id, 'model_type': model_type})
+            
+            row = result.fetchone()
+            
+            # Se não encontrou, busca global
+            if not row:
                 result = await conn.execute(text("""
-                    SELECT id, version, metrics, hyperparameters, training_samples, trained_at, is_global
+                    SELECT id, version, weights_path, metrics, hyperparameters, training_samples, trained_at, is_global
                     FROM ml_models
-                    WHERE tenant_id = :tenant_id
+                    WHERE is_global = true
                     AND model_type = :model_type
                     AND is_active = true
                     ORDER BY version DESC
                     LIMIT 1
-                """), {'tenant_id': tenant_id, 'model_type': model_type})
+                """), {'model_type': model_type})
                 
                 row = result.fetchone()
-                
-                # Se não encontrou, busca global
-                if not row:
-                    result = await conn.execute(text("""
-                        SELECT id, version, metrics, hyperparameters, training_samples, trained_at, is_global
-                        FROM ml_models
-                        WHERE is_global = true
-                        AND model_type = :model_type
-                        AND is_active = true
-                        ORDER BY version DESC
-                        LIMIT 1
-                    """), {'model_type': model_type})
-                    
-                    row = result.fetchone()
-                
-                if row:
-                    return {
-                        'id': str(row.id),
-                        'version': row.version,
-                        'metrics': json.loads(row.metrics) if isinstance(row.metrics, str) else row.metrics,
-                        'hyperparameters': json.loads(row.hyperparameters) if isinstance(row.hyperparameters, str) else row.hyperparameters,
-                        'training_samples': row.training_samples,
-                        'trained_at': row.trained_at.isoformat() if row.trained_at else None,
-                        'is_global': row.is_global,
-                    }
-                
-                return None
-                
-        except Exception as e:
-            logger.error("get_model_info_error", error=str(e))
+            
+            if row:
+                return {
+                    'id': str(row.id),
+                    'version': row.version,
+                    'metrics': json.loads(row.metrics) if isinstance(row.metrics, str) else row.metrics,
+                    'hyperparameters': json.loads(row.hyperparameters) if isinstance(row.hyperparameters, str) else row.hyperparameters,
+                    'training_samples': row.training_samples,
+                    'trained_at': row.trained_at.isoformat() if row.trained_at else None,
+                    'is_global': row.is_global,
+                    'weights_path': row.weights_path,
+                }
+            
             return None
     
+    def checkpoint_path(self, info: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Caminho do checkpoint torch do modelo (get_model_info), se existir em disco."""
+        if not info or not info.get('weights_path'):
+            return None
+        full_path = os.path.join(self.MODELS_DIR, info['weights_path'])
+        return full_path if os.path.exists(full_path) else None
+    
     def clear_cache(self, tenant_id: str = None, model_type: str = None):
-        """Limpa cache de modelos."""
+        """Limpa cache local de modelos (e das informações dos modelos)."""
+        self._model_cache.invalidate(tenant_id, model_type)
+        
+        cache = self._info_cache
         if tenant_id and model_type:
-            key = f"{tenant_id}_{model_type}"
-            self._model_cache.pop(key, None)
+            cache.pop(f"{tenant_id}_{model_type}", None)
         elif tenant_id:
-            keys = [k for k in self._model_cache if k.startswith(f"{tenant_id}_")]
+            keys = [k for k in cache if k.startswith(f"{tenant_id}_")]
             for key in keys:
-                self._model_cache.pop(key, None)
+                cache.pop(key, None)
         elif model_type:
-            keys = [k for k in self._model_cache if k.endswith(f"_{model_type}")]
+            keys = [k for k in cache if k.endswith(f"_{model_type}")]
             for key in keys:
-                self._model_cache.pop(key, None)
+                cache.pop(key, None)
         else:
-            self._model_cache.clear()
+            cache.clear()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estatísticas do cache de modelos (hits, evictions, bytes)."""
+        return {
+            **self._model_cache.get_stats(),
+            'loading': len(self._loading),
+            'listener_running': bool(self._listener_task and not self._listener_task.done()),
+        }
     
     def get_model_version(self, model_type: str, tenant_id: str) -> str:
         """
@@ -469,10 +861,10 @@ class ModelRegistry:
         
         Usado para identificar qual modelo está sendo usado nas predições.
         """
-        cache_key = f"{tenant_id}_{model_type}_version"
+        cached = self._info_cache.get(f"{tenant_id}_{model_type}")
         
-        if cache_key in self._model_cache:
-            return self._model_cache[cache_key]
+        if cached and cached[1]:
+            return str(cached[1].get('version'))
         
         # Se não está no cache, retorna "unknown" 
         # (a versão real seria buscada do banco na próxima chamada get_model_info)
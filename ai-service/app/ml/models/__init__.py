@@ -4,9 +4,20 @@ Neural Network Models para ML.
 Contém:
 - LeadScoreNet: Predição de probabilidade de conversão de leads
 - CampaignPredictorNet: Predição de métricas de campanhas de Ads
-"""
+- features: Extração de features (NumPy puro, sem torch)
 
-from app.ml.models.lead_score_net import LeadScoreNet
-from app.ml.models.campaign_predictor import CampaignPredictorNet
+As classes torch são importadas sob demanda: o serving com o runtime
+NumPy não precisa de torch instalado.
+"""
 
 __all__ = ['LeadScoreNet', 'CampaignPredictorNet']
+
+
+def __getattr__(name):
+    if name == 'LeadScoreNet':
+        from app.ml.models.lead_score_net import LeadScoreNet
+        return LeadScoreNet
+    if name == 'CampaignPredictorNet':
+        from app.ml.models.campaign_predictor import CampaignPredictorNet
+        return CampaignPredictorNet
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
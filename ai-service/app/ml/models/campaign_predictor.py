@@ -10,6 +10,14 @@ import numpy as np
 from typing import Dict, Any, List, Tuple, Optional
 import structlog
 
+from app.ml.campaign_optimizer import optimize_configuration
+from app.ml.models.features import (
+    CAMPAIGN_CREATIVE_MAP,
+    CAMPAIGN_OBJECTIVE_MAP,
+    campaign_features,
+    campaign_features_batch,
+)
+
 logger = structlog.get_logger()
 
 
@@ -42,6 +50,10 @@ class CampaignPredictorNet(nn.Module):
     3. predicted_conversions (0-1, normalizado por budget)
     """
     
+    # Encodings das features categóricas
+    OBJECTIVE_MAP = CAMPAIGN_OBJECTIVE_MAP
+    CREATIVE_MAP = CAMPAIGN_CREATIVE_MAP
+    
     def __init__(
         self,
         input_size: int = 12,
@@ -119,130 +131,43 @@ class CampaignPredictorNet(nn.Module):
                 'predicted_conversion_rate': float(outputs[2])
             }
     
-    def predict_batch(self, features_batch: np.ndarray) -> List[Dict[str, float]]:
-        """Prediz para um batch de campanhas."""
+    def predict_array(self, features_batch: np.ndarray) -> np.ndarray:
+        """Prediz para um batch: array (N x 3) com roas, ctr, conversion_rate."""
         self.eval()
         with torch.no_grad():
-            x = torch.FloatTensor(features_batch)
-            outputs = self.forward(x).numpy()
-            
-            return [
-                {
-                    'predicted_roas': float(row[0]),
-                    'predicted_ctr': float(row[1]),
-                    'predicted_conversion_rate': float(row[2])
-                }
-                for row in outputs
-            ]
+            return self.forward(torch.FloatTensor(features_batch)).numpy()
     
-    @staticmethod
-    def extract_features(
-        campaign_data: Dict[str, Any],
-        historical_data: Dict[str, Any] = None
-    ) -> np.ndarray:
-        """
-        Extrai features de uma campanha para o modelo.
-        
-        Args:
-            campaign_data: Dados da campanha
-            historical_data: Dados históricos do tenant
-        
-        Returns:
-            Array numpy com 12 features normalizadas
-        """
-        historical_data = historical_data or {}
-        
-        # Encodings
-        objective_map = {
-            'OUTCOME_SALES': 1.0,
-            'OUTCOME_LEADS': 0.8,
-            'OUTCOME_AWARENESS': 0.3,
-            'OUTCOME_TRAFFIC': 0.5,
-            'OUTCOME_ENGAGEMENT': 0.4
-        }
-        
-        creative_map = {
-            'video': 1.0,
-            'carousel': 0.7,
-            'image': 0.5,
-            'text': 0.3
-        }
-        
-        features = np.zeros(12, dtype=np.float32)
-        
-        # 1. Objective encoded
-        features[0] = objective_map.get(campaign_data.get('objective', ''), 0.5)
-        
-        # 2. Daily budget normalizado (assume max R$ 5000)
-        features[1] = min(campaign_data.get('daily_budget', 0) / 5000, 1.0)
-        
-        # 3. Creative type encoded
-        features[2] = creative_map.get(campaign_data.get('creative_type', 'image'), 0.5)
-        
-        # 4. Audience size normalizado (assume max 10M)
-        audience_size = campaign_data.get('audience_size', 1000000)
-        features[3] = min(np.log10(audience_size + 1) / 7, 1.0)  # log scale
-        
-        # 5. Historical CTR avg
-        features[4] = min(historical_data.get('avg_ctr', 1.0) / 5, 1.0)
-        
-        # 6. Historical ROAS avg
-        features[5] = min(historical_data.get('avg_roas', 1.0) / 5, 1.0)
-        
-        # 7. Historical CPA normalizado (assume max R$ 200)
-        features[6] = min(historical_data.get('avg_cpa', 50) / 200, 1.0)
-        
-        # 8. Days of week (média, assume veiculação full week)
-        features[7] = 0.7  # Default: maioria dos dias
-        
-        # 9. Is retargeting
-        features[8] = 1.0 if campaign_data.get('is_retargeting', False) else 0.0
-        
-        # 10. Has video
-        features[9] = 1.0 if campaign_data.get('creative_type', '') == 'video' else 0.0
-        
-        # 11. Audience lookalike score
-        features[10] = campaign_data.get('lookalike_score', 0.5)
-        
-        # 12. Seasonal factor (pode ser ajustado por mês/evento)
-        features[11] = campaign_data.get('seasonal_factor', 0.5)
-        
-        return features
+    def predict_batch(self, features_batch: np.ndarray) -> List[Dict[str, float]]:
+        """Prediz para um batch de campanhas."""
+        return [
+            {
+                'predicted_roas': float(row[0]),
+                'predicted_ctr': float(row[1]),
+                'predicted_conversion_rate': float(row[2])
+            }
+            for row in self.predict_array(features_batch)
+        ]
+    
+    # Extração de features (implementação sem torch em app.ml.models.features)
+    extract_features = staticmethod(campaign_features)
+    extract_features_batch = staticmethod(campaign_features_batch)
     
     def get_optimal_configuration(
         self,
         base_config: Dict[str, Any],
-        historical_data: Dict[str, Any]
-    ) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        historical_data: Dict[str, Any],
+        time_budget_ms: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, float], List[Dict[str, Any]]]:
         """
         Sugere configuração ótima variando parâmetros.
         
-        Simula diferentes configurações e retorna a melhor.
-        """
-        best_config = base_config.copy()
-        best_prediction = {'predicted_roas': 0}
-        
-        # Variações a testar
-        objectives = ['OUTCOME_SALES', 'OUTCOME_LEADS', 'OUTCOME_TRAFFIC']
-        creative_types = ['video', 'image', 'carousel']
-        budget_multipliers = [0.5, 1.0, 1.5, 2.0]
-        
-        for objective in objectives:
-            for creative_type in creative_types:
-                for budget_mult in budget_multipliers:
-                    config = base_config.copy()
-                    config['objective'] = objective
-                    config['creative_type'] = creative_type
-                    config['daily_budget'] = base_config.get('daily_budget', 100) * budget_mult
-                    
-                    features = self.extract_features(config, historical_data)
-                    prediction = self.predict(features)
-                    
-                    if prediction['predicted_roas'] > best_prediction['predicted_roas']:
-                        best_prediction = prediction
-                        best_config = config
+        Busca em batch com refinamento sucessivo (app.ml.campaign_optimizer).
         
-        return best_config, best_prediction
+        Returns:
+            (configuração de maior ROAS, predição dela, fronteira de Pareto ROAS x CPA)
+        """
+        result = optimize_configuration(self, base_config, historical_data, time_budget_ms)
+        return result['best_config'], result['best_prediction'], result['pareto_front']
 
 
 class CampaignPredictorTrainer:
@@ -315,6 +240,13 @@ class CampaignPredictorTrainer:
         
         return total_loss / num_batches
     
+    def validation_loss(self, features: np.ndarray, targets: np.ndarray) -> float:
+        """Loss (MSE nos targets normalizados, como no treino) da validação."""
+        self.model.eval()
+        with torch.no_grad():
+            outputs = self.model.model(torch.FloatTensor(features))
+            return self.criterion(outputs, torch.FloatTensor(targets) / self.model.output_scales).item()
+    
     def evaluate(
         self,
         features: np.ndarray,
@@ -0,0 +1,308 @@
+"""
+Extração de features dos modelos ML (sem dependência de torch).
+
+Usada tanto pelas classes PyTorch (LeadScoreNet.extract_features etc.)
+quanto pelo runtime NumPy de inferência, que não importa torch.
+
+A extração em batch lê os registros coluna a coluna (ColumnBatch) e
+aceita os formatos que chegam aos modelos:
+- lista de dicts (requisições, bulk scoring)
+- lista de linhas do SQLAlchemy (Row, via _mapping)
+- record batch: dict de colunas {"lead_score": [...], "temperature": [...]}
+
+e devolve cada feature como um vetor float64 do batch inteiro, com a mesma
+semântica de default do `dict.get` usado em extract_features.
+"""
+from typing import Any, Dict, List, Mapping, Sequence, Union
+
+import numpy as np
+
+Records = Union[Sequence[Any], Mapping[str, Sequence[Any]]]
+
+
+class ColumnBatch:
+    """Acesso coluna a coluna a um batch de registros."""
+
+    def __init__(self, records: Records):
+        if isinstance(records, Mapping):
+            self._columns = records
+            self._rows = None
+            lengths = {len(values) for values in records.values()}
+            if len(lengths) > 1:
+                raise ValueError("Colunas do record batch com tamanhos diferentes")
+            self._n = lengths.pop() if lengths else 0
+        else:
+            self._columns = None
+            self._rows = [getattr(row, '_mapping', row) for row in records]
+            self._n = len(self._rows)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def values(self, key: str, default: Any) -> Sequence[Any]:
+        """Valores brutos da coluna (default onde a chave não existe)."""
+        if self._columns is not None:
+            column = self._columns.get(key)
+            return [default] * self._n if column is None else column
+        return [row.get(key, default) for row in self._rows]
+
+    def column(self, key: str, default: float) -> np.ndarray:
+        values = self.values(key, default)
+        if isinstance(values, np.ndarray):
+            return values.astype(np.float64)
+        return np.fromiter(values, dtype=np.float64, count=self._n)
+
+    def flag(self, key: str) -> np.ndarray:
+        """1.0 onde o valor é verdadeiro (mesma regra de `1.0 if x else 0.0`)."""
+        return np.fromiter(map(bool, self.values(key, False)), dtype=np.float64, count=self._n)
+
+    def equals(self, key: str, default: Any, target: Any) -> np.ndarray:
+        return np.fromiter((v == target for v in self.values(key, default)), dtype=np.float64, count=self._n)
+
+    def encoded(self, key: str, default: Any, mapping: Dict[Any, float], fallback: float) -> np.ndarray:
+        """
+        Codifica uma coluna categórica com uma tabela de lookup: cada valor
+        distinto é mapeado uma vez e o resultado é espalhado pelo índice
+        inverso.
+        """
+        values = self.values(key, default)
+        index: Dict[Any, int] = {}
+        inverse = np.fromiter(
+            (index.setdefault(v, len(index)) for v in values), dtype=np.intp, count=self._n
+        )
+        lookup = np.fromiter((mapping.get(v, fallback) for v in index), dtype=np.float64, count=len(index))
+        return lookup[inverse]
+
+
+# ============================================
+# LeadScoreNet (15 features)
+# ============================================
+
+LEAD_TEMPERATURE_MAP = {'hot': 1.0, 'warm': 0.66, 'cold': 0.33, 'unknown': 0.0}
+LEAD_INTENT_MAP = {
+    'greeting': 0.0, 'question_product': 0.2, 'question_price': 0.3,
+    'objection': 0.4, 'interest': 0.6, 'scheduling': 0.9,
+    'complaint': 0.1, 'support': 0.2, 'goodbye': 0.1, 'unclear': 0.0
+}
+
+LEAD_FEATURE_NAMES = [
+    'lead_score', 'temperature', 'stage_index', 'intent',
+    'intent_confidence', 'num_messages', 'time_since_last',
+    'avg_response_time', 'sentiment', 'has_objection',
+    'objection_count', 'budget_mentioned', 'timeline_mentioned',
+    'decision_maker', 'rag_context_relevance'
+]
+
+
+def lead_score_features(
+    lead_data: Dict[str, Any],
+    messages: List[Dict[str, Any]] = None
+) -> np.ndarray:
+    """
+    Extrai features de um lead para o modelo.
+
+    Args:
+        lead_data: Dados do lead (score, stage, etc.)
+        messages: Histórico de mensagens (opcional)
+
+    Returns:
+        Array numpy com 15 features normalizadas
+    """
+    # Extrai e normaliza features
+    features = np.zeros(15, dtype=np.float32)
+
+    # 1. Lead score normalizado
+    features[0] = min(lead_data.get('lead_score', 0) / 100, 1.0)
+
+    # 2. Temperature encoded
+    features[1] = LEAD_TEMPERATURE_MAP.get(lead_data.get('temperature', 'unknown'), 0.0)
+
+    # 3. Stage index normalizado (assume max 10 estágios)
+    features[2] = min(lead_data.get('stage_index', 0) / 10, 1.0)
+
+    # 4. Intent encoded
+    features[3] = LEAD_INTENT_MAP.get(lead_data.get('intent', 'unclear'), 0.0)
+
+    # 5. Intent confidence
+    features[4] = lead_data.get('intent_confidence', 0.0)
+
+    # 6. Num messages normalizado (assume max 50)
+    features[5] = min(lead_data.get('num_messages', 0) / 50, 1.0)
+
+    # 7. Time since last normalizado (assume max 1 dia)
+    features[6] = min(lead_data.get('time_since_last_msg', 0) / 86400, 1.0)
+
+    # 8. Avg response time normalizado (assume max 1 hora)
+    features[7] = min(lead_data.get('avg_response_time', 0) / 3600, 1.0)
+
+    # 9. Sentiment normalizado (-1 a 1 para 0 a 1)
+    features[8] = (lead_data.get('sentiment', 0) + 1) / 2
+
+    # 10. Has objection
+    features[9] = 1.0 if lead_data.get('has_objection', False) else 0.0
+
+    # 11. Objection count normalizado (assume max 5)
+    features[10] = min(lead_data.get('objection_count', 0) / 5, 1.0)
+
+    # 12-14. BANT flags
+    features[11] = 1.0 if lead_data.get('budget_mentioned', False) else 0.0
+    features[12] = 1.0 if lead_data.get('timeline_mentioned', False) else 0.0
+    features[13] = 1.0 if lead_data.get('decision_maker', False) else 0.0
+
+    # 15. RAG context relevance
+    features[14] = lead_data.get('rag_context_relevance', 0.0)
+
+    return features
+
+
+def lead_score_features_batch(leads: Records) -> np.ndarray:
+    """
+    Extrai features de vários leads de uma vez (coluna a coluna).
+
+    Produz exatamente as mesmas linhas que extract_features, mas cada
+    feature é calculada para o batch inteiro com operações NumPy e as
+    categóricas são codificadas por tabela de lookup.
+
+    Args:
+        leads: Lista de dicts (mesmo formato de extract_features), linhas
+            do banco ou record batch {coluna: valores}
+
+    Returns:
+        Array (N, 15) float32
+    """
+    batch = ColumnBatch(leads)
+
+    features = np.empty((len(batch), 15), dtype=np.float64)
+    features[:, 0] = np.minimum(batch.column('lead_score', 0) / 100, 1.0)
+    features[:, 1] = batch.encoded('temperature', 'unknown', LEAD_TEMPERATURE_MAP, 0.0)
+    features[:, 2] = np.minimum(batch.column('stage_index', 0) / 10, 1.0)
+    features[:, 3] = batch.encoded('intent', 'unclear', LEAD_INTENT_MAP, 0.0)
+    features[:, 4] = batch.column('intent_confidence', 0.0)
+    features[:, 5] = np.minimum(batch.column('num_messages', 0) / 50, 1.0)
+    features[:, 6] = np.minimum(batch.column('time_since_last_msg', 0) / 86400, 1.0)
+    features[:, 7] = np.minimum(batch.column('avg_response_time', 0) / 3600, 1.0)
+    features[:, 8] = (batch.column('sentiment', 0) + 1) / 2
+    features[:, 9] = batch.flag('has_objection')
+    features[:, 10] = np.minimum(batch.column('objection_count', 0) / 5, 1.0)
+    features[:, 11] = batch.flag('budget_mentioned')
+    features[:, 12] = batch.flag('timeline_mentioned')
+    features[:, 13] = batch.flag('decision_maker')
+    features[:, 14] = batch.column('rag_context_relevance', 0.0)
+
+    return features.astype(np.float32)
+
+
+# ============================================
+# CampaignPredictorNet (12 features)
+# ============================================
+
+CAMPAIGN_OBJECTIVE_MAP = {
+    'OUTCOME_SALES': 1.0,
+    'OUTCOME_LEADS': 0.8,
+    'OUTCOME_AWARENESS': 0.3,
+    'OUTCOME_TRAFFIC': 0.5,
+    'OUTCOME_ENGAGEMENT': 0.4
+}
+
+CAMPAIGN_CREATIVE_MAP = {
+    'video': 1.0,
+    'carousel': 0.7,
+    'image': 0.5,
+    'text': 0.3
+}
+
+
+def campaign_features(
+    campaign_data: Dict[str, Any],
+    historical_data: Dict[str, Any] = None
+) -> np.ndarray:
+    """
+    Extrai features de uma campanha para o modelo.
+
+    Args:
+        campaign_data: Dados da campanha
+        historical_data: Dados históricos do tenant
+
+    Returns:
+        Array numpy com 12 features normalizadas
+    """
+    historical_data = historical_data or {}
+
+    features = np.zeros(12, dtype=np.float32)
+
+    # 1. Objective encoded
+    features[0] = CAMPAIGN_OBJECTIVE_MAP.get(campaign_data.get('objective', ''), 0.5)
+
+    # 2. Daily budget normalizado (assume max R$ 5000)
+    features[1] = min(campaign_data.get('daily_budget', 0) / 5000, 1.0)
+
+    # 3. Creative type encoded
+    features[2] = CAMPAIGN_CREATIVE_MAP.get(campaign_data.get('creative_type', 'image'), 0.5)
+
+    # 4. Audience size normalizado (assume max 10M)
+    audience_size = campaign_data.get('audience_size', 1000000)
+    features[3] = min(np.log10(audience_size + 1) / 7, 1.0)  # log scale
+
+    # 5. Historical CTR avg
+    features[4] = min(historical_data.get('avg_ctr', 1.0) / 5, 1.0)
+
+    # 6. Historical ROAS avg
+    features[5] = min(historical_data.get('avg_roas', 1.0) / 5, 1.0)
+
+    # 7. Historical CPA normalizado (assume max R$ 200)
+    features[6] = min(historical_data.get('avg_cpa', 50) / 200, 1.0)
+
+    # 8. Days of week (média, assume veiculação full week)
+    features[7] = 0.7  # Default: maioria dos dias
+
+    # 9. Is retargeting
+    features[8] = 1.0 if campaign_data.get('is_retargeting', False) else 0.0
+
+    # 10. Has video
+    features[9] = 1.0 if campaign_data.get('creative_type', '') == 'video' else 0.0
+
+    # 11. Audience lookalike score
+    features[10] = campaign_data.get('lookalike_score', 0.5)
+
+    # 12. Seasonal factor (pode ser ajustado por mês/evento)
+    features[11] = campaign_data.get('seasonal_factor', 0.5)
+
+    return features
+
+
+def campaign_features_batch(
+    campaigns: Records,
+    historical_data: Dict[str, Any] = None
+) -> np.ndarray:
+    """
+    Extrai features de várias campanhas de uma vez (coluna a coluna).
+
+    Mesmas linhas que extract_features; o histórico é do tenant e vale
+    para todas as campanhas do batch.
+
+    Args:
+        campaigns: Lista de dicts, linhas do banco ou record batch
+        historical_data: Dados históricos do tenant
+
+    Returns:
+        Array (N, 12) float32
+    """
+    historical_data = historical_data or {}
+    batch = ColumnBatch(campaigns)
+
+    features = np.empty((len(batch), 12), dtype=np.float64)
+    features[:, 0] = batch.encoded('objective', '', CAMPAIGN_OBJECTIVE_MAP, 0.5)
+    features[:, 1] = np.minimum(batch.column('daily_budget', 0) / 5000, 1.0)
+    features[:, 2] = batch.encoded('creative_type', 'image', CAMPAIGN_CREATIVE_MAP, 0.5)
+    features[:, 3] = np.minimum(np.log10(batch.column('audience_size', 1000000) + 1) / 7, 1.0)
+    # Histórico é constante no batch
+    features[:, 4] = min(historical_data.get('avg_ctr', 1.0) / 5, 1.0)
+    features[:, 5] = min(historical_data.get('avg_roas', 1.0) / 5, 1.0)
+    features[:, 6] = min(historical_data.get('avg_cpa', 50) / 200, 1.0)
+    features[:, 7] = 0.7
+    features[:, 8] = batch.flag('is_retargeting')
+    features[:, 9] = batch.equals('creative_type', '', 'video')
+    features[:, 10] = batch.column('lookalike_score', 0.5)
+    features[:, 11] = batch.column('seasonal_factor', 0.5)
+
+    return features.astype(np.float32)
@@ -7,9 +7,17 @@ baseado em features extraídas do comportamento e perfil do lead.
 import torch
 import torch.nn as nn
 import numpy as np
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import structlog
 
+from app.ml.models.features import (
+    LEAD_FEATURE_NAMES,
+    LEAD_INTENT_MAP,
+    LEAD_TEMPERATURE_MAP,
+    lead_score_features,
+    lead_score_features_batch,
+)
+
 logger = structlog.get_logger()
 
 
@@ -40,6 +48,10 @@ class LeadScoreNet(nn.Module):
     15. rag_context_relevance (0-1)
     """
     
+    # Encodings das features categóricas
+    TEMPERATURE_MAP = LEAD_TEMPERATURE_MAP
+    INTENT_MAP = LEAD_INTENT_MAP
+    
     def __init__(
         self,
         input_size: int = 15,
@@ -109,76 +121,12 @@ class LeadScoreNet(nn.Module):
         with torch.no_grad():
             x = torch.FloatTensor(features_batch)
             probs = self.forward(x)
-            return probs.squeeze().numpy()
+            # reshape em vez de squeeze: batch de 1 continua sendo um array
+            return probs.reshape(-1).numpy()
     
-    @staticmethod
-    def extract_features(
-        lead_data: Dict[str, Any],
-        messages: List[Dict[str, Any]] = None
-    ) -> np.ndarray:
-        """
-        Extrai features de um lead para o modelo.
-        
-        Args:
-            lead_data: Dados do lead (score, stage, etc.)
-            messages: Histórico de mensagens (opcional)
-        
-        Returns:
-            Array numpy com 15 features normalizadas
-        """
-        # Encodings
-        temperature_map = {'hot': 1.0, 'warm': 0.66, 'cold': 0.33, 'unknown': 0.0}
-        intent_map = {
-            'greeting': 0.0, 'question_product': 0.2, 'question_price': 0.3,
-            'objection': 0.4, 'interest': 0.6, 'scheduling': 0.9,
-            'complaint': 0.1, 'support': 0.2, 'goodbye': 0.1, 'unclear': 0.0
-        }
-        
-        # Extrai e normaliza features
-        features = np.zeros(15, dtype=np.float32)
-        
-        # 1. Lead score normalizado
-        features[0] = min(lead_data.get('lead_score', 0) / 100, 1.0)
-        
-        # 2. Temperature encoded
-        features[1] = temperature_map.get(lead_data.get('temperature', 'unknown'), 0.0)
-        
-        # 3. Stage index normalizado (assume max 10 estágios)
-        features[2] = min(lead_data.get('stage_index', 0) / 10, 1.0)
-        
-        # 4. Intent encoded
-        features[3] = intent_map.get(lead_data.get('intent', 'unclear'), 0.0)
-        
-        # 5. Intent confidence
-        features[4] = lead_data.get('intent_confidence', 0.0)
-        
-        # 6. Num messages normalizado (assume max 50)
-        features[5] = min(lead_data.get('num_messages', 0) / 50, 1.0)
-        
-        # 7. Time since last normalizado (assume max 1 dia)
-        features[6] = min(lead_data.get('time_since_last_msg', 0) / 86400, 1.0)
-        
-        # 8. Avg response time normalizado (assume max 1 hora)
-        features[7] = min(lead_data.get('avg_response_time', 0) / 3600, 1.0)
-        
-        # 9. Sentiment normalizado (-1 a 1 para 0 a 1)
-        features[8] = (lead_data.get('sentiment', 0) + 1) / 2
-        
-        # 10. Has objection
-        features[9] = 1.0 if lead_data.get('has_objection', False) else 0.0
-        
-        # 11. Objection count normalizado (assume max 5)
-        features[10] = min(lead_data.get('objection_count', 0) / 5, 1.0)
-        
-        # 12-14. BANT flags
-        features[11] = 1.0 if lead_data.get('budget_mentioned', False) else 0.0
-        features[12] = 1.0 if lead_data.get('timeline_mentioned', False) else 0.0
-        features[13] = 1.0 if lead_data.get('decision_maker', False) else 0.0
-        
-        # 15. RAG context relevance
-        features[14] = lead_data.get('rag_context_relevance', 0.0)
-        
-        return features
+    # Extração de features (implementação sem torch em app.ml.models.features)
+    extract_features = staticmethod(lead_score_features)
+    extract_features_batch = staticmethod(lead_score_features_batch)
     
     def get_feature_importance(
         self,
@@ -189,13 +137,7 @@ class LeadScoreNet(nn.Module):
         
         Usa os pesos da primeira camada como proxy.
         """
-        feature_names = [
-            'lead_score', 'temperature', 'stage_index', 'intent',
-            'intent_confidence', 'num_messages', 'time_since_last',
-            'avg_response_time', 'sentiment', 'has_objection',
-            'objection_count', 'budget_mentioned', 'timeline_mentioned',
-            'decision_maker', 'rag_context_relevance'
-        ]
+        feature_names = LEAD_FEATURE_NAMES
         
         # Pega pesos da primeira camada
         first_layer = self.model[0]
@@ -275,6 +217,13 @@ class LeadScoreTrainer:
         
         return total_loss / num_batches
     
+    def validation_loss(self, features: np.ndarray, labels: np.ndarray) -> float:
+        """Loss (BCE) no conjunto de validação, usada no early stopping."""
+        self.model.eval()
+        with torch.no_grad():
+            outputs = self.model(torch.FloatTensor(features))
+            return self.criterion(outputs, torch.FloatTensor(labels).unsqueeze(1)).item()
+    
     def evaluate(
         self,
         features: np.ndarray,
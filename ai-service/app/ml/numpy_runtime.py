@@ -0,0 +1,290 @@
+"""
+Runtime NumPy de inferência (sem torch).
+
+LeadScoreNet, CampaignPredictorNet e as políticas DQN são MLPs pequenos
+(Linear + ReLU/Sigmoid). Para servir predições não é preciso importar torch
+(centenas de MB de RSS e segundos de import): o checkpoint é exportado para
+um .npz com os pesos de cada camada linear e a ativação seguinte, e o
+forward pass é feito com NumPy.
+
+Formato do .npz:
+- W{i}, b{i}: peso (entrada x saída, float32) e bias da i-ésima camada
+- meta: JSON com model_type, input_size, hidden_sizes, output_size,
+  activations (uma por camada) e output_scales (CampaignPredictorNet)
+
+O .npz é gravado ao lado do .pt pelo ModelRegistry.save_model. Para
+checkpoints antigos:
+
+    python -m app.ml.numpy_runtime /var/models
+"""
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.ml.campaign_optimizer import optimize_configuration
+from app.ml.models.features import (
+    LEAD_FEATURE_NAMES,
+    campaign_features,
+    campaign_features_batch,
+    lead_score_features,
+    lead_score_features_batch,
+)
+
+logger = structlog.get_logger()
+
+FORMAT_VERSION = 1
+
+ACTIVATIONS = {
+    'identity': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    # Forma com tanh: estável para |x| grande (sem overflow em exp)
+    'sigmoid': lambda x: 0.5 * (1 + np.tanh(0.5 * x)),
+    'tanh': np.tanh,
+}
+
+# Nome da classe do módulo torch -> ativação
+_TORCH_ACTIVATIONS = {'ReLU': 'relu', 'Sigmoid': 'sigmoid', 'Tanh': 'tanh'}
+
+# Módulos sem efeito em inferência
+_TORCH_IGNORED = {'Dropout', 'Identity', 'Flatten'}
+
+
+def numpy_weights_path(weights_path: str) -> str:
+    """Caminho do .npz exportado para um checkpoint .pt."""
+    return os.path.splitext(weights_path)[0] + '.npz'
+
+
+class NumpyMLP:
+    """MLP (camadas lineares + ativação) avaliado com NumPy."""
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray, str]], meta: Dict[str, Any]):
+        self.layers = layers
+        self.meta = meta
+        self.model_type = meta.get('model_type')
+        self.input_size = meta.get('input_size', layers[0][0].shape[0])
+        self.hidden_sizes = meta.get('hidden_sizes', [w.shape[1] for w, _, _ in layers[:-1]])
+        self.output_size = meta.get('output_size', layers[-1][0].shape[1])
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[np.newaxis, :]
+        for weight, bias, activation in self.layers:
+            x = ACTIVATIONS[activation](x @ weight + bias)
+        return x
+
+    __call__ = forward
+
+    def eval(self) -> "NumpyMLP":
+        """Compatibilidade com código que chama model.eval()."""
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return sum(w.nbytes + b.nbytes for w, b, _ in self.layers)
+
+
+class NumpyLeadScoreNet(NumpyMLP):
+    """LeadScoreNet servido sem torch (mesma interface de predição)."""
+
+    extract_features = staticmethod(lead_score_features)
+    extract_features_batch = staticmethod(lead_score_features_batch)
+
+    def predict(self, features: np.ndarray) -> float:
+        return float(self.forward(features).reshape(-1)[0])
+
+    def predict_batch(self, features_batch: np.ndarray) -> np.ndarray:
+        return self.forward(features_batch).reshape(-1)
+
+    def get_feature_importance(self, sample_input: Any = None) -> Dict[str, float]:
+        """Mesma aproximação do LeadScoreNet: pesos médios da primeira camada."""
+        weights = np.abs(self.layers[0][0]).mean(axis=1)
+        weights = weights / weights.sum()
+        return dict(zip(LEAD_FEATURE_NAMES, weights.tolist()))
+
+
+class NumpyCampaignPredictorNet(NumpyMLP):
+    """CampaignPredictorNet servido sem torch."""
+
+    extract_features = staticmethod(campaign_features)
+    extract_features_batch = staticmethod(campaign_features_batch)
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray, str]], meta: Dict[str, Any]):
+        super().__init__(layers, meta)
+        self.output_scales = np.asarray(meta.get('output_scales', [5.0, 5.0, 1.0]), dtype=np.float32)
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        return super().forward(x) * self.output_scales
+
+    __call__ = forward
+
+    @staticmethod
+    def _to_dict(row: np.ndarray) -> Dict[str, float]:
+        return {
+            'predicted_roas': float(row[0]),
+            'predicted_ctr': float(row[1]),
+            'predicted_conversion_rate': float(row[2])
+        }
+
+    def predict(self, features: np.ndarray) -> Dict[str, float]:
+        return self._to_dict(self.forward(features)[0])
+
+    def predict_array(self, features_batch: np.ndarray) -> np.ndarray:
+        return self.forward(features_batch)
+
+    def predict_batch(self, features_batch: np.ndarray) -> List[Dict[str, float]]:
+        return [self._to_dict(row) for row in self.forward(features_batch)]
+
+    def get_optimal_configuration(
+        self,
+        base_config: Dict[str, Any],
+        historical_data: Dict[str, Any],
+        time_budget_ms: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, float], List[Dict[str, Any]]]:
+        """Mesma busca do CampaignPredictorNet (app.ml.campaign_optimizer)."""
+        result = optimize_configuration(self, base_config, historical_data, time_budget_ms)
+        return result['best_config'], result['best_prediction'], result['pareto_front']
+
+
+class NumpyQNetwork(NumpyMLP):
+    """Rede Q das políticas DQN (sdr_policy / ads_policy)."""
+
+    def predict_q(self, state_vector: np.ndarray) -> np.ndarray:
+        return self.forward(state_vector)[0]
+
+
+_RUNTIME_CLASSES = {
+    'lead_score': NumpyLeadScoreNet,
+    'campaign_predictor': NumpyCampaignPredictorNet,
+    'sdr_policy': NumpyQNetwork,
+    'ads_policy': NumpyQNetwork,
+}
+
+
+def load_numpy_model(path: str, model_type: Optional[str] = None) -> NumpyMLP:
+    """Carrega um .npz exportado por export_model."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Formato de pesos não suportado: {meta.get('format_version')}")
+        layers = [
+            (data[f'W{i}'], data[f'b{i}'], activation)
+            for i, activation in enumerate(meta['activations'])
+        ]
+    cls = _RUNTIME_CLASSES.get(model_type or meta.get('model_type'), NumpyMLP)
+    return cls(layers, meta)
+
+
+# ============================================
+# Exportação (requer torch; roda no treino)
+# ============================================
+
+def export_model(model: Any, path: str, model_type: str) -> str:
+    """
+    Exporta um nn.Module (Linear + ativações, em sequência) para .npz.
+
+    Dropout é ignorado (inferência); qualquer outro módulo não suportado
+    interrompe a exportação.
+    """
+    layers: List[Tuple[np.ndarray, np.ndarray]] = []
+    activations: List[str] = []
+
+    for module in model.modules():
+        if list(module.children()):
+            continue  # Containers (Sequential, o próprio modelo)
+        name = type(module).__name__
+        if name == 'Linear':
+            layers.append((
+                np.ascontiguousarray(module.weight.detach().cpu().numpy().T, dtype=np.float32),
+                module.bias.detach().cpu().numpy().astype(np.float32),
+            ))
+            activations.append('identity')
+        elif name in _TORCH_ACTIVATIONS:
+            if not layers or activations[-1] != 'identity':
+                raise ValueError(f"Ativação {name} fora de posição")
+            activations[-1] = _TORCH_ACTIVATIONS[name]
+        elif name not in _TORCH_IGNORED:
+            raise ValueError(f"Módulo não suportado pelo runtime NumPy: {name}")
+
+    if not layers:
+        raise ValueError("Modelo sem camadas lineares")
+
+    meta: Dict[str, Any] = {
+        'format_version': FORMAT_VERSION,
+        'model_type': model_type,
+        'input_size': int(layers[0][0].shape[0]),
+        'hidden_sizes': [int(w.shape[1]) for w, _ in layers[:-1]],
+        'output_size': int(layers[-1][0].shape[1]),
+        'activations': activations,
+    }
+    scales = getattr(model, 'output_scales', None)
+    if scales is not None:
+        meta['output_scales'] = [float(v) for v in scales.detach().cpu().numpy().reshape(-1)]
+
+    arrays = {'meta': np.array(json.dumps(meta))}
+    for i, (weight, bias) in enumerate(layers):
+        arrays[f'W{i}'] = weight
+        arrays[f'b{i}'] = bias
+
+    # Grava num temporário e renomeia: réplicas nunca leem um arquivo pela metade
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_checkpoint(model_type: str, checkpoint_path: str) -> str:
+    """Converte um checkpoint .pt (lead_score / campaign_predictor) em .npz."""
+    import torch
+    from app.ml.models.lead_score_net import LeadScoreNet
+    from app.ml.models.campaign_predictor import CampaignPredictorNet
+
+    checkpoint = torch.load(checkpoint_path, map_location='cpu')
+    if model_type == 'lead_score':
+        model = LeadScoreNet(
+            input_size=checkpoint.get('input_size') or 15,
+            hidden_sizes=checkpoint.get('hidden_sizes') or [64, 32]
+        )
+    elif model_type == 'campaign_predictor':
+        model = CampaignPredictorNet(
+            input_size=checkpoint.get('input_size') or 12,
+            hidden_sizes=checkpoint.get('hidden_sizes') or [64, 32],
+            output_size=checkpoint.get('output_size') or 3
+        )
+    else:
+        raise ValueError(f"Tipo de modelo sem classe torch: {model_type}")
+
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return export_model(model, numpy_weights_path(checkpoint_path), model_type)
+
+
+def export_directory(models_dir: str) -> int:
+    """Exporta todos os .pt de models_dir que ainda não têm .npz."""
+    exported = 0
+    for root, _, files in os.walk(models_dir):
+        for filename in files:
+            if not filename.endswith('.pt'):
+                continue
+            path = os.path.join(root, filename)
+            if os.path.exists(numpy_weights_path(path)):
+                continue
+            # Arquivos são gravados como {model_type}_{uuid}.pt
+            model_type = filename.rsplit('_', 1)[0]
+            try:
+                export_checkpoint(model_type, path)
+                exported += 1
+                logger.info("numpy_weights_exported", path=path)
+            except Exception as e:
+                logger.warning("numpy_export_failed", path=path, error=str(e))
+    return exported
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('MODELS_DIR', '/var/models')
+    print(f"{export_directory(directory)} modelos exportados")
@@ -4,10 +4,37 @@ Training Module - Treinamento periódico de modelos ML.
 Inclui:
 - TrainingJob: Job que executa treinamento por tenant
 - DataLoader: Carrega dados de treino do banco
+- TrainingExecutor: Fila de treinos fora do event loop (process pool)
+- TrainingOrchestrator: Treino de todos os tenants em paralelo (orçamento de CPU/memória)
 - Scheduler: Agenda treinamentos periódicos
+
+Importações sob demanda: os processos de treino (spawn) e o serving não
+carregam torch/registry só por importar o pacote.
 """
 
-from app.ml.training.training_job import TenantTrainingJob, get_training_job
-from app.ml.training.data_loader import TrainingDataLoader
+__all__ = [
+    'TenantTrainingJob',
+    'get_training_job',
+    'TrainingDataLoader',
+    'TrainingExecutor',
+    'get_training_executor',
+    'TrainingOrchestrator',
+    'get_training_orchestrator',
+]
+
+_EXPORTS = {
+    'TenantTrainingJob': 'app.ml.training.training_job',
+    'get_training_job': 'app.ml.training.training_job',
+    'TrainingDataLoader': 'app.ml.training.data_loader',
+    'TrainingExecutor': 'app.ml.training.executor',
+    'get_training_executor': 'app.ml.training.executor',
+    'TrainingOrchestrator': 'app.ml.training.orchestrator',
+    'get_training_orchestrator': 'app.ml.training.orchestrator',
+}
+
 
-__all__ = ['TenantTrainingJob', 'get_training_job', 'TrainingDataLoader']
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
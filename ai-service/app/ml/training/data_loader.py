@@ -5,20 +5,98 @@ Responsável por:
 - Carregar dados de leads para treino do LeadScoreNet
 - Carregar dados de campanhas para treino do CampaignPredictorNet
 - Carregar experiências de RL para treino de políticas
+- Fingerprint dos dados de treino (pular tenants sem dados novos)
+
+Treino global: shard=(k, n) restringe a consulta aos tenants cujo hash cai
+no shard k de n, para carregar os dados de todos os tenants em partes.
+
+As cargas de leads e campanhas leem em streaming (cursor no servidor): o
+JSONB é decodificado no banco em colunas tipadas e cada chunk vira features
+num array float32 pré-alocado (app.ml.training.streaming).
 """
+import hashlib
 import json
 import numpy as np
-from typing import List, Dict, Any, Tuple, Optional
+from typing import Callable, List, Dict, Any, Tuple, Optional
 from datetime import datetime, timedelta
 import structlog
 
 from app.config import get_settings
-from app.ml.models.lead_score_net import LeadScoreNet
-from app.ml.models.campaign_predictor import CampaignPredictorNet
+from app.ml.models.features import campaign_features_batch, lead_score_features_batch
+from app.ml.training.streaming import (
+    ArrayBuilder,
+    DatasetCache,
+    json_flag,
+    json_number,
+    json_text,
+    record_batch,
+)
 
 logger = structlog.get_logger()
 settings = get_settings()
 
+# Tenants distribuídos em shards pelo hash do id (hashtext é int4 com sinal)
+SHARD_FILTER = " AND mod(hashtext({alias}.tenant_id::text)::bigint + 2147483648, :num_shards) = :shard"
+
+# Leads com outcome conhecido; campos do agente vêm de custom_fields (JSONB)
+LEAD_DATASET = {
+    'alias': 'l',
+    'select': f"""
+        SELECT
+            COALESCE(l.score, 0)::float8 AS lead_score,
+            COALESCE(l.temperature, 'unknown') AS temperature,
+            COALESCE(ps."order", 0)::float8 AS stage_index,
+            {json_text('cf.f', 'last_intent', 'unclear')} AS intent,
+            {json_number('cf.f', 'intent_confidence', 0)} AS intent_confidence,
+            {json_number('cf.f', 'message_count', 0)} AS num_messages,
+            {json_number('cf.f', 'avg_response_time', 0)} AS avg_response_time,
+            {json_number('cf.f', 'sentiment', 0)} AS sentiment,
+            {json_flag('cf.f', 'has_objection')} AS has_objection,
+            {json_number('cf.f', 'objection_count', 0)} AS objection_count,
+            {json_flag('cf.f', 'budget_mentioned')} AS budget_mentioned,
+            {json_flag('cf.f', 'timeline_mentioned')} AS timeline_mentioned,
+            {json_flag('cf.f', 'decision_maker')} AS decision_maker,
+            {json_number('cf.f', 'rag_relevance', 0)} AS rag_context_relevance,
+            CASE WHEN l.status = 'won' THEN 1 ELSE 0 END AS converted
+    """,
+    'from': "FROM leads l",
+    'joins': """
+        LEFT JOIN pipeline_stages ps ON l.stage_id = ps.id
+        CROSS JOIN LATERAL (SELECT COALESCE(l.custom_fields::jsonb, '{}'::jsonb) AS f) cf
+    """,
+    'where': """
+        WHERE l.created_at > :since_date
+        AND l.status IN ('won', 'lost')
+    """,
+}
+
+# Campanhas com entrega suficiente; criativo/público vêm de metadata (JSONB)
+CAMPAIGN_DATASET = {
+    'alias': 'ac',
+    'select': f"""
+        SELECT
+            COALESCE(ac.objective, '') AS objective,
+            COALESCE(ac.daily_budget, 0)::float8 AS daily_budget,
+            {json_text('md.f', 'creative_type', 'image')} AS creative_type,
+            {json_number('md.f', 'audience_size', 1000000)} AS audience_size,
+            {json_flag('md.f', 'is_retargeting')} AS is_retargeting,
+            {json_number('md.f', 'lookalike_score', 0.5)} AS lookalike_score,
+            {json_number('md.f', 'seasonal_factor', 0.5)} AS seasonal_factor,
+            COALESCE(ac.roas, 0)::float8 AS roas,
+            COALESCE(ac.ctr, 0)::float8 AS ctr,
+            CASE WHEN ac.clicks > 0 THEN COALESCE(ac.conversions, 0)::float8 / ac.clicks ELSE 0 END AS conversion_rate
+    """,
+    'from': "FROM ad_campaigns ac",
+    'joins': """
+        CROSS JOIN LATERAL (SELECT COALESCE(ac.metadata::jsonb, '{}'::jsonb) AS f) md
+    """,
+    'where': """
+        WHERE ac.created_at > :since_date
+        AND ac.impressions > 100
+        AND ac.status IN ('ACTIVE', 'PAUSED', 'COMPLETED')
+    """,
+}
+
 
 class TrainingDataLoader:
     """
@@ -38,11 +116,114 @@ class TrainingDataLoader:
             self._db_engine = create_async_engine(db_url)
         return self._db_engine
     
+    def _cache(self) -> Optional[DatasetCache]:
+        if not settings.ml_training_cache_dir:
+            return None
+        return DatasetCache(settings.ml_training_cache_dir, settings.ml_training_cache_max_mb * 1024 * 1024)
+    
+    @staticmethod
+    def _window_start(days: int) -> datetime:
+        """Início da janela alinhado ao dia: consultas do mesmo dia repetem a chave do cache."""
+        since = datetime.utcnow() - timedelta(days=days)
+        return since.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    @staticmethod
+    def _filters(
+        alias: str,
+        tenant_id: Optional[str],
+        shard: Optional[Tuple[int, int]],
+        updated_since: Optional[datetime],
+        params: Dict[str, Any]
+    ) -> str:
+        """Filtros opcionais (tenant, shard, fine-tune) comuns às cargas."""
+        sql = ""
+        if tenant_id:
+            sql += f" AND {alias}.tenant_id = :tenant_id"
+            params['tenant_id'] = tenant_id
+        if shard:
+            sql += SHARD_FILTER.format(alias=alias)
+            params['shard'], params['num_shards'] = shard
+        if updated_since:
+            sql += f" AND {alias}.updated_at > :updated_since"
+            params['updated_since'] = updated_since
+        return sql
+    
+    @staticmethod
+    def _stats_sql(spec: Dict[str, str], filters: str) -> str:
+        """Contagem e última atualização das linhas de uma carga (COUNT e fingerprint)."""
+        return (
+            f"SELECT COUNT(*) AS samples, MAX({spec['alias']}.updated_at) AS last_update "
+            f"{spec['from']} {spec['where']}{filters}"
+        )
+    
+    async def _stream_dataset(
+        self,
+        conn,
+        name: str,
+        spec: Dict[str, str],
+        filters: str,
+        params: Dict[str, Any],
+        min_samples: int,
+        to_features: Callable[[Dict[str, Any]], np.ndarray],
+        feature_width: int,
+        target_columns: List[str],
+        cache_parts: Tuple[Any, ...] = ()
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lê o dataset com cursor no servidor, chunk a chunk, para arrays
+        float32 pré-alocados pelo COUNT da mesma consulta.
+        
+        Com ml_training_cache_dir, o resultado é reaproveitado enquanto a
+        consulta, a contagem e a última atualização forem as mesmas.
+        """
+        from sqlalchemy import text
+        
+        where = spec['where'] + filters
+        stats = (await conn.execute(text(self._stats_sql(spec, filters)), params)).fetchone()
+        samples = int(stats.samples or 0)
+        
+        if samples < min_samples:
+            logger.warning(f"insufficient_{name}_data",
+                tenant_id=params.get('tenant_id'),
+                count=samples,
+                min_required=min_samples
+            )
+            return np.array([]), np.array([])
+        
+        sql = f"{spec['select']} {spec['from']} {spec['joins']} {where}"
+        cache = self._cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(name, sql, params, samples, stats.last_update, *cache_parts)
+            cached = cache.load(cache_key)
+            if cached is not None:
+                logger.info(f"{name}_data_cache_hit", tenant_id=params.get('tenant_id'), samples=len(cached[0]))
+                return cached
+        
+        features = ArrayBuilder(feature_width, samples)
+        targets = ArrayBuilder(len(target_columns) if len(target_columns) > 1 else None, samples)
+        
+        result = await conn.stream(text(sql), params)
+        keys = list(result.keys())
+        async for rows in result.partitions(settings.ml_training_fetch_size):
+            columns = record_batch(keys, rows)
+            features.append(to_features(columns))
+            target_block = np.array([columns[c] for c in target_columns], dtype=np.float32)
+            targets.append(target_block.T if len(target_columns) > 1 else target_block[0])
+        
+        features, targets = features.result(), targets.result()
+        if cache_key is not None:
+            cache.save(cache_key, features, targets)
+        return features, targets
+    
     async def load_lead_score_data(
         self,
         tenant_id: Optional[str] = None,
         days: int = 90,
-        min_samples: int = 50
+        min_samples: int = 50,
+        shard: Optional[Tuple[int, int]] = None,
+        updated_since: Optional[datetime] = None,
+        raise_errors: bool = False
     ) -> Tuple[np.ndarray, np.ndarray]:
         """
         Carrega dados de leads para treinar LeadScoreNet.
@@ -51,97 +232,51 @@ class TrainingDataLoader:
             tenant_id: ID do tenant (None para global)
             days: Dias de histórico para usar
             min_samples: Mínimo de amostras necessárias
+            shard: (k, n) para carregar só o shard k de n (treino global)
+            updated_since: só registros alterados depois (fine-tune incremental)
+            raise_errors: propaga erros do banco em vez de devolver arrays
+                vazios (shards do treino global: vazio por erro != sem dados)
         
         Returns:
-            Tuple (features, labels) como arrays numpy
+            Tuple (features, labels) como arrays numpy float32
         """
         try:
             engine = await self.get_db_engine()
             
             async with engine.connect() as conn:
-                from sqlalchemy import text
-                
-                since_date = datetime.utcnow() - timedelta(days=days)
-                
-                # Query para buscar leads com outcome conhecido
-                sql = """
-                    SELECT 
-                        l.id,
-                        l.score,
-                        l.temperature,
-                        ps.position as stage_index,
-                        l.metadata,
-                        CASE WHEN l.status = 'won' THEN 1 ELSE 0 END as converted
-                    FROM leads l
-                    LEFT JOIN pipeline_stages ps ON l.stage_id = ps.id
-                    WHERE l.created_at > :since_date
-                    AND l.status IN ('won', 'lost')
-                """
-                
-                params = {'since_date': since_date}
-                
-                if tenant_id:
-                    sql += " AND l.tenant_id = :tenant_id"
-                    params['tenant_id'] = tenant_id
-                
-                result = await conn.execute(text(sql), params)
-                rows = result.fetchall()
+                params: Dict[str, Any] = {'since_date': self._window_start(days)}
+                filters = self._filters('l', tenant_id, shard, updated_since, params)
+                
+                features, labels = await self._stream_dataset(
+                    conn, 'lead', LEAD_DATASET, filters, params, min_samples,
+                    to_features=lead_score_features_batch,
+                    feature_width=15,
+                    target_columns=['converted']
+                )
                 
-                if len(rows) < min_samples:
-                    logger.warning("insufficient_lead_data",
+                if len(features):
+                    logger.info("lead_score_data_loaded",
                         tenant_id=tenant_id,
-                        count=len(rows),
-                        min_required=min_samples
+                        samples=len(features),
+                        positive_rate=float(labels.mean())
                     )
-                    return np.array([]), np.array([])
-                
-                features_list = []
-                labels_list = []
-                
-                for row in rows:
-                    # Extrai metadata
-                    metadata = json.loads(row.metadata) if row.metadata and isinstance(row.metadata, str) else (row.metadata or {})
-                    
-                    # Monta dados do lead para extração de features
-                    lead_data = {
-                        'lead_score': row.score or 0,
-                        'temperature': row.temperature or 'unknown',
-                        'stage_index': row.stage_index or 0,
-                        'intent': metadata.get('last_intent', 'unclear'),
-                        'intent_confidence': metadata.get('intent_confidence', 0),
-                        'num_messages': metadata.get('message_count', 0),
-                        'time_since_last_msg': 0,  # Não disponível historicamente
-                        'avg_response_time': metadata.get('avg_response_time', 0),
-                        'sentiment': metadata.get('sentiment', 0),
-                        'has_objection': metadata.get('has_objection', False),
-                        'objection_count': metadata.get('objection_count', 0),
-                        'budget_mentioned': metadata.get('budget_mentioned', False),
-                        'timeline_mentioned': metadata.get('timeline_mentioned', False),
-                        'decision_maker': metadata.get('decision_maker', False),
-                        'rag_context_relevance': metadata.get('rag_relevance', 0),
-                    }
-                    
-                    features = LeadScoreNet.extract_features(lead_data)
-                    features_list.append(features)
-                    labels_list.append(row.converted)
-                
-                logger.info("lead_score_data_loaded",
-                    tenant_id=tenant_id,
-                    samples=len(features_list),
-                    positive_rate=sum(labels_list) / len(labels_list) if labels_list else 0
-                )
                 
-                return np.array(features_list), np.array(labels_list)
+                return features, labels
                 
         except Exception as e:
             logger.error("load_lead_score_data_error", error=str(e))
+            if raise_errors:
+                raise
             return np.array([]), np.array([])
     
     async def load_campaign_data(
         self,
         tenant_id: Optional[str] = None,
         days: int = 90,
-        min_samples: int = 30
+        min_samples: int = 30,
+        shard: Optional[Tuple[int, int]] = None,
+        updated_since: Optional[datetime] = None,
+        raise_errors: bool = False
     ) -> Tuple[np.ndarray, np.ndarray]:
         """
         Carrega dados de campanhas para treinar CampaignPredictorNet.
@@ -150,94 +285,90 @@ class TrainingDataLoader:
             tenant_id: ID do tenant (None para global)
             days: Dias de histórico
             min_samples: Mínimo de amostras
+            shard: (k, n) para carregar só o shard k de n (treino global)
+            updated_since: só registros alterados depois (fine-tune incremental)
+            raise_errors: propaga erros do banco em vez de devolver arrays
+                vazios (shards do treino global: vazio por erro != sem dados)
         
         Returns:
-            Tuple (features, targets) como arrays numpy
+            Tuple (features, targets) como arrays numpy float32
             targets são [roas, ctr, conversion_rate]
         """
         try:
             engine = await self.get_db_engine()
             
             async with engine.connect() as conn:
-                from sqlalchemy import text
-                
-                since_date = datetime.utcnow() - timedelta(days=days)
+                params: Dict[str, Any] = {'since_date': self._window_start(days)}
+                filters = self._filters('ac', tenant_id, shard, updated_since, params)
                 
-                sql = """
-                    SELECT 
-                        ac.id,
-                        ac.objective,
-                        ac.daily_budget,
-                        ac.spend,
-                        ac.impressions,
-                        ac.clicks,
-                        ac.conversions,
-                        ac.roas,
-                        ac.ctr,
-                        ac.metadata
-                    FROM ad_campaigns ac
-                    WHERE ac.created_at > :since_date
-                    AND ac.impressions > 100
-                    AND ac.status IN ('ACTIVE', 'PAUSED', 'COMPLETED')
-                """
-                
-                params = {'since_date': since_date}
-                
-                if tenant_id:
-                    sql += " AND ac.tenant_id = :tenant_id"
-                    params['tenant_id'] = tenant_id
+                # Histórico do tenant entra nas features (e na chave do cache)
+                historical_data = await self._get_historical_averages(conn, tenant_id)
                 
-                result = await conn.execute(text(sql), params)
-                rows = result.fetchall()
+                features, targets = await self._stream_dataset(
+                    conn, 'campaign', CAMPAIGN_DATASET, filters, params, min_samples,
+                    to_features=lambda columns: campaign_features_batch(columns, historical_data),
+                    feature_width=12,
+                    target_columns=['roas', 'ctr', 'conversion_rate'],
+                    cache_parts=(historical_data,)
+                )
                 
-                if len(rows) < min_samples:
-                    logger.warning("insufficient_campaign_data",
+                if len(features):
+                    logger.info("campaign_data_loaded",
                         tenant_id=tenant_id,
-                        count=len(rows),
-                        min_required=min_samples
+                        samples=len(features)
                     )
-                    return np.array([]), np.array([])
-                
-                # Calcula histórico para features
-                historical_data = await self._get_historical_averages(conn, tenant_id)
-                
-                features_list = []
-                targets_list = []
                 
-                for row in rows:
-                    metadata = json.loads(row.metadata) if row.metadata and isinstance(row.metadata, str) else (row.metadata or {})
-                    
-                    campaign_data = {
-                        'objective': row.objective or '',
-                        'daily_budget': row.daily_budget or 0,
-                        'creative_type': metadata.get('creative_type', 'image'),
-                        'audience_size': metadata.get('audience_size', 1000000),
-                        'is_retargeting': metadata.get('is_retargeting', False),
-                        'lookalike_score': metadata.get('lookalike_score', 0.5),
-                        'seasonal_factor': metadata.get('seasonal_factor', 0.5),
-                    }
-                    
-                    features = CampaignPredictorNet.extract_features(campaign_data, historical_data)
-                    features_list.append(features)
-                    
-                    # Targets reais
-                    roas = row.roas or 0
-                    ctr = row.ctr or 0
-                    conversion_rate = (row.conversions / row.clicks) if row.clicks > 0 else 0
-                    
-                    targets_list.append([roas, ctr, conversion_rate])
-                
-                logger.info("campaign_data_loaded",
-                    tenant_id=tenant_id,
-                    samples=len(features_list)
-                )
-                
-                return np.array(features_list), np.array(targets_list)
+                return features, targets
                 
         except Exception as e:
             logger.error("load_campaign_data_error", error=str(e))
+            if raise_errors:
+                raise
             return np.array([]), np.array([])
     
+    async def data_fingerprint(
+        self,
+        model_type: str,
+        tenant_id: str,
+        days: int = 90
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fingerprint dos dados que um treino usaria (mesmos filtros das cargas).
+        
+        Contagem + última atualização das linhas: muda quando entra, sai da
+        janela ou é alterado algum registro.
+        
+        Returns:
+            Dict com fingerprint e samples, ou None em erro
+        """
+        spec = {'lead_score': LEAD_DATASET, 'campaign_predictor': CAMPAIGN_DATASET}.get(model_type)
+        if spec is None:
+            return None
+        
+        # Mesma janela (alinhada ao dia) e mesmos filtros de _stream_dataset
+        params: Dict[str, Any] = {'since_date': self._window_start(days)}
+        sql = self._stats_sql(spec, self._filters(spec['alias'], tenant_id, None, None, params))
+        
+        try:
+            engine = await self.get_db_engine()
+            
+            async with engine.connect() as conn:
+                from sqlalchemy import text
+                
+                result = await conn.execute(text(sql), params)
+                row = result.fetchone()
+        except Exception as e:
+            logger.error("data_fingerprint_error", tenant_id=tenant_id, model_type=model_type, error=str(e))
+            return None
+        
+        samples = int(row.samples or 0)
+        last_update = row.last_update.isoformat() if row.last_update else ''
+        raw = f"{model_type}:{days}:{samples}:{last_update}"
+        return {
+            'fingerprint': hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16],
+            'samples': samples,
+        }
+    
     async def _get_historical_averages(
         self,
         conn,
@@ -277,7 +408,11 @@ class TrainingDataLoader:
         limit: int = 10000
     ) -> List[Dict[str, Any]]:
         """
-        Carrega experiências de RL para treino de políticas.
+        Carga de experiências de RL para treino de políticas.
+        
+        Lê com cursor no servidor; action, reward e is_terminal já chegam
+        tipados do banco (ações não numéricas ficam de fora). state e
+        next_state seguem como dicts (SDRState/AdsState.from_dict).
         
         Returns:
             Lista de experiências com state, action, reward, next_state
@@ -293,39 +428,40 @@ class TrainingDataLoader:
                 sql = """
                     SELECT 
                         state,
-                        action,
-                        reward,
+                        action::int AS action,
+                        COALESCE(reward, 0)::float8 AS reward,
                         next_state,
                         is_terminal
                     FROM rl_experiences
                     WHERE agent_type = :agent_type
                     AND reward_received = true
                     AND created_at > :since_date
+                    AND action ~ '^-?[0-9]+$'
                 """
                 
                 params = {
                     'agent_type': agent_type,
                     'since_date': since_date,
+                    'limit': limit,
                 }
                 
                 if tenant_id:
                     sql += " AND tenant_id = :tenant_id"
                     params['tenant_id'] = tenant_id
                 
-                sql += f" ORDER BY created_at DESC LIMIT {limit}"
-                
-                result = await conn.execute(text(sql), params)
-                rows = result.fetchall()
+                sql += " ORDER BY created_at DESC LIMIT :limit"
                 
                 experiences = []
-                for row in rows:
-                    experiences.append({
-                        'state': json.loads(row.state) if isinstance(row.state, str) else row.state,
-                        'action': int(row.action),
-                        'reward': float(row.reward),
-                        'next_state': json.loads(row.next_state) if row.next_state and isinstance(row.next_state, str) else row.next_state,
-                        'is_terminal': row.is_terminal,
-                    })
+                result = await conn.stream(text(sql), params)
+                async for rows in result.partitions(settings.ml_training_fetch_size):
+                    for row in rows:
+                        experiences.append({
+                            'state': json.loads(row.state) if isinstance(row.state, str) else row.state,
+                            'action': row.action,
+                            'reward': row.reward,
+                            'next_state': json.loads(row.next_state) if row.next_state and isinstance(row.next_state, str) else row.next_state,
+                            'is_terminal': row.is_terminal,
+                        })
                 
                 logger.info("rl_experiences_loaded",
                     agent_type=agent_type,
@@ -0,0 +1,345 @@
+"""
+Executor de treino fora do event loop.
+
+As épocas de PyTorch são CPU puro e síncronas: rodando dentro de uma
+coroutine (como background task do FastAPI) travam o event loop que
+atende os agentes. O TrainingExecutor:
+
+- roda os laços de treino (app.ml.training.fitting) num ProcessPool
+  (spawn) com limite de threads do torch por processo e prioridade
+  reduzida (nice); ml_training_mode=thread usa uma thread no lugar
+- enfileira jobs: no máximo ml_training_workers treinando ao mesmo tempo
+- deduplica por (tenant, tipo de modelo): pedir de novo um treino que já
+  está na fila ou rodando devolve o job existente
+- reporta progresso por época (get_job / get_training_status)
+- cancela jobs na fila ou entre duas épocas
+"""
+import asyncio
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+import multiprocessing
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class TrainingCancelled(Exception):
+    """Job de treino cancelado (na fila ou entre duas épocas)."""
+
+
+def _init_worker(threads: int, niceness: int) -> None:
+    """Inicializa um processo de treino: limita threads e reduz prioridade."""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    if niceness:
+        try:
+            os.nice(niceness)
+        except OSError:
+            pass
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+
+def _run_fit(fn: Callable, kwargs: Dict[str, Any], job_id: str, progress: Any, cancel: Any) -> Any:
+    """Executa fn no processo (ou thread) de treino, reportando progresso."""
+    def report(epoch: int, epochs: int, train_loss: float) -> None:
+        progress[job_id] = {'epoch': epoch, 'epochs': epochs, 'train_loss': float(train_loss)}
+        if cancel.is_set():
+            raise TrainingCancelled()
+
+    if cancel.is_set():
+        raise TrainingCancelled()
+    return fn(progress=report, **kwargs)
+
+
+@dataclass
+class TrainingJobInfo:
+    """Estado de um job de treino."""
+    job_id: str
+    tenant_id: Optional[str]
+    model_type: str
+    status: str = 'queued'  # queued | running | completed | skipped | failed | cancelled
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.tenant_id or 'global', self.model_type)
+
+    def to_dict(self, progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = {
+            'job_id': self.job_id,
+            'tenant_id': self.tenant_id,
+            'model_type': self.model_type,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': 100 if self.status == 'completed' else 0,
+        }
+        if progress:
+            data['epoch'] = progress['epoch']
+            data['epochs'] = progress['epochs']
+            data['train_loss'] = progress['train_loss']
+            if self.status != 'completed':
+                data['progress'] = round(100 * progress['epoch'] / max(progress['epochs'], 1), 1)
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class TrainingExecutor:
+    """Fila de jobs de treino executados fora do event loop."""
+
+    # Jobs finalizados mantidos para consulta de status
+    MAX_FINISHED_JOBS = 200
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, TrainingJobInfo]" = OrderedDict()
+        self._active: Dict[Tuple[str, str], str] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._manager = None
+        self._progress: Any = {}
+        self._cancel_events: Dict[str, Any] = {}
+        self._stats = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    @property
+    def mode(self) -> str:
+        return 'thread' if settings.ml_training_mode == 'thread' else 'process'
+
+    def _get_pool(self):
+        """Cria o pool (bloqueante: spawn do Manager e dos processos)."""
+        with self._pool_lock:
+            return self._create_pool()
+
+    def _create_pool(self):
+        if self._pool is None:
+            workers = max(1, settings.ml_training_workers)
+            if self.mode == 'thread':
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ml-training')
+            else:
+                context = multiprocessing.get_context('spawn')
+                self._manager = context.Manager()
+                self._progress = self._manager.dict()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(settings.ml_training_threads, settings.ml_training_nice)
+                )
+                logger.info("training_pool_started", workers=workers, threads=settings.ml_training_threads)
+        return self._pool
+
+    def _discard_pool(self, pool: Any) -> None:
+        """Descarta um pool quebrado junto com o Manager dele (o próximo job recria os dois)."""
+        with self._pool_lock:
+            # Outro job que falhou junto já descartou (ou o pool já foi recriado)
+            if self._pool is not pool:
+                return
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            manager, self._manager = self._manager, None
+            self._progress = {}
+        if manager is not None:
+            manager.shutdown()
+
+    def _new_cancel_event(self) -> Any:
+        if self._manager is not None:
+            return self._manager.Event()
+        return threading.Event()
+
+    # ============================================
+    # Fila de jobs
+    # ============================================
+
+    def submit(
+        self,
+        tenant_id: Optional[str],
+        model_type: str,
+        runner: Callable[[TrainingJobInfo], Awaitable[Dict[str, Any]]]
+    ) -> TrainingJobInfo:
+        """
+        Enfileira um treino. Se já há um job ativo para (tenant, tipo),
+        devolve esse job.
+        """
+        key = (tenant_id or 'global', model_type)
+        active_id = self._active.get(key)
+        if active_id and self._jobs[active_id].status in ACTIVE_STATUSES:
+            self._stats["deduplicated"] += 1
+            return self._jobs[active_id]
+
+        job = TrainingJobInfo(job_id=str(uuid.uuid4()), tenant_id=tenant_id, model_type=model_type)
+        self._jobs[job.job_id] = job
+        self._active[key] = job.job_id
+        self._stats["submitted"] += 1
+        job.task = asyncio.create_task(self._run_job(job, runner))
+        self._trim_finished()
+
+        logger.info("training_job_queued", job_id=job.job_id, tenant_id=tenant_id, model_type=model_type)
+        return job
+
+    async def _run_job(
+        self,
+        job: TrainingJobInfo,
+        runner: Callable[[TrainingJobInfo], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, settings.ml_training_workers))
+
+        try:
+            async with self._semaphore:
+                if job.cancel_requested:
+                    raise TrainingCancelled()
+                job.status = 'running'
+                job.started_at = datetime.utcnow().isoformat()
+                result = await runner(job)
+
+            job.result = result
+            job.status = 'completed' if result.get('success') else 'skipped'
+            self._stats["completed"] += 1
+        except (TrainingCancelled, asyncio.CancelledError):
+            job.status = 'cancelled'
+            self._stats["cancelled"] += 1
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            self._stats["failed"] += 1
+            logger.error("training_job_failed", job_id=job.job_id, model_type=job.model_type, error=str(e))
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+            if self._active.get(job.key) == job.job_id:
+                self._active.pop(job.key, None)
+            self._cancel_events.pop(job.job_id, None)
+            logger.info("training_job_finished", job_id=job.job_id, status=job.status)
+
+    def _trim_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            self._jobs.pop(job_id, None)
+            self._progress.pop(job_id, None)
+
+    async def wait(self, job: TrainingJobInfo) -> TrainingJobInfo:
+        """Aguarda o fim do job."""
+        if job.task is not None:
+            await asyncio.shield(job.task)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancela um job na fila ou em treino (interrompe na próxima época)."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        job.cancel_requested = True
+        event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        elif job.status == 'queued' and job.task is not None:
+            job.task.cancel()
+        logger.info("training_job_cancel_requested", job_id=job_id)
+        return True
+
+    # ============================================
+    # Execução do laço de treino
+    # ============================================
+
+    async def fit(self, job: Optional[TrainingJobInfo], fn: Callable, **kwargs) -> Any:
+        """
+        Executa um laço de treino (app.ml.training.fitting) no pool.
+
+        Levanta TrainingCancelled se o job for cancelado.
+        """
+        job_id = job.job_id if job else str(uuid.uuid4())
+        # Subir os processos leva centenas de ms: fora do event loop
+        pool = self._pool or await asyncio.to_thread(self._get_pool)
+        cancel = self._new_cancel_event()
+        if job is not None:
+            if job.cancel_requested:
+                raise TrainingCancelled()
+            self._cancel_events[job_id] = cancel
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, _run_fit, fn, kwargs, job_id, self._progress, cancel)
+        except BrokenProcessPool:
+            # Processo morto (OOM, kill): recria o pool no próximo job
+            logger.error("training_pool_broken", job_id=job_id)
+            await asyncio.to_thread(self._discard_pool, pool)
+            raise
+        finally:
+            if job is None:
+                self._progress.pop(job_id, None)
+
+    # ============================================
+    # Consulta
+    # ============================================
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return job.to_dict(self._progress.get(job_id))
+
+    def list_jobs(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            job.to_dict(self._progress.get(job.job_id))
+            for job in self._jobs.values()
+            if tenant_id is None or job.tenant_id == tenant_id
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            **self._stats,
+            'mode': self.mode,
+            'workers': max(1, settings.ml_training_workers),
+            'jobs': statuses,
+        }
+
+    def shutdown(self) -> None:
+        """Cancela jobs ativos e encerra o pool (chamado no shutdown do serviço)."""
+        for job_id in list(self._active.values()):
+            self.cancel(job_id)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._progress = {}
+
+
+# Singleton
+training_executor = TrainingExecutor()
+
+
+def get_training_executor() -> TrainingExecutor:
+    """Retorna instância singleton do executor."""
+    return training_executor
@@ -0,0 +1,274 @@
+"""
+Laços de treino (CPU) dos modelos ML.
+
+Funções puras: recebem arrays, devolvem (modelo, métricas, histórico).
+Não acessam banco nem Redis, então rodam num processo do TrainingExecutor
+sem carregar o resto do serviço. Carregar dados e salvar o modelo
+continua sendo papel do TenantTrainingJob.
+
+Todos os laços:
+- avaliam a loss de validação a cada época e param quando ela não melhora
+  por `patience` épocas (early stopping), restaurando os pesos da melhor
+  época
+- podem partir de um checkpoint existente (init_path, warm-start) em vez
+  de pesos aleatórios; com keep_initial=True os pesos iniciais contam
+  como candidatos (fine-tune nunca piora a validação)
+
+progress(epoch, epochs, train_loss) é chamado ao fim de cada época; o
+executor o usa para reportar progresso e para interromper jobs
+cancelados (o callback levanta TrainingCancelled).
+"""
+import copy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+import torch
+
+from app.ml.models.lead_score_net import LeadScoreNet, LeadScoreTrainer
+from app.ml.models.campaign_predictor import CampaignPredictorNet, CampaignPredictorTrainer
+
+logger = structlog.get_logger()
+
+ProgressCallback = Callable[[int, int, float], None]
+
+# Tipo de modelo -> (classe do modelo, treinador)
+MODEL_TRAINERS = {
+    'lead_score': (LeadScoreNet, LeadScoreTrainer),
+    'campaign_predictor': (CampaignPredictorNet, CampaignPredictorTrainer),
+}
+
+
+def _split(n: int, val_ratio: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices embaralhados de treino e validação."""
+    split_idx = int(n * (1 - val_ratio))
+    indices = np.random.permutation(n)
+    return indices[:split_idx], indices[split_idx:]
+
+
+def _build_trainer(
+    model_type: str,
+    learning_rate: float,
+    hidden_sizes: Optional[List[int]] = None,
+    init_path: Optional[str] = None
+) -> Tuple[Any, bool]:
+    """
+    Cria o treinador, com os pesos de init_path quando compatíveis.
+
+    Sem hidden_sizes explícito a arquitetura vem do checkpoint (o tenant
+    pode partir do global, que é maior). Returns: (treinador, warm_start)
+    """
+    model_cls, trainer_cls = MODEL_TRAINERS[model_type]
+
+    checkpoint = None
+    if init_path:
+        try:
+            checkpoint = torch.load(init_path, map_location='cpu')
+        except Exception as e:
+            logger.warning("warm_start_load_error", path=init_path, error=str(e))
+
+    if checkpoint and hidden_sizes and list(checkpoint.get('hidden_sizes') or []) != list(hidden_sizes):
+        logger.info("warm_start_architecture_mismatch",
+            model_type=model_type,
+            checkpoint=checkpoint.get('hidden_sizes'),
+            requested=hidden_sizes
+        )
+        checkpoint = None
+
+    model = model_cls(hidden_sizes=hidden_sizes or (checkpoint or {}).get('hidden_sizes'))
+    if checkpoint:
+        try:
+            model.load_state_dict(checkpoint['model_state_dict'])
+        except (KeyError, RuntimeError) as e:
+            logger.warning("warm_start_state_error", model_type=model_type, error=str(e))
+            model = model_cls(hidden_sizes=hidden_sizes)
+            checkpoint = None
+
+    return trainer_cls(model, learning_rate=learning_rate), checkpoint is not None
+
+
+def _train_loop(
+    trainer: Any,
+    run_epoch: Callable[[], float],
+    val_features: np.ndarray,
+    val_targets: np.ndarray,
+    epochs: int,
+    patience: int = 0,
+    min_delta: float = 1e-4,
+    keep_initial: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    Executa até `epochs` épocas com early stopping e restaura a melhor.
+
+    patience=0 desativa a parada antecipada (ainda restaura a melhor
+    época). Sem validação a loss de treino faz o papel dela.
+    """
+    model = trainer.model
+    has_val = len(val_features) > 0
+
+    best_loss, best_epoch, best_state = float('inf'), 0, None
+    if keep_initial and has_val:
+        best_loss = trainer.validation_loss(val_features, val_targets)
+        best_state = copy.deepcopy(model.state_dict())
+
+    epochs_run = 0
+    stale = 0
+    for epoch in range(epochs):
+        train_loss = run_epoch()
+        val_loss = trainer.validation_loss(val_features, val_targets) if has_val else train_loss
+        epochs_run = epoch + 1
+
+        if val_loss < best_loss - min_delta:
+            best_loss, best_epoch, stale = val_loss, epochs_run, 0
+            best_state = copy.deepcopy(model.state_dict())
+        else:
+            stale += 1
+
+        logger.debug("training_epoch", epoch=epochs_run, train_loss=train_loss, val_loss=val_loss)
+
+        if progress:
+            progress(epochs_run, epochs, train_loss)
+
+        if patience and stale >= patience:
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+
+    return {
+        'epochs_run': epochs_run,
+        'best_epoch': best_epoch,
+        'best_val_loss': best_loss if best_loss != float('inf') else None,
+        'stopped_early': epochs_run < epochs,
+    }
+
+
+def fit_model(
+    model_type: str,
+    features: np.ndarray,
+    targets: np.ndarray,
+    epochs: int,
+    learning_rate: float,
+    batch_size: int,
+    hidden_sizes: Optional[List[int]] = None,
+    val_ratio: float = 0.2,
+    patience: int = 0,
+    min_delta: float = 1e-4,
+    init_path: Optional[str] = None,
+    keep_initial: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[Any, Dict[str, float], Dict[str, Any]]:
+    """
+    Treina um modelo do tipo dado em memória (split treino/validação).
+
+    Returns: (modelo, métricas de avaliação, histórico do treino)
+    """
+    train_idx, val_idx = _split(len(features), val_ratio)
+    train_features, train_targets = features[train_idx], targets[train_idx]
+    val_features, val_targets = features[val_idx], targets[val_idx]
+
+    trainer, warm_start = _build_trainer(model_type, learning_rate, hidden_sizes, init_path)
+    history = _train_loop(
+        trainer,
+        lambda: trainer.train_epoch(train_features, train_targets, batch_size),
+        val_features,
+        val_targets,
+        epochs,
+        patience=patience,
+        min_delta=min_delta,
+        keep_initial=keep_initial and warm_start,
+        progress=progress
+    )
+    history['warm_start'] = warm_start
+    history['val_samples'] = len(val_idx)
+
+    # Poucas amostras novas (fine-tune) podem não sobrar validação
+    eval_features, eval_targets = (val_features, val_targets) if len(val_idx) else (features, targets)
+    return trainer.model, trainer.evaluate(eval_features, eval_targets), history
+
+
+def fit_lead_score_net(
+    features: np.ndarray,
+    labels: np.ndarray,
+    epochs: int,
+    learning_rate: float,
+    batch_size: int,
+    hidden_sizes: Optional[List[int]] = None,
+    val_ratio: float = 0.2,
+    patience: int = 0,
+    min_delta: float = 1e-4,
+    init_path: Optional[str] = None,
+    keep_initial: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[LeadScoreNet, Dict[str, float], Dict[str, Any]]:
+    """Treina um LeadScoreNet e avalia na validação."""
+    return fit_model(
+        'lead_score', features, labels, epochs, learning_rate, batch_size, hidden_sizes,
+        val_ratio, patience, min_delta, init_path, keep_initial, progress
+    )
+
+
+def fit_campaign_predictor(
+    features: np.ndarray,
+    targets: np.ndarray,
+    epochs: int,
+    learning_rate: float,
+    batch_size: int,
+    hidden_sizes: Optional[List[int]] = None,
+    val_ratio: float = 0.2,
+    patience: int = 0,
+    min_delta: float = 1e-4,
+    init_path: Optional[str] = None,
+    keep_initial: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[CampaignPredictorNet, Dict[str, float], Dict[str, Any]]:
+    """Treina um CampaignPredictorNet e avalia na validação."""
+    return fit_model(
+        'campaign_predictor', features, targets, epochs, learning_rate, batch_size, hidden_sizes,
+        val_ratio, patience, min_delta, init_path, keep_initial, progress
+    )
+
+
+def fit_sharded(
+    model_type: str,
+    shards: List[Tuple[str, str]],
+    val_features: np.ndarray,
+    val_targets: np.ndarray,
+    epochs: int,
+    learning_rate: float,
+    batch_size: int,
+    hidden_sizes: Optional[List[int]] = None,
+    patience: int = 0,
+    min_delta: float = 1e-4,
+    init_path: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[Any, Dict[str, float], Dict[str, Any]]:
+    """
+    Treina sobre shards em disco (ShardStore), um shard em memória por vez.
+
+    Cada época percorre os shards em ordem aleatória; dentro do shard o
+    treinador embaralha as amostras como no treino em memória.
+    """
+    trainer, warm_start = _build_trainer(model_type, learning_rate, hidden_sizes, init_path)
+
+    def run_epoch() -> float:
+        total_loss = 0.0
+        total_samples = 0
+        for index in np.random.permutation(len(shards)):
+            features_path, targets_path = shards[index]
+            features = np.load(features_path)
+            targets = np.load(targets_path)
+            loss = trainer.train_epoch(features, targets, batch_size)
+            total_loss += loss * len(features)
+            total_samples += len(features)
+        return total_loss / max(total_samples, 1)
+
+    history = _train_loop(
+        trainer, run_epoch, val_features, val_targets, epochs,
+        patience=patience, min_delta=min_delta, progress=progress
+    )
+    history['warm_start'] = warm_start
+    history['val_samples'] = len(val_features)
+
+    return trainer.model, trainer.evaluate(val_features, val_targets), history
@@ -0,0 +1,228 @@
+"""
+Orquestração do treino de todos os tenants.
+
+O run_all_tenants percorria os tenants em série: o ciclo noturno crescia
+linearmente com o número de tenants. O TrainingOrchestrator:
+
+- checa o fingerprint dos dados de cada (tenant, modelo) e pula quem não
+  mudou desde o último modelo treinado (hyperparameters.data_fingerprint)
+- treina os demais em paralelo dentro de um orçamento: no máximo
+  ml_training_workers jobs (processos do TrainingExecutor) e
+  ml_training_memory_budget_mb de memória estimada pelas amostras
+- gera um relatório por execução: duração, amostras e motivo de cada
+  tenant pulado
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.config import get_settings
+from app.ml.training.executor import get_training_executor
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+class ResourceBudget:
+    """Orçamento de jobs simultâneos e de memória estimada (bytes)."""
+
+    def __init__(self, max_jobs: int, max_bytes: int):
+        self.max_jobs = max(1, max_jobs)
+        self.max_bytes = max_bytes
+        self.running = 0
+        self.used_bytes = 0
+        self._condition = asyncio.Condition()
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.running >= self.max_jobs:
+            return False
+        # Um job maior que o orçamento inteiro roda sozinho
+        return self.running == 0 or self.used_bytes + nbytes <= self.max_bytes
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._fits(nbytes))
+            self.running += 1
+            self.used_bytes += nbytes
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.running -= 1
+                self.used_bytes -= nbytes
+                self._condition.notify_all()
+
+
+class TrainingOrchestrator:
+    """Treina os tenants elegíveis em paralelo, pulando dados inalterados."""
+
+    # Pico de memória estimado por amostra no treino (arrays float32 da
+    # carga em streaming, cópias do split e tensores)
+    BYTES_PER_SAMPLE = 1024
+
+    # Checagens de fingerprint simultâneas (limita conexões ao banco)
+    CHECK_CONCURRENCY = 8
+
+    def __init__(self, training_job=None):
+        self._training_job = training_job
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._running: Optional[asyncio.Task] = None
+
+    @property
+    def training_job(self):
+        if self._training_job is None:
+            from app.ml.training.training_job import get_training_job
+            self._training_job = get_training_job()
+        return self._training_job
+
+    async def _last_fingerprint(self, model_type: str, tenant_id: str) -> Optional[str]:
+        """Fingerprint dos dados do modelo ativo do próprio tenant (não do global)."""
+        info = await self.training_job.model_registry.get_model_info(model_type, tenant_id)
+        if not info or info.get('is_global'):
+            return None
+        return (info.get('hyperparameters') or {}).get('data_fingerprint')
+
+    async def _run_one(
+        self,
+        tenant_id: str,
+        model_type: str,
+        budget: ResourceBudget,
+        check_semaphore: asyncio.Semaphore,
+        force: bool
+    ) -> Dict[str, Any]:
+        started = time.monotonic()
+        entry: Dict[str, Any] = {
+            'tenant_id': tenant_id,
+            'model_type': model_type,
+            'status': 'skipped',
+            'reason': None,
+            'samples': 0,
+        }
+
+        try:
+            async with check_semaphore:
+                fingerprint = await self.training_job.data_loader.data_fingerprint(model_type, tenant_id)
+                last_fingerprint = None if force else await self._last_fingerprint(model_type, tenant_id)
+
+            if fingerprint is None:
+                entry.update(status='failed', reason='fingerprint_error')
+            elif fingerprint['samples'] < self.training_job.MIN_SAMPLES[model_type]:
+                entry.update(reason='insufficient_data', samples=fingerprint['samples'])
+            elif last_fingerprint == fingerprint['fingerprint']:
+                entry.update(reason='unchanged_data', samples=fingerprint['samples'])
+            else:
+                async with budget.reserve(fingerprint['samples'] * self.BYTES_PER_SAMPLE):
+                    # Tempo esperando orçamento fica fora da duração do treino
+                    entry['queued_s'] = round(time.monotonic() - started, 2)
+                    started = time.monotonic()
+                    job = self.training_job.schedule(
+                        tenant_id, [model_type], data_fingerprint=fingerprint['fingerprint']
+                    )[0]
+                    await get_training_executor().wait(job)
+
+                entry['job_id'] = job.job_id
+                entry['samples'] = (job.result or {}).get('samples', fingerprint['samples'])
+                if job.status == 'completed':
+                    entry['status'] = 'trained'
+                elif job.status == 'skipped':
+                    entry['reason'] = (job.result or {}).get('reason')
+                else:
+                    entry.update(status=job.status, reason=job.error)
+        except Exception as e:
+            logger.error("tenant_training_error", tenant_id=tenant_id, model_type=model_type, error=str(e))
+            entry.update(status='failed', reason=str(e))
+
+        entry['duration_s'] = round(time.monotonic() - started, 2)
+        return entry
+
+    async def run(
+        self,
+        tenant_ids: Optional[List[str]] = None,
+        model_types: Optional[List[str]] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Treina os tenants (default: get_tenants_for_training) e devolve o relatório.
+
+        force=True ignora o fingerprint e retreina mesmo sem dados novos.
+        """
+        started = time.monotonic()
+        started_at = datetime.utcnow().isoformat()
+
+        if tenant_ids is None:
+            tenant_ids = await self.training_job.get_tenants_for_training()
+        model_types = [m for m in (model_types or self.training_job.MODEL_TYPES) if m in self.training_job.MODEL_TYPES]
+
+        budget = ResourceBudget(
+            max_jobs=settings.ml_training_workers,
+            max_bytes=settings.ml_training_memory_budget_mb * 1024 * 1024
+        )
+        check_semaphore = asyncio.Semaphore(self.CHECK_CONCURRENCY)
+
+        logger.info("training_run_started", tenants=len(tenant_ids), model_types=model_types)
+
+        entries = await asyncio.gather(*(
+            self._run_one(tenant_id, model_type, budget, check_semaphore, force)
+            for tenant_id in tenant_ids
+            for model_type in model_types
+        ))
+
+        skipped: Dict[str, int] = {}
+        for entry in entries:
+            if entry['status'] == 'skipped':
+                skipped[entry['reason']] = skipped.get(entry['reason'], 0) + 1
+
+        report = {
+            'started_at': started_at,
+            'finished_at': datetime.utcnow().isoformat(),
+            'duration_s': round(time.monotonic() - started, 2),
+            'tenants': len(tenant_ids),
+            'trained': sum(1 for e in entries if e['status'] == 'trained'),
+            'skipped': skipped,
+            'failed': sum(1 for e in entries if e['status'] in ('failed', 'cancelled')),
+            'samples_trained': sum(e['samples'] for e in entries if e['status'] == 'trained'),
+            'train_time_s': round(sum(e['duration_s'] for e in entries if e['status'] == 'trained'), 2),
+            'entries': list(entries),
+        }
+        self._last_report = report
+
+        logger.info("training_run_report",
+            duration_s=report['duration_s'],
+            tenants=report['tenants'],
+            trained=report['trained'],
+            skipped=skipped,
+            failed=report['failed']
+        )
+
+        return report
+
+    def start(self, force: bool = False) -> bool:
+        """Dispara run() em background; False se já há uma execução em andamento."""
+        if self._running is not None and not self._running.done():
+            return False
+        self._running = asyncio.create_task(self.run(force=force))
+        return True
+
+    def get_last_report(self) -> Optional[Dict[str, Any]]:
+        report = self._last_report
+        if report is None:
+            return {'running': self.is_running} if self.is_running else None
+        return {**report, 'running': self.is_running}
+
+    @property
+    def is_running(self) -> bool:
+        return self._running is not None and not self._running.done()
+
+
+# Singleton
+training_orchestrator = TrainingOrchestrator()
+
+
+def get_training_orchestrator() -> TrainingOrchestrator:
+    """Retorna instância singleton do orquestrador."""
+    return training_orchestrator
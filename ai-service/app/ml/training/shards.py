@@ -0,0 +1,62 @@
+"""
+Shards em disco para o treino global.
+
+O treino global junta o histórico de todos os tenants. Em vez de montar
+um único array em memória, o TenantTrainingJob carrega os dados shard a
+shard (TrainingDataLoader, shard=(k, n)) e grava cada um aqui como .npy.
+Uma fração de cada shard é separada para a validação (mantida em
+memória, que é pequena). fitting.fit_sharded percorre os shards em ordem
+aleatória a cada época, com um shard por vez em memória.
+"""
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class ShardStore:
+    """Shards de treino (.npy) de um job global e a validação acumulada."""
+
+    def __init__(self, val_ratio: float = 0.1, base_dir: Optional[str] = None):
+        self.val_ratio = val_ratio
+        self.directory = tempfile.mkdtemp(prefix='ml-shards-', dir=base_dir)
+        self.shards: List[Tuple[str, str]] = []
+        self.samples = 0
+        self._val_features: List[np.ndarray] = []
+        self._val_targets: List[np.ndarray] = []
+
+    def add(self, features: np.ndarray, targets: np.ndarray) -> None:
+        """Separa a validação do shard e grava o restante em disco."""
+        if len(features) == 0:
+            return
+
+        indices = np.random.permutation(len(features))
+        split_idx = int(len(features) * (1 - self.val_ratio))
+        train_idx, val_idx = indices[:split_idx], indices[split_idx:]
+
+        self._val_features.append(features[val_idx])
+        self._val_targets.append(targets[val_idx])
+        self.samples += len(features)
+        if len(train_idx) == 0:
+            return
+
+        index = len(self.shards)
+        features_path = os.path.join(self.directory, f'X_{index}.npy')
+        targets_path = os.path.join(self.directory, f'y_{index}.npy')
+        np.save(features_path, features[train_idx])
+        np.save(targets_path, targets[train_idx])
+
+        self.shards.append((features_path, targets_path))
+
+    @property
+    def val_features(self) -> np.ndarray:
+        return np.concatenate(self._val_features) if self._val_features else np.empty((0, 0), dtype=np.float32)
+
+    @property
+    def val_targets(self) -> np.ndarray:
+        return np.concatenate(self._val_targets) if self._val_targets else np.empty(0)
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
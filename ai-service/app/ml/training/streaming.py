@@ -0,0 +1,162 @@
+"""
+Carga de dados de treino em streaming.
+
+O TrainingDataLoader lia a janela inteira com fetchall(), decodificava o
+JSON de metadata linha a linha em Python e montava listas antes de virar
+NumPy: memória e tempo proporcionais ao histórico todo. Aqui ficam as
+peças da carga em streaming:
+
+- expressões SQL que decodificam o JSONB no banco em colunas tipadas
+  (mesmos defaults do `dict.get` das features)
+- ArrayBuilder: arrays float32 pré-alocados pelo COUNT da consulta,
+  preenchidos chunk a chunk (cursor no servidor, conn.stream)
+- DatasetCache: dataset materializado em .npy, chaveado pelo fingerprint
+  da consulta (SQL, parâmetros, contagem e última atualização)
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+
+# ============================================
+# JSONB -> colunas tipadas
+# ============================================
+
+# Valores JSON falsos em Python (mesma regra de `1.0 if x else 0.0`)
+_FALSY_JSON = """ARRAY['false', 'null', '0', '""', '[]', '{}']::jsonb[]"""
+
+
+def json_number(source: str, key: str, default: float) -> str:
+    """Número do JSONB (default se a chave não existe ou não é número)."""
+    return (
+        f"CASE WHEN jsonb_typeof({source}->'{key}') = 'number' "
+        f"THEN ({source}->>'{key}')::float8 ELSE {float(default)} END"
+    )
+
+
+def json_flag(source: str, key: str) -> str:
+    """Booleano com a truthiness do Python sobre o valor JSON."""
+    return f"COALESCE(NOT ({source}->'{key}' = ANY({_FALSY_JSON})), false)"
+
+
+def json_text(source: str, key: str, default: str) -> str:
+    """Texto do JSONB (default se a chave não existe ou é null)."""
+    return f"COALESCE({source}->>'{key}', '{default}')"
+
+
+# ============================================
+# Arrays pré-alocados
+# ============================================
+
+class ArrayBuilder:
+    """Array float32 (N x width) preenchido por blocos, com capacidade inicial."""
+
+    def __init__(self, width: Optional[int], capacity: int):
+        shape = (max(capacity, 0),) if width is None else (max(capacity, 0), width)
+        self._array = np.empty(shape, dtype=np.float32)
+        self._size = 0
+
+    def append(self, block: np.ndarray) -> None:
+        n = len(block)
+        if self._size + n > len(self._array):
+            # Entraram linhas entre o COUNT e a leitura: cresce geometricamente
+            grown = np.empty((max(2 * len(self._array), self._size + n),) + self._array.shape[1:], dtype=np.float32)
+            grown[:self._size] = self._array[:self._size]
+            self._array = grown
+        self._array[self._size:self._size + n] = block
+        self._size += n
+
+    def __len__(self) -> int:
+        return self._size
+
+    def result(self) -> np.ndarray:
+        if self._size == len(self._array):
+            return self._array
+        return self._array[:self._size].copy()
+
+
+def record_batch(keys: Any, rows: Any) -> Dict[str, Tuple[Any, ...]]:
+    """Linhas de uma partição do cursor como {coluna: valores}."""
+    columns = list(zip(*rows)) if rows else [()] * len(keys)
+    return dict(zip(keys, columns))
+
+
+# ============================================
+# Cache em disco
+# ============================================
+
+class DatasetCache:
+    """Datasets materializados em .npy, com limite de tamanho total."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        raw = json.dumps(parts, default=str, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.directory, f"{key}_X.npy"),
+            os.path.join(self.directory, f"{key}_y.npy"),
+        )
+
+    def load(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        features_path, targets_path = self._paths(key)
+        try:
+            features = np.load(features_path)
+            targets = np.load(targets_path)
+        except (OSError, ValueError):
+            return None
+        # Marca como usado recentemente (poda por mtime)
+        for path in (features_path, targets_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return features, targets
+
+    def save(self, key: str, features: np.ndarray, targets: np.ndarray) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for path, array in zip(self._paths(key), (features, targets)):
+                # Grava em arquivo temporário e renomeia: leitores nunca veem .npy parcial
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp_path, path)
+            self._prune()
+        except OSError as e:
+            logger.warning("dataset_cache_write_error", directory=self.directory, error=str(e))
+
+    def _prune(self) -> None:
+        """Remove os arquivos menos usados até caber em max_bytes."""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
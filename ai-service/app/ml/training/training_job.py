@@ -5,18 +5,20 @@ Executa:
 1. Treino de LeadScoreNet quando há dados suficientes
 2. Treino de CampaignPredictorNet quando há dados suficientes
 3. Atualização de políticas de RL (opcional)
+
+O treino em si (épocas) roda no TrainingExecutor, fora do event loop.
 """
 import asyncio
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-import numpy as np
 import structlog
 
 from app.config import get_settings
 from app.ml.model_registry import get_model_registry
-from app.ml.models.lead_score_net import LeadScoreNet, LeadScoreTrainer
-from app.ml.models.campaign_predictor import CampaignPredictorNet, CampaignPredictorTrainer
 from app.ml.training.data_loader import get_training_data_loader
+from app.ml.training.executor import TrainingJobInfo, get_training_executor
+from app.ml.training.fitting import fit_model, fit_sharded
+from app.ml.training.shards import ShardStore
 
 logger = structlog.get_logger()
 settings = get_settings()
@@ -51,6 +53,17 @@ class TenantTrainingJob:
         'campaign_predictor': 50,
     }
     
+    # Fine-tune incremental (tenants pequenos, só dados novos)
+    FINETUNE_EPOCHS = {
+        'lead_score': 15,
+        'campaign_predictor': 10,
+    }
+    FINETUNE_LR_FACTOR = 0.3
+    FINETUNE_MIN_SAMPLES = 10
+    # Validação mínima para as métricas do fine-tune substituírem as do modelo
+    FINETUNE_MIN_VAL_SAMPLES = 30
+    FINETUNE_MAX_VAL_RATIO = 0.5
+    
     def __init__(self):
         self.data_loader = get_training_data_loader()
         self.model_registry = get_model_registry()
@@ -66,6 +79,43 @@ class TenantTrainingJob:
             self._db_engine = create_async_engine(db_url)
         return self._db_engine
     
+    # Tipos de modelo treinados por tenant
+    MODEL_TYPES = ('lead_score', 'campaign_predictor')
+    
+    def _runner(self, tenant_id: Optional[str], model_type: str, **train_kwargs):
+        """Coroutine de treino de um tipo de modelo (tenant ou global)."""
+        if tenant_id is None:
+            methods = {
+                'lead_score': self.train_global_lead_score,
+                'campaign_predictor': self.train_global_campaign_predictor,
+            }
+            return lambda job: methods[model_type](job=job)
+        methods = {
+            'lead_score': self.train_lead_score_net,
+            'campaign_predictor': self.train_campaign_predictor,
+        }
+        return lambda job: methods[model_type](tenant_id, job=job, **train_kwargs)
+    
+    def schedule(
+        self,
+        tenant_id: Optional[str],
+        model_types: Optional[List[str]] = None,
+        **train_kwargs
+    ) -> List[TrainingJobInfo]:
+        """
+        Enfileira treinos no TrainingExecutor (um job por tipo de modelo).
+        
+        tenant_id None agenda os modelos globais. Treinos já na fila ou
+        rodando para o mesmo (tenant, tipo) não são duplicados.
+        train_kwargs vão para train_lead_score_net / train_campaign_predictor.
+        """
+        executor = get_training_executor()
+        return [
+            executor.submit(tenant_id, model_type, self._runner(tenant_id, model_type, **train_kwargs))
+            for model_type in (model_types or self.MODEL_TYPES)
+            if model_type in self.MODEL_TYPES
+        ]
+    
     async def run(self, tenant_id: str) -> Dict[str, Any]:
         """
         Executa treinamento completo para um tenant.
@@ -82,31 +132,17 @@ class TenantTrainingJob:
         
         logger.info("training_job_started", tenant_id=tenant_id)
         
-        # 1. Treina LeadScoreNet
-        try:
-            lead_result = await self.train_lead_score_net(tenant_id)
-            if lead_result['success']:
-                results['models_trained'].append({
-                    'type': 'lead_score',
-                    'metrics': lead_result['metrics'],
-                    'samples': lead_result['samples'],
-                })
-        except Exception as e:
-            logger.error("lead_score_training_error", error=str(e))
-            results['errors'].append({'type': 'lead_score', 'error': str(e)})
-        
-        # 2. Treina CampaignPredictorNet
-        try:
-            campaign_result = await self.train_campaign_predictor(tenant_id)
-            if campaign_result['success']:
+        executor = get_training_executor()
+        for job in self.schedule(tenant_id):
+            await executor.wait(job)
+            if job.status == 'completed':
                 results['models_trained'].append({
-                    'type': 'campaign_predictor',
-                    'metrics': campaign_result['metrics'],
-                    'samples': campaign_result['samples'],
+                    'type': job.model_type,
+                    'metrics': job.result['metrics'],
+                    'samples': job.result['samples'],
                 })
-        except Exception as e:
-            logger.error("campaign_predictor_training_error", error=str(e))
-            results['errors'].append({'type': 'campaign_predictor', 'error': str(e)})
+            elif job.status in ('failed', 'cancelled'):
+                results['errors'].append({'type': job.model_type, 'error': job.error or job.status})
         
         results['finished_at'] = datetime.utcnow().isoformat()
         
@@ -118,177 +154,299 @@ class TenantTrainingJob:
         
         return results
     
-    async def train_lead_score_net(
+    async def _training_plan(self, model_type: str, tenant_id: str) -> Dict[str, Any]:
+        """
+        Decide como treinar o modelo do tenant.
+        
+        - full: todos os dados da janela, partindo do modelo atual (do
+          tenant ou global) quando ml_training_warm_start está ligado
+        - finetune: tenant pequeno (até ml_finetune_max_samples) com modelo
+          próprio treina só com os registros alterados desde o último
+          treino; a cada ml_finetune_max_runs fine-tunes há um full
+        """
+        plan = {
+            'mode': 'full', 'init_path': None, 'since': None,
+            'finetune_runs': 0, 'base_samples': 0, 'metrics': None,
+        }
+        if not settings.ml_training_warm_start:
+            return plan
+        
+        info = await self.model_registry.get_model_info(model_type, tenant_id)
+        plan['init_path'] = self.model_registry.checkpoint_path(info)
+        if not plan['init_path'] or info.get('is_global') or not info.get('trained_at'):
+            return plan
+        
+        training_samples = info.get('training_samples') or 0
+        finetune_runs = (info.get('hyperparameters') or {}).get('finetune_runs', 0)
+        if training_samples <= settings.ml_finetune_max_samples and finetune_runs < settings.ml_finetune_max_runs:
+            plan.update(
+                mode='finetune',
+                since=datetime.fromisoformat(info['trained_at']),
+                finetune_runs=finetune_runs + 1,
+                base_samples=training_samples,
+                metrics=info.get('metrics')
+            )
+        return plan
+    
+    async def _train_tenant_model(
         self,
+        model_type: str,
         tenant_id: str,
-        epochs: int = None,
-        learning_rate: float = None
+        epochs: Optional[int],
+        learning_rate: Optional[float],
+        job: Optional[TrainingJobInfo],
+        data_fingerprint: Optional[str]
     ) -> Dict[str, Any]:
-        """
-        Treina LeadScoreNet para um tenant.
-        """
-        epochs = epochs or self.EPOCHS['lead_score']
-        learning_rate = learning_rate or self.LEARNING_RATES['lead_score']
-        batch_size = self.BATCH_SIZES['lead_score']
-        
-        # Carrega dados
-        features, labels = await self.data_loader.load_lead_score_data(tenant_id)
-        
-        if len(features) < self.MIN_SAMPLES['lead_score']:
-            logger.info("insufficient_data_for_lead_score",
+        """Carrega os dados, treina no TrainingExecutor e salva o modelo do tenant."""
+        plan = await self._training_plan(model_type, tenant_id)
+        finetune = plan['mode'] == 'finetune'
+        
+        learning_rate = learning_rate or self.LEARNING_RATES[model_type]
+        if finetune:
+            epochs = epochs or self.FINETUNE_EPOCHS[model_type]
+            learning_rate *= self.FINETUNE_LR_FACTOR
+            min_samples = self.FINETUNE_MIN_SAMPLES
+        else:
+            epochs = epochs or self.EPOCHS[model_type]
+            min_samples = self.MIN_SAMPLES[model_type]
+        batch_size = self.BATCH_SIZES[model_type]
+        
+        # Carrega dados (no fine-tune, só o que mudou desde o último treino)
+        load = self.data_loader.load_lead_score_data if model_type == 'lead_score' else self.data_loader.load_campaign_data
+        if finetune:
+            features, targets = await load(tenant_id, min_samples=0, updated_since=plan['since'])
+        else:
+            features, targets = await load(tenant_id)
+        
+        if len(features) < min_samples:
+            logger.info(f"insufficient_data_for_{model_type}",
                 tenant_id=tenant_id,
-                samples=len(features)
+                samples=len(features),
+                mode=plan['mode']
             )
-            return {'success': False, 'reason': 'insufficient_data', 'samples': len(features)}
-        
-        # Split treino/validação (80/20)
-        split_idx = int(len(features) * 0.8)
-        indices = np.random.permutation(len(features))
-        
-        train_features = features[indices[:split_idx]]
-        train_labels = labels[indices[:split_idx]]
-        val_features = features[indices[split_idx:]]
-        val_labels = labels[indices[split_idx:]]
-        
-        # Cria modelo e treinador
-        model = LeadScoreNet()
-        trainer = LeadScoreTrainer(model, learning_rate=learning_rate)
-        
-        # Treina
-        best_loss = float('inf')
-        best_metrics = {}
-        
-        for epoch in range(epochs):
-            train_loss = trainer.train_epoch(train_features, train_labels, batch_size)
-            
-            if (epoch + 1) % 10 == 0:
-                metrics = trainer.evaluate(val_features, val_labels)
-                
-                logger.debug("lead_score_epoch",
-                    epoch=epoch+1,
-                    train_loss=train_loss,
-                    val_loss=metrics['loss'],
-                    f1=metrics['f1']
-                )
-                
-                if metrics['loss'] < best_loss:
-                    best_loss = metrics['loss']
-                    best_metrics = metrics
+            reason = 'no_new_data' if finetune else 'insufficient_data'
+            return {'success': False, 'reason': reason, 'samples': len(features)}
+        
+        # Split 80/20 treino/validação; no fine-tune a validação cresce (até
+        # metade das amostras novas) para a escolha entre pesos antigos e
+        # novos não depender de 2 ou 3 amostras
+        val_ratio = 0.2
+        if finetune:
+            val_ratio = min(self.FINETUNE_MAX_VAL_RATIO, max(val_ratio, self.FINETUNE_MIN_VAL_SAMPLES / len(features)))
+        
+        model, final_metrics, history = await get_training_executor().fit(
+            job,
+            fit_model,
+            model_type=model_type,
+            features=features,
+            targets=targets,
+            epochs=epochs,
+            learning_rate=learning_rate,
+            batch_size=batch_size,
+            val_ratio=val_ratio,
+            patience=settings.ml_training_patience,
+            init_path=plan['init_path'],
+            # Fine-tune só substitui os pesos atuais se melhorar a validação
+            keep_initial=finetune
+        )
         
-        # Avaliação final
-        final_metrics = trainer.evaluate(val_features, val_labels)
+        # Métricas alimentam a confiança das predições: validação pequena
+        # demais no fine-tune mantém as do modelo anterior
+        metrics_source = 'validation'
+        if finetune and history['val_samples'] < self.FINETUNE_MIN_VAL_SAMPLES and plan['metrics']:
+            final_metrics = plan['metrics']
+            metrics_source = 'previous_model'
         
         # Salva modelo
         model_id = await self.model_registry.save_model(
             model=model,
-            model_type='lead_score',
+            model_type=model_type,
             tenant_id=tenant_id,
             metrics=final_metrics,
             hyperparameters={
-                'epochs': epochs,
+                'epochs': history['epochs_run'],
+                'max_epochs': epochs,
+                'best_epoch': history['best_epoch'],
                 'learning_rate': learning_rate,
                 'batch_size': batch_size,
                 'hidden_sizes': model.hidden_sizes,
+                'mode': plan['mode'],
+                'warm_start': history['warm_start'],
+                'finetune_runs': plan['finetune_runs'],
+                'val_samples': history['val_samples'],
+                'metrics_source': metrics_source,
+                # Orquestrador pula o tenant enquanto os dados não mudarem
+                'data_fingerprint': data_fingerprint,
             },
-            training_samples=len(features)
-        )
-        
-        logger.info("lead_score_net_trained",
-            tenant_id=tenant_id,
-            model_id=model_id,
-            samples=len(features),
-            f1=final_metrics['f1'],
-            accuracy=final_metrics['accuracy']
+            # No fine-tune, estimativa do total já visto pelo modelo
+            training_samples=plan['base_samples'] + len(features)
         )
         
         return {
             'success': True,
             'model_id': model_id,
             'metrics': final_metrics,
-            'samples': len(features)
+            'samples': len(features),
+            'mode': plan['mode'],
+            'epochs_run': history['epochs_run'],
         }
     
+    async def train_lead_score_net(
+        self,
+        tenant_id: str,
+        epochs: int = None,
+        learning_rate: float = None,
+        job: Optional[TrainingJobInfo] = None,
+        data_fingerprint: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Treina LeadScoreNet para um tenant.
+        
+        As épocas rodam no TrainingExecutor, fora do event loop.
+        """
+        result = await self._train_tenant_model('lead_score', tenant_id, epochs, learning_rate, job, data_fingerprint)
+        
+        if result['success']:
+            logger.info("lead_score_net_trained",
+                tenant_id=tenant_id,
+                model_id=result['model_id'],
+                samples=result['samples'],
+                mode=result['mode'],
+                epochs_run=result['epochs_run'],
+                f1=result['metrics']['f1'],
+                accuracy=result['metrics']['accuracy']
+            )
+        
+        return result
+    
     async def train_campaign_predictor(
         self,
         tenant_id: str,
         epochs: int = None,
-        learning_rate: float = None
+        learning_rate: float = None,
+        job: Optional[TrainingJobInfo] = None,
+        data_fingerprint: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Treina CampaignPredictorNet para um tenant.
-        """
-        epochs = epochs or self.EPOCHS['campaign_predictor']
-        learning_rate = learning_rate or self.LEARNING_RATES['campaign_predictor']
-        batch_size = self.BATCH_SIZES['campaign_predictor']
         
-        # Carrega dados
-        features, targets = await self.data_loader.load_campaign_data(tenant_id)
+        As épocas rodam no TrainingExecutor, fora do event loop.
+        """
+        result = await self._train_tenant_model('campaign_predictor', tenant_id, epochs, learning_rate, job, data_fingerprint)
         
-        if len(features) < self.MIN_SAMPLES['campaign_predictor']:
-            logger.info("insufficient_data_for_campaign_predictor",
+        if result['success']:
+            logger.info("campaign_predictor_trained",
                 tenant_id=tenant_id,
-                samples=len(features)
+                model_id=result['model_id'],
+                samples=result['samples'],
+                mode=result['mode'],
+                epochs_run=result['epochs_run'],
+                r2_roas=result['metrics']['r2_roas']
             )
-            return {'success': False, 'reason': 'insufficient_data', 'samples': len(features)}
-        
-        # Split treino/validação
-        split_idx = int(len(features) * 0.8)
-        indices = np.random.permutation(len(features))
         
-        train_features = features[indices[:split_idx]]
-        train_targets = targets[indices[:split_idx]]
-        val_features = features[indices[split_idx:]]
-        val_targets = targets[indices[split_idx:]]
+        return result
+    
+    async def _load_global_shards(self, model_type: str, days: int) -> ShardStore:
+        """
+        Carrega os dados globais shard a shard (tenants por hash) para disco.
         
-        # Cria modelo e treinador
-        model = CampaignPredictorNet()
-        trainer = CampaignPredictorTrainer(model, learning_rate=learning_rate)
+        Erro em qualquer shard aborta o treino: um global sem 1/n dos
+        tenants não deve ser treinado nem ativado.
+        """
+        store = ShardStore(val_ratio=0.1)
+        num_shards = max(1, settings.ml_global_training_shards)
+        load = self.data_loader.load_lead_score_data if model_type == 'lead_score' else self.data_loader.load_campaign_data
         
-        # Treina
-        for epoch in range(epochs):
-            train_loss = trainer.train_epoch(train_features, train_targets, batch_size)
-            
-            if (epoch + 1) % 10 == 0:
-                metrics = trainer.evaluate(val_features, val_targets)
-                
-                logger.debug("campaign_predictor_epoch",
-                    epoch=epoch+1,
-                    train_loss=train_loss,
-                    r2_roas=metrics['r2_roas']
+        try:
+            for shard in range(num_shards):
+                features, targets = await load(
+                    tenant_id=None, days=days, min_samples=0, shard=(shard, num_shards), raise_errors=True
                 )
+                store.add(features, targets)
+        except Exception as e:
+            store.cleanup()
+            logger.error("global_shard_load_error", model_type=model_type, shard=shard, error=str(e))
+            raise RuntimeError(f"global {model_type} shard {shard}/{num_shards} failed to load: {e}") from e
+        
+        logger.info("global_shards_loaded",
+            model_type=model_type,
+            shards=len(store.shards),
+            samples=store.samples
+        )
+        return store
+    
+    async def _train_global(
+        self,
+        model_type: str,
+        min_samples: int,
+        epochs: int,
+        batch_size: int,
+        job: Optional[TrainingJobInfo] = None
+    ) -> Dict[str, Any]:
+        """Treina um modelo global sobre os shards (6 meses, todos os tenants)."""
+        hidden_sizes = [128, 64, 32]
         
-        # Avaliação final
-        final_metrics = trainer.evaluate(val_features, val_targets)
+        # Warm-start a partir do global atual
+        init_path = None
+        if settings.ml_training_warm_start:
+            info = await self.model_registry.get_model_info(model_type, None)
+            if info and info.get('is_global'):
+                init_path = self.model_registry.checkpoint_path(info)
+        
+        store = await self._load_global_shards(model_type, days=180)
+        
+        try:
+            if store.samples < min_samples:
+                return {'success': False, 'reason': 'insufficient_data', 'samples': store.samples}
+            
+            # Treina com mais dados e mais épocas
+            model, metrics, history = await get_training_executor().fit(
+                job,
+                fit_sharded,
+                model_type=model_type,
+                shards=store.shards,
+                val_features=store.val_features,
+                val_targets=store.val_targets,
+                epochs=epochs,
+                learning_rate=0.0005,
+                batch_size=batch_size,
+                hidden_sizes=hidden_sizes,
+                patience=settings.ml_training_patience,
+                init_path=init_path
+            )
+        finally:
+            store.cleanup()
         
-        # Salva modelo
         model_id = await self.model_registry.save_model(
             model=model,
-            model_type='campaign_predictor',
-            tenant_id=tenant_id,
-            metrics=final_metrics,
+            model_type=model_type,
+            tenant_id=None,  # Global
+            metrics=metrics,
             hyperparameters={
-                'epochs': epochs,
-                'learning_rate': learning_rate,
-                'batch_size': batch_size,
-                'hidden_sizes': model.hidden_sizes,
+                'hidden_sizes': hidden_sizes,
+                'epochs': history['epochs_run'],
+                'max_epochs': epochs,
+                'best_epoch': history['best_epoch'],
+                'warm_start': history['warm_start'],
             },
-            training_samples=len(features)
-        )
-        
-        logger.info("campaign_predictor_trained",
-            tenant_id=tenant_id,
-            model_id=model_id,
-            samples=len(features),
-            r2_roas=final_metrics['r2_roas']
+            training_samples=store.samples
         )
         
         return {
             'success': True,
             'model_id': model_id,
-            'metrics': final_metrics,
-            'samples': len(features)
+            'metrics': metrics,
+            'samples': store.samples
         }
     
+    async def train_global_lead_score(self, job: Optional[TrainingJobInfo] = None) -> Dict[str, Any]:
+        """Treina o LeadScoreNet global (dados de todos os tenants)."""
+        return await self._train_global('lead_score', min_samples=500, epochs=100, batch_size=64, job=job)
+    
+    async def train_global_campaign_predictor(self, job: Optional[TrainingJobInfo] = None) -> Dict[str, Any]:
+        """Treina o CampaignPredictorNet global."""
+        return await self._train_global('campaign_predictor', min_samples=200, epochs=50, batch_size=32, job=job)
+    
     async def train_global_models(self) -> Dict[str, Any]:
         """
         Treina modelos globais usando dados de todos os tenants.
@@ -303,100 +461,20 @@ class TenantTrainingJob:
         
         logger.info("global_training_started")
         
-        # 1. LeadScoreNet global
-        try:
-            features, labels = await self.data_loader.load_lead_score_data(
-                tenant_id=None,  # Global
-                days=180,        # 6 meses
-                min_samples=500
-            )
-            
-            if len(features) >= 500:
-                # Treina com mais dados e mais épocas
-                model = LeadScoreNet(hidden_sizes=[128, 64, 32])
-                trainer = LeadScoreTrainer(model, learning_rate=0.0005)
-                
-                split_idx = int(len(features) * 0.9)
-                indices = np.random.permutation(len(features))
-                
-                for epoch in range(100):
-                    trainer.train_epoch(
-                        features[indices[:split_idx]],
-                        labels[indices[:split_idx]],
-                        batch_size=64
-                    )
-                
-                metrics = trainer.evaluate(
-                    features[indices[split_idx:]],
-                    labels[indices[split_idx:]]
-                )
-                
-                model_id = await self.model_registry.save_model(
-                    model=model,
-                    model_type='lead_score',
-                    tenant_id=None,  # Global
-                    metrics=metrics,
-                    hyperparameters={'hidden_sizes': [128, 64, 32]},
-                    training_samples=len(features)
-                )
-                
-                results['models_trained'].append({
-                    'type': 'lead_score_global',
-                    'model_id': model_id,
-                    'samples': len(features),
-                    'f1': metrics['f1']
-                })
-                
-        except Exception as e:
-            logger.error("global_lead_score_error", error=str(e))
-            results['errors'].append({'type': 'lead_score_global', 'error': str(e)})
-        
-        # 2. CampaignPredictorNet global
-        try:
-            features, targets = await self.data_loader.load_campaign_data(
-                tenant_id=None,
-                days=180,
-                min_samples=200
-            )
-            
-            if len(features) >= 200:
-                model = CampaignPredictorNet(hidden_sizes=[128, 64, 32])
-                trainer = CampaignPredictorTrainer(model, learning_rate=0.0005)
-                
-                split_idx = int(len(features) * 0.9)
-                indices = np.random.permutation(len(features))
-                
-                for epoch in range(50):
-                    trainer.train_epoch(
-                        features[indices[:split_idx]],
-                        targets[indices[:split_idx]],
-                        batch_size=32
-                    )
-                
-                metrics = trainer.evaluate(
-                    features[indices[split_idx:]],
-                    targets[indices[split_idx:]]
-                )
-                
-                model_id = await self.model_registry.save_model(
-                    model=model,
-                    model_type='campaign_predictor',
-                    tenant_id=None,
-                    metrics=metrics,
-                    hyperparameters={'hidden_sizes': [128, 64, 32]},
-                    training_samples=len(features)
-                )
-                
+        executor = get_training_executor()
+        for job in self.schedule(None):
+            await executor.wait(job)
+            if job.status == 'completed':
+                metric = 'f1' if job.model_type == 'lead_score' else 'r2_roas'
                 results['models_trained'].append({
-                    'type': 'campaign_predictor_global',
-                    'model_id': model_id,
-                    'samples': len(features),
-                    'r2_roas': metrics['r2_roas']
+                    'type': f"{job.model_type}_global",
+                    'model_id': job.result['model_id'],
+                    'samples': job.result['samples'],
+                    metric: job.result['metrics'][metric],
                 })
-                
-        except Exception as e:
-            logger.error("global_campaign_predictor_error", error=str(e))
-            results['errors'].append({'type': 'campaign_predictor_global', 'error': str(e)})
+            elif job.status in ('failed', 'cancelled'):
+                logger.error(f"global_{job.model_type}_error", error=job.error or job.status)
+                results['errors'].append({'type': f"{job.model_type}_global", 'error': job.error or job.status})
         
         results['finished_at'] = datetime.utcnow().isoformat()
         
@@ -434,40 +512,29 @@ class TenantTrainingJob:
             logger.error("get_tenants_error", error=str(e))
             return []
     
-    async def run_all_tenants(self) -> Dict[str, Any]:
+    async def run_all_tenants(self, force: bool = False) -> Dict[str, Any]:
         """
         Executa treinamento para todos os tenants elegíveis.
-        """
-        tenants = await self.get_tenants_for_training()
-        
-        results = {
-            'started_at': datetime.utcnow().isoformat(),
-            'tenants_processed': 0,
-            'tenants_successful': 0,
-            'total_models_trained': 0,
-            'errors': [],
-        }
         
-        for tenant_id in tenants:
-            try:
-                tenant_result = await self.run(tenant_id)
-                results['tenants_processed'] += 1
-                
-                if not tenant_result['errors']:
-                    results['tenants_successful'] += 1
-                
-                results['total_models_trained'] += len(tenant_result['models_trained'])
-                
-            except Exception as e:
-                logger.error("tenant_training_error", tenant_id=tenant_id, error=str(e))
-                results['errors'].append({
-                    'tenant_id': tenant_id,
-                    'error': str(e)
-                })
+        Em paralelo (TrainingOrchestrator), pulando tenants sem dados novos.
+        """
+        from app.ml.training.orchestrator import get_training_orchestrator
         
-        results['finished_at'] = datetime.utcnow().isoformat()
+        report = await get_training_orchestrator().run(force=force)
         
-        return results
+        tenants_with_errors = {e['tenant_id'] for e in report['entries'] if e['status'] in ('failed', 'cancelled')}
+        return {
+            'started_at': report['started_at'],
+            'tenants_processed': report['tenants'],
+            'tenants_successful': report['tenants'] - len(tenants_with_errors),
+            'total_models_trained': report['trained'],
+            'errors': [
+                {'tenant_id': e['tenant_id'], 'model_type': e['model_type'], 'error': e['reason']}
+                for e in report['entries'] if e['status'] in ('failed', 'cancelled')
+            ],
+            'finished_at': report['finished_at'],
+            'report': report,
+        }
 
 
 # Singleton
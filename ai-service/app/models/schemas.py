@@ -219,6 +219,10 @@ class AgentRunResponse(BaseModel):
     # MCP Tool Call (para agentes de suporte executarem ferramentas técnicas)
     mcp_tool_call: Optional[Dict[str, Any]] = None  # {"tool": "get_error_logs", "params": {...}}
 
+    # Streaming (partes da mensagem já entregues via /api/agent/response/stream)
+    stream_id: Optional[str] = None
+    streamed_chars: int = 0  # Prefixo de `message` já enviado ao lead
+
 
 # ==================== MEMORY MODELS ====================
 
@@ -278,3 +282,12 @@ class IntentClassification(BaseModel):
     confidence: float
     alternatives: List[Dict[str, float]] = []
 
+
+class MessageAnalysis(BaseModel):
+    """Análise completa da mensagem: intenção + qualificação + transferência"""
+    intent: IntentClassification
+    qualification: Qualification
+    should_transfer: bool = False
+    transfer_reason: str = ""
+    fused: bool = False  # True = veio da chamada única (sem fallback)
+
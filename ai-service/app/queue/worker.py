@@ -9,6 +9,8 @@ import httpx
 
 from app.queue.message_queue import message_queue
 from app.services.agent_service import agent_service
+from app.services.response_streamer import LaravelStreamSink
+from app.services.single_flight import agent_run_guard
 from app.models.schemas import (
     AgentRunRequest, LeadInfo, AgentConfig, TenantConfig,
     Message, MessageDirection, SenderType
@@ -130,20 +132,37 @@ class QueueWorker:
             # Converte o dicionário para objeto AgentRunRequest
             request = AgentRunRequest(**context["request"])
 
-            # Executa o agente
-            response = await agent_service.run(request)
-            print(f"[WORKER] Agent response: action={response.action.value}, message={response.message[:100] if response.message else 'None'}", flush=True)
+            # Uma execução (e uma resposta) por mensagem, mesmo com reentrega
+            run_key = agent_run_guard.key(request.tenant.id, request.lead.id, request.message_id)
+            if not await agent_run_guard.claim(run_key):
+                logger.info("agent_run_duplicate_skipped", ticket_id=ticket_id, message_id=request.message_id)
+                return
 
-            # Envia resposta de volta ao Laravel
-            # mode="json" converte datetime para ISO string automaticamente
-            print(f"[WORKER] Sending response back to Laravel...", flush=True)
-            await self._send_response(
-                ticket_id=ticket_id,
-                lead_id=data["lead_id"],
-                channel_id=data["channel_id"],
-                response=response.model_dump(mode="json")
-            )
-            print(f"[WORKER] Response sent!", flush=True)
+            completed = False
+            try:
+                # Executa o agente (com streaming, partes da mensagem já saem durante a geração)
+                stream_sink = None
+                if settings.agent_streaming_enabled:
+                    stream_sink = LaravelStreamSink(
+                        ticket_id=ticket_id,
+                        lead_id=data["lead_id"],
+                        channel_id=data["channel_id"]
+                    )
+                response = await agent_service.run(request, stream_sink=stream_sink)
+                print(f"[WORKER] Agent response: action={response.action.value}, message={response.message[:100] if response.message else 'None'}", flush=True)
+
+                # Envia resposta de volta ao Laravel
+                # mode="json" converte datetime para ISO string automaticamente
+                print(f"[WORKER] Sending response back to Laravel...", flush=True)
+                completed = await self._send_response(
+                    ticket_id=ticket_id,
+                    lead_id=data["lead_id"],
+                    channel_id=data["channel_id"],
+                    response=response.model_dump(mode="json")
+                )
+                print(f"[WORKER] Response sent!", flush=True)
+            finally:
+                await agent_run_guard.release(run_key, completed)
 
             logger.info("ticket_processed_successfully",
                 ticket_id=ticket_id,
@@ -202,8 +221,8 @@ class QueueWorker:
         lead_id: str,
         channel_id: str,
         response: dict
-    ):
-        """Envia a resposta processada de volta ao Laravel"""
+    ) -> bool:
+        """Envia a resposta processada de volta ao Laravel (True se aceita)"""
         try:
             async with httpx.AsyncClient() as client:
                 result = await client.post(
@@ -226,9 +245,12 @@ class QueueWorker:
                         status=result.status_code,
                         body=result.text
                     )
+                    return False
+                return True
                     
         except Exception as e:
             logger.error("send_response_error", error=str(e))
+            return False
 
 
 # Singleton
@@ -93,7 +93,7 @@ class AdsKnowledgeService:
             engine = await self.get_db_engine()
             
             # Cria embedding da query
-            query_embedding = await self.vector_store.create_embedding(query)
+            query_embedding = await self.vector_store.create_embedding(query, tenant_id=tenant_id)
             
             if not query_embedding:
                 logger.warning("ads_search_no_embedding", query=query)
@@ -252,10 +252,10 @@ class AdsKnowledgeService:
         Adiciona novo conhecimento à base de Ads
         """
         try:
-            # Gera embedding
-            embedding = await self.vector_store.create_embedding(f"{title}\n{content}")
+            # Gera embedding (perfil ativo do tenant + escrita dupla durante re-index)
+            embedding_columns = await self.vector_store.embed_for_storage(f"{title}\n{content}", tenant_id)
             
-            if not embedding:
+            if not embedding_columns:
                 logger.error("add_knowledge_no_embedding")
                 return None
             
@@ -268,10 +268,12 @@ class AdsKnowledgeService:
                 
                 await conn.execute(text("""
                     INSERT INTO knowledge_base 
-                    (id, tenant_id, context, category, title, content, embedding, 
+                    (id, tenant_id, context, category, title, content, embedding, embedding_profile,
+                     embedding_next, embedding_next_profile,
                      metadata, priority, tags, source, source_reference, is_active, created_at, updated_at)
                     VALUES 
-                    (:id, :tenant_id, 'ads', :category, :title, :content, :embedding,
+                    (:id, :tenant_id, 'ads', :category, :title, :content, :embedding, :embedding_profile,
+                     :embedding_next, :embedding_next_profile,
                      :metadata, :priority, :tags, :source, :source_reference, true, NOW(), NOW())
                 """), {
                     'id': knowledge_id,
@@ -279,7 +281,7 @@ class AdsKnowledgeService:
                     'category': category,
                     'title': title,
                     'content': content,
-                    'embedding': json.dumps(embedding),
+                    **embedding_columns,
                     'metadata': json.dumps(metadata or {}),
                     'priority': priority,
                     'tags': json.dumps(tags or []),
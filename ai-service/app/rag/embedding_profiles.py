@@ -0,0 +1,181 @@
+"""
+Perfis de Embedding por Tenant (modelo + dimensões)
+
+Os modelos text-embedding-3 aceitam o parâmetro `dimensions`, que encurta
+o vetor com pequena perda de recall e reduz armazenamento e custo de busca
+na mesma proporção. Cada tenant tem um perfil ativo (usado nas buscas) e,
+durante uma re-indexação, um perfil alvo que recebe escrita dupla.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# Modelos em que o vetor encurtado equivale ao vetor completo truncado e
+# renormalizado (Matryoshka). Permite derivar perfis menores sem chamar a API.
+TRUNCATABLE_MODELS = ('text-embedding-3-small', 'text-embedding-3-large')
+
+MODEL_FULL_DIMENSIONS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536,
+}
+
+
+@dataclass(frozen=True)
+class EmbeddingProfile:
+    """Perfil de embedding: modelo + dimensões (None = dimensão completa)"""
+    model: str
+    dimensions: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        """Identificador gravado junto de cada vetor (coluna embedding_profile)."""
+        return f"{self.model}@{self.dimensions or 'full'}"
+
+    @property
+    def output_dimensions(self) -> Optional[int]:
+        return self.dimensions or MODEL_FULL_DIMENSIONS.get(self.model)
+
+    @classmethod
+    def default(cls) -> "EmbeddingProfile":
+        return cls(
+            model=settings.openai_embedding_model,
+            dimensions=settings.openai_embedding_dimensions or None
+        )
+
+    @classmethod
+    def parse(cls, key: Optional[str]) -> "EmbeddingProfile":
+        """
+        Converte a chave gravada no banco em perfil.
+        Linhas legadas (sem perfil) foram geradas com o modelo padrão completo.
+        """
+        if not key:
+            return cls(model=settings.openai_embedding_model)
+        model, _, dims = key.partition('@')
+        return cls(model=model, dimensions=int(dims) if dims and dims != 'full' else None)
+
+    def can_derive_from(self, source: "EmbeddingProfile") -> bool:
+        """Se um vetor deste perfil pode ser obtido truncando um vetor de `source`."""
+        if self.model != source.model or self.model not in TRUNCATABLE_MODELS:
+            return False
+        if source.dimensions is None:
+            return True
+        return self.dimensions is not None and self.dimensions <= source.dimensions
+
+    def derive(self, vector: List[float]) -> List[float]:
+        """Trunca e renormaliza um vetor de um perfil maior do mesmo modelo."""
+        truncated = vector[:self.dimensions] if self.dimensions else list(vector)
+        norm = sum(v * v for v in truncated) ** 0.5
+        if norm == 0:
+            return truncated
+        return [v / norm for v in truncated]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'model': self.model,
+            'dimensions': self.dimensions,
+            'key': self.key,
+            'output_dimensions': self.output_dimensions,
+        }
+
+
+class EmbeddingProfileService:
+    """
+    Resolve o perfil de embedding de cada tenant.
+
+    O estado fica na tabela tenant_embedding_profiles e é cacheado em
+    memória por alguns segundos (é consultado em toda busca/escrita).
+    """
+
+    CACHE_TTL_SECONDS = 30
+
+    def __init__(self):
+        self._db_engine = None
+        self._cache: Dict[str, tuple] = {}
+
+    async def get_db_engine(self):
+        """Lazy loading do engine do banco"""
+        if self._db_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            db_url = settings.database_url
+            if not db_url.startswith('postgresql+asyncpg://'):
+                db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://')
+            self._db_engine = create_async_engine(db_url)
+        return self._db_engine
+
+    async def get_state(self, tenant_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Retorna o estado do perfil do tenant:
+            {'active': EmbeddingProfile, 'target': EmbeddingProfile | None, 'status': str, ...}
+        """
+        default_state = {
+            'active': EmbeddingProfile.default(),
+            'target': None,
+            'status': 'active',
+            'progress': None,
+            'cutover_at': None,
+        }
+        if not tenant_id:
+            return default_state
+
+        cached = self._cache.get(tenant_id)
+        if cached and time.monotonic() - cached[0] < self.CACHE_TTL_SECONDS:
+            return cached[1]
+
+        state = default_state
+        try:
+            engine = await self.get_db_engine()
+
+            async with engine.connect() as conn:
+                from sqlalchemy import text
+
+                result = await conn.execute(text("""
+                    SELECT model, dimensions, target_model, target_dimensions,
+                           status, progress, cutover_at
+                    FROM tenant_embedding_profiles
+                    WHERE tenant_id = :tenant_id
+                """), {'tenant_id': tenant_id})
+
+                row = result.fetchone()
+
+                if row:
+                    target = None
+                    if row.status == 'reindexing' and row.target_model:
+                        target = EmbeddingProfile(row.target_model, row.target_dimensions)
+                    state = {
+                        'active': EmbeddingProfile(row.model, row.dimensions),
+                        'target': target,
+                        'status': row.status,
+                        'progress': row.progress,
+                        'cutover_at': row.cutover_at.isoformat() if row.cutover_at else None,
+                    }
+        except Exception as e:
+            logger.error("get_embedding_profile_error", error=str(e), tenant_id=tenant_id)
+
+        self._cache[tenant_id] = (time.monotonic(), state)
+        return state
+
+    async def get_active_profile(self, tenant_id: Optional[str]) -> EmbeddingProfile:
+        return (await self.get_state(tenant_id))['active']
+
+    async def get_target_profile(self, tenant_id: Optional[str]) -> Optional[EmbeddingProfile]:
+        return (await self.get_state(tenant_id))['target']
+
+    def invalidate(self, tenant_id: str = None):
+        """Limpa cache do perfil (após início de re-index ou cut-over)."""
+        if tenant_id:
+            self._cache.pop(tenant_id, None)
+        else:
+            self._cache.clear()
+
+
+# Singleton
+embedding_profile_service = EmbeddingProfileService()
@@ -0,0 +1,425 @@
+"""
+Re-indexação online de embeddings para um novo perfil (modelo + dimensões)
+
+Fluxo:
+1. start(): registra o perfil alvo (status 'reindexing'); a partir daí as
+   escritas gravam também embedding_next (escrita dupla)
+2. Backfill em lotes: preenche embedding_next de todas as linhas do tenant.
+   Se o perfil alvo é um truncamento do perfil atual (text-embedding-3),
+   o vetor é derivado localmente, sem chamar a API
+3. Cut-over em uma transação: embedding <- embedding_next e troca do perfil ativo
+
+Até o cut-over as buscas continuam usando embedding / perfil antigo.
+
+O benchmark de recall compara top-k no perfil completo com os perfis
+encurtados usando os próprios vetores do tenant (offline, sem custo de API).
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+from app.rag.embedding_profiles import EmbeddingProfile, embedding_profile_service
+from app.rag.index_snapshot import index_snapshot_store
+from app.rag.vector_store import vector_store
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# Tabelas vetoriais por tenant -> expressão SQL do texto que gerou o embedding
+REINDEX_TABLES = {
+    'sdr_knowledge_embeddings': "content",
+    'knowledge_base': "title || E'\\n' || content",
+}
+
+
+class EmbeddingReindexJob:
+    """Job de re-indexação de perfil de embedding por tenant."""
+
+    # Tentativas de cut-over (linhas escritas durante o backfill podem faltar)
+    MAX_CUTOVER_ATTEMPTS = 3
+
+    def __init__(self):
+        self._db_engine = None
+        self._running: Dict[str, asyncio.Task] = {}
+
+    async def get_db_engine(self):
+        """Lazy loading do engine do banco"""
+        if self._db_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            db_url = settings.database_url
+            if not db_url.startswith('postgresql+asyncpg://'):
+                db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://')
+            self._db_engine = create_async_engine(db_url)
+        return self._db_engine
+
+    # ==================== CONTROLE ====================
+
+    async def start(
+        self,
+        tenant_id: str,
+        model: str,
+        dimensions: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Inicia a migração do tenant para um novo perfil em background.
+        """
+        target = EmbeddingProfile(model=model, dimensions=dimensions or None)
+
+        task = self._running.get(tenant_id)
+        if task is not None and not task.done():
+            return {'status': 'already_running', 'target': target.to_dict()}
+
+        embedding_profile_service.invalidate(tenant_id)
+        state = await embedding_profile_service.get_state(tenant_id)
+        active = state['active']
+
+        if active == target:
+            return {'status': 'noop', 'active': active.to_dict()}
+
+        engine = await self.get_db_engine()
+
+        async with engine.begin() as conn:
+            from sqlalchemy import text
+            import uuid
+
+            await conn.execute(text("""
+                INSERT INTO tenant_embedding_profiles
+                (id, tenant_id, model, dimensions, target_model, target_dimensions, status, created_at, updated_at)
+                VALUES (:id, :tenant_id, :model, :dimensions, :target_model, :target_dimensions, 'reindexing', NOW(), NOW())
+                ON CONFLICT (tenant_id) DO UPDATE SET
+                    target_model = :target_model,
+                    target_dimensions = :target_dimensions,
+                    status = 'reindexing',
+                    progress = NULL,
+                    updated_at = NOW()
+            """), {
+                'id': str(uuid.uuid4()),
+                'tenant_id': tenant_id,
+                'model': active.model,
+                'dimensions': active.dimensions,
+                'target_model': target.model,
+                'target_dimensions': target.dimensions,
+            })
+
+            # Descarta vetores de re-indexações anteriores para outro perfil
+            for table in REINDEX_TABLES:
+                await conn.execute(text(f"""
+                    UPDATE {table}
+                    SET embedding_next = NULL, embedding_next_profile = NULL
+                    WHERE tenant_id = :tenant_id
+                    AND embedding_next_profile IS NOT NULL
+                    AND embedding_next_profile <> :target
+                """), {'tenant_id': tenant_id, 'target': target.key})
+
+        embedding_profile_service.invalidate(tenant_id)
+        self._running[tenant_id] = asyncio.create_task(self.run(tenant_id, target))
+
+        logger.info("embedding_reindex_started",
+            tenant_id=tenant_id,
+            active=active.key,
+            target=target.key
+        )
+
+        return {'status': 'started', 'active': active.to_dict(), 'target': target.to_dict()}
+
+    async def run(self, tenant_id: str, target: EmbeddingProfile) -> bool:
+        """Executa backfill + cut-over. Em caso de erro o perfil antigo continua ativo."""
+        start = time.perf_counter()
+        progress: Dict[str, Any] = {table: {'processed': 0, 'derived': 0, 'embedded': 0} for table in REINDEX_TABLES}
+
+        try:
+            for attempt in range(self.MAX_CUTOVER_ATTEMPTS):
+                for table, text_expr in REINDEX_TABLES.items():
+                    await self._backfill_table(tenant_id, table, text_expr, target, progress)
+
+                if await self._cutover(tenant_id, target, progress):
+                    logger.info("embedding_reindex_completed",
+                        tenant_id=tenant_id,
+                        target=target.key,
+                        attempts=attempt + 1,
+                        elapsed_s=round(time.perf_counter() - start, 1),
+                        progress=progress
+                    )
+                    return True
+
+            raise RuntimeError("Linhas pendentes após todas as tentativas de cut-over")
+
+        except Exception as e:
+            logger.error("embedding_reindex_error", tenant_id=tenant_id, target=target.key, error=str(e))
+            progress['error'] = str(e)
+            await self._set_status(tenant_id, 'failed', progress)
+            return False
+
+        finally:
+            self._running.pop(tenant_id, None)
+            embedding_profile_service.invalidate(tenant_id)
+
+    async def _backfill_table(
+        self,
+        tenant_id: str,
+        table: str,
+        text_expr: str,
+        target: EmbeddingProfile,
+        progress: Dict[str, Any]
+    ) -> None:
+        """Preenche embedding_next em lotes até não restar linha pendente."""
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        stats = progress[table]
+
+        while True:
+            async with engine.connect() as conn:
+                result = await conn.execute(text(f"""
+                    SELECT id, {text_expr} AS text_input, embedding, embedding_profile
+                    FROM {table}
+                    WHERE tenant_id = :tenant_id
+                    AND embedding IS NOT NULL
+                    AND embedding_next_profile IS DISTINCT FROM :target
+                    ORDER BY id
+                    LIMIT :limit
+                """), {
+                    'tenant_id': tenant_id,
+                    'target': target.key,
+                    'limit': settings.embedding_reindex_batch_size,
+                })
+                rows = result.fetchall()
+
+            if not rows:
+                return
+
+            updates = []
+            to_embed = []
+            for row in rows:
+                vector = json.loads(row.embedding) if isinstance(row.embedding, str) else row.embedding
+                if vector and target.can_derive_from(EmbeddingProfile.parse(row.embedding_profile)):
+                    updates.append({'id': row.id, 'embedding_next': json.dumps(target.derive(vector))})
+                    stats['derived'] += 1
+                else:
+                    to_embed.append(row)
+
+            if to_embed:
+                vectors = await vector_store.create_embeddings(
+                    [row.text_input or '' for row in to_embed],
+                    profile=target
+                )
+                if len(vectors) != len(to_embed):
+                    raise RuntimeError(f"Falha ao gerar embeddings do perfil {target.key}")
+                for row, vector in zip(to_embed, vectors):
+                    updates.append({'id': row.id, 'embedding_next': json.dumps(vector)})
+                stats['embedded'] += len(to_embed)
+
+            async with engine.begin() as conn:
+                await conn.execute(text(f"""
+                    UPDATE {table}
+                    SET embedding_next = :embedding_next, embedding_next_profile = :target
+                    WHERE id = :id
+                """), [{**u, 'target': target.key} for u in updates])
+
+            stats['processed'] += len(rows)
+            await self._set_status(tenant_id, 'reindexing', progress)
+
+    async def _cutover(
+        self,
+        tenant_id: str,
+        target: EmbeddingProfile,
+        progress: Dict[str, Any]
+    ) -> bool:
+        """
+        Troca os vetores e o perfil ativo atomicamente.
+        Retorna False (sem alterar nada) se ainda há linhas sem o vetor alvo.
+        """
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+
+        async with engine.begin() as conn:
+            # Bloqueia o registro do perfil para serializar com outros cut-overs
+            await conn.execute(text("""
+                SELECT id FROM tenant_embedding_profiles WHERE tenant_id = :tenant_id FOR UPDATE
+            """), {'tenant_id': tenant_id})
+
+            for table in REINDEX_TABLES:
+                pending = await conn.execute(text(f"""
+                    SELECT COUNT(*) FROM {table}
+                    WHERE tenant_id = :tenant_id
+                    AND embedding IS NOT NULL
+                    AND embedding_next_profile IS DISTINCT FROM :target
+                """), {'tenant_id': tenant_id, 'target': target.key})
+                if pending.scalar():
+                    return False
+
+            for table in REINDEX_TABLES:
+                # updated_at muda para que os snapshots mmap sejam reconstruídos
+                await conn.execute(text(f"""
+                    UPDATE {table}
+                    SET embedding = embedding_next,
+                        embedding_profile = embedding_next_profile,
+                        embedding_next = NULL,
+                        embedding_next_profile = NULL,
+                        updated_at = NOW()
+                    WHERE tenant_id = :tenant_id
+                    AND embedding_next_profile = :target
+                """), {'tenant_id': tenant_id, 'target': target.key})
+
+            await conn.execute(text("""
+                UPDATE tenant_embedding_profiles
+                SET model = :model,
+                    dimensions = :dimensions,
+                    target_model = NULL,
+                    target_dimensions = NULL,
+                    status = 'active',
+                    progress = :progress,
+                    cutover_at = NOW(),
+                    updated_at = NOW()
+                WHERE tenant_id = :tenant_id
+            """), {
+                'tenant_id': tenant_id,
+                'model': target.model,
+                'dimensions': target.dimensions,
+                'progress': json.dumps(progress),
+            })
+
+        embedding_profile_service.invalidate(tenant_id)
+        index_snapshot_store.mark_tenant_stale(tenant_id)
+        return True
+
+    async def _set_status(self, tenant_id: str, status: str, progress: Dict[str, Any]) -> None:
+        try:
+            from sqlalchemy import text
+
+            engine = await self.get_db_engine()
+
+            async with engine.begin() as conn:
+                await conn.execute(text("""
+                    UPDATE tenant_embedding_profiles
+                    SET status = :status, progress = :progress, updated_at = NOW()
+                    WHERE tenant_id = :tenant_id
+                """), {'tenant_id': tenant_id, 'status': status, 'progress': json.dumps(progress)})
+        except Exception as e:
+            logger.error("embedding_reindex_status_error", tenant_id=tenant_id, error=str(e))
+
+    def is_running(self, tenant_id: str) -> bool:
+        task = self._running.get(tenant_id)
+        return task is not None and not task.done()
+
+    # ==================== BENCHMARK ====================
+
+    async def benchmark_recall(
+        self,
+        tenant_id: str,
+        dimensions: List[int],
+        k: int = 10,
+        sample_size: int = 200,
+        queries: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Mede a perda de recall@k ao encurtar os embeddings do tenant.
+
+        A referência é o top-k no perfil ativo; cada dimensão candidata é
+        obtida por truncamento + renormalização dos mesmos vetores. Sem
+        `queries`, usa uma amostra dos próprios documentos como consultas
+        (excluindo o próprio documento do resultado).
+        """
+        from sqlalchemy import text
+
+        active = await embedding_profile_service.get_active_profile(tenant_id)
+        full_dims = active.output_dimensions
+
+        candidates = [
+            d for d in sorted(set(dimensions))
+            if EmbeddingProfile(active.model, d).can_derive_from(active) and d < (full_dims or 0)
+        ]
+        if not candidates:
+            return {
+                'error': f"Perfil {active.key} não permite derivar as dimensões pedidas por truncamento",
+                'active': active.to_dict(),
+            }
+
+        engine = await self.get_db_engine()
+        vectors = []
+
+        async with engine.connect() as conn:
+            for table in REINDEX_TABLES:
+                result = await conn.execute(text(f"""
+                    SELECT embedding FROM {table}
+                    WHERE tenant_id = :tenant_id
+                    AND embedding IS NOT NULL
+                """), {'tenant_id': tenant_id})
+                for row in result:
+                    vector = json.loads(row.embedding) if isinstance(row.embedding, str) else row.embedding
+                    if vector and len(vector) == full_dims:
+                        vectors.append(vector)
+
+        if len(vectors) <= k:
+            return {'error': 'Base insuficiente para o benchmark', 'documents': len(vectors)}
+
+        corpus = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(42)
+
+        if queries:
+            query_vectors = np.asarray(
+                await vector_store.create_embeddings(queries, profile=active),
+                dtype=np.float32
+            )
+            exclude_self = None
+        else:
+            exclude_self = rng.choice(len(corpus), size=min(sample_size, len(corpus)), replace=False)
+            query_vectors = corpus[exclude_self]
+
+        def _top_k(docs: np.ndarray, qs: np.ndarray) -> tuple:
+            docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+            qs = qs / np.maximum(np.linalg.norm(qs, axis=1, keepdims=True), 1e-12)
+            started = time.perf_counter()
+            scores = qs @ docs.T
+            elapsed = time.perf_counter() - started
+            if exclude_self is not None:
+                scores[np.arange(len(qs)), exclude_self] = -np.inf
+            top = np.argpartition(-scores, k, axis=1)[:, :k]
+            return top, elapsed
+
+        reference, reference_time = _top_k(corpus, query_vectors)
+        reference_sets = [set(row) for row in reference]
+
+        results = []
+        for d in candidates:
+            top, elapsed = _top_k(corpus[:, :d], query_vectors[:, :d])
+            recall = float(np.mean([
+                len(reference_sets[i] & set(row)) / k for i, row in enumerate(top)
+            ]))
+            results.append({
+                'profile': EmbeddingProfile(active.model, d).key,
+                'dimensions': d,
+                f'recall_at_{k}': round(recall, 4),
+                'recall_loss': round(1 - recall, 4),
+                'storage_ratio': round(d / full_dims, 4),
+                'scoring_speedup': round(reference_time / elapsed, 2) if elapsed > 0 else None,
+            })
+
+        report = {
+            'tenant_id': tenant_id,
+            'active': active.to_dict(),
+            'documents': len(corpus),
+            'queries': len(query_vectors),
+            'query_source': 'provided' if queries else 'corpus_sample',
+            'k': k,
+            'results': results,
+        }
+
+        logger.info("embedding_recall_benchmark", tenant_id=tenant_id, results=results)
+        return report
+
+
+# Singleton
+embedding_reindex_job = EmbeddingReindexJob()
+
+
+def get_embedding_reindex_job() -> EmbeddingReindexJob:
+    """Retorna instância singleton do job"""
+    return embedding_reindex_job
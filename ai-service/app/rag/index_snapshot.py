@@ -0,0 +1,621 @@
+"""
+Snapshot em disco do índice vetorial (memory-mapped) para warm start rápido.
+
+Cada par tenant/agente tem um arquivo versionado contendo:
+- Header JSON (dimensão, quantidade, watermark de updated_at, offsets das seções)
+- Matriz float32 N x D com os embeddings já normalizados
+- Tabela de offsets (uint64) + blob de payloads JSON (id, content, source, metadata)
+- Lista de ids e updated_at por linha (usados no refresh incremental)
+
+O arquivo é aberto com mmap somente leitura: workers diferentes compartilham
+as mesmas páginas do page cache do SO e um container novo carrega o índice
+em milissegundos, sem decodificar a tabela de embeddings do banco.
+
+O refresh é incremental: busca apenas as linhas com updated_at acima do
+watermark do snapshot (o "change log" da tabela), remove ids apagados e
+publica uma nova versão de forma atômica (os.replace no ponteiro CURRENT).
+"""
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+from app.models.schemas import KnowledgeChunk
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+MAGIC = b"CRMVIDX1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza as linhas para que similaridade de cosseno vire produto interno."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def write_snapshot(
+    path: str,
+    header: Dict[str, Any],
+    matrix: np.ndarray,
+    ids: List[str],
+    updated: np.ndarray,
+    payloads: List[bytes],
+) -> None:
+    """
+    Grava um snapshot no formato binário do índice.
+
+    A escrita é feita em arquivo temporário e movida com os.replace,
+    então leitores nunca enxergam um arquivo parcial.
+    """
+    count, dim = matrix.shape if matrix.size else (0, int(header.get('dim', 0)))
+
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    if payloads:
+        offsets[1:] = np.cumsum([len(p) for p in payloads], dtype=np.uint64)
+    ids_blob = json.dumps(ids).encode('utf-8')
+
+    # Os offsets fazem parte do header, então recalcula até o layout estabilizar
+    header = dict(header, format=FORMAT_VERSION, dim=dim, count=count)
+    sections: Dict[str, int] = {}
+    while True:
+        header_blob = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        cursor = _align(len(MAGIC) + 4 + len(header_blob))
+        if sections.get('matrix_offset') == cursor:
+            break
+        sections['matrix_offset'] = cursor
+        cursor = _align(cursor + count * dim * 4)
+        sections['updated_offset'] = cursor
+        cursor = _align(cursor + count * 8)
+        sections['offsets_offset'] = cursor
+        cursor = _align(cursor + (count + 1) * 8)
+        sections['ids_offset'] = cursor
+        sections['ids_length'] = len(ids_blob)
+        cursor = _align(cursor + len(ids_blob))
+        sections['payload_offset'] = cursor
+        header.update(sections)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_blob)))
+        f.write(header_blob)
+
+        def _write_at(offset: int, data: bytes) -> None:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+
+        _write_at(header['matrix_offset'], np.ascontiguousarray(matrix, dtype='<f4').tobytes())
+        _write_at(header['updated_offset'], np.ascontiguousarray(updated, dtype='<f8').tobytes())
+        _write_at(header['offsets_offset'], offsets.astype('<u8').tobytes())
+        _write_at(header['ids_offset'], ids_blob)
+        f.write(b"\0" * (header['payload_offset'] - f.tell()))
+        for payload in payloads:
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+class IndexSnapshot:
+    """Snapshot aberto via mmap (somente leitura)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Snapshot inválido: {path}")
+
+        (header_len,) = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        self.header: Dict[str, Any] = json.loads(self._mmap[header_start:header_start + header_len])
+
+        count = self.header['count']
+        dim = self.header['dim']
+        self.matrix = np.frombuffer(
+            self._mmap, dtype='<f4', count=count * dim, offset=self.header['matrix_offset']
+        ).reshape(count, dim)
+        self.updated = np.frombuffer(
+            self._mmap, dtype='<f8', count=count, offset=self.header['updated_offset']
+        )
+        self.offsets = np.frombuffer(
+            self._mmap, dtype='<u8', count=count + 1, offset=self.header['offsets_offset']
+        )
+        self._ids: Optional[List[str]] = None
+
+    @property
+    def count(self) -> int:
+        return self.header['count']
+
+    @property
+    def version(self) -> int:
+        return self.header.get('version', 0)
+
+    @property
+    def ids(self) -> List[str]:
+        """Lista de ids (decodificada sob demanda; só o refresh precisa dela)."""
+        if self._ids is None:
+            start = self.header['ids_offset']
+            self._ids = json.loads(self._mmap[start:start + self.header['ids_length']])
+        return self._ids
+
+    def payload_bytes(self, row: int) -> bytes:
+        base = self.header['payload_offset']
+        return self._mmap[base + int(self.offsets[row]):base + int(self.offsets[row + 1])]
+
+    def row(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.payload_bytes(row))
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        threshold: float,
+        source_filter: Optional[List[str]] = None
+    ) -> List[KnowledgeChunk]:
+        """Busca por similaridade de cosseno (query já normalizada)."""
+        if self.count == 0 or query.shape[0] != self.header['dim']:
+            return []
+
+        scores = self.matrix @ query
+        candidates = np.flatnonzero(scores >= threshold)
+        if candidates.size == 0:
+            return []
+
+        # Com filtro de source alguns candidatos são descartados; ordena todos
+        limit = candidates.size if source_filter else min(top_k, candidates.size)
+        if limit < candidates.size:
+            part = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[part]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        chunks = []
+        for row in candidates:
+            payload = self.row(int(row))
+            if source_filter and payload.get('source') not in source_filter:
+                continue
+            chunks.append(KnowledgeChunk(
+                id=payload['id'],
+                content=payload['content'],
+                source=payload.get('source') or 'unknown',
+                similarity=float(scores[row]),
+                metadata=payload.get('metadata') or {}
+            ))
+            if len(chunks) >= top_k:
+                break
+        return chunks
+
+    def close(self) -> None:
+        # Views numpy mantêm referência ao mmap; solta antes de fechar
+        self.matrix = self.updated = self.offsets = None
+        try:
+            self._mmap.close()
+        except (BufferError, ValueError):
+            # Ainda há views vivas em outra busca; o GC fecha depois
+            pass
+        self._file.close()
+
+
+class VectorIndexSnapshotStore:
+    """
+    Gerencia snapshots versionados do índice vetorial por tenant/agente.
+
+    Layout em disco:
+        {base_dir}/{tenant_id}/{agent_id|_geral}/index-000001.bin
+        {base_dir}/{tenant_id}/{agent_id|_geral}/CURRENT   -> nome do arquivo ativo
+        {base_dir}/{tenant_id}/{agent_id|_geral}/.lock     -> flock entre processos
+    """
+
+    # Quantas versões antigas manter no disco (leitores podem ainda estar nelas)
+    KEEP_VERSIONS = 2
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or settings.rag_index_dir
+        self._snapshots: Dict[Tuple[str, str], IndexSnapshot] = {}
+        self._current_stamp: Dict[Tuple[str, str], int] = {}
+        self._last_refresh: Dict[Tuple[str, str], float] = {}
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._db_engine = None
+        self._stats = {'searches': 0, 'cold_builds': 0, 'refreshes': 0, 'published': 0}
+        # Diretório sem permissão de escrita (container não-root, FS read-only):
+        # para de tentar construir snapshots e as buscas caem no scan do banco
+        self._write_error: Optional[str] = None
+
+    async def get_db_engine(self):
+        """Lazy loading do engine do banco"""
+        if self._db_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            db_url = settings.database_url
+            if not db_url.startswith('postgresql+asyncpg://'):
+                db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://')
+            self._db_engine = create_async_engine(db_url)
+        return self._db_engine
+
+    # ==================== PATHS ====================
+
+    def _key(self, tenant_id: str, agent_id: str) -> Tuple[str, str]:
+        return (str(tenant_id), str(agent_id or ''))
+
+    def _dir(self, key: Tuple[str, str]) -> str:
+        tenant_id, agent_id = key
+        return os.path.join(self.base_dir, tenant_id, agent_id or '_geral')
+
+    def _current_path(self, key: Tuple[str, str]) -> str:
+        return os.path.join(self._dir(key), 'CURRENT')
+
+    # ==================== LEITURA ====================
+
+    def _open_current(self, key: Tuple[str, str]) -> Optional[IndexSnapshot]:
+        """
+        Retorna o snapshot ativo, reabrindo se outro processo publicou versão nova.
+        O custo no caminho quente é um os.stat do ponteiro CURRENT.
+        """
+        current_path = self._current_path(key)
+        try:
+            stamp = os.stat(current_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and self._current_stamp.get(key) == stamp:
+            return snapshot
+
+        try:
+            with open(current_path) as f:
+                filename = f.read().strip()
+            new_snapshot = IndexSnapshot(os.path.join(self._dir(key), filename))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("rag_snapshot_open_error", key=key, error=str(e))
+            return snapshot
+
+        self._snapshots[key] = new_snapshot
+        self._current_stamp[key] = stamp
+        if snapshot is not None:
+            snapshot.close()
+
+        logger.info("rag_snapshot_loaded",
+            tenant_id=key[0],
+            agent_id=key[1],
+            version=new_snapshot.version,
+            rows=new_snapshot.count
+        )
+        return new_snapshot
+
+    async def search(
+        self,
+        embedding: List[float],
+        tenant_id: str,
+        agent_id: str,
+        top_k: int,
+        threshold: float,
+        source_filter: Optional[List[str]] = None
+    ) -> Optional[List[KnowledgeChunk]]:
+        """
+        Busca no snapshot do tenant/agente.
+
+        Retorna None quando não há snapshot disponível (e não foi possível
+        construir um agora), para o chamador cair no scan do banco.
+        """
+        key = self._key(tenant_id, agent_id)
+        self._stats['searches'] += 1
+
+        snapshot = self._open_current(key)
+        if snapshot is None:
+            # Cold start sem snapshot em disco: constrói agora
+            self._stats['cold_builds'] += 1
+            if not await self.refresh(tenant_id, agent_id, wait_for_lock=False):
+                return None
+            snapshot = self._open_current(key)
+            if snapshot is None:
+                return None
+        else:
+            self._schedule_refresh_if_stale(key)
+
+        if snapshot.count and snapshot.header['dim'] != len(embedding):
+            # Perfil de embedding mudou (cut-over de re-index): reconstrói e usa o banco
+            self.mark_stale(tenant_id, agent_id)
+            self._schedule_refresh_if_stale(key)
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        return snapshot.search(query / norm, top_k, threshold, source_filter)
+
+    def _schedule_refresh_if_stale(self, key: Tuple[str, str]) -> None:
+        """Agenda refresh incremental em background (serve o snapshot atual enquanto isso)."""
+        last = self._last_refresh.get(key, 0.0)
+        if time.monotonic() - last < settings.rag_index_refresh_seconds:
+            return
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return
+        self._last_refresh[key] = time.monotonic()
+        self._refreshing[key] = asyncio.create_task(self.refresh(key[0], key[1]))
+
+    def mark_stale(self, tenant_id: str, agent_id: str) -> None:
+        """Força refresh na próxima busca (chamado após escritas locais)."""
+        self._last_refresh.pop(self._key(tenant_id, agent_id), None)
+
+    def mark_tenant_stale(self, tenant_id: str) -> None:
+        """Força refresh de todos os snapshots do tenant."""
+        for key in list(self._last_refresh):
+            if key[0] == str(tenant_id):
+                self._last_refresh.pop(key, None)
+
+    async def refresh_tenant(self, tenant_id: str) -> int:
+        """Reconstrói todos os snapshots do tenant existentes em disco."""
+        tenant_dir = os.path.join(self.base_dir, str(tenant_id))
+        if not os.path.isdir(tenant_dir):
+            return 0
+        refreshed = 0
+        for agent_dir in os.listdir(tenant_dir):
+            agent_id = '' if agent_dir == '_geral' else agent_dir
+            if await self.refresh(str(tenant_id), agent_id):
+                refreshed += 1
+        return refreshed
+
+    def preload(self) -> int:
+        """
+        Mapeia todos os snapshots existentes em disco (startup).
+        Só abre os arquivos; as páginas são carregadas sob demanda pelo SO.
+        """
+        loaded = 0
+        if not os.path.isdir(self.base_dir):
+            return 0
+        for tenant_id in os.listdir(self.base_dir):
+            tenant_dir = os.path.join(self.base_dir, tenant_id)
+            if not os.path.isdir(tenant_dir):
+                continue
+            for agent_dir in os.listdir(tenant_dir):
+                agent_id = '' if agent_dir == '_geral' else agent_dir
+                if self._open_current((tenant_id, agent_id)) is not None:
+                    loaded += 1
+        logger.info("rag_snapshots_preloaded", count=loaded)
+        return loaded
+
+    # ==================== REFRESH ====================
+
+    async def refresh(
+        self,
+        tenant_id: str,
+        agent_id: str,
+        full: bool = False,
+        wait_for_lock: bool = True
+    ) -> bool:
+        """
+        Atualiza o snapshot a partir das mudanças no banco.
+
+        - Busca apenas linhas com updated_at >= watermark do snapshot atual
+        - Remove linhas cujo id não existe mais
+        - Reaproveita vetores e payloads do snapshot anterior sem decodificar
+
+        Returns:
+            True se existe um snapshot válido ao final
+        """
+        key = self._key(tenant_id, agent_id)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        if self._write_error is not None:
+            return self._open_current(key) is not None
+
+        if lock.locked() and not wait_for_lock:
+            return False
+
+        async with lock:
+            try:
+                os.makedirs(self._dir(key), exist_ok=True)
+                lock_file = open(os.path.join(self._dir(key), '.lock'), 'w')
+            except OSError as e:
+                self._write_error = str(e)
+                logger.warning("rag_snapshot_dir_unwritable",
+                    base_dir=self.base_dir,
+                    error=str(e)
+                )
+                return self._open_current(key) is not None
+
+            try:
+                # Lock entre processos: só um worker reconstrói por vez
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.debug("rag_snapshot_refresh_busy", tenant_id=tenant_id, agent_id=agent_id)
+                    return self._open_current(key) is not None
+
+                self._last_refresh[key] = time.monotonic()
+                self._stats['refreshes'] += 1
+                return await self._refresh_locked(key, full)
+            except Exception as e:
+                logger.error("rag_snapshot_refresh_error",
+                    tenant_id=tenant_id,
+                    agent_id=agent_id,
+                    error=str(e)
+                )
+                return self._open_current(key) is not None
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    async def _refresh_locked(self, key: Tuple[str, str], full: bool) -> bool:
+        from sqlalchemy import text
+
+        tenant_id, agent_id = key
+        start = time.perf_counter()
+        current = None if full else self._open_current(key)
+        watermark = current.header.get('watermark') if current else None
+
+        engine = await self.get_db_engine()
+        async with engine.connect() as conn:
+            scope = """
+                FROM sdr_knowledge_embeddings
+                WHERE tenant_id = :tenant_id
+                AND (sdr_agent_id = :agent_id OR sdr_agent_id IS NULL)
+                AND embedding IS NOT NULL
+            """
+            params = {'tenant_id': tenant_id, 'agent_id': agent_id}
+
+            live_result = await conn.execute(text(f"SELECT id {scope}"), params)
+            live_ids = {str(row.id) for row in live_result}
+
+            changed_sql = f"""
+                SELECT id, content, source, metadata, embedding, updated_at
+                {scope}
+            """
+            if watermark is not None:
+                changed_sql += " AND updated_at >= :watermark"
+                params['watermark'] = datetime.fromtimestamp(watermark)
+            changed_result = await conn.execute(text(changed_sql), params)
+            changed_rows = changed_result.fetchall()
+
+        # Linhas retornadas no limite do watermark que não mudaram são ignoradas
+        old_index: Dict[str, int] = {}
+        if current is not None:
+            old_index = {row_id: i for i, row_id in enumerate(current.ids)}
+
+        changed: Dict[str, Tuple[List[float], float, bytes]] = {}
+        dim = current.header['dim'] if current is not None and current.count else None
+        for row in changed_rows:
+            row_id = str(row.id)
+            updated_ts = row.updated_at.timestamp() if row.updated_at else 0.0
+            if row_id in old_index and current.updated[old_index[row_id]] >= updated_ts:
+                continue
+            vector = json.loads(row.embedding) if isinstance(row.embedding, str) else row.embedding
+            if not vector:
+                continue
+            if dim is None:
+                dim = len(vector)
+            elif len(vector) != dim:
+                if current is not None and not full:
+                    # Mudança de modelo/dimensão: reconstrói do zero
+                    logger.info("rag_snapshot_dim_changed", tenant_id=tenant_id, agent_id=agent_id)
+                    return await self._refresh_locked(key, full=True)
+                continue
+            metadata = json.loads(row.metadata) if isinstance(row.metadata, str) else (row.metadata or {})
+            payload = json.dumps({
+                'id': row_id,
+                'content': row.content,
+                'source': row.source or 'unknown',
+                'metadata': metadata,
+            }, ensure_ascii=False, default=str).encode('utf-8')
+            changed[row_id] = (vector, updated_ts, payload)
+
+        kept_rows = [
+            i for row_id, i in old_index.items()
+            if row_id in live_ids and row_id not in changed
+        ]
+        removed = len(old_index) - len(kept_rows) - sum(1 for r in changed if r in old_index)
+
+        if current is not None and not changed and removed == 0:
+            logger.debug("rag_snapshot_up_to_date", tenant_id=tenant_id, agent_id=agent_id)
+            return True
+
+        ids = [current.ids[i] for i in kept_rows] + list(changed.keys())
+        payloads = [current.payload_bytes(i) for i in kept_rows] + [c[2] for c in changed.values()]
+        updated = np.concatenate([
+            current.updated[kept_rows] if kept_rows else np.zeros(0),
+            np.array([c[1] for c in changed.values()], dtype=np.float64),
+        ])
+        new_vectors = (
+            _normalize_rows(np.asarray([c[0] for c in changed.values()], dtype=np.float32))
+            if changed else np.zeros((0, dim or 0), dtype=np.float32)
+        )
+        if kept_rows:
+            matrix = np.vstack([current.matrix[kept_rows], new_vectors])
+        else:
+            matrix = new_vectors
+
+        version = (current.version if current is not None else self._latest_version(key)) + 1
+        header = {
+            'version': version,
+            'tenant_id': tenant_id,
+            'agent_id': agent_id,
+            'embedding_model': settings.openai_embedding_model,
+            'watermark': float(updated.max()) if updated.size else watermark,
+            'built_at': datetime.now().isoformat(),
+            'dim': dim or 0,
+        }
+
+        filename = f"index-{version:06d}.bin"
+        await asyncio.to_thread(
+            write_snapshot,
+            os.path.join(self._dir(key), filename),
+            header, matrix, ids, updated, payloads
+        )
+        self._publish(key, filename)
+        self._stats['published'] += 1
+
+        logger.info("rag_snapshot_published",
+            tenant_id=tenant_id,
+            agent_id=agent_id,
+            version=version,
+            rows=len(ids),
+            changed=len(changed),
+            removed=removed,
+            elapsed_ms=int((time.perf_counter() - start) * 1000)
+        )
+        return self._open_current(key) is not None
+
+    def _publish(self, key: Tuple[str, str], filename: str) -> None:
+        """Troca o ponteiro CURRENT atomicamente e limpa versões antigas."""
+        directory = self._dir(key)
+        tmp_path = os.path.join(directory, f"CURRENT.tmp-{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            f.write(filename)
+        os.replace(tmp_path, self._current_path(key))
+
+        versions = sorted(f for f in os.listdir(directory) if f.startswith('index-') and f.endswith('.bin'))
+        for old in versions[:-self.KEEP_VERSIONS]:
+            try:
+                # Leitores com mmap aberto continuam válidos após o unlink
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass
+
+    def _latest_version(self, key: Tuple[str, str]) -> int:
+        directory = self._dir(key)
+        if not os.path.isdir(directory):
+            return 0
+        versions = [
+            int(f[len('index-'):-len('.bin')])
+            for f in os.listdir(directory)
+            if f.startswith('index-') and f.endswith('.bin')
+        ]
+        return max(versions, default=0)
+
+    # ==================== ESTATÍSTICAS ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'loaded_snapshots': len(self._snapshots),
+            'rows': sum(s.count for s in self._snapshots.values()),
+            'base_dir': self.base_dir,
+            'write_error': self._write_error,
+        }
+
+
+# Singleton
+index_snapshot_store = VectorIndexSnapshotStore()
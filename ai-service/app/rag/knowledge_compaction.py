@@ -0,0 +1,509 @@
+"""
+Compactação da Base de Conhecimento
+
+Insights de leads (MemoryService.add_insight_to_memory), conhecimento aprendido
+de feedbacks e padrões gerados automaticamente são sempre acrescentados,
+nunca consolidados. Este job roda periodicamente por tenant e:
+
+1. Agrupa vetores quase-duplicados (similaridade >= limiar) dentro do mesmo
+   escopo (agente/fonte/lead ou contexto/categoria)
+2. Mantém um representante por grupo e remove (sdr_knowledge_embeddings) ou
+   desativa com superseded_by (knowledge_base) os demais
+3. Aplica retenção por idade (memórias de lead) e por uso (usage_count de
+   AdsKnowledgeService.increment_usage) para conhecimento automático
+4. Reconstrói os snapshots do índice vetorial afetados
+
+Só entradas geradas pela IA são compactadas; documentos, FAQs e conhecimento
+manual não são alterados.
+"""
+import json
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import structlog
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from app.config import get_settings
+from app.rag.embedding_profiles import embedding_profile_service
+from app.rag.index_snapshot import index_snapshot_store
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+class KnowledgeCompactionJob:
+    """Job de compactação de quase-duplicados e retenção por tenant."""
+
+    # Fontes da knowledge_base geradas automaticamente (elegíveis para compactação)
+    KNOWLEDGE_BASE_AUTO_SOURCES = ('learned', 'feedback', 'performance', 'bi_agent')
+
+    # Quantidade de consultas amostradas para medir latência de busca
+    LATENCY_SAMPLE_QUERIES = 20
+
+    def __init__(self):
+        self._db_engine = None
+        self.scheduler: Optional[AsyncIOScheduler] = None
+
+    async def get_db_engine(self):
+        """Lazy loading do engine do banco"""
+        if self._db_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            db_url = settings.database_url
+            if not db_url.startswith('postgresql+asyncpg://'):
+                db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://')
+            self._db_engine = create_async_engine(db_url)
+        return self._db_engine
+
+    # ==================== AGENDAMENTO ====================
+
+    async def start(self):
+        """Agenda a compactação diária de todos os tenants."""
+        if self.scheduler is not None:
+            return
+        self.scheduler = AsyncIOScheduler()
+        self.scheduler.add_job(
+            self.run_all_tenants,
+            CronTrigger(hour=settings.kb_compaction_hour, minute=0),
+            id="kb_compaction",
+            name="Knowledge Base Compaction",
+            replace_existing=True,
+        )
+        self.scheduler.start()
+        logger.info("kb_compaction_scheduled", hour=settings.kb_compaction_hour)
+
+    async def stop(self):
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
+
+    async def run_all_tenants(self) -> List[Dict[str, Any]]:
+        """Compacta todos os tenants com conhecimento automático."""
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        async with engine.connect() as conn:
+            result = await conn.execute(text("""
+                SELECT DISTINCT tenant_id FROM sdr_knowledge_embeddings
+                WHERE source = 'lead_memory' OR source_type = 'learned'
+                UNION
+                SELECT DISTINCT tenant_id FROM knowledge_base
+                WHERE is_active = true AND source = ANY(:sources)
+            """), {'sources': list(self.KNOWLEDGE_BASE_AUTO_SOURCES)})
+            tenant_ids = [str(row.tenant_id) for row in result]
+
+        reports = []
+        for tenant_id in tenant_ids:
+            try:
+                reports.append(await self.compact_tenant(tenant_id))
+            except Exception as e:
+                logger.error("kb_compaction_tenant_error", tenant_id=tenant_id, error=str(e))
+                reports.append({'tenant_id': tenant_id, 'error': str(e)})
+
+        logger.info("kb_compaction_finished", tenants=len(tenant_ids))
+        return reports
+
+    # ==================== COMPACTAÇÃO ====================
+
+    @asynccontextmanager
+    async def _tenant_lock(self, tenant_id: str):
+        """
+        Advisory lock por tenant, preso à transação de uma conexão dedicada.
+
+        Cada réplica da API agenda seu próprio cron: sem o lock, duas
+        execuções simultâneas do mesmo tenant montariam o mesmo plano.
+        Yields: True se o lock foi obtido (liberado ao fim do bloco).
+        """
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+                {'key': f"kb_compaction:{tenant_id}"}
+            )
+            yield bool(result.scalar())
+
+    async def compact_tenant(self, tenant_id: str, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Compacta a base de um tenant e retorna relatório antes/depois.
+
+        Args:
+            tenant_id: ID do tenant
+            dry_run: Apenas calcula o plano, sem alterar o banco
+        """
+        if dry_run:
+            return await self._compact_tenant(tenant_id, dry_run=True)
+
+        async with self._tenant_lock(tenant_id) as acquired:
+            if not acquired:
+                logger.info("kb_compaction_tenant_locked", tenant_id=tenant_id)
+                return {'tenant_id': tenant_id, 'skipped': 'compaction_in_progress'}
+            return await self._compact_tenant(tenant_id, dry_run=False)
+
+    async def _compact_tenant(self, tenant_id: str, dry_run: bool) -> Dict[str, Any]:
+        start = time.perf_counter()
+
+        state = await embedding_profile_service.get_state(tenant_id)
+        if state['status'] == 'reindexing':
+            return {'tenant_id': tenant_id, 'skipped': 'embedding_reindex_in_progress'}
+
+        size_before = await self._measure_size(tenant_id)
+
+        sdr_rows = await self._load_sdr_rows(tenant_id)
+        kb_rows = await self._load_knowledge_base_rows(tenant_id)
+
+        sdr_plan = self._plan_sdr(sdr_rows)
+        kb_plan = self._plan_knowledge_base(kb_rows)
+
+        # Latência de busca (scan completo) antes/depois sobre os vetores do tenant
+        removed_ids = set(sdr_plan['delete']) | set(kb_plan['deactivate']) | set(kb_plan['supersede'])
+        latency = self._measure_latency(sdr_rows + kb_rows, removed_ids)
+
+        if not dry_run:
+            await self._apply_sdr_plan(sdr_plan)
+            await self._apply_knowledge_base_plan(kb_plan)
+            if sdr_plan['delete']:
+                await index_snapshot_store.refresh_tenant(tenant_id)
+
+        size_after = await self._measure_size(tenant_id) if not dry_run else None
+
+        report = {
+            'tenant_id': tenant_id,
+            'dry_run': dry_run,
+            'sdr_knowledge_embeddings': {
+                'scanned': len(sdr_rows),
+                'duplicates_removed': sdr_plan['duplicates'],
+                'expired_removed': sdr_plan['expired'],
+                'clusters_merged': len(sdr_plan['keepers']),
+            },
+            'knowledge_base': {
+                'scanned': len(kb_rows),
+                'duplicates_superseded': len(kb_plan['supersede']),
+                'expired_deactivated': len(kb_plan['deactivate']),
+                'clusters_merged': len(kb_plan['keepers']),
+            },
+            'size_before': size_before,
+            'size_after': size_after,
+            'search_latency_ms': latency,
+            'elapsed_ms': int((time.perf_counter() - start) * 1000),
+        }
+
+        logger.info("kb_compaction_completed", **report)
+        return report
+
+    async def _load_sdr_rows(self, tenant_id: str) -> List[Dict[str, Any]]:
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        async with engine.connect() as conn:
+            result = await conn.execute(text("""
+                SELECT id, sdr_agent_id, source, embedding, metadata, created_at
+                FROM sdr_knowledge_embeddings
+                WHERE tenant_id = :tenant_id
+                AND embedding IS NOT NULL
+                AND (source = 'lead_memory' OR source_type = 'learned')
+            """), {'tenant_id': tenant_id})
+
+            rows = []
+            for row in result:
+                metadata = json.loads(row.metadata) if isinstance(row.metadata, str) else (row.metadata or {})
+                rows.append({
+                    'id': str(row.id),
+                    # Memórias de leads diferentes nunca se fundem
+                    'group': (str(row.sdr_agent_id), row.source, metadata.get('lead_id')),
+                    'source': row.source,
+                    'embedding': json.loads(row.embedding) if isinstance(row.embedding, str) else row.embedding,
+                    'metadata': metadata,
+                    'created_at': row.created_at,
+                    # Mais recente primeiro: memória mais atual do lead
+                    'rank': (row.created_at.timestamp() if row.created_at else 0.0,),
+                })
+            return rows
+
+    async def _load_knowledge_base_rows(self, tenant_id: str) -> List[Dict[str, Any]]:
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        async with engine.connect() as conn:
+            result = await conn.execute(text("""
+                SELECT id, context, category, source, embedding, metadata,
+                       usage_count, is_verified, created_at, last_used_at
+                FROM knowledge_base
+                WHERE tenant_id = :tenant_id
+                AND is_active = true
+                AND embedding IS NOT NULL
+                AND source = ANY(:sources)
+            """), {'tenant_id': tenant_id, 'sources': list(self.KNOWLEDGE_BASE_AUTO_SOURCES)})
+
+            rows = []
+            for row in result:
+                last_used = row.last_used_at or row.created_at
+                rows.append({
+                    'id': str(row.id),
+                    'group': (row.context, row.category),
+                    'source': row.source,
+                    'embedding': json.loads(row.embedding) if isinstance(row.embedding, str) else row.embedding,
+                    'metadata': json.loads(row.metadata) if isinstance(row.metadata, str) else (row.metadata or {}),
+                    'usage_count': row.usage_count or 0,
+                    'is_verified': bool(row.is_verified),
+                    'created_at': row.created_at,
+                    'last_used_at': last_used,
+                    # Representante: verificado, mais usado, usado mais recentemente
+                    'rank': (
+                        int(bool(row.is_verified)),
+                        row.usage_count or 0,
+                        last_used.timestamp() if last_used else 0.0,
+                    ),
+                })
+            return rows
+
+    def _cluster(self, rows: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Agrupamento guloso de quase-duplicados por escopo.
+
+        Percorre as linhas em ordem de preferência; cada linha ainda livre vira
+        representante e absorve as linhas livres com similaridade >= limiar.
+
+        Returns:
+            {id_representante: [ids absorvidos]} (apenas grupos com duplicados)
+        """
+        threshold = settings.kb_compaction_similarity
+        groups: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            if row['embedding']:
+                groups[row['group']].append(row)
+
+        clusters: Dict[str, List[str]] = {}
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+
+            # Dimensão predominante (linhas de outro perfil ficam de fora)
+            dims = defaultdict(int)
+            for row in members:
+                dims[len(row['embedding'])] += 1
+            dim = max(dims, key=dims.get)
+            members = [row for row in members if len(row['embedding']) == dim]
+            members.sort(key=lambda r: r['rank'], reverse=True)
+
+            matrix = np.asarray([row['embedding'] for row in members], dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+            assigned = np.zeros(len(members), dtype=bool)
+            for i in range(len(members)):
+                if assigned[i]:
+                    continue
+                assigned[i] = True
+                sims = matrix[i + 1:] @ matrix[i]
+                dup_idx = np.flatnonzero((sims >= threshold) & ~assigned[i + 1:]) + i + 1
+                if dup_idx.size:
+                    assigned[dup_idx] = True
+                    clusters[members[i]['id']] = [members[j]['id'] for j in dup_idx]
+
+        return clusters
+
+    def _plan_sdr(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Plano para sdr_knowledge_embeddings: expira memórias antigas e remove duplicados."""
+        cutoff = datetime.now() - timedelta(days=settings.kb_lead_memory_retention_days)
+
+        expired = [
+            row['id'] for row in rows
+            if row['source'] == 'lead_memory'
+            and row['created_at'] is not None
+            and row['created_at'].replace(tzinfo=None) < cutoff
+        ]
+        expired_set = set(expired)
+        alive = [row for row in rows if row['id'] not in expired_set]
+
+        clusters = self._cluster(alive)
+        by_id = {row['id']: row for row in alive}
+
+        keepers = {}
+        for keeper_id, dup_ids in clusters.items():
+            metadata = dict(by_id[keeper_id]['metadata'])
+            metadata['merged_count'] = metadata.get('merged_count', 0) + len(dup_ids)
+            metadata['compacted_at'] = datetime.now().isoformat()
+            keepers[keeper_id] = metadata
+
+        duplicates = sum(len(d) for d in clusters.values())
+        return {
+            'delete': expired + [i for dups in clusters.values() for i in dups],
+            'keepers': keepers,
+            'expired': len(expired),
+            'duplicates': duplicates,
+        }
+
+    def _plan_knowledge_base(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Plano para knowledge_base: desativa itens sem uso antigos e supersede duplicados."""
+        cutoff = datetime.now() - timedelta(days=settings.kb_learned_retention_days)
+
+        deactivate = [
+            row['id'] for row in rows
+            if not row['is_verified']
+            and row['usage_count'] == 0
+            and row['last_used_at'] is not None
+            and row['last_used_at'].replace(tzinfo=None) < cutoff
+        ]
+        deactivate_set = set(deactivate)
+        alive = [row for row in rows if row['id'] not in deactivate_set]
+
+        clusters = self._cluster(alive)
+        by_id = {row['id']: row for row in alive}
+
+        keepers = {}
+        supersede = {}
+        for keeper_id, dup_ids in clusters.items():
+            # merged_from e o uso absorvido são completados no apply, só com
+            # os duplicados que a transação de fato desativou
+            keepers[keeper_id] = {'metadata': dict(by_id[keeper_id]['metadata'])}
+            for dup_id in dup_ids:
+                supersede[dup_id] = keeper_id
+
+        return {'deactivate': deactivate, 'supersede': supersede, 'keepers': keepers}
+
+    async def _apply_sdr_plan(self, plan: Dict[str, Any]) -> None:
+        if not plan['delete'] and not plan['keepers']:
+            return
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        async with engine.begin() as conn:
+            if plan['delete']:
+                await conn.execute(text("""
+                    DELETE FROM sdr_knowledge_embeddings WHERE id = ANY(:ids)
+                """), {'ids': plan['delete']})
+            if plan['keepers']:
+                # Metadata não altera o vetor; mantém updated_at para não forçar rebuild
+                await conn.execute(text("""
+                    UPDATE sdr_knowledge_embeddings SET metadata = :metadata WHERE id = :id
+                """), [
+                    {'id': keeper_id, 'metadata': json.dumps(metadata, default=str)}
+                    for keeper_id, metadata in plan['keepers'].items()
+                ])
+
+    async def _apply_knowledge_base_plan(self, plan: Dict[str, Any]) -> None:
+        if not plan['deactivate'] and not plan['supersede']:
+            return
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        async with engine.begin() as conn:
+            if plan['deactivate']:
+                await conn.execute(text("""
+                    UPDATE knowledge_base
+                    SET is_active = false, updated_at = NOW()
+                    WHERE id = ANY(:ids) AND is_active = true
+                """), {'ids': plan['deactivate']})
+            if not plan['supersede']:
+                return
+
+            # Só linhas ainda ativas: uma execução repetida (ou concorrente)
+            # não supersede nem soma o uso do mesmo duplicado duas vezes
+            result = await conn.execute(text("""
+                UPDATE knowledge_base kb
+                SET is_active = false, superseded_by = plan.keeper_id, updated_at = NOW()
+                FROM unnest(CAST(:ids AS uuid[]), CAST(:keeper_ids AS uuid[])) AS plan(id, keeper_id)
+                WHERE kb.id = plan.id
+                AND kb.is_active = true
+                RETURNING kb.id, kb.superseded_by, kb.usage_count
+            """), {
+                'ids': list(plan['supersede'].keys()),
+                'keeper_ids': list(plan['supersede'].values()),
+            })
+
+            absorbed = defaultdict(lambda: {'ids': [], 'usage': 0})
+            for row in result:
+                merged = absorbed[str(row.superseded_by)]
+                merged['ids'].append(str(row.id))
+                # Uso dos duplicados passa para o representante
+                merged['usage'] += row.usage_count or 0
+
+            if not absorbed:
+                return
+
+            keeper_params = []
+            for keeper_id, merged in absorbed.items():
+                metadata = dict(plan['keepers'][keeper_id]['metadata'])
+                metadata['merged_from'] = metadata.get('merged_from', []) + merged['ids']
+                metadata['compacted_at'] = datetime.now().isoformat()
+                keeper_params.append({
+                    'id': keeper_id,
+                    'absorbed_usage': merged['usage'],
+                    'metadata': json.dumps(metadata, default=str),
+                })
+
+            await conn.execute(text("""
+                UPDATE knowledge_base
+                SET usage_count = usage_count + :absorbed_usage, metadata = :metadata, updated_at = NOW()
+                WHERE id = :id
+            """), keeper_params)
+
+    # ==================== MÉTRICAS ====================
+
+    async def _measure_size(self, tenant_id: str) -> Dict[str, Any]:
+        """Linhas e bytes armazenados de embeddings do tenant."""
+        from sqlalchemy import text
+
+        engine = await self.get_db_engine()
+        size = {}
+        async with engine.connect() as conn:
+            for table, active_filter in (
+                ('sdr_knowledge_embeddings', ''),
+                ('knowledge_base', 'AND is_active = true'),
+            ):
+                result = await conn.execute(text(f"""
+                    SELECT COUNT(*) AS rows, COALESCE(SUM(pg_column_size(embedding)), 0) AS embedding_bytes
+                    FROM {table}
+                    WHERE tenant_id = :tenant_id
+                    AND embedding IS NOT NULL
+                    {active_filter}
+                """), {'tenant_id': tenant_id})
+                row = result.fetchone()
+                size[table] = {'rows': row.rows, 'embedding_bytes': int(row.embedding_bytes)}
+        return size
+
+    def _measure_latency(self, rows: List[Dict[str, Any]], removed_ids: set) -> Dict[str, Any]:
+        """
+        Mede o tempo de um scan completo de similaridade (como o fallback do
+        VectorStore) sobre os vetores do tenant, antes e depois da compactação.
+        """
+        dims = defaultdict(int)
+        for row in rows:
+            if row['embedding']:
+                dims[len(row['embedding'])] += 1
+        if not dims:
+            return {'before': 0.0, 'after': 0.0}
+        dim = max(dims, key=dims.get)
+
+        vectors = [row for row in rows if row['embedding'] and len(row['embedding']) == dim]
+        before = np.asarray([row['embedding'] for row in vectors], dtype=np.float32)
+        keep_mask = np.array([row['id'] not in removed_ids for row in vectors], dtype=bool)
+        after = before[keep_mask]
+
+        rng = np.random.default_rng(0)
+        queries = before[rng.choice(len(before), size=min(self.LATENCY_SAMPLE_QUERIES, len(before)), replace=False)]
+
+        def _timed(matrix: np.ndarray) -> float:
+            if matrix.size == 0:
+                return 0.0
+            started = time.perf_counter()
+            for q in queries:
+                scores = matrix @ q
+                np.argsort(-scores)[:settings.rag_top_k]
+            return (time.perf_counter() - started) * 1000 / len(queries)
+
+        return {'before': round(_timed(before), 3), 'after': round(_timed(after), 3)}
+
+
+# Singleton
+knowledge_compaction_job = KnowledgeCompactionJob()
+
+
+def get_knowledge_compaction_job() -> KnowledgeCompactionJob:
+    """Retorna instância singleton do job"""
+    return knowledge_compaction_job
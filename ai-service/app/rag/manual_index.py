@@ -0,0 +1,290 @@
+"""
+Índice do Manual de Usabilidade (suporte)
+
+O manual é dividido em seções (por heading markdown) uma única vez e
+mantido em memória com um índice invertido (BM25). O arquivo só é relido
+quando mtime/tamanho mudam, e só é re-indexado se o hash do conteúdo mudou.
+
+Opcionalmente gera embeddings das seções (uma chamada em lote por versão
+do manual) para ranking híbrido léxico + semântico.
+"""
+import hashlib
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na',
+    'nos', 'nas', 'um', 'uma', 'para', 'por', 'com', 'como', 'que', 'se', 'ao',
+    'the', 'is', 'eu', 'meu', 'minha', 'onde', 'qual', 'quais',
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos (busca tolerante a 'configuração' vs 'configuracao')."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(normalize(text)) if len(t) > 1 and t not in STOPWORDS]
+
+
+@dataclass
+class ManualSection:
+    """Seção do manual delimitada por headings"""
+    title: str
+    path: str  # "Leads > Importação > CSV"
+    start_line: int  # 1-indexed
+    lines: List[str]
+    tokens: Counter = field(default_factory=Counter)
+    length: int = 0
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+
+class ManualIndex:
+    """Índice em memória do manual com recarga por mudança de arquivo."""
+
+    # Parâmetros BM25
+    K1 = 1.5
+    B = 0.75
+    # Tokens do título valem mais que do corpo
+    TITLE_WEIGHT = 3
+    # Janela de contexto do snippet (linhas antes/depois do melhor trecho)
+    SNIPPET_RADIUS = 5
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._stat: Optional[Tuple[int, int]] = None
+        self._hash: Optional[str] = None
+        self.sections: List[ManualSection] = []
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._avg_length = 0.0
+        self._section_embeddings: Optional[List[List[float]]] = None
+        self._embeddings_hash: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        if self._path:
+            return self._path
+        manual_path = settings.support_manual_path
+        if settings.git_repo_path:
+            return os.path.join(settings.git_repo_path, manual_path)
+        return manual_path
+
+    # ==================== CARGA ====================
+
+    def ensure_loaded(self) -> bool:
+        """
+        Garante que o índice reflete o arquivo atual.
+        Custo no caminho quente: um os.stat.
+
+        Returns:
+            False se o manual não existe
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if stat_key == self._stat:
+            return True
+
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        self._stat = stat_key
+
+        if content_hash != self._hash:
+            self._build(raw.decode('utf-8', errors='ignore'))
+            self._hash = content_hash
+            logger.info("manual_index_built", path=self.path, sections=len(self.sections))
+
+        return True
+
+    def _build(self, content: str) -> None:
+        sections: List[ManualSection] = []
+        heading_stack: List[str] = []
+        current: Optional[ManualSection] = None
+
+        for i, line in enumerate(content.split('\n')):
+            match = re.match(r"^(#{1,6})\s+(.*)", line)
+            if match:
+                level = len(match.group(1))
+                title = match.group(2).strip()
+                heading_stack = heading_stack[:level - 1] + [title]
+                current = ManualSection(
+                    title=title,
+                    path=' > '.join(heading_stack),
+                    start_line=i + 1,
+                    lines=[line]
+                )
+                sections.append(current)
+            else:
+                if current is None:
+                    current = ManualSection(title='', path='', start_line=i + 1, lines=[])
+                    sections.append(current)
+                current.lines.append(line)
+
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        total_length = 0
+        for idx, section in enumerate(sections):
+            counts = Counter(tokenize(section.text))
+            for token in tokenize(section.path):
+                counts[token] += self.TITLE_WEIGHT
+            section.tokens = counts
+            section.length = sum(counts.values())
+            total_length += section.length
+            for token, tf in counts.items():
+                postings[token][idx] = tf
+
+        self.sections = sections
+        self._postings = dict(postings)
+        self._avg_length = total_length / len(sections) if sections else 0.0
+
+    # ==================== BUSCA ====================
+
+    def _bm25(self, query_tokens: List[str], candidates: Optional[set] = None) -> Dict[int, float]:
+        n = len(self.sections)
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(query_tokens):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, tf in postings.items():
+                if candidates is not None and idx not in candidates:
+                    continue
+                length_norm = 1 - self.B + self.B * self.sections[idx].length / (self._avg_length or 1)
+                scores[idx] += idf * tf * (self.K1 + 1) / (tf + self.K1 * length_norm)
+        return scores
+
+    def _snippet(self, section: ManualSection, query_tokens: List[str], phrase: str) -> Tuple[int, str, str]:
+        """Trecho da seção em torno da linha com mais termos da busca."""
+        query_set = set(query_tokens)
+        best_line, best_score = 0, -1
+        for i, line in enumerate(section.lines):
+            normalized = normalize(line)
+            score = sum(1 for t in tokenize(line) if t in query_set)
+            if phrase and phrase in normalized:
+                score += len(query_set) + 1
+            if score > best_score:
+                best_line, best_score = i, score
+
+        start = max(0, best_line - self.SNIPPET_RADIUS)
+        end = min(len(section.lines), best_line + self.SNIPPET_RADIUS + 1)
+        return (
+            section.start_line + best_line,
+            '\n'.join(section.lines[start:end]),
+            section.lines[best_line].strip() if section.lines else ''
+        )
+
+    async def search(
+        self,
+        query: str,
+        section: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca ranqueada por seção.
+
+        Returns:
+            Lista de {line, section, context, match, score} em ordem de relevância
+        """
+        if not self.ensure_loaded():
+            raise FileNotFoundError(self.path)
+
+        candidates = None
+        if section:
+            section_norm = normalize(section)
+            candidates = {i for i, s in enumerate(self.sections) if section_norm in normalize(s.path)}
+
+        query_tokens = tokenize(query)
+        phrase = normalize(query).strip()
+        scores = self._bm25(query_tokens, candidates)
+
+        # Frase exata ainda conta (compatível com a busca por substring antiga)
+        if phrase:
+            for idx, s in enumerate(self.sections):
+                if (candidates is None or idx in candidates) and phrase in normalize(s.text):
+                    scores[idx] += 2.0
+
+        if settings.support_manual_embeddings:
+            await self._apply_semantic_scores(query, scores, candidates)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+        results = []
+        for idx, score in ranked:
+            if score <= 0:
+                continue
+            s = self.sections[idx]
+            line, context, match = self._snippet(s, query_tokens, phrase)
+            results.append({
+                "line": line,
+                "section": s.path or s.title,
+                "context": context,
+                "match": match,
+                "score": round(score, 4),
+            })
+        return results
+
+    async def _apply_semantic_scores(
+        self,
+        query: str,
+        scores: Dict[int, float],
+        candidates: Optional[set]
+    ) -> None:
+        """Soma similaridade de cosseno (escalada) ao score léxico."""
+        from app.rag.vector_store import vector_store
+
+        if self._embeddings_hash != self._hash:
+            texts = [s.text[:8000] for s in self.sections]
+            embeddings = await vector_store.create_embeddings(texts) if texts else []
+            if len(embeddings) != len(texts):
+                return
+            self._section_embeddings = embeddings
+            self._embeddings_hash = self._hash
+
+        query_embedding = await vector_store.create_embedding(query)
+        if not query_embedding or not self._section_embeddings:
+            return
+
+        max_lexical = max(scores.values(), default=0.0) or 1.0
+        for idx, emb in enumerate(self._section_embeddings):
+            if candidates is not None and idx not in candidates:
+                continue
+            similarity = vector_store._cosine_similarity(query_embedding, emb)
+            if similarity >= settings.rag_similarity_threshold * 0.5:
+                scores[idx] += similarity * max_lexical
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "sections": len(self.sections),
+            "terms": len(self._postings),
+            "content_hash": self._hash,
+            "embeddings": self._section_embeddings is not None,
+        }
+
+
+# Singleton
+manual_index = ManualIndex()
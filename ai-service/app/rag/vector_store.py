@@ -2,12 +2,15 @@
 Vector Store para RAG usando pgvector/Supabase
 """
 import asyncio
+import json
 from typing import List, Optional, Dict, Any
 from openai import AsyncOpenAI
 import structlog
 
 from app.config import get_settings
 from app.models.schemas import KnowledgeChunk, RAGResult
+from app.rag.index_snapshot import index_snapshot_store
+from app.rag.embedding_profiles import EmbeddingProfile, embedding_profile_service
 
 logger = structlog.get_logger()
 settings = get_settings()
@@ -22,6 +25,17 @@ class VectorStore:
             project=settings.openai_project_id if settings.openai_project_id else None
         )
         self._supabase = None
+        self._db_engine = None
+    
+    async def get_db_engine(self):
+        """Lazy loading do engine do banco"""
+        if self._db_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            db_url = settings.database_url
+            if not db_url.startswith('postgresql+asyncpg://'):
+                db_url = db_url.replace('postgresql://', 'postgresql+asyncpg://')
+            self._db_engine = create_async_engine(db_url)
+        return self._db_engine
     
     @property
     def supabase(self):
@@ -34,18 +48,82 @@ class VectorStore:
             )
         return self._supabase
     
-    async def create_embedding(self, text: str) -> List[float]:
-        """Cria embedding para um texto"""
+    async def create_embedding(
+        self,
+        text: str,
+        tenant_id: Optional[str] = None,
+        profile: Optional[EmbeddingProfile] = None
+    ) -> List[float]:
+        """
+        Cria embedding para um texto.
+        Usa o perfil ativo do tenant (modelo + dimensões) se nenhum for informado.
+        """
+        embeddings = await self.create_embeddings([text], tenant_id=tenant_id, profile=profile)
+        return embeddings[0] if embeddings else []
+    
+    async def create_embeddings(
+        self,
+        texts: List[str],
+        tenant_id: Optional[str] = None,
+        profile: Optional[EmbeddingProfile] = None
+    ) -> List[List[float]]:
+        """Cria embeddings em lote (uma chamada à API) na ordem dos textos"""
+        profile = profile or await embedding_profile_service.get_active_profile(tenant_id)
+        params = {'model': profile.model, 'input': texts}
+        if profile.dimensions:
+            params['dimensions'] = profile.dimensions
+        
         try:
-            response = await self.openai.embeddings.create(
-                model=settings.openai_embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            response = await self.openai.embeddings.create(**params)
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
         except Exception as e:
-            logger.error("embedding_error", error=str(e))
+            logger.error("embedding_error", error=str(e), profile=profile.key)
             return []
     
+    async def embed_for_storage(
+        self,
+        text: str,
+        tenant_id: str,
+        embedding: Optional[List[float]] = None,
+        encode: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Gera as colunas de embedding para gravação de uma linha.
+        
+        Registra o perfil que gerou o vetor e, se o tenant estiver em
+        re-indexação, também grava o vetor do perfil alvo (escrita dupla),
+        para que o cut-over não deixe linhas novas para trás.
+        
+        encode=False mantém os vetores como listas (insert via Supabase,
+        que serializa o JSON); True devolve texto JSON para o SQL direto.
+        """
+        dump = json.dumps if encode else (lambda vector: vector)
+        state = await embedding_profile_service.get_state(tenant_id)
+        active, target = state['active'], state['target']
+        
+        if embedding is None:
+            embedding = await self.create_embedding(text, profile=active)
+        if not embedding:
+            return None
+        
+        columns = {
+            'embedding': dump(embedding),
+            'embedding_profile': active.key,
+            'embedding_next': None,
+            'embedding_next_profile': None,
+        }
+        
+        if target is not None:
+            if target.can_derive_from(active):
+                next_embedding = target.derive(embedding)
+            else:
+                next_embedding = await self.create_embedding(text, profile=target)
+            if next_embedding:
+                columns['embedding_next'] = dump(next_embedding)
+                columns['embedding_next_profile'] = target.key
+        
+        return columns
+    
     async def search_knowledge(
         self,
         query: str,
@@ -61,8 +139,8 @@ class VectorStore:
         top_k = top_k or settings.rag_top_k
         threshold = threshold or settings.rag_similarity_threshold
         
-        # Cria embedding da query
-        query_embedding = await self.create_embedding(query)
+        # Cria embedding da query (no perfil ativo do tenant)
+        query_embedding = await self.create_embedding(query, tenant_id=tenant_id)
         
         if not query_embedding:
             return RAGResult(chunks=[], query=query, total_tokens=0)
@@ -151,6 +229,20 @@ class VectorStore:
         source_filter: Optional[List[str]]
     ) -> List[KnowledgeChunk]:
         """Busca vetorial no PostgreSQL local usando similaridade de cosseno"""
+        # Caminho rápido: snapshot mmap em disco (sem decodificar a tabela inteira)
+        if settings.rag_index_enabled:
+            chunks = await index_snapshot_store.search(
+                embedding,
+                tenant_id,
+                agent_id,
+                top_k,
+                threshold,
+                source_filter
+            )
+            if chunks is not None:
+                logger.info("snapshot_search_completed", chunks_found=len(chunks))
+                return chunks
+        
         try:
             from sqlalchemy.ext.asyncio import create_async_engine
             from sqlalchemy import text
@@ -250,9 +342,11 @@ class VectorStore:
         metadata: Dict[str, Any] = None
     ) -> Optional[str]:
         """Adiciona conhecimento à base vetorial"""
-        embedding = await self.create_embedding(content)
+        # Mesmas colunas do caminho Postgres: perfil do vetor e escrita dupla
+        # durante re-indexação (filtros por perfil e cut-over dependem delas)
+        columns = await self.embed_for_storage(content, tenant_id, encode=False)
         
-        if not embedding:
+        if columns is None:
             return None
         
         if self.supabase:
@@ -261,11 +355,12 @@ class VectorStore:
                     'tenant_id': tenant_id,
                     'sdr_agent_id': agent_id,
                     'content': content,
-                    'embedding': embedding,
                     'source': source,
-                    'metadata': metadata or {}
+                    **columns,
+                    'metadata': {**(metadata or {}), 'embedding_profile': columns['embedding_profile']}
                 }).execute()
                 
+                index_snapshot_store.mark_stale(tenant_id, agent_id)
                 return result.data[0]['id'] if result.data else None
             except Exception as e:
                 logger.error("add_knowledge_error", error=str(e))
@@ -287,18 +382,22 @@ class VectorStore:
         Este conhecimento é usado para melhorar respostas futuras.
         """
         try:
-            from sqlalchemy.ext.asyncio import create_async_engine
             from sqlalchemy import text
-            import json
             import uuid
             
+            columns = await self.embed_for_storage(content, tenant_id, embedding=embedding)
+            if columns is None:
+                return False
+            
             engine = await self.get_db_engine()
             
             async with engine.begin() as conn:
                 await conn.execute(text("""
                     INSERT INTO sdr_knowledge_embeddings 
-                    (id, tenant_id, sdr_agent_id, content, source, source_type, embedding, metadata, created_at, updated_at)
-                    VALUES (:id, :tenant_id, :agent_id, :content, :source, :source_type, :embedding, :metadata, NOW(), NOW())
+                    (id, tenant_id, sdr_agent_id, content, source, source_type, embedding, embedding_profile,
+                     embedding_next, embedding_next_profile, metadata, created_at, updated_at)
+                    VALUES (:id, :tenant_id, :agent_id, :content, :source, :source_type, :embedding, :embedding_profile,
+                     :embedding_next, :embedding_next_profile, :metadata, NOW(), NOW())
                 """), {
                     'id': str(uuid.uuid4()),
                     'tenant_id': tenant_id,
@@ -306,10 +405,12 @@ class VectorStore:
                     'content': content,
                     'source': source,
                     'source_type': 'learned',
-                    'embedding': json.dumps(embedding),
+                    **columns,
                     'metadata': json.dumps(metadata or {})
                 })
             
+            index_snapshot_store.mark_stale(tenant_id, agent_id)
+            
             logger.info("learned_knowledge_saved",
                 source=source,
                 agent_id=agent_id
@@ -52,7 +52,7 @@ class PolicyEngine:
     
     def __init__(self):
         self.experience_buffer = get_experience_buffer()
-        self._model_cache = {}  # Cache de modelos DQN carregados
+        # Modelos DQN ficam no cache do ModelRegistry (LRU, invalidado entre réplicas)
     
     async def get_mode(self, agent_type: str, tenant_id: str) -> PolicyMode:
         """Determina o modo atual baseado em quantidade de dados."""
@@ -271,25 +271,24 @@ class PolicyEngine:
                 action = random.choice(list(AdsAction))
             return int(action), 0.5
         
-        # Tenta carregar modelo do cache ou do disco
-        model_key = f"{tenant_id}_{agent_type}"
-        
-        if model_key not in self._model_cache:
-            model = await self._load_dqn_model(agent_type, tenant_id)
-            if model:
-                self._model_cache[model_key] = model
-            else:
-                # Fallback para bandit se modelo não disponível
-                return await self._bandit_select(
-                    state, agent_type, tenant_id, exploration_rate
-                )
-        
-        model = self._model_cache[model_key]
+        # Carrega modelo (cache do registry ou disco)
+        model = await self._load_dqn_model(agent_type, tenant_id)
+        if not model:
+            # Fallback para bandit se modelo não disponível
+            return await self._bandit_select(
+                state, agent_type, tenant_id, exploration_rate
+            )
         
         # Converte estado para tensor
         state_vector = state.to_vector()
         
         try:
+            # Runtime NumPy (pesos .npz): não precisa de torch
+            if hasattr(model, 'predict_q'):
+                q_values = model.predict_q(state_vector)
+                exp_q = np.exp(q_values - q_values.max())
+                return int(q_values.argmax()), float(exp_q.max() / exp_q.sum())
+            
             import torch
             with torch.no_grad():
                 state_tensor = torch.FloatTensor(state_vector).unsqueeze(0)
@@ -307,7 +306,7 @@ class PolicyEngine:
             )
     
     async def _load_dqn_model(self, agent_type: str, tenant_id: str):
-        """Carrega modelo DQN do disco."""
+        """Carrega modelo DQN pelo registry (em cache após a primeira vez)."""
         try:
             from app.ml.model_registry import get_model_registry
             
@@ -321,13 +320,12 @@ class PolicyEngine:
             return None
     
     def clear_cache(self, tenant_id: str = None):
-        """Limpa cache de modelos."""
-        if tenant_id:
-            keys_to_remove = [k for k in self._model_cache if k.startswith(tenant_id)]
-            for key in keys_to_remove:
-                del self._model_cache[key]
-        else:
-            self._model_cache.clear()
+        """Limpa cache de modelos DQN (no registry)."""
+        from app.ml.model_registry import get_model_registry
+        
+        registry = get_model_registry()
+        for model_type in ('sdr_policy', 'ads_policy'):
+            registry.clear_cache(tenant_id, model_type)
 
 
 # Singleton
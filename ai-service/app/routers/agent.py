@@ -7,10 +7,11 @@ import structlog
 
 from app.config import get_settings
 from app.models.schemas import (
-    AgentRunRequest, AgentRunResponse,
+    AgentRunRequest, AgentRunResponse, AgentAction, AgentDecision,
     LeadInfo, IntentClassification, Qualification
 )
 from app.services.agent_service import agent_service
+from app.services.single_flight import agent_run_guard
 from app.ml.classifier import ml_classifier
 
 logger = structlog.get_logger()
@@ -38,14 +39,34 @@ async def run_agent(
     - Mensagem de resposta (se aplicável)
     - Qualificação do lead
     - Decisão e reasoning
+    
+    Reentregas da mesma mensagem (tenant, lead, message_id) recebem
+    no_action: só a primeira execução responde ao lead.
     """
+    run_key = agent_run_guard.key(request.tenant.id, request.lead.id, request.message_id)
+    if not await agent_run_guard.claim(run_key):
+        logger.info("agent_run_duplicate_skipped", lead_id=request.lead.id, message_id=request.message_id)
+        return AgentRunResponse(
+            action=AgentAction.NO_ACTION,
+            decision=AgentDecision(
+                action=AgentAction.NO_ACTION,
+                confidence=1.0,
+                reasoning="Mensagem já atendida (entrega duplicada)"
+            ),
+            metrics={"duplicate": True}
+        )
+    
+    completed = False
     try:
         response = await agent_service.run(request)
+        completed = True
         return response
         
     except Exception as e:
         logger.error("agent_run_endpoint_error", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await agent_run_guard.release(run_key, completed)
 
 
 @router.post("/classify-intent", response_model=IntentClassification)
@@ -80,6 +101,15 @@ async def qualify_lead(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/classifier/stats")
+async def classifier_stats(api_key: str = Depends(verify_api_key)):
+    """
+    Estatísticas do classificador: chamadas, fallbacks da análise fundida
+    e economia de tokens/latência em relação às chamadas individuais.
+    """
+    return ml_classifier.get_analysis_stats()
+
+
 @router.get("/health")
 async def health_check():
     """Health check do serviço"""
@@ -97,17 +127,23 @@ async def cache_stats(api_key: str = Depends(verify_api_key)):
     Útil para monitorar economia de tokens.
     """
     from app.cache import response_cache
+    from app.services.prompt_cache import prompt_cache_stats
+    from app.services.single_flight import single_flight
     
     # Força conexão antes de buscar stats
     await response_cache.connect()
     stats = await response_cache.get_stats()
     return {
         "cache": stats,
+        "prompt_cache": prompt_cache_stats.get_stats(),
+        "single_flight": single_flight.get_stats(),
         "info": {
             "cached_responses": "Respostas salvas (evita chamar LLM)",
             "cached_embeddings": "Embeddings salvos (evita recalcular)",
             "hits": "Cache hits (economia de tokens)",
-            "misses": "Cache misses (precisou chamar LLM)"
+            "misses": "Cache misses (precisou chamar LLM)",
+            "prompt_cache": "Tokens de entrada servidos do cache de prefixo do provedor",
+            "single_flight": "Chamadas idênticas simultâneas que aguardaram a mesma chamada ao LLM"
         }
     }
 
@@ -9,17 +9,40 @@ from typing import Optional, List
 from datetime import datetime
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from pydantic import BaseModel
 import structlog
 
 from app.config import get_settings
 from app.rag.document_processor import DocumentProcessor, ProcessedDocument
 from app.rag.ads_knowledge import get_ads_knowledge_service
+from app.rag.embedding_profiles import embedding_profile_service
+from app.rag.embedding_reindex import get_embedding_reindex_job
+from app.rag.knowledge_compaction import get_knowledge_compaction_job
 
 logger = structlog.get_logger()
 settings = get_settings()
 router = APIRouter()
 
 
+class EmbeddingReindexRequest(BaseModel):
+    tenant_id: str
+    model: str
+    dimensions: Optional[int] = None  # None = dimensão completa do modelo
+
+
+class KnowledgeCompactionRequest(BaseModel):
+    tenant_id: str
+    dry_run: bool = False
+
+
+class EmbeddingBenchmarkRequest(BaseModel):
+    tenant_id: str
+    dimensions: List[int] = [256, 512, 1024]
+    k: int = 10
+    sample_size: int = 200
+    queries: Optional[List[str]] = None
+
+
 @router.post("/knowledge/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -262,3 +285,90 @@ async def get_knowledge_stats(tenant_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao obter estatísticas: {str(e)}"
         )
+
+
+@router.get("/knowledge/embedding-profile/{tenant_id}")
+async def get_embedding_profile(tenant_id: str):
+    """Retorna o perfil de embedding ativo do tenant e o estado da re-indexação."""
+    embedding_profile_service.invalidate(tenant_id)
+    state = await embedding_profile_service.get_state(tenant_id)
+    
+    return {
+        "success": True,
+        "active": state['active'].to_dict(),
+        "target": state['target'].to_dict() if state['target'] else None,
+        "status": state['status'],
+        "progress": state['progress'],
+        "cutover_at": state['cutover_at'],
+        "job_running": get_embedding_reindex_job().is_running(tenant_id),
+    }
+
+
+@router.post("/knowledge/embedding-profile/reindex")
+async def reindex_embedding_profile(request: EmbeddingReindexRequest):
+    """
+    Migra o tenant para um novo perfil de embedding (modelo + dimensões).
+    
+    A re-indexação roda em background; as buscas continuam no perfil
+    atual até o cut-over.
+    """
+    if request.dimensions is not None and request.dimensions <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="dimensions deve ser positivo"
+        )
+    
+    try:
+        result = await get_embedding_reindex_job().start(
+            tenant_id=request.tenant_id,
+            model=request.model,
+            dimensions=request.dimensions
+        )
+        return {"success": True, **result}
+    except Exception as e:
+        logger.error("embedding_reindex_start_error", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao iniciar re-indexação: {str(e)}"
+        )
+
+
+@router.post("/knowledge/embedding-profile/benchmark")
+async def benchmark_embedding_profile(request: EmbeddingBenchmarkRequest):
+    """Mede a perda de recall@k de perfis encurtados sobre a base do tenant."""
+    try:
+        report = await get_embedding_reindex_job().benchmark_recall(
+            tenant_id=request.tenant_id,
+            dimensions=request.dimensions,
+            k=request.k,
+            sample_size=request.sample_size,
+            queries=request.queries
+        )
+        return {"success": 'error' not in report, **report}
+    except Exception as e:
+        logger.error("embedding_benchmark_error", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro no benchmark: {str(e)}"
+        )
+
+
+@router.post("/knowledge/compact")
+async def compact_knowledge(request: KnowledgeCompactionRequest):
+    """
+    Compacta a base de conhecimento do tenant (quase-duplicados e retenção).
+    
+    Com dry_run=true apenas retorna o plano e as métricas estimadas.
+    """
+    try:
+        report = await get_knowledge_compaction_job().compact_tenant(
+            tenant_id=request.tenant_id,
+            dry_run=request.dry_run
+        )
+        return {"success": True, "report": report}
+    except Exception as e:
+        logger.error("kb_compaction_error", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro na compactação: {str(e)}"
+        )
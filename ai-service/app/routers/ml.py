@@ -4,17 +4,25 @@ Router para endpoints de Machine Learning.
 Fornece endpoints para:
 - Status de modelos por tenant
 - Predições de LeadScoreNet e CampaignPredictorNet
-- Trigger de treinamento
+- Busca de configuração de campanha (fronteira de Pareto ROAS x CPA)
+- Scoring de leads em massa (NDJSON)
+- Trigger de treinamento (fila fora do event loop, status e cancelamento)
+- Cache de modelos (stats, invalidação) e rollback de versão
 """
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
+import asyncio
+import json
 import structlog
 
 from app.ml.model_registry import get_model_registry
-from app.ml.models.lead_score_net import LeadScoreNet
-from app.ml.models.campaign_predictor import CampaignPredictorNet
-from app.ml.training.training_job import get_training_job
+from app.ml.inference_batcher import get_inference_batcher
+from app.ml.bulk_scoring import BulkLeadScorer
+from app.ml.campaign_optimizer import optimize_configuration
+from app.ml.training.executor import get_training_executor
+from app.ml.models.features import campaign_features, lead_score_features
 
 logger = structlog.get_logger()
 router = APIRouter(prefix="/ml", tags=["Machine Learning"])
@@ -36,12 +44,31 @@ class LeadScoreResponse(BaseModel):
     feature_importance: Optional[Dict[str, float]] = None
 
 
+class BulkLeadScoreRequest(BaseModel):
+    tenant_id: str
+    # Leads enviados diretamente (mesmo formato de lead_data, com 'id')...
+    leads: Optional[List[Dict[str, Any]]] = None
+    # ...ou filtro para ler os leads do tenant no banco
+    stage_id: Optional[str] = None
+    pipeline_id: Optional[str] = None
+    status: Optional[str] = 'open'
+    write_back: bool = False  # Grava em lead_memory.conversion_probability
+    chunk_size: Optional[int] = None
+
+
 class CampaignPredictionRequest(BaseModel):
     tenant_id: str
     campaign_data: Dict[str, Any]
     historical_data: Optional[Dict[str, Any]] = None
 
 
+class CampaignOptimizationRequest(BaseModel):
+    tenant_id: str
+    campaign_data: Dict[str, Any]
+    historical_data: Optional[Dict[str, Any]] = None
+    time_budget_ms: Optional[float] = None  # Default: ml_campaign_optimizer_budget_ms
+
+
 class CampaignPredictionResponse(BaseModel):
     predicted_roas: float
     predicted_ctr: float
@@ -58,6 +85,11 @@ class ModelInfoResponse(BaseModel):
     trained_at: Optional[str] = None
 
 
+class RollbackModelRequest(BaseModel):
+    model_type: str
+    tenant_id: Optional[str] = None  # None = modelo global
+
+
 class TrainModelRequest(BaseModel):
     tenant_id: str
     model_types: List[str] = ['lead_score', 'campaign_predictor']
@@ -126,10 +158,10 @@ async def predict_lead_score(request: LeadScoreRequest):
         )
     
     # Extrai features
-    features = LeadScoreNet.extract_features(request.lead_data)
+    features = lead_score_features(request.lead_data)
     
-    # Prediz
-    prob = model.predict(features)
+    # Prediz (agrupado com as predições concorrentes do mesmo modelo)
+    prob = float(await get_inference_batcher().predict('lead_score', model, features))
     
     # Calcula confiança baseada no modelo
     model_info = await registry.get_model_info('lead_score', request.tenant_id)
@@ -155,6 +187,50 @@ async def predict_lead_score(request: LeadScoreRequest):
     )
 
 
+@router.post("/predict/lead-score/bulk")
+async def predict_lead_score_bulk(request: BulkLeadScoreRequest):
+    """
+    Prediz a probabilidade de conversão de muitos leads de uma vez.
+    
+    Responde em NDJSON (uma linha por lead, na ordem processada) e uma
+    linha final com o resumo ({"done": true, "scored": N, ...}).
+    """
+    if request.chunk_size is not None and request.chunk_size <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="chunk_size deve ser positivo"
+        )
+    
+    scorer = BulkLeadScorer(
+        request.tenant_id,
+        chunk_size=request.chunk_size,
+        write_back=request.write_back
+    )
+    
+    if request.leads is not None:
+        results = scorer.score_leads(request.leads)
+    else:
+        results = scorer.score_from_db(
+            stage_id=request.stage_id,
+            pipeline_id=request.pipeline_id,
+            status=request.status
+        )
+    
+    async def ndjson():
+        try:
+            async for result in results:
+                yield json.dumps(result) + "\n"
+            summary = scorer.summary()
+        except Exception as e:
+            logger.error("bulk_lead_score_error", tenant_id=request.tenant_id, error=str(e))
+            summary = {**scorer.summary(), 'done': False, 'error': str(e)}
+        
+        logger.info("bulk_lead_score_finished", tenant_id=request.tenant_id, **summary)
+        yield json.dumps(summary) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 @router.post("/predict/campaign", response_model=CampaignPredictionResponse)
 async def predict_campaign_performance(request: CampaignPredictionRequest):
     """
@@ -176,13 +252,13 @@ async def predict_campaign_performance(request: CampaignPredictionRequest):
         )
     
     # Extrai features
-    features = CampaignPredictorNet.extract_features(
+    features = campaign_features(
         request.campaign_data,
         request.historical_data or {}
     )
     
-    # Prediz
-    prediction = model.predict(features)
+    # Prediz (agrupado com as predições concorrentes do mesmo modelo)
+    prediction = await get_inference_batcher().predict('campaign_predictor', model, features)
     
     # Calcula confiança
     model_info = await registry.get_model_info('campaign_predictor', request.tenant_id)
@@ -207,16 +283,76 @@ async def predict_campaign_performance(request: CampaignPredictionRequest):
     )
 
 
+@router.post("/optimize/campaign")
+async def optimize_campaign_configuration(request: CampaignOptimizationRequest):
+    """
+    Sugere configuração de campanha (objetivo, criativo, budget, público).
+    
+    Chamado pelo agente de Ads a cada passada de otimização. Devolve a
+    configuração de maior ROAS e a fronteira de Pareto ROAS x CPA.
+    """
+    model = await get_model_registry().get_model('campaign_predictor', request.tenant_id)
+    
+    if model is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum modelo de campanha disponível para o tenant"
+        )
+    
+    # Busca limitada por time_budget_ms, fora do event loop
+    return await asyncio.to_thread(
+        optimize_configuration,
+        model,
+        request.campaign_data,
+        request.historical_data or {},
+        request.time_budget_ms
+    )
+
+
+@router.get("/inference/stats")
+async def get_inference_stats():
+    """
+    Estatísticas do micro-batching de inferência (tamanho médio dos batches).
+    """
+    return get_inference_batcher().get_stats()
+
+
+@router.get("/cache/stats")
+async def get_model_cache_stats():
+    """
+    Estatísticas do cache de modelos (hits, evictions, memória estimada).
+    """
+    return get_model_registry().get_cache_stats()
+
+
+@router.post("/models/rollback")
+async def rollback_model(request: RollbackModelRequest):
+    """
+    Reativa a versão anterior de um modelo (do tenant ou global).
+    
+    Todas as réplicas descartam o modelo em cache.
+    """
+    registry = get_model_registry()
+    result = await registry.rollback_model(request.model_type, request.tenant_id)
+    
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhuma versão anterior disponível"
+        )
+    
+    return {'status': 'rolled_back', **result}
+
+
 @router.post("/train")
-async def train_models(
-    request: TrainModelRequest,
-    background_tasks: BackgroundTasks
-):
+async def train_models(request: TrainModelRequest):
     """
     Trigger treinamento de modelos para um tenant.
     
-    Executa em background.
+    Enfileira um job por tipo de modelo no TrainingExecutor (fora do event
+    loop). Pedidos repetidos devolvem o job já em andamento.
     """
+    from app.ml.training.training_job import get_training_job  # torch só no treino
     training_job = get_training_job()
     
     # Verifica se há dados suficientes
@@ -236,49 +372,105 @@ async def train_models(
             'message': 'Dados insuficientes para treinamento'
         }
     
-    # Agenda treinamento em background
-    async def run_training():
-        await training_job.run(request.tenant_id)
-    
-    background_tasks.add_task(run_training)
+    jobs = training_job.schedule(
+        request.tenant_id,
+        [model_type for model_type, ok in can_train.items() if ok]
+    )
     
     return {
         'status': 'training_scheduled',
         'tenant_id': request.tenant_id,
         'model_types': request.model_types,
-        'can_train': can_train
+        'can_train': can_train,
+        'jobs': [{'job_id': job.job_id, 'model_type': job.model_type, 'status': job.status} for job in jobs]
     }
 
 
 @router.post("/train/global")
-async def train_global_models(background_tasks: BackgroundTasks):
+async def train_global_models():
     """
     Trigger treinamento de modelos globais.
     
     Usa dados de todos os tenants (anonimizados).
     """
-    training_job = get_training_job()
-    
-    async def run_global_training():
-        await training_job.train_global_models()
-    
-    background_tasks.add_task(run_global_training)
+    from app.ml.training.training_job import get_training_job  # torch só no treino
+    jobs = get_training_job().schedule(None)
     
     return {
         'status': 'global_training_scheduled',
-        'message': 'Treinamento global agendado'
+        'message': 'Treinamento global agendado',
+        'jobs': [{'job_id': job.job_id, 'model_type': job.model_type, 'status': job.status} for job in jobs]
     }
 
 
+@router.post("/train/all")
+async def train_all_tenants(force: bool = False):
+    """
+    Treina todos os tenants elegíveis em paralelo (orçamento de CPU/memória).
+    
+    Tenants sem dados novos desde o último modelo são pulados (force=true
+    retreina mesmo assim). O relatório fica em GET /ml/train/report.
+    """
+    from app.ml.training.orchestrator import get_training_orchestrator
+    
+    if not get_training_orchestrator().start(force=force):
+        return {'status': 'already_running'}
+    
+    return {'status': 'training_run_started'}
+
+
+@router.get("/train/report")
+async def get_training_report():
+    """
+    Relatório da última execução do treino de todos os tenants.
+    """
+    from app.ml.training.orchestrator import get_training_orchestrator
+    
+    report = get_training_orchestrator().get_last_report()
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhuma execução registrada")
+    return report
+
+
+@router.get("/train/jobs")
+async def list_training_jobs(tenant_id: Optional[str] = None):
+    """
+    Lista jobs de treino (na fila, rodando e os finalizados recentes).
+    """
+    executor = get_training_executor()
+    return {'jobs': executor.list_jobs(tenant_id), 'stats': executor.get_stats()}
+
+
+@router.get("/train/jobs/{job_id}")
+async def get_training_job_status(job_id: str):
+    """
+    Status e progresso (época atual) de um job de treino.
+    """
+    job = get_training_executor().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return job
+
+
+@router.delete("/train/jobs/{job_id}")
+async def cancel_training_job(job_id: str):
+    """
+    Cancela um job na fila ou em treino (interrompe na próxima época).
+    """
+    if not get_training_executor().cancel(job_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado ou já finalizado")
+    return {'status': 'cancel_requested', 'job_id': job_id}
+
+
 @router.delete("/cache/{tenant_id}")
 async def clear_model_cache(tenant_id: str, model_type: Optional[str] = None):
     """
-    Limpa cache de modelos para um tenant.
+    Limpa cache de modelos para um tenant (em todas as réplicas).
     
     Útil após retreinamento.
     """
     registry = get_model_registry()
-    registry.clear_cache(tenant_id, model_type)
+    await registry.invalidate(tenant_id, model_type)
     
     return {'status': 'cache_cleared'}
 
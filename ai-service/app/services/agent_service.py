@@ -1,8 +1,10 @@
 """
 Serviço Principal do Agente - Orquestra RAG, Memory, ML e LLM
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from types import SimpleNamespace
 from datetime import datetime
+import asyncio
 import json
 import time
 import structlog
@@ -19,6 +21,9 @@ from app.memory.memory_service import memory_service
 from app.ml.classifier import ml_classifier
 from app.cache import response_cache, history_cache
 from app.services.usage_service import usage_service
+from app.services.response_streamer import LaravelStreamSink, JsonStringFieldParser
+from app.services.prompt_cache import prefix_fingerprint, extract_cache_usage, prompt_cache_stats
+from app.services.single_flight import coalesced_call
 
 # Import support tools para execução de diagnóstico
 from mcp.tools.support_tools import (
@@ -433,9 +438,16 @@ class AgentService:
             project=settings.openai_project_id if settings.openai_project_id else None
         )
     
-    async def run(self, request: AgentRunRequest) -> AgentRunResponse:
+    async def run(
+        self,
+        request: AgentRunRequest,
+        stream_sink: Optional[LaravelStreamSink] = None
+    ) -> AgentRunResponse:
         """
         Executa o agente para uma mensagem recebida.
+
+        Com stream_sink, o texto da resposta final é enviado ao Laravel em
+        partes enquanto o LLM gera (ver app/services/response_streamer.py).
         """
         start_time = datetime.now()
 
@@ -513,13 +525,9 @@ class AgentService:
                 for chunk in rag_chunks:
                     print(f"[RAG] - {chunk.source}: {chunk.content[:100]}... (sim: {chunk.similarity:.4f})")
             
-            # 4. Classifica intenção
-            intent_result = await ml_classifier.classify_intent(
-                message=request.message,
-                history=request.history or short_term.messages
-            )
-            
-            # 5. Qualifica lead
+            # 4-6. Intenção + qualificação + decisão de transferência
+            # (uma única chamada ao LLM no modo fundido)
+            history = list(request.history or short_term.messages)
             all_messages = (request.history or short_term.messages)
             # Adiciona mensagem atual
             all_messages.append(Message(
@@ -529,17 +537,17 @@ class AgentService:
                 sender_type="contact",
                 created_at=datetime.now()
             ))
-            
-            qualification = await ml_classifier.qualify_lead(
+
+            analysis = await ml_classifier.analyze_message(
+                message=request.message,
                 lead=request.lead,
-                messages=all_messages
-            )
-            
-            # 6. Verifica se deve transferir para humano
-            should_transfer, transfer_reason = await ml_classifier.should_transfer_to_human(
                 messages=all_messages,
-                qualification=qualification
+                history=history,
+                tenant_id=request.tenant.id
             )
+            intent_result = analysis.intent
+            qualification = analysis.qualification
+            should_transfer, transfer_reason = analysis.should_transfer, analysis.transfer_reason
             
             if should_transfer:
                 return AgentRunResponse(
@@ -585,7 +593,8 @@ class AgentService:
                 tenant_config=request.tenant,
                 intent=intent_result.intent,
                 qualification=qualification,
-                log_context=log_context
+                log_context=log_context,
+                stream_sink=stream_sink
             )
             
             # 9. Salva contexto atualizado
@@ -611,6 +620,7 @@ class AgentService:
                 response.metrics.update(time_metrics)
             else:
                 response.metrics = time_metrics
+            response.metrics["classifier_fused"] = analysis.fused
             response.context_used = {
                 "rag_chunks": len(rag_chunks),
                 "history_messages": len(all_messages),
@@ -670,7 +680,8 @@ class AgentService:
         tenant_config,
         intent: str,
         qualification: Qualification,
-        log_context: Optional[Dict[str, Any]] = None
+        log_context: Optional[Dict[str, Any]] = None,
+        stream_sink: Optional[LaravelStreamSink] = None
     ) -> AgentRunResponse:
         """
         Gera resposta usando LLM com function calling.
@@ -689,42 +700,28 @@ class AgentService:
         current_time = now.strftime("%H:%M")
         weekday = ['segunda-feira', 'terça-feira', 'quarta-feira', 'quinta-feira', 'sexta-feira', 'sábado', 'domingo'][now.weekday()]
 
-        # System prompt diferente para agente de SUPORTE vs SDR
+        # O prompt é dividido em prefixo estável (persona, regras, produtos/estágios)
+        # e sufixo volátil (data/hora, contexto, lead). O prefixo idêntico entre
+        # chamadas é reaproveitado pelo cache de prompt do provedor.
         if agent_config.type == "support":
             # Prompt simplificado para suporte - foco em diagnóstico
-            system_prompt = f"""{agent_config.prompt}
+            stable_prefix = agent_config.prompt
 
-## Contexto da Conversa
+            volatile_suffix = f"""## Contexto da Conversa
 {context}
 
 ## Data/Hora Atual
 {weekday}, {today_formatted} às {current_time}"""
         else:
             # Monta system prompt para SDR
-            system_prompt = f"""{agent_config.prompt}
+            stable_prefix = f"""{agent_config.prompt}
 
-## ⚠️ DATA E HORA ATUAL (CRÍTICO - LEIA COM ATENÇÃO!)
-- HOJE é: {weekday}, {today_formatted} ({today_str})
-- Hora atual: {current_time}
-
-### REGRAS DE DATAS (SIGA RIGOROSAMENTE):
-- "HOJE" = {today_str} (dia {now.day})
-- "AMANHÃ" = {(now + timedelta(days=1)).strftime('%Y-%m-%d')} (dia {(now + timedelta(days=1)).day})
+## ⚠️ REGRAS DE DATAS (SIGA RIGOROSAMENTE):
+- A data e a hora atuais estão na seção "DATA E HORA ATUAL" logo abaixo
 - Se o lead mencionar um número de dia (ex: "dia 05"), calcule a data correta no mês atual
 - SEMPRE use formato YYYY-MM-DD para datas
 - SEMPRE use formato HH:MM para horários (ex: 10:00, 14:30)
 
-## Contexto da Conversa
-{context}
-
-## Intenção: {intent}
-
-## Lead
-- Temperatura: {qualification.temperature.value}
-- Score: {qualification.score}
-- Dores: {', '.join(qualification.pain_points) or 'Nenhuma identificada'}
-- Objeções: {', '.join(qualification.objections) or 'Nenhuma'}
-
 ## Produtos: {json.dumps([p.get('name', '') for p in tenant_config.products[:5]], ensure_ascii=False)}
 ## Estágios: {json.dumps([s.get('name', '') for s in tenant_config.stages], ensure_ascii=False)}
 
@@ -742,7 +739,7 @@ class AgentService:
 
 ### 3. AGENDAMENTO
 - Quando tiver data E horário confirmados, use schedule_meeting IMEDIATAMENTE
-- Exemplo: Lead diz "amanhã às 10h" e depois "sim" → USE: date="{(now + timedelta(days=1)).strftime('%Y-%m-%d')}", time="10:00"
+- Exemplo: Lead diz "amanhã às 10h" e depois "sim" → USE: date=<data de AMANHÃ em YYYY-MM-DD>, time="10:00"
 - NÃO peça mais confirmações após o lead dizer "sim"
 
 ### 4. EVITE ALUCINAÇÕES
@@ -752,10 +749,29 @@ class AgentService:
 
 ## Tom: {agent_config.tone}
 ## Idioma: {agent_config.language}
+"""
+
+            volatile_suffix = f"""## ⚠️ DATA E HORA ATUAL (CRÍTICO - LEIA COM ATENÇÃO!)
+- HOJE é: {weekday}, {today_formatted} ({today_str})
+- Hora atual: {current_time}
+- "HOJE" = {today_str} (dia {now.day})
+- "AMANHÃ" = {(now + timedelta(days=1)).strftime('%Y-%m-%d')} (dia {(now + timedelta(days=1)).day})
+
+## Contexto da Conversa
+{context}
+
+## Intenção: {intent}
+
+## Lead
+- Temperatura: {qualification.temperature.value}
+- Score: {qualification.score}
+- Dores: {', '.join(qualification.pain_points) or 'Nenhuma identificada'}
+- Objeções: {', '.join(qualification.objections) or 'Nenhuma'}
 """
 
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": stable_prefix},
+            {"role": "system", "content": volatile_suffix},
             {"role": "user", "content": f"Mensagem do lead: {message}"}
         ]
 
@@ -764,33 +780,49 @@ class AgentService:
         available_functions = SUPPORT_FUNCTIONS if agent_config.type == "support" else SDR_FUNCTIONS
         print(f"[AGENT] Available functions: {[f['name'] for f in available_functions]}", flush=True)
 
+        # Versão do prefixo estável (tools + prefixo): também direciona o
+        # roteamento do cache de prompt da OpenAI
+        prefix_version = prefix_fingerprint(available_functions, stable_prefix)
+
         try:
             # Loop para executar ferramentas de diagnóstico antes de responder
             # Máximo de 10 iterações para permitir diagnósticos completos
-            total_tokens = {"input": 0, "output": 0, "total": 0}
+            total_tokens = {"input": 0, "output": 0, "total": 0, "cached": 0}
             max_iterations = 10
 
             for iteration in range(max_iterations):
                 print(f"[AGENT] Iteration {iteration + 1}/{max_iterations}, calling OpenAI...", flush=True)
 
-                response = await self.openai.chat.completions.create(
+                completion_kwargs = dict(
                     model=agent_config.ai_model,
                     messages=messages,
                     tools=[{"type": "function", "function": f} for f in available_functions],
                     tool_choice="auto",
                     temperature=agent_config.temperature,
-                    max_tokens=agent_config.max_tokens
+                    max_tokens=agent_config.max_tokens,
+                    extra_body={"prompt_cache_key": prefix_version}
                 )
 
-                assistant_message = response.choices[0].message
+                if stream_sink:
+                    assistant_message, usage_info = await self._stream_completion(completion_kwargs, stream_sink)
+                else:
+                    response = await coalesced_call(
+                        self.openai.chat.completions.create, "agent_run",
+                        tenant_id=tenant_config.id, **completion_kwargs
+                    )
+                    assistant_message = response.choices[0].message
+                    usage_info = response.usage
+
                 print(f"[AGENT] Response: tool_calls={assistant_message.tool_calls is not None}, content={assistant_message.content[:100] if assistant_message.content else 'None'}", flush=True)
 
                 # Acumula tokens usados
-                usage_info = response.usage
                 if usage_info:
                     total_tokens["input"] += usage_info.prompt_tokens
                     total_tokens["output"] += usage_info.completion_tokens
                     total_tokens["total"] += usage_info.total_tokens
+                    cache_usage = extract_cache_usage(usage_info)
+                    total_tokens["cached"] += cache_usage["cached_input_tokens"]
+                    prompt_cache_stats.record("agent_service", prefix_version, cache_usage)
 
                 # Se não houver function call, temos a resposta final
                 if not assistant_message.tool_calls:
@@ -799,8 +831,10 @@ class AgentService:
                         "input_tokens": total_tokens["input"],
                         "output_tokens": total_tokens["output"],
                         "total_tokens": total_tokens["total"],
+                        "cached_input_tokens": total_tokens["cached"],
+                        "prompt_prefix_version": prefix_version,
                     }
-                    return AgentRunResponse(
+                    return await self._finish_stream(stream_sink, AgentRunResponse(
                         action=AgentAction.SEND_MESSAGE,
                         message=assistant_message.content,
                         qualification=qualification,
@@ -811,10 +845,14 @@ class AgentService:
                             reasoning="Resposta direta sem ação específica"
                         ),
                         metrics=token_metrics
-                    )
+                    ))
 
                 tool_call = assistant_message.tool_calls[0]
                 function_name = tool_call.function.name
+
+                # Só o send_message é transmitido; o resto do texto desta iteração não vale
+                if stream_sink and function_name != "send_message":
+                    stream_sink.discard()
                 function_args = json.loads(tool_call.function.arguments)
                 print(f"[AGENT] Tool call: {function_name}({function_args})", flush=True)
 
@@ -824,35 +862,42 @@ class AgentService:
                     iteration=iteration
                 )
 
-                # Se for uma ferramenta de diagnóstico, executa e continua o loop
+                # Se for uma ferramenta de diagnóstico, executa e continua o loop.
+                # Todas as de diagnóstico do turno (só leitura) rodam em paralelo.
                 if function_name in DIAGNOSTIC_TOOLS:
-                    tool_result = await self._execute_diagnostic_tool(function_name, function_args, log_context)
+                    diagnostic_calls = [
+                        tc for tc in assistant_message.tool_calls
+                        if tc.function.name in DIAGNOSTIC_TOOLS
+                    ]
+                    tool_results = await self._execute_diagnostic_tools(diagnostic_calls, log_context)
 
-                    # Adiciona a chamada e resultado à conversa
+                    # Adiciona as chamadas e resultados à conversa (na ordem pedida)
                     messages.append({
                         "role": "assistant",
                         "content": None,
                         "tool_calls": [
                             {
-                                "id": tool_call.id,
+                                "id": tc.id,
                                 "type": "function",
                                 "function": {
-                                    "name": function_name,
-                                    "arguments": tool_call.function.arguments
+                                    "name": tc.function.name,
+                                    "arguments": tc.function.arguments
                                 }
                             }
+                            for tc in diagnostic_calls
                         ]
                     })
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps(tool_result, ensure_ascii=False, default=str)
-                    })
-
-                    logger.info("diagnostic_tool_executed",
-                        function=function_name,
-                        result_preview=str(tool_result)[:200]
-                    )
+                    for tc, tool_result in zip(diagnostic_calls, tool_results):
+                        messages.append({
+                            "role": "tool",
+                            "tool_call_id": tc.id,
+                            "content": json.dumps(tool_result, ensure_ascii=False, default=str)
+                        })
+
+                        logger.info("diagnostic_tool_executed",
+                            function=tc.function.name,
+                            result_preview=str(tool_result)[:200]
+                        )
                     continue
 
                 # Se não for ferramenta de diagnóstico, processa normalmente
@@ -860,6 +905,8 @@ class AgentService:
                     "input_tokens": total_tokens["input"],
                     "output_tokens": total_tokens["output"],
                     "total_tokens": total_tokens["total"],
+                    "cached_input_tokens": total_tokens["cached"],
+                    "prompt_prefix_version": prefix_version,
                 }
                 result = self._process_function_call(
                     function_name=function_name,
@@ -868,11 +915,11 @@ class AgentService:
                     intent=intent
                 )
                 result.metrics = token_metrics
-                return result
+                return await self._finish_stream(stream_sink, result)
 
             # Se atingiu o limite de iterações, retorna erro
             logger.warning("agent_max_iterations_reached", iterations=max_iterations)
-            return AgentRunResponse(
+            return await self._finish_stream(stream_sink, AgentRunResponse(
                 action=AgentAction.SEND_MESSAGE,
                 message="Desculpe, estou tendo dificuldade em processar sua solicitação. Um atendente humano irá ajudá-lo em breve.",
                 qualification=qualification,
@@ -883,12 +930,131 @@ class AgentService:
                     reasoning="Limite de iterações atingido"
                 ),
                 requires_human=True
-            )
+            ))
 
         except Exception as e:
             logger.error("generate_response_error", error=str(e))
+            if stream_sink:
+                await stream_sink.close()
             raise
 
+    async def _stream_completion(
+        self,
+        completion_kwargs: Dict[str, Any],
+        stream_sink: LaravelStreamSink
+    ) -> Tuple[Any, Any]:
+        """
+        Chamada ao LLM em streaming.
+
+        Só o argumento `message` do send_message é repassado ao stream_sink à
+        medida que chega (decodificado incrementalmente dos argumentos do
+        function call). Conteúdo direto fica retido até o fim da completion:
+        se ela terminar em outro tool call, o texto não vai para o lead (como
+        no caminho sem streaming, que o descarta). Retorna objetos com o mesmo
+        formato de choices[0].message e usage da chamada sem streaming.
+        """
+        stream = await self.openai.chat.completions.create(
+            **completion_kwargs,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        content_parts: List[str] = []
+        calls: Dict[int, Dict[str, Any]] = {}
+        message_parser: Optional[JsonStringFieldParser] = None
+        usage_info = None
+
+        async for chunk in stream:
+            if chunk.usage:
+                usage_info = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.content:
+                content_parts.append(delta.content)
+
+            for tc in delta.tool_calls or []:
+                call = calls.setdefault(tc.index, {"id": None, "name": "", "arguments": ""})
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function and tc.function.name:
+                    call["name"] += tc.function.name
+                fragment = tc.function.arguments if tc.function else None
+                if not fragment:
+                    continue
+                call["arguments"] += fragment
+
+                if tc.index == min(calls) and call["name"] == "send_message":
+                    if message_parser is None:
+                        message_parser = JsonStringFieldParser("message")
+                        fragment = call["arguments"]
+                    await stream_sink.write(message_parser.feed(fragment))
+
+        tool_calls = [
+            SimpleNamespace(
+                id=call["id"],
+                type="function",
+                function=SimpleNamespace(name=call["name"], arguments=call["arguments"])
+            )
+            for _, call in sorted(calls.items())
+        ] or None
+
+        # Resposta direta: sem tool call, o texto retido é a mensagem final
+        if not tool_calls and content_parts:
+            await stream_sink.write(''.join(content_parts))
+
+        assistant_message = SimpleNamespace(
+            content=''.join(content_parts) or None,
+            tool_calls=tool_calls
+        )
+        return assistant_message, usage_info
+
+    async def _finish_stream(
+        self,
+        stream_sink: Optional[LaravelStreamSink],
+        response: AgentRunResponse
+    ) -> AgentRunResponse:
+        """Fecha o streaming e marca na resposta o prefixo já entregue."""
+        if not stream_sink:
+            return response
+
+        stats = await stream_sink.close()
+        if response.message and stream_sink.delivered_chars:
+            response.stream_id = stream_sink.stream_id
+            response.streamed_chars = min(stream_sink.delivered_chars, len(response.message))
+        response.metrics = {**(response.metrics or {}), **stats}
+
+        logger.info("agent_response_streamed",
+            stream_id=stream_sink.stream_id,
+            parts=stats["stream_parts"],
+            time_to_first_part_ms=stats["time_to_first_part_ms"],
+            streamed_chars=response.streamed_chars
+        )
+        return response
+
+    async def _execute_diagnostic_tools(
+        self,
+        tool_calls: List[Any],
+        context: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Executa em paralelo as ferramentas de diagnóstico de um turno
+        (no máximo settings.tool_call_concurrency ao mesmo tempo).
+        Os resultados seguem a ordem das chamadas.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.tool_call_concurrency))
+
+        async def run(tool_call) -> Dict[str, Any]:
+            try:
+                function_args = json.loads(tool_call.function.arguments or "{}")
+            except json.JSONDecodeError:
+                return {"success": False, "error": "Argumentos inválidos"}
+            async with semaphore:
+                return await self._execute_diagnostic_tool(tool_call.function.name, function_args, context)
+
+        return await asyncio.gather(*(run(tc) for tc in tool_calls))
+
     async def _execute_diagnostic_tool(
         self,
         function_name: str,
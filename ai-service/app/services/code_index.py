@@ -0,0 +1,334 @@
+"""
+Índice de Código (trigramas) para o Agente de Suporte
+
+Mantém, para cada arquivo de `settings.git_repo_path`, o conjunto ordenado
+de trigramas do conteúdo (uint32, minúsculas). Uma busca só abre os arquivos
+que contêm todos os trigramas da consulta, e cada arquivo é lido uma única
+vez para extrair as linhas que casam.
+
+Atualização incremental: a lista de arquivos vem de `git ls-files` (respeita
+.gitignore; fallback os.walk) e só arquivos com mtime/tamanho diferentes são
+re-indexados. O índice é persistido em disco e recarregado no restart.
+
+Todo o trabalho de I/O e CPU roda em thread (asyncio.to_thread), nunca no
+event loop.
+"""
+import asyncio
+import fnmatch
+import os
+import pickle
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+INDEX_FORMAT_VERSION = 1
+
+# Diretórios ignorados quando o repositório não é git
+SKIP_DIRS = {
+    '.git', 'node_modules', 'vendor', 'storage', '__pycache__', '.venv', 'venv',
+    'dist', 'build', '.next', '.idea', '.vscode',
+}
+
+
+@dataclass
+class IndexedFile:
+    """Arquivo indexado: assinatura de stat + trigramas ordenados"""
+    mtime_ns: int
+    size: int
+    trigrams: Optional[np.ndarray]  # uint32 ordenado e único (None = binário/grande)
+
+
+def extract_trigrams(text: str) -> np.ndarray:
+    """Trigramas (por byte UTF-8 do texto em minúsculas) como uint32 ordenado."""
+    data = np.frombuffer(text.lower().encode('utf-8'), dtype=np.uint8)
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+    data = data.astype(np.uint32)
+    ids = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    return np.unique(ids)
+
+
+def contains_all(trigrams: np.ndarray, required: np.ndarray) -> bool:
+    if len(required) == 0:
+        return True
+    if len(trigrams) == 0:
+        return False
+    idx = np.searchsorted(trigrams, required)
+    idx[idx >= len(trigrams)] = 0
+    return bool(np.all(trigrams[idx] == required))
+
+
+def match_pattern(rel_path: str, pattern: str) -> bool:
+    """Glob estilo rg: '**/*.php' também casa arquivos na raiz."""
+    if not pattern or pattern in ('*', '**', '**/*'):
+        return True
+    if fnmatch.fnmatch(rel_path, pattern):
+        return True
+    if pattern.startswith('**/'):
+        return fnmatch.fnmatch(os.path.basename(rel_path), pattern[3:])
+    return False
+
+
+class CodeIndex:
+    """Índice de trigramas incremental e persistente de um repositório."""
+
+    def __init__(self, root: Optional[str] = None, index_path: Optional[str] = None):
+        self._root = root
+        self._index_path = index_path
+        self._files: Dict[str, IndexedFile] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._stats = {
+            'searches': 0,
+            'files_reindexed': 0,
+            'last_refresh_ms': 0.0,
+        }
+
+    @property
+    def root(self) -> str:
+        return self._root or settings.git_repo_path or os.getcwd()
+
+    @property
+    def index_path(self) -> str:
+        if self._index_path:
+            return self._index_path
+        key = os.path.abspath(self.root).strip(os.sep).replace(os.sep, '_') or 'root'
+        return os.path.join(settings.code_index_dir, f"{key}.pkl")
+
+    # ==================== PERSISTÊNCIA ====================
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') != INDEX_FORMAT_VERSION or data.get('root') != self.root:
+                return
+            self._files = data['files']
+            logger.info("code_index_loaded", root=self.root, files=len(self._files))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("code_index_load_failed", error=str(e), path=self.index_path)
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({
+                    'version': INDEX_FORMAT_VERSION,
+                    'root': self.root,
+                    'files': self._files,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning("code_index_save_failed", error=str(e), path=self.index_path)
+
+    # ==================== ATUALIZAÇÃO ====================
+
+    def _list_files(self) -> List[str]:
+        """Arquivos do repositório (caminhos relativos)."""
+        try:
+            result = subprocess.run(
+                ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                cwd=self.root, capture_output=True, timeout=30
+            )
+            if result.returncode == 0:
+                return [p for p in result.stdout.decode('utf-8', errors='ignore').split('\0') if p]
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                files.append(os.path.relpath(os.path.join(dirpath, name), self.root))
+        return files
+
+    def _index_file(self, rel_path: str, st: os.stat_result) -> Optional[IndexedFile]:
+        if st.st_size > settings.code_index_max_file_bytes:
+            return None
+        try:
+            with open(os.path.join(self.root, rel_path), 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        if b'\0' in raw[:8192]:
+            return None  # binário
+        return IndexedFile(
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            trigrams=extract_trigrams(raw.decode('utf-8', errors='ignore'))
+        )
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """
+        Sincroniza o índice com o disco (bloqueante; chamar via to_thread).
+        Só re-lê arquivos com mtime/tamanho alterados.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            now = time.monotonic()
+            if not force and now - self._last_refresh < settings.code_index_refresh_seconds:
+                return {'added': 0, 'updated': 0, 'removed': 0}
+
+            start = time.perf_counter()
+            current = set()
+            added = updated = 0
+
+            for rel_path in self._list_files():
+                try:
+                    st = os.stat(os.path.join(self.root, rel_path))
+                except OSError:
+                    continue
+                current.add(rel_path)
+
+                entry = self._files.get(rel_path)
+                if entry and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                    continue
+
+                indexed = self._index_file(rel_path, st)
+                if indexed is None:
+                    # Binário/grande demais: guarda assinatura vazia para não reler
+                    indexed = IndexedFile(st.st_mtime_ns, st.st_size, None)
+                if entry:
+                    updated += 1
+                else:
+                    added += 1
+                self._files[rel_path] = indexed
+
+            removed = [p for p in self._files if p not in current]
+            for rel_path in removed:
+                del self._files[rel_path]
+
+            self._last_refresh = now
+            self._stats['files_reindexed'] += added + updated
+            self._stats['last_refresh_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+            if added or updated or removed:
+                self._save()
+                logger.info(
+                    "code_index_refreshed",
+                    added=added, updated=updated, removed=len(removed),
+                    files=len(self._files), ms=self._stats['last_refresh_ms']
+                )
+
+            return {'added': added, 'updated': updated, 'removed': len(removed)}
+
+    # ==================== BUSCA ====================
+
+    def search_sync(
+        self,
+        query: str,
+        file_pattern: str = "**/*",
+        max_results: int = 20,
+        max_bytes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Busca case-insensitive por substring com filtro de trigramas.
+        Para ao atingir max_results linhas ou max_bytes lidos.
+        """
+        self.refresh()
+        max_bytes = max_bytes or settings.code_index_max_scan_bytes
+        query_lower = query.lower()
+        required = extract_trigrams(query)
+
+        with self._lock:
+            candidates: List[Tuple[str, IndexedFile]] = [
+                (path, entry) for path, entry in self._files.items()
+                if entry.trigrams is not None
+                and match_pattern(path, file_pattern)
+                and contains_all(entry.trigrams, required)
+            ]
+
+        candidates.sort(key=lambda item: item[0])
+
+        matches = []
+        files_matched = set()
+        bytes_scanned = 0
+        truncated = False
+
+        for rel_path, entry in candidates:
+            if len(matches) >= max_results or bytes_scanned + entry.size > max_bytes:
+                truncated = True
+                break
+            try:
+                with open(os.path.join(self.root, rel_path), 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+            except OSError:
+                continue
+            bytes_scanned += entry.size
+
+            for i, line in enumerate(content.split('\n')):
+                if query_lower in line.lower():
+                    files_matched.add(rel_path)
+                    matches.append({
+                        "file": rel_path,
+                        "line": i + 1,
+                        "content": line.strip()[:200]
+                    })
+                    if len(matches) >= max_results:
+                        break
+
+        self._stats['searches'] += 1
+
+        return {
+            "files_count": len(files_matched),
+            "candidates_count": len(candidates),
+            "matches": matches,
+            "bytes_scanned": bytes_scanned,
+            "truncated": truncated,
+        }
+
+    async def search(
+        self,
+        query: str,
+        file_pattern: str = "**/*",
+        max_results: int = 20,
+        max_bytes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Versão async: executa a busca fora do event loop."""
+        return await asyncio.to_thread(self.search_sync, query, file_pattern, max_results, max_bytes)
+
+    async def warm_up(self) -> None:
+        """Carrega/sincroniza o índice em background (startup)."""
+        try:
+            await asyncio.to_thread(self.refresh, True)
+        except Exception as e:
+            logger.warning("code_index_warm_up_failed", error=str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        indexed = [e for e in self._files.values() if e.trigrams is not None]
+        return {
+            "root": self.root,
+            "files": len(self._files),
+            "indexed_files": len(indexed),
+            "trigram_bytes": int(sum(e.trigrams.nbytes for e in indexed)),
+            **self._stats,
+        }
+
+
+_code_index: Optional[CodeIndex] = None
+
+
+def get_code_index() -> CodeIndex:
+    """Retorna o índice de código do repositório configurado."""
+    global _code_index
+    if _code_index is None:
+        _code_index = CodeIndex()
+    return _code_index
@@ -0,0 +1,115 @@
+"""
+Cache de Prefixo de Prompt (OpenAI / Anthropic)
+
+Os provedores reaproveitam o processamento de um prefixo idêntico entre
+chamadas (OpenAI automaticamente a partir de ~1024 tokens; Anthropic com
+breakpoints `cache_control`). Para isso o prompt é montado como:
+
+    [tools] + [prefixo estável e versionado] + [sufixo volátil] + [mensagens]
+
+O prefixo (persona, regras, ferramentas, produtos/estágios do tenant) não
+pode conter data/hora, lead, RAG ou histórico. A versão do prefixo é um hash
+do template + conteúdo e aparece nas métricas de cada chamada.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+# Incrementar ao mudar a estrutura dos templates de prefixo
+PROMPT_PREFIX_VERSION = "v1"
+
+
+def prefix_fingerprint(*parts: Any) -> str:
+    """Versão curta e determinística de um prefixo (template + conteúdo)."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha256(f"{PROMPT_PREFIX_VERSION}:{payload}".encode('utf-8')).hexdigest()
+    return f"{PROMPT_PREFIX_VERSION}-{digest[:12]}"
+
+
+def extract_cache_usage(usage: Any) -> Dict[str, int]:
+    """
+    Normaliza o uso de tokens de OpenAI e Anthropic:
+        input_tokens: total de entrada (incluindo o que veio do cache)
+        cached_input_tokens: lidos do cache de prefixo
+        cache_write_tokens: gravados no cache (Anthropic)
+        output_tokens
+    """
+    if usage is None:
+        return {"input_tokens": 0, "cached_input_tokens": 0, "cache_write_tokens": 0, "output_tokens": 0}
+
+    # Anthropic: input_tokens exclui leitura/escrita de cache
+    if hasattr(usage, "cache_read_input_tokens") or hasattr(usage, "cache_creation_input_tokens"):
+        cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+        written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        return {
+            "input_tokens": (getattr(usage, "input_tokens", 0) or 0) + cached + written,
+            "cached_input_tokens": cached,
+            "cache_write_tokens": written,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        }
+
+    # OpenAI: prompt_tokens inclui os tokens em cache
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_input_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        "cache_write_tokens": 0,
+        "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+class PromptCacheStats:
+    """Acumula tokens de entrada vs. tokens servidos do cache por origem/prefixo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, source: str, prefix_version: Optional[str], usage: Dict[str, int]) -> None:
+        key = f"{source}:{prefix_version or '-'}"
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                "source": source,
+                "prefix_version": prefix_version,
+                "calls": 0,
+                "calls_with_hit": 0,
+                "input_tokens": 0,
+                "cached_input_tokens": 0,
+                "cache_write_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["calls_with_hit"] += int(usage["cached_input_tokens"] > 0)
+            stats["input_tokens"] += usage["input_tokens"]
+            stats["cached_input_tokens"] += usage["cached_input_tokens"]
+            stats["cache_write_tokens"] += usage["cache_write_tokens"]
+
+        logger.info(
+            "llm_prompt_cache",
+            source=source,
+            prefix_version=prefix_version,
+            input_tokens=usage["input_tokens"],
+            cached_input_tokens=usage["cached_input_tokens"],
+            cache_write_tokens=usage["cache_write_tokens"],
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = []
+            for stats in self._stats.values():
+                entry = dict(stats)
+                entry["cached_ratio"] = (
+                    round(stats["cached_input_tokens"] / stats["input_tokens"], 4)
+                    if stats["input_tokens"] else 0.0
+                )
+                entries.append(entry)
+        return {"prefix_version": PROMPT_PREFIX_VERSION, "entries": entries}
+
+
+# Singleton
+prompt_cache_stats = PromptCacheStats()
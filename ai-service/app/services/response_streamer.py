@@ -0,0 +1,276 @@
+"""
+Streaming de respostas do agente para o Laravel
+
+Enquanto o LLM gera a resposta final (conteúdo direto ou argumento `message`
+do send_message), o texto é cortado em fronteiras de frase e cada parte é
+enviada ao Laravel assim que fica pronta, para sair no WhatsApp em partes.
+
+O Laravel (PHP-FPM) só lê o corpo da requisição quando ela termina, então
+cada parte é um POST curto para /api/agent/response/stream (com stream_id
+e seq para ordenação e idempotência), enviado em ordem por uma task única.
+"""
+import asyncio
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# Pontuação de fim de frase seguida de espaço (não quebra "1.500" nem "R$ 2,50")
+_SENTENCE_END_RE = re.compile(r"[.!?…]+[\"')\]]*\s+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Abreviações comuns que não encerram frase
+ABBREVIATIONS = {'sr', 'sra', 'srta', 'dr', 'dra', 'prof', 'av', 'obs', 'ex', 'aprox'}
+
+
+class SentenceChunker:
+    """
+    Acumula texto e libera partes em fronteiras de frase/parágrafo.
+
+    As partes são fatias consecutivas do texto original (sem perda), então a
+    soma dos tamanhos das partes entregues é o prefixo já enviado.
+    """
+
+    def __init__(self, min_chars: Optional[int] = None, max_chars: Optional[int] = None):
+        self.min_chars = min_chars or settings.agent_stream_min_chars
+        self.max_chars = max_chars or settings.agent_stream_max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        parts = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            parts.append(self._buffer[:cut])
+            self._buffer = self._buffer[cut:]
+        return parts
+
+    def flush(self) -> Optional[str]:
+        part, self._buffer = self._buffer, ""
+        return part or None
+
+    def discard(self) -> None:
+        self._buffer = ""
+
+    def _find_cut(self) -> Optional[int]:
+        buffer = self._buffer
+
+        # Parágrafo sempre separa mensagens (se já houver texto suficiente)
+        for match in _PARAGRAPH_RE.finditer(buffer):
+            if match.start() >= self.min_chars // 2:
+                return match.end()
+
+        cut = None
+        for match in _SENTENCE_END_RE.finditer(buffer):
+            if match.start() + 1 < self.min_chars:
+                continue
+            word = re.findall(r"(\w+)[.]*$", buffer[:match.start() + 1].rstrip('.!?…'))
+            if buffer[match.start()] == '.' and word and word[-1].lower() in ABBREVIATIONS:
+                continue
+            cut = match.end()
+            break
+
+        if cut is None and len(buffer) > self.max_chars:
+            # Frase longa demais: corta no último espaço antes do limite
+            space = buffer.rfind(' ', 0, self.max_chars)
+            cut = space + 1 if space > 0 else self.max_chars
+
+        return cut
+
+
+class JsonStringFieldParser:
+    """
+    Extrai incrementalmente o valor string de um campo de um objeto JSON
+    que chega em fragmentos (argumentos de function call em streaming).
+
+        parser = JsonStringFieldParser("message")
+        parser.feed('{"mess') -> ""
+        parser.feed('age": "Olá, tu') -> "Olá, tu"
+        parser.feed('do bem?"}') -> "do bem?"
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self._key_re = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos: Optional[int] = None  # início do trecho ainda não decodificado
+        self._pending_surrogate = ""
+        self.done = False
+
+    def feed(self, fragment: str) -> str:
+        self._buffer += fragment
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self._key_re.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        buffer, i = self._buffer, self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+            # Escape incompleto: espera o próximo fragmento
+            if i + 1 >= len(buffer):
+                break
+            code = buffer[i + 1]
+            if code == 'u':
+                if i + 6 > len(buffer):
+                    break
+                out.append(chr(int(buffer[i + 2:i + 6], 16)))
+                i += 6
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                i += 2
+
+        self._pos = i
+        text = self._pending_surrogate + ''.join(out)
+        self._pending_surrogate = ""
+        # \uD83D\uDE00 (emoji) pode chegar dividido: segura a metade alta
+        if text and '\ud800' <= text[-1] <= '\udbff' and not self.done:
+            text, self._pending_surrogate = text[:-1], text[-1]
+        return text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace') if text else ""
+
+    @property
+    def arguments(self) -> str:
+        return self._buffer
+
+
+class LaravelStreamSink:
+    """
+    Destino do streaming de uma execução do agente (um ticket).
+
+    write() recebe tokens, o SentenceChunker decide as partes e uma task de
+    envio faz os POSTs em ordem. Se um envio falha, o streaming para e o
+    restante do texto segue na resposta final (delivered_chars indica o
+    prefixo já entregue ao lead).
+    """
+
+    def __init__(self, ticket_id: str, lead_id: str, channel_id: str):
+        self.ticket_id = ticket_id
+        self.lead_id = lead_id
+        self.channel_id = channel_id
+        self.stream_id = str(uuid.uuid4())
+        self._chunker = SentenceChunker()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._started_at = time.perf_counter()
+        self._seq = 0
+        self._failed = False
+        self._segment = 0
+        self._segment_chars = 0
+        self.delivered_chars = 0
+        self.parts_sent = 0
+        self.first_part_ms: Optional[int] = None
+
+    async def write(self, text: str) -> None:
+        if not text or self._failed:
+            return
+        for part in self._chunker.feed(text):
+            self._enqueue(part)
+
+    def discard(self) -> None:
+        """
+        Descarta o texto ainda não liberado e inicia novo segmento
+        (a iteração terminou em tool call; a resposta final vem depois).
+        """
+        self._chunker.discard()
+        self._segment += 1
+        self._segment_chars = 0
+        self.delivered_chars = 0
+
+    async def close(self) -> Dict[str, Any]:
+        """Libera o restante, espera os envios e retorna estatísticas."""
+        remainder = self._chunker.flush()
+        if remainder and not self._failed:
+            self._enqueue(remainder, final=True)
+
+        if self._sender:
+            await self._queue.put(None)
+            await self._sender
+        if self._client:
+            await self._client.aclose()
+
+        return {
+            "stream_id": self.stream_id,
+            "stream_parts": self.parts_sent,
+            "time_to_first_part_ms": self.first_part_ms,
+        }
+
+    def _enqueue(self, part: str, final: bool = False) -> None:
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_loop())
+        self._queue.put_nowait((self._seq, self._segment, self._segment_chars, part, final))
+        self._seq += 1
+        self._segment_chars += len(part)
+
+    async def _send_loop(self) -> None:
+        self._client = httpx.AsyncClient()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            seq, segment, offset, part, final = item
+            if self._failed:
+                continue
+            if not part.strip():
+                self._advance(segment, offset, part)
+                continue
+            try:
+                result = await self._client.post(
+                    f"{settings.LARAVEL_API_URL}/api/agent/response/stream",
+                    json={
+                        "ticket_id": self.ticket_id,
+                        "lead_id": self.lead_id,
+                        "channel_id": self.channel_id,
+                        "stream_id": self.stream_id,
+                        "seq": seq,
+                        "text": part.strip(),
+                        "final": final,
+                    },
+                    headers={
+                        "X-API-Key": settings.LARAVEL_API_KEY,
+                        "Content-Type": "application/json"
+                    },
+                    timeout=15
+                )
+                if result.status_code != 200:
+                    raise RuntimeError(f"HTTP {result.status_code}: {result.text[:200]}")
+            except Exception as e:
+                self._failed = True
+                logger.warning("agent_stream_part_failed", error=str(e), stream_id=self.stream_id, seq=seq)
+                continue
+
+            if self.first_part_ms is None:
+                self.first_part_ms = int((time.perf_counter() - self._started_at) * 1000)
+            self.parts_sent += 1
+            self._advance(segment, offset, part)
+
+    def _advance(self, segment: int, offset: int, part: str) -> None:
+        # Só conta partes do segmento atual (discard() inicia outro)
+        if segment == self._segment and offset == self.delivered_chars:
+            self.delivered_chars = offset + len(part)
+
@@ -0,0 +1,240 @@
+"""
+Single-flight de chamadas ao LLM
+
+Retentativas de webhook do Laravel e leads que enviam a mesma mensagem duas
+vezes geram chamadas idênticas ao LLM ao mesmo tempo, e o ResponseCache só
+é preenchido quando a primeira termina. Aqui a primeira chamada (líder) roda
+numa task e as idênticas que chegam enquanto ela está em andamento aguardam
+o mesmo resultado em vez de chamar o provedor de novo.
+
+A chave é um hash canônico de modelo + mensagens + tools (e demais
+parâmetros da chamada), prefixado pelo escopo: por tenant
+(settings.llm_single_flight_scope="tenant") ou global. Nada é guardado
+depois que a chamada termina; isso continua sendo papel do ResponseCache.
+
+Coalescer só a chamada ao LLM não basta para reentregas do webhook: cada
+uma ainda rodaria o loop de ferramentas e enviaria a resposta. O
+AgentRunGuard deduplica a execução inteira do agente por (tenant, lead,
+mensagem).
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, TypeVar
+
+import redis.asyncio as redis
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+def _canonical_default(obj: Any) -> Any:
+    """Objetos de SDK (pydantic) entram no hash pelo conteúdo, não pelo repr."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(exclude_none=True)
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    return str(obj)
+
+
+def request_key(scope: str, request: Dict[str, Any]) -> str:
+    """Hash canônico (ordem de chaves irrelevante) de uma requisição ao LLM."""
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True, default=_canonical_default)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return f"{scope}:{digest}"
+
+
+class SingleFlight:
+    """Coalesce chamadas idênticas em andamento numa única task."""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def scope_for(self, tenant_id: Optional[str]) -> str:
+        if settings.llm_single_flight_scope == "tenant":
+            return f"tenant:{tenant_id or '-'}"
+        return "global"
+
+    def _source_stats(self, source: str) -> Dict[str, int]:
+        return self._stats.setdefault(source, {"calls": 0, "leaders": 0, "coalesced": 0, "errors": 0})
+
+    async def do(self, source: str, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executa fn() uma única vez por chave enquanto houver chamada em
+        andamento. Exceções do líder propagam para todos que aguardavam.
+
+        A task do líder é protegida com shield: se quem a iniciou for
+        cancelado (timeout do cliente), os demais continuam aguardando. Só
+        quando todos os chamadores desistem a chamada é cancelada (ex.: o
+        perdedor de um hedge).
+        """
+        stats = self._source_stats(source)
+        stats["calls"] += 1
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            stats["coalesced"] += 1
+            self._waiters[key] += 1
+            logger.info("llm_single_flight_coalesced", source=source, waiters=self._waiters[key])
+            return await self._wait(key, task)
+
+        stats["leaders"] += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        self._waiters[key] = 1
+
+        def _done(finished: asyncio.Task) -> None:
+            self._in_flight.pop(key, None)
+            self._waiters.pop(key, None)
+            if not finished.cancelled() and finished.exception() is not None:
+                stats["errors"] += 1
+
+        task.add_done_callback(_done)
+        return await self._wait(key, task)
+
+    async def _wait(self, key: str, task: asyncio.Task) -> Any:
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._in_flight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] <= 0:
+                    task.cancel()
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        sources = {}
+        for source, stats in self._stats.items():
+            sources[source] = {
+                **stats,
+                "coalesced_ratio": round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0,
+            }
+        return {
+            "enabled": settings.llm_single_flight_enabled,
+            "scope": settings.llm_single_flight_scope,
+            "in_flight": len(self._in_flight),
+            "sources": sources,
+        }
+
+
+# Singleton
+single_flight = SingleFlight()
+
+
+async def coalesced_call(
+    create: Callable[..., Awaitable[T]],
+    source: str,
+    tenant_id: Optional[str] = None,
+    **request: Any
+) -> T:
+    """
+    Chama create(**request) passando pelo single-flight.
+
+        response = await coalesced_call(
+            self.openai.chat.completions.create, "classify_intent",
+            model="gpt-4o-mini", messages=[...]
+        )
+
+    O objeto de resposta é compartilhado entre os chamadores e deve ser
+    tratado como somente leitura. Chamadas com stream=True não são
+    coalescidas (o stream só pode ser consumido uma vez).
+    """
+    if not settings.llm_single_flight_enabled or request.get("stream"):
+        return await create(**request)
+
+    key = request_key(single_flight.scope_for(tenant_id), {"source": source, **request})
+    return await single_flight.do(source, key, lambda: create(**request))
+
+
+# ============================================
+# Execução do agente (run inteiro)
+# ============================================
+
+class AgentRunGuard:
+    """
+    Uma execução do agente por (tenant, lead, mensagem).
+
+    Na mesma réplica, a reserva é um set em memória (verificar e marcar sem
+    await no meio). Entre réplicas, um SET NX no Redis com TTL marca a
+    mensagem como atendida e continua valendo depois do envio da resposta,
+    então reentregas tardias também são descartadas. Sem Redis, vale só a
+    reserva local.
+    """
+
+    def __init__(self):
+        self._redis: Optional[redis.Redis] = None
+        self._running: Set[str] = set()
+        self._stats = {"runs": 0, "duplicates": 0}
+
+    async def connect(self):
+        """Conecta ao Redis"""
+        if not self._redis:
+            try:
+                redis_url = settings.redis_url or f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+                await self._redis.ping()
+            except Exception as e:
+                logger.error("agent_run_guard_connection_error", error=str(e))
+                self._redis = None
+
+    @staticmethod
+    def key(tenant_id: str, lead_id: str, message_id: str) -> str:
+        return f"agent_run:{tenant_id}:{lead_id}:{message_id}"
+
+    async def claim(self, key: str) -> bool:
+        """Reserva a execução; False se a mensagem já está sendo (ou foi) atendida."""
+        if not settings.agent_run_dedup_enabled:
+            return True
+
+        if key in self._running:
+            self._stats["duplicates"] += 1
+            return False
+        self._running.add(key)
+
+        if not self._redis:
+            await self.connect()
+        if self._redis:
+            try:
+                claimed = await self._redis.set(key, "1", nx=True, ex=settings.agent_run_dedup_ttl_seconds)
+            except Exception as e:
+                logger.warning("agent_run_guard_redis_error", error=str(e))
+                claimed = True
+            if not claimed:
+                self._running.discard(key)
+                self._stats["duplicates"] += 1
+                return False
+
+        self._stats["runs"] += 1
+        return True
+
+    async def release(self, key: str, completed: bool) -> None:
+        """
+        Fim da execução. completed=False (erro antes de responder) libera a
+        chave no Redis para que uma nova entrega possa ser atendida.
+        """
+        if not settings.agent_run_dedup_enabled:
+            return
+        self._running.discard(key)
+        if not completed and self._redis:
+            try:
+                await self._redis.delete(key)
+            except Exception as e:
+                logger.warning("agent_run_guard_redis_error", error=str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.agent_run_dedup_enabled,
+            "running": len(self._running),
+            **self._stats,
+        }
+
+
+# Singleton
+agent_run_guard = AgentRunGuard()
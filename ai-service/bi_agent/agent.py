@@ -597,6 +597,7 @@ class BIAgent:
         """Gera resposta usando LLM com os dados coletados."""
         try:
             from openai import OpenAI
+            from app.services.single_flight import coalesced_call
             
             client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
             
@@ -653,7 +654,12 @@ DETALHES POR CAMPANHA:
 
 Analise esses dados e responda à pergunta considerando os objetivos de cada campanha."""
 
-            response = client.chat.completions.create(
+            # Cliente síncrono roda em thread; perguntas idênticas simultâneas
+            # (mesmo tenant e mesmos dados) compartilham a mesma chamada
+            response = await coalesced_call(
+                lambda **request: asyncio.to_thread(client.chat.completions.create, **request),
+                "bi_ask_analyst",
+                tenant_id=self.tenant_id,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Paridade do runtime NumPy com os modelos torch.
+
+Cria LeadScoreNet e CampaignPredictorNet com pesos aleatórios, exporta
+para .npz (export_model), recarrega com load_numpy_model e compara
+predict / predict_batch. Requer torch (roda no ambiente de treino).
+
+    python examples/numpy_runtime_parity.py [N]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from app.ml.models.lead_score_net import LeadScoreNet
+from app.ml.models.campaign_predictor import CampaignPredictorNet
+from app.ml.numpy_runtime import export_model, load_numpy_model
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(n: int) -> None:
+    torch.manual_seed(42)
+    rng = np.random.default_rng(42)
+
+    cases = [
+        ('lead_score', LeadScoreNet(hidden_sizes=[128, 64, 32]), 15),
+        ('campaign_predictor', CampaignPredictorNet(), 12),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for model_type, model, input_size in cases:
+            model.eval()
+            path = export_model(model, os.path.join(tmp, f'{model_type}.npz'), model_type)
+            numpy_model = load_numpy_model(path)
+
+            features = rng.random((n, input_size), dtype=np.float32)
+
+            expected = model.predict_batch(features)
+            actual = numpy_model.predict_batch(features)
+            if model_type == 'lead_score':
+                assert np.allclose(expected, actual, atol=1e-6), f"{model_type}: batch diverge"
+                assert abs(model.predict(features[0]) - numpy_model.predict(features[0])) < 1e-6
+                assert np.allclose(
+                    list(model.get_feature_importance().values()),
+                    list(numpy_model.get_feature_importance().values()),
+                    atol=1e-6
+                )
+            else:
+                for exp_row, act_row in zip(expected, actual):
+                    for key in exp_row:
+                        assert abs(exp_row[key] - act_row[key]) < 1e-5, f"{model_type}: {key} diverge"
+
+            t_torch = timed(lambda: model.predict_batch(features))
+            t_numpy = timed(lambda: numpy_model.predict_batch(features))
+            print(
+                f"{model_type:20s} paridade OK | torch: {t_torch * 1000:7.2f} ms | "
+                f"numpy: {t_numpy * 1000:7.2f} ms ({n} linhas)"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -4,6 +4,7 @@ Microserviço de IA para agentes SDR autônomos
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import structlog
 import uvicorn
 
@@ -24,6 +25,10 @@ from app.routers import bi as bi_router
 from app.routers import content as content_router
 from app.routers import support as support_router
 from bi_agent.scheduler import bi_scheduler
+from app.rag.index_snapshot import index_snapshot_store
+from app.rag.knowledge_compaction import knowledge_compaction_job
+from app.services.code_index import get_code_index
+from app.ml.model_registry import get_model_registry
 
 # Configuração de logging estruturado
 structlog.configure(
@@ -69,6 +74,7 @@ app = FastAPI(
     - `POST /mcp/run` - Executa agente MCP com LLM
     - `POST /mcp/tool` - Chama ferramenta MCP diretamente
     - `GET /mcp/tools` - Lista ferramentas disponíveis
+    - `GET /mcp/metrics` - Métricas das ferramentas (formato Prometheus)
     - `POST /content/analyze-viral` - Analisa estrutura viral
     - `POST /content/generate-viral-script` - Cria roteiro viral
     """,
@@ -129,6 +135,25 @@ async def startup_event():
         traceback.print_exc()
         logger.warning("queue_worker_init_failed", error=str(e))
 
+    # Mapeia snapshots do índice vetorial já existentes em disco (warm start)
+    if settings.rag_index_enabled:
+        try:
+            index_snapshot_store.preload()
+        except Exception as e:
+            logger.warning("rag_snapshot_preload_failed", error=str(e))
+
+    # Invalidação de modelos ML entre réplicas + preload dos tenants mais ativos
+    try:
+        model_registry = get_model_registry()
+        await model_registry.start_invalidation_listener()
+        asyncio.create_task(model_registry.preload_hot_tenants())
+    except Exception as e:
+        logger.warning("ml_model_cache_init_failed", error=str(e))
+
+    # Sincroniza o índice de código do suporte em background (não bloqueia o startup)
+    if settings.git_repo_path:
+        asyncio.create_task(get_code_index().warm_up())
+
     # Inicia o scheduler do BI Agent
     try:
         await bi_scheduler.start()
@@ -136,6 +161,13 @@ async def startup_event():
     except Exception as e:
         logger.warning("bi_scheduler_init_failed", error=str(e))
 
+    # Agenda compactação periódica da base de conhecimento
+    if settings.kb_compaction_enabled:
+        try:
+            await knowledge_compaction_job.start()
+        except Exception as e:
+            logger.warning("kb_compaction_init_failed", error=str(e))
+
     print("[STARTUP] Serviço pronto!", flush=True)
 
 
@@ -155,6 +187,23 @@ async def shutdown_event():
     except Exception:
         pass
     
+    try:
+        await knowledge_compaction_job.stop()
+    except Exception:
+        pass
+    
+    try:
+        await get_model_registry().stop_invalidation_listener()
+    except Exception:
+        pass
+    
+    # Interrompe treinos em andamento e encerra o pool de processos
+    try:
+        from app.ml.training.executor import get_training_executor
+        get_training_executor().shutdown()
+    except Exception:
+        pass
+    
     logger.info("service_stopped")
 
 
@@ -11,6 +11,10 @@ Componentes:
 - server.py: MCP Server principal
 - permissions.py: Controle de acesso por agente/tenant
 - schemas.py: JSON Schemas das ferramentas
+- tool_cache.py: Cache TTL dos resultados de ferramentas read-only
+- tool_metrics.py: Agregados de latência/erros por ferramenta (Prometheus)
+- rate_limiter.py: Rate limit distribuído (token bucket Redis) por tenant/ferramenta
+- provider_router.py: Failover/hedge entre provedores de LLM
 - tools/: Implementação das ferramentas por domínio
 """
 
@@ -14,6 +14,9 @@ from datetime import datetime
 import structlog
 
 from app.config import get_settings
+from app.services.prompt_cache import prefix_fingerprint, extract_cache_usage, prompt_cache_stats
+from app.services.single_flight import coalesced_call, single_flight
+from mcp.provider_router import ProviderRouter, get_provider_router
 
 logger = structlog.get_logger()
 settings = get_settings()
@@ -127,6 +130,11 @@ class MCPLLMIntegration:
         
         # Obtém system prompt
         system_prompt = self.mcp_server.get_system_prompt(config.agent_type)
+
+        # Tools + system prompt formam o prefixo estável (cacheado pelo provedor);
+        # tudo que varia por chamada vai nas mensagens
+        prefix_version = prefix_fingerprint(tools, system_prompt)
+        usage_totals = {"input_tokens": 0, "cached_input_tokens": 0, "cache_write_tokens": 0, "output_tokens": 0}
         
         # Prepara mensagens
         messages = []
@@ -145,21 +153,14 @@ class MCPLLMIntegration:
         while iterations < max_iterations:
             iterations += 1
             
-            # Chama LLM
-            if self.provider == LLMProvider.ANTHROPIC:
-                response = await self._call_anthropic(
-                    system_prompt=system_prompt,
-                    messages=messages,
-                    tools=tools,
-                    config=config
-                )
-            else:
-                response = await self._call_openai(
-                    system_prompt=system_prompt,
-                    messages=messages,
-                    tools=tools,
-                    config=config
-                )
+            # Chama LLM (provedor escolhido pelo roteador: failover/hedge)
+            response = await self._call_llm(system_prompt, messages, tools, config, prefix_version)
+
+            call_usage = response.get("usage") or {}
+            for key in usage_totals:
+                usage_totals[key] += call_usage.get(key, 0)
+            if call_usage:
+                prompt_cache_stats.record(f"mcp_{response['provider']}", prefix_version, call_usage)
             
             # Verifica se há tool calls
             if not response.get("tool_calls"):
@@ -168,36 +169,40 @@ class MCPLLMIntegration:
                     "response": response.get("content", ""),
                     "tool_calls_made": tool_calls_made,
                     "iterations": iterations,
-                    "finished": True
+                    "finished": True,
+                    "usage": usage_totals,
+                    "prompt_prefix_version": prefix_version,
+                    "provider": response["provider"],
+                    "model": response["model"]
                 }
             
-            # Executa tool calls
+            # Executa tool calls (read-only em paralelo, demais em sequência)
             for tool_call in response["tool_calls"]:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["arguments"]
-                
                 logger.info("Executing tool call",
-                    tool=tool_name,
+                    tool=tool_call["name"],
                     agent_type=config.agent_type,
                     tenant_id=config.tenant_id
                 )
                 
                 # Adiciona tenant_id se não estiver nos argumentos
-                if "tenant_id" not in tool_args:
-                    tool_args["tenant_id"] = config.tenant_id
-                
-                # Executa via MCP Server
-                result = await self.mcp_server.call_tool(
-                    name=tool_name,
-                    arguments=tool_args,
-                    tenant_id=config.tenant_id,
-                    agent_type=config.agent_type
-                )
+                if "tenant_id" not in tool_call["arguments"]:
+                    tool_call["arguments"]["tenant_id"] = config.tenant_id
+            
+            results = await self.mcp_server.call_tools(
+                calls=response["tool_calls"],
+                tenant_id=config.tenant_id,
+                agent_type=config.agent_type
+            )
+            
+            # Resultados entram na conversa na ordem em que o LLM pediu
+            for tool_call, result in zip(response["tool_calls"], results):
+                tool_name = tool_call["name"]
+                tool_args = tool_call["arguments"]
                 
                 tool_calls_made.append({
                     "tool": tool_name,
                     "arguments": tool_args,
-                    "result": result.result if result.success else {"error": result.error},
+                    "result": result.result if result.success else result.error_payload(),
                     "success": result.success,
                     "execution_time_ms": result.execution_time_ms
                 })
@@ -212,7 +217,7 @@ class MCPLLMIntegration:
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tool_call.get("id", tool_name),
-                    "content": json.dumps(result.result if result.success else {"error": result.error})
+                    "content": json.dumps(result.result if result.success else result.error_payload())
                 })
         
         # Limite de iterações atingido
@@ -220,29 +225,98 @@ class MCPLLMIntegration:
             "response": "Limite de iterações atingido",
             "tool_calls_made": tool_calls_made,
             "iterations": iterations,
-            "finished": False
+            "finished": False,
+            "usage": usage_totals,
+            "prompt_prefix_version": prefix_version
         }
     
+    async def _call_llm(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        config: AgentConfig,
+        prefix_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa uma rodada no LLM via ProviderRouter: o provedor da integração
+        é o primário; em 5xx/429/timeout a chamada segue para o próximo
+        provedor configurado. Agentes em settings.llm_hedge_agent_types
+        (sensíveis a latência) recebem hedge no segundo provedor.
+        """
+        async def call(provider: str, model: str) -> Dict[str, Any]:
+            if provider == LLMProvider.ANTHROPIC.value:
+                return await self._call_anthropic(system_prompt, messages, tools, config, model=model)
+            return await self._call_openai(
+                system_prompt, messages, tools, config,
+                prefix_version=prefix_version, model=model
+            )
+
+        hedge_types = {t.strip() for t in settings.llm_hedge_agent_types.split(",") if t.strip()}
+        return await get_provider_router().call(
+            self.provider.value,
+            config.model,
+            call,
+            hedge=config.agent_type in hedge_types
+        )
+
+    @staticmethod
+    def _tool_schema(tool: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        JSON Schema dos parâmetros de uma tool MCP, igual para os dois
+        provedores (Anthropic exige objeto com "properties").
+        """
+        schema = dict(tool.get("parameters") or {})
+        schema.setdefault("type", "object")
+        schema.setdefault("properties", {})
+        return schema
+
+    def _to_anthropic_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": tool["name"],
+                "description": tool.get("description", ""),
+                "input_schema": self._tool_schema(tool)
+            }
+            for tool in tools
+        ]
+
+    def _to_openai_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool["name"],
+                    "description": tool.get("description", ""),
+                    "parameters": self._tool_schema(tool)
+                }
+            }
+            for tool in tools
+        ]
+
     async def _call_anthropic(
         self,
         system_prompt: str,
         messages: List[Dict[str, Any]],
         tools: List[Dict[str, Any]],
-        config: AgentConfig
+        config: AgentConfig,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Chama a API do Claude."""
+        """
+        Chama a API do Claude.
+
+        Breakpoints de cache (máx. 4 por requisição):
+        1. última tool  -> cacheia a lista de ferramentas
+        2. system       -> cacheia tools + system prompt
+        3. última mensagem -> cacheia a conversa acumulada no loop de tools
+        """
         try:
             client = await self.get_anthropic_client()
             
             # Converte tools para formato Anthropic
-            anthropic_tools = [
-                {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "input_schema": tool["parameters"]
-                }
-                for tool in tools
-            ]
+            anthropic_tools = self._to_anthropic_tools(tools)
+            if anthropic_tools:
+                anthropic_tools[-1] = {**anthropic_tools[-1], "cache_control": {"type": "ephemeral"}}
             
             # Converte mensagens para formato Anthropic
             anthropic_messages = []
@@ -277,10 +351,18 @@ class MCPLLMIntegration:
                         "content": msg["content"] or ""
                     })
             
-            response = await client.messages.create(
-                model=config.model,
+            self._add_message_cache_breakpoint(anthropic_messages)
+
+            response = await coalesced_call(
+                client.messages.create, "mcp_anthropic",
+                tenant_id=config.tenant_id,
+                model=model or config.model,
                 max_tokens=config.max_tokens,
-                system=system_prompt,
+                system=[{
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }],
                 messages=anthropic_messages,
                 tools=anthropic_tools if tools else None,
                 temperature=config.temperature
@@ -292,47 +374,59 @@ class MCPLLMIntegration:
             
             for block in response.content:
                 if block.type == "text":
-                    content = block.text
+                    content += block.text
                 elif block.type == "tool_use":
                     tool_calls.append({
                         "id": block.id,
                         "name": block.name,
-                        "arguments": block.input
+                        "arguments": dict(block.input or {})
                     })
             
             return {
                 "content": content,
                 "tool_calls": tool_calls if tool_calls else None,
-                "stop_reason": response.stop_reason
+                "stop_reason": response.stop_reason,
+                "usage": extract_cache_usage(getattr(response, "usage", None))
             }
             
         except Exception as e:
             logger.error("Error calling Anthropic", error=str(e))
             raise
+
+    def _add_message_cache_breakpoint(self, anthropic_messages: List[Dict[str, Any]]) -> None:
+        """Marca o último bloco da última mensagem como fim do prefixo cacheável."""
+        if not anthropic_messages:
+            return
+        last = anthropic_messages[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            if not content:
+                return
+            content = [{"type": "text", "text": content}]
+        else:
+            content = list(content)
+        content[-1] = {**content[-1], "cache_control": {"type": "ephemeral"}}
+        anthropic_messages[-1] = {**last, "content": content}
     
     async def _call_openai(
         self,
         system_prompt: str,
         messages: List[Dict[str, Any]],
         tools: List[Dict[str, Any]],
-        config: AgentConfig
+        config: AgentConfig,
+        prefix_version: Optional[str] = None,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Chama a API da OpenAI."""
+        """
+        Chama a API da OpenAI.
+        O cache de prefixo é automático; prompt_cache_key agrupa as chamadas
+        com o mesmo prefixo no mesmo cache.
+        """
         try:
             client = await self.get_openai_client()
             
             # Converte tools para formato OpenAI
-            openai_tools = [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": tool["name"],
-                        "description": tool["description"],
-                        "parameters": tool["parameters"]
-                    }
-                }
-                for tool in tools
-            ]
+            openai_tools = self._to_openai_tools(tools)
             
             # Prepara mensagens
             openai_messages = [
@@ -368,12 +462,15 @@ class MCPLLMIntegration:
                         "content": msg["content"] or ""
                     })
             
-            response = await client.chat.completions.create(
-                model=config.model.replace("claude", "gpt-4"),  # Ajusta modelo
+            response = await coalesced_call(
+                client.chat.completions.create, "mcp_openai",
+                tenant_id=config.tenant_id,
+                model=model or ProviderRouter.model_for(LLMProvider.OPENAI.value, config.model),
                 messages=openai_messages,
                 tools=openai_tools if tools else None,
                 temperature=config.temperature,
-                max_tokens=config.max_tokens
+                max_tokens=config.max_tokens,
+                extra_body={"prompt_cache_key": prefix_version} if prefix_version else None
             )
             
             choice = response.choices[0]
@@ -382,16 +479,21 @@ class MCPLLMIntegration:
             tool_calls = []
             if choice.message.tool_calls:
                 for tc in choice.message.tool_calls:
+                    try:
+                        arguments = json.loads(tc.function.arguments or "{}")
+                    except json.JSONDecodeError:
+                        arguments = {}
                     tool_calls.append({
                         "id": tc.id,
                         "name": tc.function.name,
-                        "arguments": json.loads(tc.function.arguments)
+                        "arguments": arguments
                     })
             
             return {
                 "content": choice.message.content or "",
                 "tool_calls": tool_calls if tool_calls else None,
-                "stop_reason": choice.finish_reason
+                "stop_reason": choice.finish_reason,
+                "usage": extract_cache_usage(getattr(response, "usage", None))
             }
             
         except Exception as e:
@@ -723,6 +825,7 @@ Passos:
 def create_mcp_router():
     """Cria router FastAPI para endpoints MCP."""
     from fastapi import APIRouter, HTTPException
+    from fastapi.responses import PlainTextResponse
     from pydantic import BaseModel
     
     router = APIRouter(prefix="/mcp", tags=["MCP"])
@@ -821,6 +924,23 @@ def create_mcp_router():
             logger.error("Error listing tools", error=str(e))
             raise HTTPException(status_code=500, detail=str(e))
     
+    @router.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        """Métricas das ferramentas no formato de exposição do Prometheus."""
+        from mcp.server import get_mcp_server
+        
+        return PlainTextResponse(
+            get_mcp_server().render_metrics(),
+            media_type="text/plain; version=0.0.4"
+        )
+    
+    @router.get("/calls/recent")
+    async def get_recent_calls(limit: int = 100):
+        """Últimas chamadas de ferramentas (buffer circular em memória)."""
+        from mcp.server import get_mcp_server
+        
+        return {"calls": get_mcp_server().get_recent_calls(limit)}
+    
     @router.get("/stats")
     async def get_stats():
         """Retorna estatísticas do MCP Server."""
@@ -828,7 +948,12 @@ def create_mcp_router():
             from mcp.server import get_mcp_server
             
             server = get_mcp_server()
-            return server.get_stats()
+            return {
+                **server.get_stats(),
+                "prompt_cache": prompt_cache_stats.get_stats(),
+                "single_flight": single_flight.get_stats(),
+                "provider_router": get_provider_router().get_stats(),
+            }
             
         except Exception as e:
             logger.error("Error getting stats", error=str(e))
@@ -9,6 +9,7 @@ from dataclasses import dataclass
 import structlog
 
 from app.config import get_settings
+from mcp.rate_limiter import RateLimitDecision, RateLimitRule, get_rate_limiter
 
 logger = structlog.get_logger()
 settings = get_settings()
@@ -21,6 +22,7 @@ class PermissionResult:
     reason: Optional[str] = None
     requires_approval: bool = False
     approval_id: Optional[str] = None
+    retry_after: Optional[float] = None  # Segundos até liberar (rate limit)
 
 
 class MCPPermissions:
@@ -208,7 +210,9 @@ class MCPPermissions:
         'deploy_production',
     }
     
-    # Limites de chamadas por minuto por ferramenta
+    # Limites de chamadas por minuto por ferramenta (token bucket no Redis).
+    # O tenant pode sobrescrever em metadata.mcp_permissions.rate_limits:
+    #   {"send_message": 60} ou {"send_message": {"per_minute": 60, "burst": 20}}
     RATE_LIMITS = {
         'send_message': 30,       # Max 30 mensagens/minuto
         'create_campaign': 5,     # Max 5 campanhas/minuto
@@ -218,7 +222,7 @@ class MCPPermissions:
     def __init__(self):
         self._db_engine = None
         self._pending_approvals: Dict[str, dict] = {}
-        self._call_counts: Dict[str, Dict[str, int]] = {}  # tenant -> tool -> count
+        self._rate_limiter = get_rate_limiter()
     
     async def get_db_engine(self):
         """Lazy loading do engine do banco."""
@@ -287,10 +291,12 @@ class MCPPermissions:
                 )
         
         # Verifica rate limit
-        if not await self._check_rate_limit(tenant_id, tool_name):
+        rate_limit = await self._check_rate_limit(tenant_id, tool_name, tenant_permissions)
+        if not rate_limit.allowed:
             return PermissionResult(
                 allowed=False,
-                reason=f"Rate limit excedido para '{tool_name}'"
+                reason=f"Rate limit excedido para '{tool_name}', tente novamente em {rate_limit.retry_after}s",
+                retry_after=rate_limit.retry_after
             )
         
         # Verifica se precisa aprovação
@@ -336,36 +342,47 @@ class MCPPermissions:
             logger.error("Error getting tenant permissions", error=str(e))
             return None
     
-    async def _check_rate_limit(self, tenant_id: str, tool_name: str) -> bool:
-        """Verifica rate limit para uma ferramenta."""
-        if tool_name not in self.RATE_LIMITS:
-            return True
-        
-        limit = self.RATE_LIMITS[tool_name]
-        
-        # Inicializa contador se necessário
-        if tenant_id not in self._call_counts:
-            self._call_counts[tenant_id] = {}
-        
-        if tool_name not in self._call_counts[tenant_id]:
-            self._call_counts[tenant_id][tool_name] = 0
-        
-        # Verifica limite
-        if self._call_counts[tenant_id][tool_name] >= limit:
-            return False
-        
-        # Incrementa contador
-        self._call_counts[tenant_id][tool_name] += 1
-        
-        return True
-    
+    @classmethod
+    def get_rate_limit_rule(
+        cls,
+        tool_name: str,
+        tenant_permissions: Optional[Dict[str, Any]] = None
+    ) -> Optional[RateLimitRule]:
+        """Quota da ferramenta (override do tenant ou padrão)."""
+        overrides = (tenant_permissions or {}).get('rate_limits') or {}
+        value = overrides.get(tool_name, cls.RATE_LIMITS.get(tool_name))
+        if value is None:
+            return None
+        try:
+            return RateLimitRule.parse(value)
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Invalid rate limit override", tool=tool_name, value=value)
+            return RateLimitRule.parse(cls.RATE_LIMITS[tool_name]) if tool_name in cls.RATE_LIMITS else None
+
+    async def _check_rate_limit(
+        self,
+        tenant_id: str,
+        tool_name: str,
+        tenant_permissions: Optional[Dict[str, Any]] = None
+    ) -> RateLimitDecision:
+        """Verifica rate limit para uma ferramenta (compartilhado entre réplicas)."""
+        rule = self.get_rate_limit_rule(tool_name, tenant_permissions)
+        if rule is None:
+            return RateLimitDecision(allowed=True)
+
+        decision = await self._rate_limiter.acquire(tenant_id, tool_name, rule)
+        if not decision.allowed:
+            logger.warning("Rate limit exceeded",
+                tool=tool_name,
+                tenant_id=tenant_id,
+                retry_after=decision.retry_after
+            )
+        return decision
+
     def reset_rate_limits(self, tenant_id: str = None) -> None:
-        """Reseta contadores de rate limit."""
-        if tenant_id:
-            self._call_counts.pop(tenant_id, None)
-        else:
-            self._call_counts.clear()
-    
+        """Reseta o estado local de rate limit (os buckets no Redis expiram sozinhos)."""
+        self._rate_limiter.reset_local(tenant_id)
+
     async def request_approval(
         self,
         tool_name: str,
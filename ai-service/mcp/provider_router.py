@@ -0,0 +1,316 @@
+"""
+Roteamento de provedores de LLM (latência, hedge e failover).
+
+Mantém, por provedor + modelo, uma janela de latências e erros recentes e
+um circuit breaker. O MCPLLMIntegration pede ao roteador a ordem dos
+provedores e executa cada chamada através dele:
+
+- failover: erro 5xx/429/timeout/conexão passa para o próximo provedor;
+  falhas consecutivas abrem o circuito do provedor por um tempo
+- hedge (agentes sensíveis a latência, ex.: SDR): se o primário não
+  respondeu depois do percentil configurado da sua latência, dispara a
+  mesma chamada no segundo provedor; a primeira resposta válida vence e a
+  outra é cancelada
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# Status HTTP que indicam degradação do provedor (vale tentar outro)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Erros de provedor (5xx, 429, timeout, conexão) vs. erros da requisição (4xx)."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # APITimeoutError / APIConnectionError (openai e anthropic)
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+class CircuitOpenError(ConnectionError):
+    """Circuito aberto (ou chamada de teste já em andamento): tenta o próximo provedor."""
+
+
+class ProviderStats:
+    """Janela móvel de latências/erros e circuit breaker de um provedor + modelo."""
+
+    def __init__(self, window: int):
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        # Meio-aberto: já existe uma chamada de teste em andamento
+        self.probing = False
+
+    def record(self, latency_ms: Optional[float], ok: bool) -> None:
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies_ms.append(latency_ms)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+        else:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= settings.llm_circuit_failure_threshold:
+                self.open_until = time.monotonic() + settings.llm_circuit_open_seconds
+
+    def record_latency(self, latency_ms: float) -> None:
+        """Latência sem desfecho (chamada cancelada): entra como limite inferior."""
+        self.latencies_ms.append(latency_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies_ms) < settings.llm_hedge_min_samples:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies_ms, dtype=np.float64), q))
+
+    @property
+    def circuit(self) -> str:
+        if not self.open_until:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    @property
+    def available(self) -> bool:
+        circuit = self.circuit
+        return circuit == "closed" or (circuit == "half_open" and not self.probing)
+
+    def try_acquire(self) -> Tuple[bool, bool]:
+        """
+        Reserva a chamada. Meio-aberto libera uma única chamada de teste:
+        verificar e marcar acontece no mesmo passo (sem await no meio), então
+        requisições concorrentes não passam todas como "a" chamada de teste.
+
+        Returns: (liberada, é a chamada de teste)
+        """
+        circuit = self.circuit
+        if circuit == "closed":
+            return True, False
+        if circuit == "open" or self.probing:
+            return False, False
+        self.probing = True
+        return True, True
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = np.fromiter(self.latencies_ms, dtype=np.float64)
+        errors = self.outcomes.count(False)
+        return {
+            "samples": len(self.outcomes),
+            "error_rate": round(errors / len(self.outcomes), 4) if self.outcomes else 0.0,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+            "p99_ms": round(float(np.percentile(latencies, 99)), 1) if len(latencies) else None,
+            "circuit": self.circuit,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+# (provider, model) -> resposta normalizada
+ProviderCall = Callable[[str, str], Awaitable[Dict[str, Any]]]
+
+
+class ProviderRouter:
+    """Escolhe o provedor, aplica hedge/failover e acumula estatísticas."""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], ProviderStats] = {}
+        self._counters = {"calls": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _get(self, provider: str, model: str) -> ProviderStats:
+        key = (provider, model)
+        if key not in self._stats:
+            self._stats[key] = ProviderStats(settings.llm_stats_window)
+        return self._stats[key]
+
+    @staticmethod
+    def configured_providers() -> List[str]:
+        """Provedores habilitados e com credencial, na ordem de preferência."""
+        keys = {"anthropic": settings.anthropic_api_key, "openai": settings.openai_api_key}
+        order = [p.strip() for p in settings.llm_failover_providers.split(",") if p.strip()]
+        return [p for p in order if keys.get(p)]
+
+    @staticmethod
+    def model_for(provider: str, requested: str) -> str:
+        """Modelo do pedido se for do provedor; senão o equivalente configurado."""
+        if provider == "anthropic":
+            return requested if requested.startswith("claude") else settings.anthropic_model
+        if requested.startswith(("gpt", "o1", "o3", "o4")):
+            return requested
+        return settings.llm_failover_openai_model
+
+    def plan(self, primary: str, requested_model: str) -> List[Tuple[str, str]]:
+        """Ordem de tentativa: primário primeiro, depois os demais configurados."""
+        providers = [primary]
+        if settings.llm_failover_enabled:
+            providers += [p for p in self.configured_providers() if p != primary]
+        return [(p, self.model_for(p, requested_model)) for p in providers]
+
+    def hedge_delay_ms(self, provider: str, model: str) -> float:
+        observed = self._get(provider, model).percentile(settings.llm_hedge_percentile)
+        if observed is None:
+            return float(settings.llm_hedge_default_delay_ms)
+        return max(float(settings.llm_hedge_min_delay_ms), observed)
+
+    async def _attempt(
+        self,
+        provider: str,
+        model: str,
+        call: ProviderCall,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        stats = self._get(provider, model)
+        allowed, probe = stats.try_acquire()
+        if not allowed and not force:
+            raise CircuitOpenError(f"circuit open for {provider}:{model}")
+
+        started = time.perf_counter()
+        try:
+            result = await call(provider, model)
+        except asyncio.CancelledError:
+            # Perdedor do hedge: o tempo decorrido é um limite inferior da
+            # latência. Sem ele a janela só guardaria as chamadas rápidas e o
+            # atraso de hedge (percentil) cairia a cada hedge disparado.
+            stats.record_latency((time.perf_counter() - started) * 1000)
+            raise
+        except Exception as e:
+            if is_retryable_error(e):
+                stats.record(None, ok=False)
+            raise
+        finally:
+            if probe:
+                stats.probing = False
+        stats.record((time.perf_counter() - started) * 1000, ok=True)
+        result["provider"] = provider
+        result["model"] = model
+        return result
+
+    async def call(
+        self,
+        primary: str,
+        requested_model: str,
+        call: ProviderCall,
+        hedge: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Executa a chamada com failover (e hedge, se pedido).
+        Erros não recuperáveis (ex.: 400) sobem imediatamente.
+        """
+        self._counters["calls"] += 1
+        candidates = [(p, m) for p, m in self.plan(primary, requested_model) if self._get(p, m).available]
+        if not candidates:
+            # Todos os circuitos abertos: tenta o primário mesmo assim
+            provider, model = self.plan(primary, requested_model)[0]
+            return await self._attempt(provider, model, call, force=True)
+
+        if hedge and len(candidates) >= 2:
+            return await self._hedged(candidates[0], candidates[1], candidates[2:], call)
+
+        last_error: Optional[BaseException] = None
+        for i, (provider, model) in enumerate(candidates):
+            if i > 0:
+                self._counters["failovers"] += 1
+                logger.warning("llm_failover", to_provider=provider, model=model, error=str(last_error))
+            try:
+                return await self._attempt(provider, model, call)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+                last_error = e
+        raise last_error
+
+    async def _hedged(
+        self,
+        first: Tuple[str, str],
+        second: Tuple[str, str],
+        rest: List[Tuple[str, str]],
+        call: ProviderCall
+    ) -> Dict[str, Any]:
+        """
+        Primário; após o atraso de hedge, também o secundário. Vence o
+        primeiro válido: um erro não recuperável de um lado não cancela o
+        outro enquanto ele ainda pode responder.
+        """
+        delay = self.hedge_delay_ms(*first) / 1000
+        tasks = {asyncio.ensure_future(self._attempt(*first, call)): first}
+        errors: List[BaseException] = []
+        hedged = False
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                task = next(iter(done))
+                if task.exception() is None:
+                    return task.result()
+                # Primário falhou antes do atraso: failover imediato
+                errors.append(task.exception())
+                if not is_retryable_error(errors[-1]):
+                    raise errors[-1]
+                self._counters["failovers"] += 1
+            else:
+                hedged = True
+                self._counters["hedges"] += 1
+                logger.info("llm_hedge_sent", primary=first[0], secondary=second[0], delay_ms=round(delay * 1000))
+            tasks[asyncio.ensure_future(self._attempt(*second, call))] = second
+
+            pending = {t for t in tasks if not t.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedged and tasks[task] == second:
+                            self._counters["hedge_wins"] += 1
+                        return task.result()
+                    errors.append(task.exception())
+        finally:
+            # Cancela o perdedor (ou o que ainda estiver em andamento)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        # Ambos falharam: erro da requisição sobe; senão segue em failover
+        # sequencial pelos restantes
+        for error in errors:
+            if not is_retryable_error(error):
+                raise error
+        for provider, model in rest:
+            self._counters["failovers"] += 1
+            try:
+                return await self._attempt(provider, model, call)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+                errors.append(e)
+        raise errors[-1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "providers": {
+                f"{provider}:{model}": stats.to_dict()
+                for (provider, model), stats in self._stats.items()
+            },
+        }
+
+
+_provider_router: Optional[ProviderRouter] = None
+
+
+def get_provider_router() -> ProviderRouter:
+    """Roteador compartilhado (as estatísticas valem para todas as integrações)."""
+    global _provider_router
+    if _provider_router is None:
+        _provider_router = ProviderRouter()
+    return _provider_router
@@ -0,0 +1,220 @@
+"""
+Rate limit distribuído das ferramentas MCP.
+
+Token bucket por (tenant, ferramenta) no Redis, atualizado atomicamente
+por um script Lua, compartilhado por todas as réplicas:
+
+- taxa: N chamadas por minuto (MCPPermissions.RATE_LIMITS ou override do
+  tenant em metadata.mcp_permissions.rate_limits)
+- burst: capacidade do bucket (por padrão N * mcp_rate_limit_burst_ratio)
+- Retry-After: quando negado, o script devolve em quantos segundos haverá
+  token disponível
+
+Pré-checagem local: quando o bucket está com folga (mais da metade cheio),
+o script concede junto um pequeno lote de tokens ("lease") que o processo
+gasta localmente sem ir ao Redis. Tokens do lease não usados expiram, então
+o limite global nunca é ultrapassado.
+
+Sem Redis, cai para um token bucket em memória (limite por processo).
+"""
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import redis.asyncio as redis
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# KEYS[1] = bucket; ARGV = taxa (tokens/s), capacidade, custo, lease máximo
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local max_lease = tonumber(ARGV[4])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local lease = 0
+local retry_after = 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+    if max_lease > 0 and tokens > capacity / 2 then
+        lease = math.min(max_lease, math.floor(tokens - capacity / 2))
+        tokens = tokens - lease
+    end
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, lease, tostring(tokens), tostring(retry_after)}
+"""
+
+
+@dataclass
+class RateLimitRule:
+    """Quota de uma ferramenta: taxa por minuto e capacidade (burst)."""
+    per_minute: float
+    burst: Optional[float] = None
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+    @property
+    def capacity(self) -> float:
+        if self.burst is not None:
+            return max(1.0, float(self.burst))
+        return max(1.0, math.ceil(self.per_minute * settings.mcp_rate_limit_burst_ratio))
+
+    @classmethod
+    def parse(cls, value: Any) -> "RateLimitRule":
+        """Aceita 30 ou {"per_minute": 30, "burst": 10}."""
+        if isinstance(value, dict):
+            return cls(per_minute=float(value["per_minute"]), burst=value.get("burst"))
+        return cls(per_minute=float(value))
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    retry_after: Optional[float] = None
+    source: str = "redis"  # redis | lease | local
+
+
+class ToolRateLimiter:
+    """Token bucket distribuído (Redis + Lua) com lease local."""
+
+    KEY_PREFIX = "mcp:ratelimit"
+
+    def __init__(self):
+        self._redis: Optional[redis.Redis] = None
+        self._script = None
+        self._retry_redis_at = 0.0
+        # (tenant, tool) -> (tokens, expira_em) concedidos pelo Redis
+        self._leases: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        # Fallback sem Redis: (tenant, tool) -> (tokens, ts)
+        self._local: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._stats = {"allowed": 0, "denied": 0, "lease_hits": 0, "redis_calls": 0, "local_fallback": 0}
+
+    async def _get_redis(self) -> Optional[redis.Redis]:
+        if self._redis is not None:
+            return self._redis
+        if time.monotonic() < self._retry_redis_at:
+            return None
+        try:
+            redis_url = settings.redis_url or f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
+            client = redis.from_url(redis_url, decode_responses=True)
+            await client.ping()
+            self._script = client.register_script(TOKEN_BUCKET_LUA)
+            self._redis = client
+            logger.info("mcp_rate_limiter_connected", url=redis_url)
+        except Exception as e:
+            # Não tenta reconectar a cada chamada
+            self._retry_redis_at = time.monotonic() + 30
+            logger.warning("mcp_rate_limiter_redis_unavailable", error=str(e))
+        return self._redis
+
+    def _take_lease(self, key: Tuple[str, str]) -> bool:
+        lease = self._leases.get(key)
+        if not lease:
+            return False
+        tokens, expires_at = lease
+        if tokens <= 0 or time.monotonic() >= expires_at:
+            self._leases.pop(key, None)
+            return False
+        self._leases[key] = (tokens - 1, expires_at)
+        return True
+
+    async def acquire(self, tenant_id: str, tool_name: str, rule: RateLimitRule) -> RateLimitDecision:
+        """Consome um token do bucket (tenant, ferramenta)."""
+        key = (str(tenant_id), tool_name)
+
+        if self._take_lease(key):
+            self._stats["lease_hits"] += 1
+            self._stats["allowed"] += 1
+            return RateLimitDecision(allowed=True, source="lease")
+
+        client = await self._get_redis()
+        if client is not None:
+            try:
+                decision = await self._acquire_redis(key, rule)
+            except Exception as e:
+                logger.warning("mcp_rate_limiter_redis_error", error=str(e))
+                self._redis = None
+                self._retry_redis_at = time.monotonic() + 30
+                decision = self._acquire_local(key, rule)
+        else:
+            decision = self._acquire_local(key, rule)
+
+        self._stats["allowed" if decision.allowed else "denied"] += 1
+        return decision
+
+    async def _acquire_redis(self, key: Tuple[str, str], rule: RateLimitRule) -> RateLimitDecision:
+        self._stats["redis_calls"] += 1
+        max_lease = max(0, settings.mcp_rate_limit_local_lease)
+        allowed, lease, _, retry_after = await self._script(
+            keys=[f"{self.KEY_PREFIX}:{key[0]}:{key[1]}"],
+            args=[rule.rate, rule.capacity, 1, max_lease]
+        )
+        if int(lease) > 0:
+            self._leases[key] = (int(lease), time.monotonic() + settings.mcp_rate_limit_lease_seconds)
+        if int(allowed):
+            return RateLimitDecision(allowed=True)
+        return RateLimitDecision(allowed=False, retry_after=round(float(retry_after), 2))
+
+    def _acquire_local(self, key: Tuple[str, str], rule: RateLimitRule) -> RateLimitDecision:
+        """Mesmo algoritmo do script Lua, em memória (sem Redis)."""
+        self._stats["local_fallback"] += 1
+        now = time.monotonic()
+        tokens, ts = self._local.get(key, (rule.capacity, now))
+        tokens = min(rule.capacity, tokens + (now - ts) * rule.rate)
+        if tokens >= 1:
+            self._local[key] = (tokens - 1, now)
+            return RateLimitDecision(allowed=True, source="local")
+        self._local[key] = (tokens, now)
+        return RateLimitDecision(allowed=False, retry_after=round((1 - tokens) / rule.rate, 2), source="local")
+
+    def reset_local(self, tenant_id: Optional[str] = None) -> None:
+        """Descarta leases e buckets locais (o estado no Redis expira sozinho)."""
+        for store in (self._leases, self._local):
+            for key in list(store):
+                if tenant_id is None or key[0] == str(tenant_id):
+                    del store[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "redis_connected": self._redis is not None,
+            "active_leases": len(self._leases),
+        }
+
+
+_rate_limiter: Optional[ToolRateLimiter] = None
+
+
+def get_rate_limiter() -> ToolRateLimiter:
+    """Retorna o rate limiter compartilhado do processo."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = ToolRateLimiter()
+    return _rate_limiter
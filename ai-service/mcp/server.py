@@ -8,12 +8,18 @@ O LLM pode chamar qualquer ferramenta registrada via protocolo MCP (JSON-RPC).
 """
 import json
 import asyncio
-from typing import Dict, Any, List, Optional, Callable, Awaitable
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Deque
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
 import structlog
 
 from app.config import get_settings
+from mcp.permissions import MCPPermissions
+from mcp.rate_limiter import get_rate_limiter
+from mcp.tool_cache import CACHE_MISS, ToolCachePolicy, ToolResultCache
+from mcp.tool_metrics import ToolCallMetrics
 
 logger = structlog.get_logger()
 settings = get_settings()
@@ -40,6 +46,8 @@ class ToolDefinition:
     category: str = "general"
     requires_approval: bool = False
     dangerous: bool = False
+    read_only: bool = False  # Sem efeitos colaterais: pode rodar em paralelo
+    cache: Optional[ToolCachePolicy] = None  # Só para ferramentas read_only
     
     def to_schema(self) -> Dict[str, Any]:
         """Converte para JSON Schema (formato OpenAI/Anthropic)."""
@@ -91,6 +99,15 @@ class ToolResult:
     result: Any
     error: Optional[str] = None
     execution_time_ms: int = 0
+    cached: bool = False
+    retry_after: Optional[float] = None  # Segundos até o rate limit liberar
+
+    def error_payload(self) -> Dict[str, Any]:
+        """Erro no formato devolvido ao LLM no loop do agente."""
+        payload: Dict[str, Any] = {"error": self.error}
+        if self.retry_after is not None:
+            payload["retry_after_seconds"] = self.retry_after
+        return payload
 
 
 class CRMMCPServer:
@@ -115,7 +132,12 @@ class CRMMCPServer:
         self._tools: Dict[str, ToolDefinition] = {}
         self._categories: Dict[str, List[str]] = {}
         self._permissions = None  # Lazy load
-        self._call_history: List[ToolCall] = []
+        # Últimas chamadas (buffer circular); agregados ficam em _metrics
+        self._call_history: Deque[ToolCall] = deque(maxlen=settings.mcp_call_history_size)
+        self._metrics = ToolCallMetrics()
+        self._tool_cache = ToolResultCache()
+        # Ferramenta que altera dados -> ferramentas cacheadas que ela invalida
+        self._invalidations: Dict[str, List[str]] = {}
         
         logger.info("MCP Server initialized", name=self.name, version=self.version)
     
@@ -127,7 +149,9 @@ class CRMMCPServer:
         handler: Callable[..., Awaitable[Dict[str, Any]]],
         category: str = "general",
         requires_approval: bool = False,
-        dangerous: bool = False
+        dangerous: bool = False,
+        read_only: bool = False,
+        cache: Optional[ToolCachePolicy] = None
     ) -> None:
         """
         Registra uma nova ferramenta no servidor MCP.
@@ -140,6 +164,8 @@ class CRMMCPServer:
             category: Categoria (sdr, ads, rag, ml, rl, memory)
             requires_approval: Se precisa aprovação humana
             dangerous: Se é uma operação perigosa (gastar dinheiro, deletar)
+            read_only: Se só lê dados (várias chamadas no mesmo turno rodam em paralelo)
+            cache: Política de cache do resultado (TTL, campos da chave, invalidadores)
         """
         tool = ToolDefinition(
             name=name,
@@ -148,9 +174,17 @@ class CRMMCPServer:
             handler=handler,
             category=category,
             requires_approval=requires_approval,
-            dangerous=dangerous
+            dangerous=dangerous,
+            read_only=read_only and not dangerous
         )
         
+        if cache and tool.read_only:
+            tool.cache = cache
+            for invalidator in cache.invalidated_by:
+                self._invalidations.setdefault(invalidator, []).append(name)
+        elif cache:
+            logger.warning("Tool cache ignored (tool is not read-only)", name=name)
+        
         self._tools[name] = tool
         
         # Agrupa por categoria
@@ -166,7 +200,8 @@ class CRMMCPServer:
         description: str = None,
         category: str = "general",
         requires_approval: bool = False,
-        dangerous: bool = False
+        dangerous: bool = False,
+        read_only: bool = False
     ):
         """
         Decorator para registrar ferramentas.
@@ -220,7 +255,8 @@ class CRMMCPServer:
                 handler=func,
                 category=category,
                 requires_approval=requires_approval,
-                dangerous=dangerous
+                dangerous=dangerous,
+                read_only=read_only
             )
             
             return func
@@ -247,7 +283,6 @@ class CRMMCPServer:
             ToolResult com o resultado ou erro
         """
         import uuid
-        import time
         
         call_id = str(uuid.uuid4())
         start_time = time.time()
@@ -269,6 +304,26 @@ class CRMMCPServer:
             call_id=call_id
         )
         
+        started = time.perf_counter()
+        result = await self._execute_call(call_id, name, arguments, tenant_id, agent_type, start_time)
+        self._metrics.record(
+            name, tenant_id, agent_type,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            success=result.success,
+            cached=result.cached
+        )
+        return result
+    
+    async def _execute_call(
+        self,
+        call_id: str,
+        name: str,
+        arguments: Dict[str, Any],
+        tenant_id: str,
+        agent_type: str,
+        start_time: float
+    ) -> ToolResult:
+        """Valida permissões, consulta o cache e executa o handler."""
         try:
             # Verifica se ferramenta existe
             if name not in self._tools:
@@ -281,20 +336,33 @@ class CRMMCPServer:
             
             tool = self._tools[name]
             
-            # Verifica permissões
+            # Verifica permissões (inclui o rate limit distribuído)
             if self._permissions:
-                allowed = await self._permissions.check_permission(
+                permission = await self._permissions.check_permission_detailed(
                     agent_type=agent_type,
                     tool_name=name,
                     tenant_id=tenant_id
                 )
-                if not allowed:
+                if not permission.allowed:
                     return ToolResult(
                         tool_call_id=call_id,
                         success=False,
                         result=None,
-                        error=f"Permission denied for tool '{name}'"
+                        error=permission.reason or f"Permission denied for tool '{name}'",
+                        retry_after=permission.retry_after
                     )
+            else:
+                rule = MCPPermissions.get_rate_limit_rule(name)
+                if rule is not None:
+                    decision = await get_rate_limiter().acquire(tenant_id, name, rule)
+                    if not decision.allowed:
+                        return ToolResult(
+                            tool_call_id=call_id,
+                            success=False,
+                            result=None,
+                            error=f"Rate limit excedido para '{name}', tente novamente em {decision.retry_after}s",
+                            retry_after=decision.retry_after
+                        )
             
             # Verifica se precisa aprovação
             if tool.requires_approval or tool.dangerous:
@@ -304,8 +372,28 @@ class CRMMCPServer:
                     dangerous=tool.dangerous
                 )
             
+            # Resultado em cache (ferramentas read-only com política de cache)
+            use_cache = tool.cache is not None and settings.mcp_tool_cache_enabled
+            if use_cache:
+                cached, generation = self._tool_cache.lookup(name, tool.cache, arguments, tenant_id)
+                if cached is not CACHE_MISS:
+                    logger.info("Tool call cache hit", tool=name, call_id=call_id)
+                    return ToolResult(
+                        tool_call_id=call_id,
+                        success=True,
+                        result=cached,
+                        execution_time_ms=int((time.time() - start_time) * 1000),
+                        cached=True
+                    )
+            
             # Executa a ferramenta
-            result = await tool.handler(**arguments)
+            try:
+                result = await tool.handler(**arguments)
+            finally:
+                self._invalidate_related(name, arguments, tenant_id)
+            
+            if use_cache and not (isinstance(result, dict) and result.get("error")):
+                self._tool_cache.store(name, tool.cache, arguments, tenant_id, result, generation)
             
             execution_time = int((time.time() - start_time) * 1000)
             
@@ -341,6 +429,58 @@ class CRMMCPServer:
                 execution_time_ms=execution_time
             )
     
+    def _invalidate_related(self, name: str, arguments: Dict[str, Any], tenant_id: str) -> None:
+        """Ferramentas que alteram dados limpam o cache das consultas relacionadas."""
+        for cached_tool in self._invalidations.get(name, []):
+            self._tool_cache.invalidate(cached_tool, arguments, tenant_id)
+
+    def is_read_only(self, name: str) -> bool:
+        tool = self._tools.get(name)
+        return bool(tool and tool.read_only)
+
+    async def call_tools(
+        self,
+        calls: List[Dict[str, Any]],
+        tenant_id: str,
+        agent_type: str = "unknown"
+    ) -> List[ToolResult]:
+        """
+        Executa as tool calls de um turno do LLM.
+
+        Chamadas read_only consecutivas rodam em paralelo (no máximo
+        settings.tool_call_concurrency ao mesmo tempo); qualquer outra
+        ferramenta é uma barreira: espera as anteriores e roda sozinha.
+        Os resultados voltam na mesma ordem das chamadas.
+
+        Args:
+            calls: Lista de {"name": ..., "arguments": {...}}
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.tool_call_concurrency))
+        results: List[Optional[ToolResult]] = [None] * len(calls)
+
+        async def run(index: int) -> None:
+            async with semaphore:
+                results[index] = await self.call_tool(
+                    name=calls[index]["name"],
+                    arguments=calls[index]["arguments"],
+                    tenant_id=tenant_id,
+                    agent_type=agent_type
+                )
+
+        batch: List[int] = []
+        for index, call in enumerate(calls):
+            if self.is_read_only(call["name"]):
+                batch.append(index)
+                continue
+            if batch:
+                await asyncio.gather(*(run(i) for i in batch))
+                batch = []
+            await run(index)
+        if batch:
+            await asyncio.gather(*(run(i) for i in batch))
+
+        return results
+
     def get_tools_for_agent(self, agent_type: str) -> List[Dict[str, Any]]:
         """
         Retorna lista de ferramentas disponíveis para um tipo de agente.
@@ -497,9 +637,32 @@ INSTRUÇÕES:
             "version": self.version,
             "total_tools": len(self._tools),
             "categories": self.get_categories(),
-            "total_calls": len(self._call_history),
-            "recent_calls": len([c for c in self._call_history[-100:]]),
+            "total_calls": self._metrics.total_calls,
+            "recent_calls": len(self._call_history),
+            "tool_calls": self._metrics.get_stats(),
+            "tool_cache": self._tool_cache.get_stats(),
+            "rate_limit": get_rate_limiter().get_stats(),
         }
+    
+    def get_recent_calls(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Últimas chamadas do buffer circular (mais recentes primeiro)."""
+        # limit em [1, tamanho do histórico]: 0 ou negativo fatiaria a lista errado
+        limit = max(1, min(limit, self._call_history.maxlen or len(self._call_history)))
+        calls = list(self._call_history)[-limit:]
+        return [
+            {
+                "id": c.id,
+                "tool": c.name,
+                "tenant_id": c.tenant_id,
+                "agent_type": c.agent_type,
+                "timestamp": c.timestamp.isoformat(),
+            }
+            for c in reversed(calls)
+        ]
+    
+    def render_metrics(self) -> str:
+        """Métricas das ferramentas no formato texto do Prometheus."""
+        return self._metrics.render_prometheus()
 
 
 # Singleton
@@ -0,0 +1,154 @@
+"""
+Cache de resultados de ferramentas MCP read-only.
+
+Ferramentas de consulta (contexto do lead, stats, diretrizes de marca,
+insights de campanha, modelo ativo, status do RL) são chamadas várias vezes
+no mesmo loop de agente e entre sessões do mesmo tenant. Cada ferramenta
+pode declarar uma ToolCachePolicy no registro:
+
+    server.register_tool(
+        name="get_lead_context", ...,
+        read_only=True,
+        cache=ToolCachePolicy(
+            ttl_seconds=60,
+            key_fields=["lead_id", "include_messages"],
+            invalidated_by=["move_lead_stage", "update_lead_memory"],
+        )
+    )
+
+O cache é em memória, por processo e sempre separado por tenant. Quando uma
+ferramenta listada em invalidated_by executa, as entradas relacionadas são
+removidas: as que têm os mesmos valores nos key_fields presentes nos
+argumentos da chamada, ou todas as do tenant se nenhum campo coincidir.
+"""
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+@dataclass
+class ToolCachePolicy:
+    """Política de cache de uma ferramenta read-only."""
+    ttl_seconds: int
+    key_fields: Optional[List[str]] = None  # None = todos os argumentos (exceto tenant_id)
+    invalidated_by: List[str] = field(default_factory=list)
+
+
+# Sentinela de cache miss (None é um resultado válido)
+CACHE_MISS = object()
+
+
+class ToolResultCache:
+    """Cache TTL + LRU de resultados de ferramentas, por tenant."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self._max_entries = max_entries
+        # (tenant_id, tool, key) -> (expira_em, campos da chave, resultado)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Dict[str, Any], Any]]" = OrderedDict()
+        # Geração por (tenant, tool): evita gravar resultado lido antes de uma invalidação
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries or settings.mcp_tool_cache_max_entries
+
+    def _tool_stats(self, tool: str) -> Dict[str, int]:
+        return self._stats.setdefault(tool, {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0})
+
+    @staticmethod
+    def _key_fields(policy: ToolCachePolicy, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if policy.key_fields is None:
+            return {k: v for k, v in arguments.items() if k != "tenant_id"}
+        return {k: arguments.get(k) for k in policy.key_fields}
+
+    def lookup(
+        self,
+        tool: str,
+        policy: ToolCachePolicy,
+        arguments: Dict[str, Any],
+        tenant_id: str
+    ) -> Tuple[Any, int]:
+        """
+        Returns:
+            (resultado ou CACHE_MISS, geração atual para passar ao store)
+        """
+        fields = self._key_fields(policy, arguments)
+        key = (tenant_id, tool, json.dumps(fields, sort_keys=True, default=str))
+        generation = self._generations.get((tenant_id, tool), 0)
+        stats = self._tool_stats(tool)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _, result = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return result, generation
+            del self._entries[key]
+
+        stats["misses"] += 1
+        return CACHE_MISS, generation
+
+    def store(
+        self,
+        tool: str,
+        policy: ToolCachePolicy,
+        arguments: Dict[str, Any],
+        tenant_id: str,
+        result: Any,
+        generation: int
+    ) -> None:
+        if self._generations.get((tenant_id, tool), 0) != generation:
+            return  # Invalidado enquanto a ferramenta executava
+        fields = self._key_fields(policy, arguments)
+        key = (tenant_id, tool, json.dumps(fields, sort_keys=True, default=str))
+        self._entries[key] = (time.monotonic() + policy.ttl_seconds, fields, result)
+        self._entries.move_to_end(key)
+        self._tool_stats(tool)["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tool: str, arguments: Dict[str, Any], tenant_id: str) -> int:
+        """
+        Remove as entradas de `tool` do tenant relacionadas aos argumentos
+        de uma ferramenta que altera dados.
+        """
+        self._generations[(tenant_id, tool)] = self._generations.get((tenant_id, tool), 0) + 1
+
+        removed = 0
+        for key in list(self._entries):
+            entry_tenant, entry_tool, _ = key
+            if entry_tenant != tenant_id or entry_tool != tool:
+                continue
+            fields = self._entries[key][1]
+            shared = [k for k in fields if k in arguments]
+            if all(fields[k] == arguments[k] for k in shared):
+                del self._entries[key]
+                removed += 1
+
+        if removed:
+            self._tool_stats(tool)["invalidations"] += removed
+            logger.debug("mcp_tool_cache_invalidated", tool=tool, tenant_id=tenant_id, entries=removed)
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        tools = {}
+        for tool, stats in self._stats.items():
+            lookups = stats["hits"] + stats["misses"]
+            tools[tool] = {**stats, "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0}
+        return {
+            "enabled": settings.mcp_tool_cache_enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "tools": tools,
+        }
@@ -0,0 +1,220 @@
+"""
+Métricas agregadas das chamadas de ferramentas MCP.
+
+Em vez de guardar todas as chamadas, cada série (tool, tenant, agent_type)
+mantém contadores e um histograma de latência com buckets logarítmicos
+(estilo HDR: erro relativo <= 10%, memória fixa por série). Percentis são
+calculados a partir do histograma e as séries são expostas em /mcp/stats e
+no formato texto do Prometheus em /mcp/metrics.
+"""
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+
+# Buckets: MIN_MS * GROWTH^i, de 0.5 ms até ~10 min
+MIN_MS = 0.5
+GROWTH = 1.1
+BUCKETS = int(math.ceil(math.log(600_000 / MIN_MS) / math.log(GROWTH))) + 1
+_LOG_GROWTH = math.log(GROWTH)
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Label usado quando o limite de séries é atingido
+OVERFLOW_TENANT = "_other"
+
+
+class LatencyHistogram:
+    """Histograma logarítmico de latências (ms)."""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float) -> None:
+        if latency_ms <= MIN_MS:
+            index = 0
+        else:
+            index = min(BUCKETS - 1, int(math.log(latency_ms / MIN_MS) / _LOG_GROWTH) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Limite superior do bucket que contém o quantil q (0-1)."""
+        if not self.count:
+            return None
+        target = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(MIN_MS * GROWTH ** i, self.max_ms)
+        return self.max_ms
+
+
+class SeriesStats:
+    """Agregados de uma série (tool, tenant, agent_type)."""
+
+    __slots__ = ("calls", "errors", "cache_hits", "latency", "last_call_at")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.latency = LatencyHistogram()
+        self.last_call_at = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value, 2) if value is not None else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "cache_hits": self.cache_hits,
+            "avg_ms": ms(self.latency.total_ms / self.latency.count) if self.latency.count else None,
+            "p50_ms": ms(self.latency.percentile(0.5)),
+            "p95_ms": ms(self.latency.percentile(0.95)),
+            "p99_ms": ms(self.latency.percentile(0.99)),
+            "max_ms": ms(self.latency.max_ms) if self.latency.count else None,
+        }
+
+
+SeriesKey = Tuple[str, str, str]
+
+
+class ToolCallMetrics:
+    """Agregação em streaming das chamadas de ferramentas."""
+
+    def __init__(self, max_series: Optional[int] = None):
+        self._max_series = max_series
+        self._series: Dict[SeriesKey, SeriesStats] = {}
+        self.total_calls = 0
+
+    @property
+    def max_series(self) -> int:
+        return self._max_series or settings.mcp_metrics_max_series
+
+    def record(
+        self,
+        tool: str,
+        tenant_id: str,
+        agent_type: str,
+        latency_ms: float,
+        success: bool,
+        cached: bool = False
+    ) -> None:
+        key = (tool, str(tenant_id), agent_type)
+        series = self._series.get(key)
+        if series is None:
+            if len(self._series) >= self.max_series:
+                # Limita a cardinalidade: tenants novos caem numa série comum
+                key = (tool, OVERFLOW_TENANT, agent_type)
+                series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = SeriesStats()
+
+        self.total_calls += 1
+        series.calls += 1
+        series.errors += int(not success)
+        series.cache_hits += int(cached)
+        series.latency.record(latency_ms)
+        series.last_call_at = time.time()
+
+    def by_tool(self) -> Dict[str, SeriesStats]:
+        """Séries agregadas por ferramenta (todos os tenants/agentes)."""
+        tools: Dict[str, SeriesStats] = {}
+        for (tool, _, _), series in self._series.items():
+            total = tools.setdefault(tool, SeriesStats())
+            total.calls += series.calls
+            total.errors += series.errors
+            total.cache_hits += series.cache_hits
+            total.latency.merge(series.latency)
+            total.last_call_at = max(total.last_call_at, series.last_call_at)
+        return tools
+
+    def get_stats(self, top: int = 50) -> Dict[str, Any]:
+        slowest = sorted(
+            self._series.items(),
+            key=lambda item: item[1].latency.percentile(0.95) or 0.0,
+            reverse=True
+        )[:top]
+        return {
+            "total_calls": self.total_calls,
+            "series": len(self._series),
+            "tools": {tool: s.to_dict() for tool, s in sorted(self.by_tool().items())},
+            "slowest_series": [
+                {"tool": tool, "tenant_id": tenant, "agent_type": agent_type, **s.to_dict()}
+                for (tool, tenant, agent_type), s in slowest
+            ],
+        }
+
+    def render_prometheus(self) -> str:
+        """Séries no formato de exposição texto do Prometheus (summary)."""
+        lines: List[str] = [
+            "# HELP mcp_tool_calls_total Chamadas de ferramentas MCP",
+            "# TYPE mcp_tool_calls_total counter",
+        ]
+
+        def labels(tool: str, tenant: str, agent_type: str, **extra: str) -> str:
+            pairs = {"tool": tool, "tenant_id": tenant, "agent_type": agent_type, **extra}
+            body = ",".join(
+                '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                for k, v in pairs.items()
+            )
+            return "{" + body + "}"
+
+        items = sorted(self._series.items())
+        for key, s in items:
+            lines.append(f"mcp_tool_calls_total{labels(*key)} {s.calls}")
+
+        lines += [
+            "# HELP mcp_tool_call_errors_total Chamadas de ferramentas MCP com erro",
+            "# TYPE mcp_tool_call_errors_total counter",
+        ]
+        for key, s in items:
+            lines.append(f"mcp_tool_call_errors_total{labels(*key)} {s.errors}")
+
+        lines += [
+            "# HELP mcp_tool_cache_hits_total Chamadas servidas pelo cache de resultados",
+            "# TYPE mcp_tool_cache_hits_total counter",
+        ]
+        for key, s in items:
+            lines.append(f"mcp_tool_cache_hits_total{labels(*key)} {s.cache_hits}")
+
+        lines += [
+            "# HELP mcp_tool_call_duration_seconds Latência das chamadas de ferramentas MCP",
+            "# TYPE mcp_tool_call_duration_seconds summary",
+        ]
+        for key, s in items:
+            for q in QUANTILES:
+                value = s.latency.percentile(q) or 0.0
+                lines.append(
+                    f"mcp_tool_call_duration_seconds{labels(*key, quantile=str(q))} {value / 1000:.6f}"
+                )
+            lines.append(f"mcp_tool_call_duration_seconds_sum{labels(*key)} {s.latency.total_ms / 1000:.6f}")
+            lines.append(f"mcp_tool_call_duration_seconds_count{labels(*key)} {s.latency.count}")
+
+        return "\n".join(lines) + "\n"
@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import structlog
 
-from mcp.server import CRMMCPServer, ToolParameter
+from mcp.server import CRMMCPServer, ToolParameter, ToolCachePolicy
 
 logger = structlog.get_logger()
 
@@ -29,7 +29,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="campaign_config", type="object", description="Configuração da campanha (objetivo, budget, criativo)"),
         ],
         handler=predict_campaign_performance,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -157,7 +158,13 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="date_range", type="string", description="Período (7d, 14d, 30d)", required=False, default="7d"),
         ],
         handler=get_campaign_insights,
-        category="ads"
+        category="ads",
+        read_only=True,
+        cache=ToolCachePolicy(
+            ttl_seconds=300,
+            key_fields=["campaign_id", "date_range"],
+            invalidated_by=["optimize_campaign", "pause_campaign", "scale_campaign"]
+        )
     )
     
     # =====================================================
@@ -172,7 +179,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="top_k", type="number", description="Número de campanhas", required=False, default=5),
         ],
         handler=get_best_performing,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -185,7 +193,9 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_brand_guidelines,
-        category="ads"
+        category="ads",
+        read_only=True,
+        cache=ToolCachePolicy(ttl_seconds=600)
     )
     
     # =====================================================
@@ -199,7 +209,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="objective", type="string", description="Objetivo da campanha"),
         ],
         handler=get_audience_suggestions,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -215,7 +226,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tone", type="string", description="Tom (formal, casual, urgente)", required=False, default="casual"),
         ],
         handler=generate_ad_copy,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -229,7 +241,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="creative_config", type="object", description="Configuração do criativo"),
         ],
         handler=validate_creative,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -244,7 +257,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="target_conversions", type="number", description="Meta de conversões", required=False),
         ],
         handler=get_budget_recommendation,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -276,7 +290,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="industry", type="string", description="Indústria/vertical", required=False),
         ],
         handler=get_competitor_insights,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     # =====================================================
@@ -290,7 +305,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="days_ahead", type="number", description="Dias para prever", required=False, default=30),
         ],
         handler=forecast_spend,
-        category="ads"
+        category="ads",
+        read_only=True
     )
     
     logger.info("Ads tools registered", count=18)
@@ -1047,7 +1047,8 @@ def register_tools(server) -> None:
             ToolParameter(name="pipeline_id", type="string", description="ID do pipeline (opcional)", required=False),
         ],
         handler=analyze_sales_funnel,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1058,7 +1059,8 @@ def register_tools(server) -> None:
             ToolParameter(name="period", type="string", description="Período: 7d, 30d, 90d", required=False, default="30d"),
         ],
         handler=analyze_support_metrics,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1069,7 +1071,8 @@ def register_tools(server) -> None:
             ToolParameter(name="period", type="string", description="Período: 7d, 30d, 90d", required=False, default="30d"),
         ],
         handler=analyze_marketing_performance,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1080,7 +1083,8 @@ def register_tools(server) -> None:
             ToolParameter(name="period", type="string", description="Período: 7d, 30d, 90d", required=False, default="30d"),
         ],
         handler=get_executive_summary,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     # =====================================================
@@ -1094,7 +1098,8 @@ def register_tools(server) -> None:
             ToolParameter(name="months", type="number", description="Quantidade de meses para prever", required=False, default=3),
         ],
         handler=predict_revenue,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1105,7 +1110,8 @@ def register_tools(server) -> None:
             ToolParameter(name="days", type="number", description="Dias para prever", required=False, default=7),
         ],
         handler=predict_lead_volume,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1115,7 +1121,8 @@ def register_tools(server) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=predict_churn_risk,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1126,7 +1133,8 @@ def register_tools(server) -> None:
             ToolParameter(name="metric", type="string", description="Métrica para analisar: conversion_rate, response_time, roas, etc"),
         ],
         handler=detect_anomalies,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     # =====================================================
@@ -1255,7 +1263,8 @@ def register_tools(server) -> None:
             ToolParameter(name="context", type="object", description="Contexto adicional", required=False),
         ],
         handler=ask_analyst,
-        category="bi"
+        category="bi",
+        read_only=True
     )
     
     server.register_tool(
@@ -1265,6 +1274,7 @@ def register_tools(server) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_proactive_insights,
-        category="bi"
+        category="bi",
+        read_only=True
     )
 
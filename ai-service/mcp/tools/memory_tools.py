@@ -29,7 +29,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_memory_for_lead,
-        category="memory"
+        category="memory",
+        read_only=True
     )
     
     # =====================================================
@@ -62,7 +63,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="limit", type="number", description="Limite de itens", required=False, default=10),
         ],
         handler=get_short_term_memory,
-        category="memory"
+        category="memory",
+        read_only=True
     )
     
     # =====================================================
@@ -77,7 +79,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="entity_type", type="string", description="Tipo (lead, campaign, tenant)", required=False, default="lead"),
         ],
         handler=get_long_term_memory,
-        category="memory"
+        category="memory",
+        read_only=True
     )
     
     # =====================================================
@@ -92,7 +95,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="top_k", type="number", description="Número de resultados", required=False, default=5),
         ],
         handler=search_similar_contexts,
-        category="memory"
+        category="memory",
+        read_only=True
     )
     
     # =====================================================
@@ -106,7 +110,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_conversation_embedding,
-        category="memory"
+        category="memory",
+        read_only=True
     )
     
     # =====================================================
@@ -137,7 +142,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="memory_type", type="string", description="Tipo específico", required=False),
         ],
         handler=get_tenant_memory,
-        category="memory"
+        category="memory",
+        read_only=True
     )
     
     logger.info("Memory tools registered", count=8)
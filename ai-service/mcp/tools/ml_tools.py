@@ -7,10 +7,9 @@ para fazer predições e gerenciar o ciclo de vida dos modelos.
 Total: 8 ferramentas
 """
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 import structlog
 
-from mcp.server import CRMMCPServer, ToolParameter
+from mcp.server import CRMMCPServer, ToolParameter, ToolCachePolicy
 
 logger = structlog.get_logger()
 
@@ -30,7 +29,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="features", type="object", description="Features do lead", required=False),
         ],
         handler=predict_lead_conversion,
-        category="ml"
+        category="ml",
+        read_only=True
     )
     
     # =====================================================
@@ -44,7 +44,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="config", type="object", description="Configuração da campanha"),
         ],
         handler=predict_campaign_metrics,
-        category="ml"
+        category="ml",
+        read_only=True
     )
     
     # =====================================================
@@ -58,7 +59,13 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_model_info,
-        category="ml"
+        category="ml",
+        read_only=True,
+        cache=ToolCachePolicy(
+            ttl_seconds=300,
+            key_fields=["model_type"],
+            invalidated_by=["trigger_training", "rollback_model"]
+        )
     )
     
     # =====================================================
@@ -72,7 +79,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_feature_importance,
-        category="ml"
+        category="ml",
+        read_only=True
     )
     
     # =====================================================
@@ -100,7 +108,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_training_status,
-        category="ml"
+        category="ml",
+        read_only=True
     )
     
     # =====================================================
@@ -115,7 +124,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="versions", type="array", description="Versões a comparar", required=False),
         ],
         handler=compare_models,
-        category="ml"
+        category="ml",
+        read_only=True
     )
     
     # =====================================================
@@ -335,27 +345,28 @@ async def get_feature_importance(model_type: str, tenant_id: str) -> Dict[str, A
 
 
 async def trigger_training(model_type: str, tenant_id: str) -> Dict[str, Any]:
-    """Inicia treinamento de modelo."""
+    """Inicia treinamento de modelo (fila do TrainingExecutor)."""
     try:
-        import uuid
+        from app.ml.training.training_job import get_training_job
         
-        job_id = str(uuid.uuid4())
+        training_job = get_training_job()
+        if model_type not in training_job.MODEL_TYPES:
+            return {"success": False, "error": f"Tipo de modelo não treinável: {model_type}"}
         
-        # TODO: Integrar com sistema de jobs real (Celery, etc.)
+        job = training_job.schedule(tenant_id, [model_type])[0]
         
         logger.info("Training triggered",
             model_type=model_type,
             tenant_id=tenant_id,
-            job_id=job_id
+            job_id=job.job_id
         )
         
         return {
             "success": True,
-            "job_id": job_id,
+            "job_id": job.job_id,
             "model_type": model_type,
             "tenant_id": tenant_id,
-            "status": "queued",
-            "estimated_time_minutes": 15
+            "status": job.status
         }
         
     except Exception as e:
@@ -364,22 +375,15 @@ async def trigger_training(model_type: str, tenant_id: str) -> Dict[str, Any]:
 
 
 async def get_training_status(job_id: str, tenant_id: str) -> Dict[str, Any]:
-    """Retorna status de treinamento."""
+    """Retorna status e progresso de um job de treinamento."""
     try:
-        # TODO: Buscar status real do job
+        from app.ml.training.executor import get_training_executor
         
-        return {
-            "job_id": job_id,
-            "tenant_id": tenant_id,
-            "status": "completed",
-            "progress": 100,
-            "metrics": {
-                "accuracy": 0.85,
-                "loss": 0.15,
-                "epochs": 50
-            },
-            "completed_at": datetime.utcnow().isoformat()
-        }
+        job = get_training_executor().get_job(job_id)
+        if job is None or (job["tenant_id"] and job["tenant_id"] != tenant_id):
+            return {"job_id": job_id, "tenant_id": tenant_id, "status": "not_found"}
+        
+        return job
         
     except Exception as e:
         logger.error("Error getting training status", error=str(e))
@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import structlog
 
-from mcp.server import CRMMCPServer, ToolParameter
+from mcp.server import CRMMCPServer, ToolParameter, ToolCachePolicy
 
 logger = structlog.get_logger()
 
@@ -31,7 +31,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="top_k", type="number", description="Número de resultados", required=False, default=5),
         ],
         handler=search_knowledge,
-        category="rag"
+        category="rag",
+        read_only=True
     )
     
     # =====================================================
@@ -46,7 +47,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="agent_type", type="string", description="Tipo de agente (sdr, ads)", required=False),
         ],
         handler=get_best_practices,
-        category="rag"
+        category="rag",
+        read_only=True
     )
     
     # =====================================================
@@ -60,7 +62,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="domain", type="string", description="Domínio (sdr, ads, pricing)", required=False),
         ],
         handler=get_rules,
-        category="rag"
+        category="rag",
+        read_only=True
     )
     
     # =====================================================
@@ -74,7 +77,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="pattern_type", type="string", description="Tipo de padrão (campaign, lead, creative)", required=False),
         ],
         handler=get_patterns,
-        category="rag"
+        category="rag",
+        read_only=True
     )
     
     # =====================================================
@@ -120,7 +124,15 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_knowledge_stats,
-        category="rag"
+        category="rag",
+        read_only=True,
+        cache=ToolCachePolicy(
+            ttl_seconds=300,
+            invalidated_by=[
+                "add_knowledge", "upload_document", "invalidate_knowledge",
+                "learn_from_campaigns", "add_to_knowledge_base",
+            ]
+        )
     )
     
     # =====================================================
@@ -150,7 +162,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="max_tokens", type="number", description="Máximo de tokens no contexto", required=False, default=2000),
         ],
         handler=get_context_for_prompt,
-        category="rag"
+        category="rag",
+        read_only=True
     )
     
     # =====================================================
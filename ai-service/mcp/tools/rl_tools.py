@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import structlog
 
-from mcp.server import CRMMCPServer, ToolParameter
+from mcp.server import CRMMCPServer, ToolParameter, ToolCachePolicy
 
 logger = structlog.get_logger()
 
@@ -77,7 +77,16 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="agent_type", type="string", description="Tipo de agente", required=False),
         ],
         handler=get_rl_status,
-        category="rl"
+        category="rl",
+        read_only=True,
+        cache=ToolCachePolicy(
+            ttl_seconds=60,
+            key_fields=["agent_type"],
+            invalidated_by=[
+                "record_experience", "add_reward", "clear_experiences",
+                "record_sdr_experience", "record_ads_experience",
+            ]
+        )
     )
     
     # =====================================================
@@ -91,7 +100,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_action_stats,
-        category="rl"
+        category="rl",
+        read_only=True
     )
     
     # =====================================================
@@ -106,7 +116,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="state", type="object", description="Estado que gerou a ação"),
         ],
         handler=explain_action,
-        category="rl"
+        category="rl",
+        read_only=True
     )
     
     # =====================================================
@@ -122,7 +133,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=validate_action,
-        category="rl"
+        category="rl",
+        read_only=True
     )
     
     # =====================================================
@@ -136,7 +148,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_policy_mode,
-        category="rl"
+        category="rl",
+        read_only=True
     )
     
     # =====================================================
@@ -150,7 +163,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_experience_count,
-        category="rl"
+        category="rl",
+        read_only=True
     )
     
     # =====================================================
@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import structlog
 
-from mcp.server import CRMMCPServer, ToolParameter
+from mcp.server import CRMMCPServer, ToolParameter, ToolCachePolicy
 
 logger = structlog.get_logger()
 
@@ -29,7 +29,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=predict_lead_score,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -73,7 +74,16 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="include_messages", type="boolean", description="Incluir histórico de mensagens", required=False, default=True),
         ],
         handler=get_lead_context,
-        category="sdr"
+        category="sdr",
+        read_only=True,
+        cache=ToolCachePolicy(
+            ttl_seconds=60,
+            key_fields=["lead_id", "include_messages"],
+            invalidated_by=[
+                "move_lead_stage", "update_lead_memory", "send_message", "schedule_meeting",
+                "qualify_lead", "escalate_to_human", "support_move_lead_stage",
+            ]
+        )
     )
     
     # =====================================================
@@ -87,7 +97,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_lead_memory,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -118,7 +129,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="top_k", type="number", description="Número de resultados", required=False, default=5),
         ],
         handler=search_similar_leads,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -182,7 +194,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="lead_id", type="string", description="ID do lead (para contexto)", required=False),
         ],
         handler=classify_intent,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -196,7 +209,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=detect_objection,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -211,7 +225,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="last_message", type="string", description="Última mensagem do lead"),
         ],
         handler=get_response_suggestion,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -243,7 +258,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="tenant_id", type="string", description="ID do tenant"),
         ],
         handler=get_conversation_summary,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -273,7 +289,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="product_name", type="string", description="Nome do produto"),
         ],
         handler=get_product_info,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -288,7 +305,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="seller_id", type="string", description="ID do vendedor", required=False),
         ],
         handler=check_availability,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     # =====================================================
@@ -303,7 +321,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="product_value", type="number", description="Valor do produto"),
         ],
         handler=calculate_discount,
-        category="sdr"
+        category="sdr",
+        read_only=True
     )
     
     logger.info("SDR tools registered", count=19)
@@ -834,7 +853,7 @@ async def classify_intent(
         from app.ml.classifier import SDRClassifier
         
         classifier = SDRClassifier()
-        result = await classifier.classify_intent(message)
+        result = await classifier.classify_intent(message, tenant_id=tenant_id)
         
         return {
             "message": message[:100],
@@ -40,7 +40,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="section", type="string", description="Secao especifica (ex: leads, tickets, dashboard)", required=False),
         ],
         handler=search_manual,
-        category="support"
+        category="support",
+        read_only=True
     )
 
     # =====================================================
@@ -55,7 +56,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="max_results", type="number", description="Maximo de resultados", required=False, default=20),
         ],
         handler=search_codebase,
-        category="support"
+        category="support",
+        read_only=True
     )
 
     # =====================================================
@@ -70,7 +72,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="line_end", type="number", description="Linha final", required=False),
         ],
         handler=read_file,
-        category="support"
+        category="support",
+        read_only=True
     )
 
     # =====================================================
@@ -134,7 +137,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="filter", type="string", description="Filtro grep opcional", required=False),
         ],
         handler=get_error_logs,
-        category="support"
+        category="support",
+        read_only=True
     )
 
     # =====================================================
@@ -145,7 +149,8 @@ def register_tools(server: CRMMCPServer) -> None:
         description="Mostra status do repositorio Git (arquivos modificados, branch, etc).",
         parameters=[],
         handler=git_status,
-        category="support"
+        category="support",
+        read_only=True
     )
 
     # =====================================================
@@ -159,7 +164,8 @@ def register_tools(server: CRMMCPServer) -> None:
             ToolParameter(name="staged", type="boolean", description="Mostrar apenas staged", required=False, default=False),
         ],
         handler=git_diff,
-        category="support"
+        category="support",
+        read_only=True
     )
 
     # =====================================================
@@ -247,63 +253,25 @@ def register_tools(server: CRMMCPServer) -> None:
 # =============================================================================
 
 async def search_manual(query: str, section: Optional[str] = None, **kwargs) -> Dict[str, Any]:
-    """Busca semantica no manual de usabilidade."""
-    try:
-        manual_path = settings.support_manual_path
-
-        # Le o manual
-        if settings.git_repo_path:
-            full_path = os.path.join(settings.git_repo_path, manual_path)
-        else:
-            full_path = manual_path
+    """Busca ranqueada no manual de usabilidade (indice em memoria por secao)."""
+    from app.rag.manual_index import manual_index
 
-        if not os.path.exists(full_path):
+    try:
+        try:
+            results = await manual_index.search(query, section=section, limit=10)
+        except FileNotFoundError as e:
             return {
                 "success": False,
-                "error": f"Manual nao encontrado em {full_path}",
+                "error": f"Manual nao encontrado em {e}",
                 "suggestion": "Verifique se o caminho support_manual_path esta correto no .env"
             }
 
-        with open(full_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Busca simples por enquanto (pode ser melhorado com RAG/embeddings)
-        query_lower = query.lower()
-        lines = content.split('\n')
-        results = []
-        current_section = ""
-
-        for i, line in enumerate(lines):
-            # Detecta secoes
-            if line.startswith('# '):
-                current_section = line[2:].strip()
-            elif line.startswith('## '):
-                current_section = line[3:].strip()
-
-            # Filtra por secao se especificada
-            if section and section.lower() not in current_section.lower():
-                continue
-
-            # Busca o termo
-            if query_lower in line.lower():
-                # Pega contexto (5 linhas antes e depois)
-                start = max(0, i - 5)
-                end = min(len(lines), i + 6)
-                context = '\n'.join(lines[start:end])
-
-                results.append({
-                    "line": i + 1,
-                    "section": current_section,
-                    "context": context,
-                    "match": line.strip()
-                })
-
         return {
             "success": True,
             "query": query,
             "section_filter": section,
             "results_count": len(results),
-            "results": results[:10],  # Limita a 10 resultados
+            "results": results,
             "suggestion": f"Encontrados {len(results)} resultados para '{query}'" if results else f"Nenhum resultado para '{query}'. Tente termos diferentes."
         }
 
@@ -313,49 +281,21 @@ async def search_manual(query: str, section: Optional[str] = None, **kwargs) ->
 
 
 async def search_codebase(query: str, file_pattern: str = "**/*", max_results: int = 20, **kwargs) -> Dict[str, Any]:
-    """Busca no codigo fonte usando grep."""
-    try:
-        repo_path = settings.git_repo_path or os.getcwd()
+    """Busca no codigo fonte usando o indice de trigramas (fora do event loop)."""
+    from app.services.code_index import get_code_index
 
-        # Usa ripgrep se disponivel, senao grep
-        try:
-            cmd = f'rg -n -l --glob "{file_pattern}" "{query}" "{repo_path}"'
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
-            files = result.stdout.strip().split('\n') if result.stdout.strip() else []
-        except:
-            cmd = f'grep -rn --include="{file_pattern}" "{query}" "{repo_path}"'
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
-            files = [line.split(':')[0] for line in result.stdout.strip().split('\n') if line]
-
-        # Remove duplicatas e limita resultados
-        files = list(set(files))[:max_results]
-
-        # Busca contexto em cada arquivo
-        matches = []
-        for file_path in files:
-            if not file_path:
-                continue
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    lines = content.split('\n')
-                    for i, line in enumerate(lines):
-                        if query.lower() in line.lower():
-                            matches.append({
-                                "file": file_path.replace(repo_path, '').lstrip('/\\'),
-                                "line": i + 1,
-                                "content": line.strip()[:200]
-                            })
-            except:
-                pass
+    try:
+        result = await get_code_index().search(query, file_pattern=file_pattern, max_results=max_results)
 
         return {
             "success": True,
             "query": query,
             "pattern": file_pattern,
-            "files_count": len(files),
-            "matches_count": len(matches),
-            "matches": matches[:max_results]
+            "files_count": result["files_count"],
+            "matches_count": len(result["matches"]),
+            "matches": result["matches"],
+            "bytes_scanned": result["bytes_scanned"],
+            "truncated": result["truncated"],
         }
 
     except Exception as e:
@@ -16,6 +16,7 @@
 use Carbon\Carbon;
 use Illuminate\Http\JsonResponse;
 use Illuminate\Http\Request;
+use Illuminate\Support\Facades\Cache;
 use Illuminate\Support\Facades\Log;
 
 /**
@@ -23,7 +24,8 @@
  * 
  * O worker Python chama esses endpoints para:
  * 1. Buscar contexto completo do lead/agent
- * 2. Enviar a resposta processada
+ * 2. Enviar partes da mensagem enquanto o LLM gera (streaming, opcional)
+ * 3. Enviar a resposta processada
  */
 class AgentQueueController extends Controller
 {
@@ -152,6 +154,65 @@ public function handleResponse(Request $request): JsonResponse
         }
     }
 
+    /**
+     * Recebe uma parte da mensagem final durante o streaming do agente
+     * e envia imediatamente ao lead.
+     *
+     * As partes chegam em ordem (seq) e podem ser reenviadas pelo worker;
+     * o par stream_id/seq garante que cada parte sai uma única vez.
+     */
+    public function handleStreamChunk(Request $request): JsonResponse
+    {
+        $validated = $request->validate([
+            'ticket_id' => 'required|uuid',
+            'lead_id' => 'required|uuid',
+            'channel_id' => 'required|uuid',
+            'stream_id' => 'required|uuid',
+            'seq' => 'required|integer|min:0',
+            'text' => 'required|string',
+            'final' => 'boolean',
+        ]);
+
+        $dedupKey = "agent_stream:{$validated['stream_id']}:{$validated['seq']}";
+
+        try {
+            if (!Cache::add($dedupKey, true, now()->addHour())) {
+                return response()->json(['success' => true, 'duplicate' => true]);
+            }
+
+            $ticket = Ticket::find($validated['ticket_id']);
+            $lead = Lead::with(['contact'])->find($validated['lead_id']);
+            $channel = Channel::find($validated['channel_id']);
+
+            if (!$ticket || !$lead || !$channel) {
+                Cache::forget($dedupKey);
+                return response()->json(['error' => 'Entities not found'], 404);
+            }
+
+            $this->deliverMessage($validated['text'], $ticket, $lead, $channel, [
+                'processed_by' => 'python_queue',
+                'action' => 'send_message',
+                'stream_id' => $validated['stream_id'],
+                'stream_seq' => $validated['seq'],
+            ]);
+
+            return response()->json(['success' => true]);
+
+        } catch (\Exception $e) {
+            Cache::forget($dedupKey);
+
+            Log::error('Error processing agent stream chunk', [
+                'error' => $e->getMessage(),
+                'ticket_id' => $validated['ticket_id'],
+                'stream_id' => $validated['stream_id'],
+            ]);
+
+            return response()->json([
+                'error' => $this->safeErrorMessage($e)
+            ], 500);
+        }
+    }
+
     /**
      * Processa a ação retornada pelo agente
      */
@@ -185,10 +246,29 @@ protected function handleSendMessage(array $result, Ticket $ticket, Lead $lead,
     {
         $messageText = $result['message'] ?? '';
 
+        // Com streaming, o início da mensagem já foi entregue em partes
+        $streamedChars = (int) ($result['streamed_chars'] ?? 0);
+        if ($streamedChars > 0) {
+            $messageText = trim(mb_substr($messageText, $streamedChars));
+        }
+
         if (empty($messageText)) {
             return;
         }
 
+        $this->deliverMessage($messageText, $ticket, $lead, $channel, [
+            'processed_by' => 'python_queue',
+            'action' => $result['action'] ?? 'send_message',
+            'intent' => $result['intent']['name'] ?? null,
+            'stream_id' => $result['stream_id'] ?? null,
+        ]);
+    }
+
+    /**
+     * Envia o texto pelo WhatsApp e registra no ticket
+     */
+    protected function deliverMessage(string $messageText, Ticket $ticket, Lead $lead, Channel $channel, array $metadata): void
+    {
         // Carrega WhatsApp e envia
         $this->whatsAppService->loadFromChannel($channel);
         $phone = $lead->contact->phone;
@@ -202,11 +282,7 @@ protected function handleSendMessage(array $result, Ticket $ticket, Lead $lead,
             'direction' => MessageDirectionEnum::OUTBOUND,
             'message' => $messageText,
             'sent_at' => now(),
-            'metadata' => [
-                'processed_by' => 'python_queue',
-                'action' => $result['action'] ?? 'send_message',
-                'intent' => $result['intent']['name'] ?? null,
-            ],
+            'metadata' => array_filter($metadata, fn ($value) => $value !== null),
         ]);
 
         event(new TicketMessageCreated($message, $ticket));
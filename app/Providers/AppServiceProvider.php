@@ -124,5 +124,11 @@ protected function configureRateLimiting(): void
         RateLimiter::for('internal', function (Request $request) {
             return Limit::perMinute(300)->by($request->ip());
         });
+
+        // Partes de resposta em streaming: várias por resposta, todas vindas do
+        // IP do worker. Limite por stream para não disputar o de 'internal'
+        RateLimiter::for('internal-stream', function (Request $request) {
+            return Limit::perMinute(120)->by('stream:' . ($request->input('stream_id') ?: $request->ip()));
+        });
     }
 }
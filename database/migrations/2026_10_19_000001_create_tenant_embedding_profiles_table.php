@@ -0,0 +1,60 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     *
+     * Perfis de embedding por tenant (modelo + dimensões) e colunas de
+     * re-indexação online. Durante a migração de perfil o ai-service grava
+     * o novo vetor em embedding_next e só troca para embedding no cut-over.
+     */
+    public function up(): void
+    {
+        Schema::create('tenant_embedding_profiles', function (Blueprint $table) {
+            $table->uuid('id')->primary();
+            $table->foreignUuid('tenant_id')->unique()->constrained()->cascadeOnDelete();
+            $table->string('model', 100); // Perfil ativo (usado nas buscas)
+            $table->integer('dimensions')->nullable(); // null = dimensão completa do modelo
+            $table->string('target_model', 100)->nullable(); // Perfil em re-indexação
+            $table->integer('target_dimensions')->nullable();
+            $table->string('status', 20)->default('active'); // active, reindexing, failed
+            $table->jsonb('progress')->nullable(); // Linhas processadas por tabela, erros
+            $table->timestamp('cutover_at')->nullable();
+            $table->timestamps();
+        });
+
+        foreach (['sdr_knowledge_embeddings', 'knowledge_base'] as $tableName) {
+            Schema::table($tableName, function (Blueprint $table) use ($tableName) {
+                if (!Schema::hasColumn($tableName, 'embedding_profile')) {
+                    // Perfil que gerou o vetor (ex: text-embedding-3-small@512); null = legado
+                    $table->string('embedding_profile', 120)->nullable()->after('embedding');
+                }
+                if (!Schema::hasColumn($tableName, 'embedding_next')) {
+                    $table->json('embedding_next')->nullable()->after('embedding_profile');
+                }
+                if (!Schema::hasColumn($tableName, 'embedding_next_profile')) {
+                    $table->string('embedding_next_profile', 120)->nullable()->after('embedding_next');
+                }
+            });
+        }
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        foreach (['sdr_knowledge_embeddings', 'knowledge_base'] as $tableName) {
+            Schema::table($tableName, function (Blueprint $table) {
+                $table->dropColumn(['embedding_profile', 'embedding_next', 'embedding_next_profile']);
+            });
+        }
+
+        Schema::dropIfExists('tenant_embedding_profiles');
+    }
+};
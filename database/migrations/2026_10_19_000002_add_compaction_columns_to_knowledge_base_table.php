@@ -0,0 +1,37 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     *
+     * Colunas usadas pela compactação da base de conhecimento do ai-service:
+     * last_used_at (retenção por uso) e superseded_by (item que absorveu
+     * um quase-duplicado desativado).
+     */
+    public function up(): void
+    {
+        Schema::table('knowledge_base', function (Blueprint $table) {
+            if (!Schema::hasColumn('knowledge_base', 'last_used_at')) {
+                $table->timestamp('last_used_at')->nullable()->after('usage_count');
+            }
+            if (!Schema::hasColumn('knowledge_base', 'superseded_by')) {
+                $table->uuid('superseded_by')->nullable()->after('is_active');
+            }
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::table('knowledge_base', function (Blueprint $table) {
+            $table->dropColumn(['last_used_at', 'superseded_by']);
+        });
+    }
+};
@@ -1212,6 +1212,11 @@
     Route::post('response', [\App\Http\Controllers\AgentQueueController::class, 'handleResponse']);
 });
 
+// Partes da resposta em streaming: limite próprio por stream_id
+Route::middleware(['internal.api', 'throttle:internal-stream'])->prefix('agent')->group(function () {
+    Route::post('response/stream', [\App\Http\Controllers\AgentQueueController::class, 'handleStreamChunk']);
+});
+
 // =============================================================================
 // Rotas de Suporte (Histórico de ações do Zion) - Somente SuperAdmin
 // =============================================================================
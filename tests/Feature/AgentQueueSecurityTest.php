@@ -53,4 +53,26 @@ public function test_agent_response_rejects_with_invalid_key(): void
 
         $response->assertStatus(401);
     }
+
+    public function test_agent_response_stream_rejects_without_internal_key(): void
+    {
+        $response = $this->postJson('/api/agent/response/stream', [
+            'ticket_id' => '00000000-0000-0000-0000-000000000000',
+            'text' => 'Olá!',
+        ]);
+
+        $response->assertStatus(401);
+    }
+
+    public function test_agent_response_stream_rejects_with_invalid_key(): void
+    {
+        $response = $this->postJson('/api/agent/response/stream', [
+            'ticket_id' => '00000000-0000-0000-0000-000000000000',
+            'text' => 'Olá!',
+        ], [
+            'X-Internal-Key' => 'wrong-key',
+        ]);
+
+        $response->assertStatus(401);
+    }
 }
@@ -0,0 +1,131 @@
+<?php
+
+namespace Tests\Feature;
+
+use App\Events\TicketMessageCreated;
+use App\Models\Channel;
+use App\Models\Contact;
+use App\Models\Lead;
+use App\Models\Pipeline;
+use App\Models\PipelineStage;
+use App\Models\Tenant;
+use App\Models\Ticket;
+use App\Models\TicketMessage;
+use App\Services\WhatsAppService;
+use Illuminate\Foundation\Testing\RefreshDatabase;
+use Illuminate\Support\Facades\Event;
+use Illuminate\Support\Str;
+use Tests\TestCase;
+
+class AgentQueueStreamTest extends TestCase
+{
+    use RefreshDatabase;
+
+    private const INTERNAL_KEY = 'test-internal-key';
+
+    private array $payload;
+
+    protected function setUp(): void
+    {
+        parent::setUp();
+
+        config(['services.internal.api_key' => self::INTERNAL_KEY]);
+        Event::fake([TicketMessageCreated::class]);
+
+        $tenant = Tenant::create([
+            'name' => 'Test Tenant',
+            'slug' => 'test-tenant',
+            'plan' => 'professional',
+            'is_active' => true,
+        ]);
+
+        $pipeline = Pipeline::create([
+            'tenant_id' => $tenant->id,
+            'name' => 'Default Pipeline',
+            'is_default' => true,
+        ]);
+
+        $stage = PipelineStage::create([
+            'pipeline_id' => $pipeline->id,
+            'name' => 'Novo',
+            'position' => 1,
+            'color' => '#3B82F6',
+        ]);
+
+        $contact = Contact::create([
+            'tenant_id' => $tenant->id,
+            'name' => 'John Doe',
+            'phone' => '5511999999999',
+        ]);
+
+        $lead = Lead::create([
+            'tenant_id' => $tenant->id,
+            'contact_id' => $contact->id,
+            'pipeline_id' => $pipeline->id,
+            'stage_id' => $stage->id,
+        ]);
+
+        $channel = Channel::create([
+            'tenant_id' => $tenant->id,
+            'name' => 'WhatsApp',
+            'type' => 'whatsapp',
+            'identifier' => '5511888888888',
+        ]);
+
+        $ticket = Ticket::create([
+            'tenant_id' => $tenant->id,
+            'lead_id' => $lead->id,
+            'contact_id' => $contact->id,
+            'channel_id' => $channel->id,
+            'status' => 'open',
+        ]);
+
+        $this->payload = [
+            'ticket_id' => $ticket->id,
+            'lead_id' => $lead->id,
+            'channel_id' => $channel->id,
+            'stream_id' => (string) Str::uuid(),
+            'seq' => 0,
+            'text' => 'Olá! Tudo bem?',
+        ];
+    }
+
+    private function postChunk(array $overrides = [])
+    {
+        return $this->postJson('/api/agent/response/stream', array_merge($this->payload, $overrides), [
+            'X-Internal-Key' => self::INTERNAL_KEY,
+        ]);
+    }
+
+    public function test_stream_chunk_is_delivered_once_and_duplicate_seq_is_ignored(): void
+    {
+        $this->mock(WhatsAppService::class, function ($mock) {
+            $mock->shouldReceive('loadFromChannel')->once()->andReturnSelf();
+            $mock->shouldReceive('sendTextMessage')->once()->with('5511999999999', 'Olá! Tudo bem?');
+        });
+
+        $this->postChunk()
+            ->assertStatus(200)
+            ->assertJson(['success' => true])
+            ->assertJsonMissing(['duplicate' => true]);
+
+        // Retry do worker com o mesmo seq: não reenvia
+        $this->postChunk()
+            ->assertStatus(200)
+            ->assertJson(['success' => true, 'duplicate' => true]);
+
+        $this->assertSame(1, TicketMessage::withoutGlobalScopes()->where('ticket_id', $this->payload['ticket_id'])->count());
+        Event::assertDispatchedTimes(TicketMessageCreated::class, 1);
+    }
+
+    public function test_stream_chunk_uses_its_own_rate_limiter(): void
+    {
+        $this->mock(WhatsAppService::class, function ($mock) {
+            $mock->shouldReceive('loadFromChannel')->andReturnSelf();
+            $mock->shouldReceive('sendTextMessage');
+        });
+
+        // Limite por stream (internal-stream), não o de 300/min por IP de 'internal'
+        $this->postChunk()->assertHeader('X-RateLimit-Limit', '120');
+    }
+}